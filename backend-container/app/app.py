@@ -1,113 +1,151 @@
-from flask import Flask, request, jsonify
-import boto3
-from botocore.exceptions import ClientError
+from flask import Flask, Response, g, request, jsonify
+from flask.json.provider import JSONProvider
+from werkzeug.exceptions import BadRequest, RequestEntityTooLarge
 import os
-import time
-import random
 import logging
-from decimal import Decimal
-import base64
-from cryptography.fernet import Fernet
-
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
+from time import perf_counter
+from dadpass_core import fastjson, tracing
+from dadpass_core.clients import create_client
+from dadpass_core.keyring import start_key_ring
+from dadpass_core.keys import DEFAULT_KEY_LENGTH
+from dadpass_core.logs import configure_logging
+from dadpass_core.metrics import REGISTRY, PROMETHEUS_CONTENT_TYPE
+from dadpass_core.service import (
+    MessageService, InvalidMessageError, RequestTooLargeError, SizeLimits, COLLISION_ERROR, DEFAULT_MAX_MESSAGE_LENGTH,
+    SERIALIZE_SECONDS
+)
+from dadpass_core.items import COMPACT_FORMAT
+from dadpass_core.store import create_store, MessageKeyExistsError
+
+# Configure logging: LOG_LEVEL (default INFO), written and redacted off the request thread (see dadpass_core.logs)
+log_pipeline = configure_logging()
 log = logging.getLogger(__name__)
 
 app = Flask(__name__)
 
-# DynamoDB setup
-dynamodb = boto3.resource('dynamodb', region_name=os.environ.get('AWS_REGION', 'us-east-1'))
-table_name = os.environ.get('MESSAGES_TABLE_NAME', 'dad-pass-messages-dev')
-table = dynamodb.Table(table_name)
-
-# TTL duration options in seconds
-TTL_OPTIONS = {
-    '15min': 900,
-    '1hour': 3600,
-    '1day': 86400,
-    '5days': 432000
-}
-
 #
-# Encryption utilities
+# Metrics (exposed at /metrics; per-stage timings are recorded by dadpass_core.service)
 #
 
-def _load_master_key_from_ssm() -> bytes:
+REQUEST_SECONDS = REGISTRY.histogram(
+    'dadpass_request_seconds', 'Total request latency by route', labels=('method', 'route')
+)
+REQUESTS = REGISTRY.counter(
+    'dadpass_requests_total', 'Requests by route and response status', labels=('method', 'route', 'status')
+)
+
+
+class FastJSONProvider(JSONProvider):
     """
-    Retrieves the master encryption key from AWS SSM Parameter Store.
-    
-    Returns:
-        The master key as bytes, suitable for Fernet encryption
+    Request and response bodies through dadpass_core.fastjson (orjson when installed).
+
+    Responses are written straight to bytes, and their serialization is
+    recorded as the 'serialize' stage.
     """
-    ssm = boto3.client('ssm', region_name=os.environ.get('AWS_REGION', 'us-east-1'))
-    parameter_name = '/dad-pass/encryption-key'
-    
-    try:
-        response = ssm.get_parameter(
-            Name=parameter_name,
-            WithDecryption=True  # Decrypt SecureString parameter
-        )
-        key_string = response['Parameter']['Value']
-        log.info(f"Master encryption key loaded from SSM: {parameter_name}")
-        return key_string.encode('utf-8')
-    except Exception as e:
-        log.error(f"Failed to retrieve encryption key from SSM: {str(e)}")
-        raise
 
+    mimetype = 'application/json'
 
-# Load the master key once at module initialization (when Flask app starts)
-_MASTER_KEY = _load_master_key_from_ssm()
+    def dumps(self, obj, **kwargs) -> str:
+        return fastjson.dumps_str(obj)
 
+    def loads(self, s: str | bytes, **kwargs):
+        return fastjson.loads(s)
 
-def _get_master_key() -> bytes:
-    """Returns the cached master encryption key."""
-    return _MASTER_KEY
+    def response(self, *args, **kwargs) -> Response:
+        obj = self._prepare_response_obj(args, kwargs)
+        start = perf_counter()
+        body = fastjson.dumps(obj)
+        SERIALIZE_SECONDS.observe(perf_counter() - start)
+        return self._app.response_class(body, mimetype=self.mimetype)
 
 
-def encrypt_message(plaintext: str) -> str:
-    """
-    Encrypts a plaintext message using Fernet symmetric encryption.
-    
-    Args:
-        plaintext: The message text to encrypt
-    
-    Returns:
-        Base64-encoded encrypted message (URL-safe)
-    """
-    try:
-        fernet = Fernet(_get_master_key())
-        encrypted_bytes = fernet.encrypt(plaintext.encode('utf-8'))
-        return encrypted_bytes.decode('utf-8')  # Fernet already returns base64-encoded
-    except Exception as e:
-        log.error(f"Encryption failed: {str(e)}")
-        raise
+app.json = FastJSONProvider(app)
 
 
-def decrypt_message(ciphertext: str) -> str:
-    """
-    Decrypts an encrypted message using Fernet symmetric encryption.
-    MASTER_KEY
-    Args:
-        ciphertext: Base64-encoded encrypted message
-    
-    Returns:
-        Decrypted plaintext message
-    """
-    try:
-        fernet = Fernet(_get_master_key())
-        decrypted_bytes = fernet.decrypt(ciphertext.encode('utf-8'))
-        return decrypted_bytes.decode('utf-8')
-    except Exception as e:
-        log.error(f"Decryption failed: {str(e)}")
-        raise
+@app.before_request
+def _start_timer():
+    g.request_start = perf_counter()
 
 
-def generate_random_id(length: int) -> str:
-    """Generate a random alphanumeric ID."""
-    return ''.join(random.choices(
-        "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789", 
-        k=length
-    ))
+@app.after_request
+def _record_request(response):
+    # The route pattern, not the path, so message keys do not become label values
+    route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    REQUEST_SECONDS.labels(request.method, route).observe(perf_counter() - g.request_start)
+    REQUESTS.labels(request.method, route, str(response.status_code)).inc()
+    g.trace.set('http_status', response.status_code)
+    return response
+
+
+#
+# Tracing (TRACE_EXPORTER / TRACE_SAMPLE_RATE, see dadpass_core.tracing)
+#
+
+tracing.configure_tracing()
+
+
+@app.before_request
+def _start_trace():
+    # Named by route pattern: the message key in the path is the secret link itself
+    route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    # Entered here and exited in _end_trace, so the span covers the whole request
+    g.trace = tracing.trace(f"{request.method} {route}", parent=tracing.context_from_headers(request.headers))
+    g.trace.__enter__()
+
+
+@app.teardown_request
+def _end_trace(error):
+    trace = g.pop('trace', None)
+    if trace is not None:
+        trace.__exit__(type(error) if error is not None else None, error, None)
+
+
+#
+# Encryption keys
+#
+
+def _create_ssm_client():
+    # Its own session, timeouts and adaptive retries (see dadpass_core.clients)
+    return create_client('ssm', region_name=os.environ.get('AWS_REGION', 'us-east-1'))
+
+
+def _create_kms_client():
+    # Only built for DATA_KEY_PROVIDER=kms, on the first data key request
+    return create_client('kms', region_name=os.environ.get('AWS_REGION', 'us-east-1'))
+
+
+# Load the versioned key ring (when Flask app starts) and keep it fresh in the background
+# so keys can be rotated without a restart (KEY_LOAD_MODE / KEY_REFRESH_SECONDS, see start_key_ring)
+key_ring = start_key_ring(_create_ssm_client, _create_kms_client)
+
+# Message storage: DynamoDB by default, or MESSAGE_STORE=memory|redis (see dadpass_core.store)
+store = create_store(
+    os.environ.get('MESSAGE_STORE', 'dynamodb'),
+    table_name=os.environ.get('MESSAGES_TABLE_NAME', 'dad-pass-messages-dev'),
+    region_name=os.environ.get('AWS_REGION', 'us-east-1'),
+    redis_url=os.environ.get('REDIS_URL'),
+    item_format=int(os.environ.get('DYNAMODB_ITEM_FORMAT', COMPACT_FORMAT)),
+    # One pooled connection per request a worker can have in flight (gunicorn.conf.py sets it)
+    max_pool_connections=int(os.environ.get('DYNAMODB_MAX_CONNECTIONS', 0)) or None
+)
+
+# Create/read logic shared with the ASGI app and the Lambda handler (see dadpass_core.service)
+service = MessageService(
+    store,
+    key_length=int(os.environ.get('MESSAGE_KEY_LENGTH', DEFAULT_KEY_LENGTH)),
+    limits=SizeLimits(int(os.environ.get('MAX_MESSAGE_LENGTH', DEFAULT_MAX_MESSAGE_LENGTH)))
+)
+
+
+def _json_body(limit: int):
+    """The request's JSON body, refused from its Content-Length before reading if over `limit` bytes."""
+    service.limits.check_body(request.content_length, limit)
+    # A chunked body has no Content-Length; werkzeug stops reading it at the limit instead
+    request.max_content_length = limit
+    try:
+        return request.get_json()
+    except RequestEntityTooLarge:
+        raise RequestTooLargeError(f'Request body is larger than {limit} bytes')
 
 
 #
@@ -116,8 +154,24 @@ def generate_random_id(length: int) -> str:
 
 @app.route("/")
 def health_check():
-    """Health check endpoint."""
-    return jsonify({"status": "healthy"})
+    """Health check endpoint. Also reports whether the encryption keys are loaded."""
+    return jsonify({"status": "healthy", "ready": key_ring.ready})
+
+
+@app.route("/ready")
+def readiness_check():
+    """Readiness endpoint: 503 until the encryption keys have been loaded."""
+    if not key_ring.ready:
+        # Restart the background load if the previous attempt failed
+        key_ring.ensure_loading()
+        return jsonify({"status": "starting", "ready": False}), 503
+    return jsonify({"status": "ready", "ready": True})
+
+
+@app.route("/metrics")
+def metrics():
+    """Prometheus scrape endpoint for this worker process's metrics."""
+    return Response(REGISTRY.render(), content_type=PROMETHEUS_CONTENT_TYPE)
 
 
 @app.route("/dad-pass/<message_key>", methods=["GET"])
@@ -125,40 +179,7 @@ def get_message(message_key: str):
     """
     Retrieve and delete a message by its key (one-time access).
     """
-    try:
-        response = table.get_item(Key={'messageKey': message_key})
-        
-        if 'Item' not in response:
-            return jsonify({'message': 'Message is no longer available'})
-        
-        item = response['Item']
-        current_time = int(time.time())
-        
-        # Check if message has expired
-        ttl = item.get('ttl', 0)
-        ttl_value = int(ttl) if isinstance(ttl, (int, Decimal)) else 0
-        
-        if ttl_value < current_time:
-            # Delete expired message
-            table.delete_item(Key={'messageKey': message_key})
-            return jsonify({'message': 'Message is no longer available'})
-        
-        # Delete message after retrieval (one-time access)
-        table.delete_item(Key={'messageKey': message_key})
-        
-        # Decrypt the message
-        encrypted_message = item.get('encryptedMessage', '')
-        decrypted_message = decrypt_message(encrypted_message)
-        
-        # Return the decrypted message (maintaining API contract)
-        return jsonify({
-            'message': decrypted_message, 
-            'ttlOption': item.get('ttlOption', '5days')
-        })
-        
-    except Exception as e:
-        log.error(f"Error retrieving message: {str(e)}")
-        return jsonify({'message': 'Message is no longer available'})
+    return jsonify(service.get_message(message_key))
 
 
 @app.route("/dad-pass", methods=["POST"])
@@ -167,49 +188,52 @@ def create_message():
     Create a new encrypted message with a unique key.
     """
     try:
-        # Generate a random message key
-        message_key = generate_random_id(10)  # Longer for better uniqueness
-        message_in = request.get_json()
-        
-        if not message_in or 'message' not in message_in:
-            return jsonify({'error': 'Message is required'}), 400
-        
-        # Get TTL option from request, default to 5 days
-        ttl_option = message_in.get('ttlOption', '5days')
-        ttl_duration = TTL_OPTIONS.get(ttl_option, TTL_OPTIONS['5days'])
-        ttl_timestamp = int(time.time()) + ttl_duration
-        
-        # Encrypt the message before storing
-        encrypted_message = encrypt_message(message_in['message'])
-        
-        # Prepare item for DynamoDB (store encrypted message)
-        item = {
-            'messageKey': message_key,
-            'ttl': ttl_timestamp,
-            'encryptedMessage': encrypted_message,
-            'ttlOption': ttl_option
-        }
-        
-        # Store in DynamoDB with condition to prevent overwriting existing key
-        table.put_item(
-            Item=item,
-            ConditionExpression='attribute_not_exists(messageKey)'
-        )
-        
-        return jsonify({'messageKey': message_key})
-    
-    except ClientError as e:
-        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
-            log.error(f"Key collision detected for message key: {message_key}")
-            return jsonify({'error': 'Key collision occurred, this is rare. Please try again.'}), 500
-        log.error(f"Error creating message: {str(e)}")
-        return jsonify({'error': 'Failed to create message'}), 500
-        
+        return jsonify(service.create_message(_json_body(service.limits.max_body_bytes)))
+
+    except InvalidMessageError as e:
+        return jsonify({'error': str(e)}), 400
+
+    except RequestTooLargeError as e:
+        return jsonify({'error': str(e)}), 413
+
+    except MessageKeyExistsError:
+        return jsonify({'error': COLLISION_ERROR}), 500
+
     except Exception as e:
         log.error(f"Error creating message: {str(e)}")
         return jsonify({'error': 'Failed to create message'}), 500
 
 
+@app.route("/dad-pass/batch", methods=["POST"])
+def create_messages():
+    """
+    Create many encrypted messages in one request.
+
+    Takes a JSON array of {message, ttlOption} entries and returns
+    {"messages": [...]} in the same order, each {"messageKey"} or {"error"}.
+    """
+    try:
+        entries = _json_body(service.limits.max_batch_body_bytes)
+    except RequestTooLargeError as e:
+        return jsonify({'error': str(e)}), 413
+    except BadRequest:
+        # Malformed JSON is rejected as an invalid batch, as the Lambda does
+        entries = None
+
+    try:
+        return jsonify(service.create_messages(entries))
+
+    except InvalidMessageError as e:
+        return jsonify({'error': str(e)}), 400
+
+    except RequestTooLargeError as e:
+        return jsonify({'error': str(e)}), 413
+
+    except Exception as e:
+        log.error(f"Error creating messages: {str(e)}")
+        return jsonify({'error': 'Failed to create messages'}), 500
+
+
 if __name__ == "__main__":
     # Run the Flask development server
     port = int(os.environ.get('PORT', 5001))
@@ -0,0 +1,299 @@
+"""
+Async (ASGI) entry point for the dad-pass container backend.
+
+Serves the same routes and responses as app.py, but message storage is awaited
+on one shared aiobotocore client, so a worker keeps handling requests while
+DynamoDB round trips are in flight instead of blocking for each one.
+
+Run with: uvicorn asgi:app --host 0.0.0.0 --port 8000
+"""
+import logging
+import os
+import re
+from contextlib import asynccontextmanager
+from functools import cache
+from time import perf_counter
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Match, Route
+
+from dadpass_core import fastjson, tracing
+from dadpass_core.async_store import open_async_store, DEFAULT_MAX_POOL_CONNECTIONS
+from dadpass_core.clients import create_client
+from dadpass_core.items import COMPACT_FORMAT
+from dadpass_core.keyring import start_key_ring
+from dadpass_core.keys import DEFAULT_KEY_LENGTH
+from dadpass_core.logs import configure_logging
+from dadpass_core.metrics import REGISTRY, PROMETHEUS_CONTENT_TYPE
+from dadpass_core.service import (
+    AsyncMessageService, InvalidMessageError, RequestTooLargeError, SizeLimits, COLLISION_ERROR,
+    DEFAULT_MAX_MESSAGE_LENGTH, SERIALIZE_SECONDS
+)
+from dadpass_core.store import MessageKeyExistsError
+
+# Configure logging: LOG_LEVEL (default INFO), written and redacted off the request thread (see dadpass_core.logs)
+log_pipeline = configure_logging()
+log = logging.getLogger(__name__)
+
+#
+# Encryption keys
+#
+
+def _create_ssm_client():
+    # Its own session (the key load runs on its own thread), timeouts and adaptive retries
+    return create_client('ssm', region_name=os.environ.get('AWS_REGION', 'us-east-1'))
+
+
+def _create_kms_client():
+    # Only built for DATA_KEY_PROVIDER=kms, on the first data key request
+    return create_client('kms', region_name=os.environ.get('AWS_REGION', 'us-east-1'))
+
+
+# Spans go where TRACE_EXPORTER says; set up first so the key load is traced
+tracing.configure_tracing()
+
+# Same key ring setup as app.py: loaded in the background by default and kept fresh
+key_ring = start_key_ring(_create_ssm_client, _create_kms_client)
+
+#
+# Metrics (exposed at /metrics; the same series as app.py, so dashboards do not depend on the worker class)
+#
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    'dadpass_request_seconds', 'Total request latency by route', labels=('method', 'route')
+)
+REQUESTS = REGISTRY.counter(
+    'dadpass_requests_total', 'Requests by route and response status', labels=('method', 'route', 'status')
+)
+
+
+class FastJSONResponse(JSONResponse):
+    """Starlette's JSONResponse encoded with dadpass_core.fastjson, timed as the 'serialize' stage."""
+
+    def render(self, content) -> bytes:
+        start = perf_counter()
+        body = fastjson.dumps(content)
+        SERIALIZE_SECONDS.observe(perf_counter() - start)
+        return body
+
+
+async def _json_body(request: Request, limit: int):
+    """The request's JSON body, refused from its Content-Length before reading if over `limit` bytes."""
+    limits = request.app.state.service.limits
+    length = request.headers.get('content-length')
+    limits.check_body(int(length) if length and length.isdigit() else None, limit)
+    # A chunked body has no Content-Length; stop reading it at the limit instead
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        limits.check_body(len(body), limit)
+    return fastjson.loads(body)
+
+
+#
+# Routes
+#
+
+async def health_check(request: Request) -> JSONResponse:
+    """Health check endpoint. Also reports whether the encryption keys are loaded."""
+    return FastJSONResponse({"status": "healthy", "ready": key_ring.ready})
+
+
+async def readiness_check(request: Request) -> JSONResponse:
+    """Readiness endpoint: 503 until the encryption keys have been loaded."""
+    if not key_ring.ready:
+        # Restart the background load if the previous attempt failed
+        key_ring.ensure_loading()
+        return FastJSONResponse({"status": "starting", "ready": False}, status_code=503)
+    return FastJSONResponse({"status": "ready", "ready": True})
+
+
+async def metrics(request: Request) -> Response:
+    """Prometheus scrape endpoint for this worker process's request and per-stage timings (see dadpass_core.service)."""
+    return Response(REGISTRY.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
+async def get_message(request: Request) -> JSONResponse:
+    """
+    Retrieve and delete a message by its key (one-time access).
+    """
+    return FastJSONResponse(await request.app.state.service.get_message(request.path_params['message_key']))
+
+
+async def create_message(request: Request) -> JSONResponse:
+    """
+    Create a new encrypted message with a unique key.
+    """
+    try:
+        service = request.app.state.service
+        body = await _json_body(request, service.limits.max_body_bytes)
+        return FastJSONResponse(await service.create_message(body))
+
+    except InvalidMessageError as e:
+        return FastJSONResponse({'error': str(e)}, status_code=400)
+
+    except RequestTooLargeError as e:
+        return FastJSONResponse({'error': str(e)}, status_code=413)
+
+    except MessageKeyExistsError:
+        return FastJSONResponse({'error': COLLISION_ERROR}, status_code=500)
+
+    except Exception as e:
+        log.error(f"Error creating message: {str(e)}")
+        return FastJSONResponse({'error': 'Failed to create message'}, status_code=500)
+
+
+async def create_messages(request: Request) -> JSONResponse:
+    """
+    Create many encrypted messages in one request.
+
+    Takes a JSON array of {message, ttlOption} entries and returns
+    {"messages": [...]} in the same order, each {"messageKey"} or {"error"}.
+    """
+    service = request.app.state.service
+    try:
+        entries = await _json_body(request, service.limits.max_batch_body_bytes)
+    except RequestTooLargeError as e:
+        return FastJSONResponse({'error': str(e)}, status_code=413)
+    except ValueError:
+        # Malformed JSON is rejected as an invalid batch, as the Lambda does
+        entries = None
+
+    try:
+        return FastJSONResponse(await service.create_messages(entries))
+
+    except InvalidMessageError as e:
+        return FastJSONResponse({'error': str(e)}, status_code=400)
+
+    except RequestTooLargeError as e:
+        return FastJSONResponse({'error': str(e)}, status_code=413)
+
+    except Exception as e:
+        log.error(f"Error creating messages: {str(e)}")
+        return FastJSONResponse({'error': 'Failed to create messages'}, status_code=500)
+
+
+def _matched_route(scope) -> Route | None:
+    """
+    The route a request was routed to, once the app has handled it.
+
+    Starlette's router records it in the scope; versions that do not are
+    matched here the same way, a full match first, then a path-only one (405).
+    """
+    if 'route' in scope:
+        return scope['route']
+    partial = None
+    for route in scope['app'].routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route
+        if match == Match.PARTIAL and partial is None:
+            partial = route
+    return partial
+
+
+@cache
+def _route_label(path: str) -> str:
+    # Flask's placeholder syntax, so both apps name spans and label metrics with the same route patterns:
+    # /dad-pass/{message_key} -> /dad-pass/<message_key>
+    return re.sub(r'\{(\w+)(?::\w+)?\}', r'<\1>', path)
+
+
+class MetricsMiddleware:
+    """Records each HTTP request's latency and status by route, like app.py's request hooks."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        start = perf_counter()
+        # Starlette turns an unhandled exception into a 500 further out
+        status = 500
+
+        async def send_recording_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_recording_status)
+        finally:
+            # The route pattern, not the path, so message keys do not become label values
+            route = _matched_route(scope)
+            label = _route_label(route.path) if route is not None else 'unmatched'
+            REQUEST_SECONDS.labels(scope['method'], label).observe(perf_counter() - start)
+            REQUESTS.labels(scope['method'], label, str(status)).inc()
+
+
+class TracingMiddleware:
+    """Traces each HTTP request, continuing the caller's trace (see dadpass_core.tracing)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        headers = {name.decode('latin-1'): value.decode('latin-1') for name, value in scope['headers']}
+        with tracing.trace(f"{scope['method']} unmatched", parent=tracing.context_from_headers(headers)) as span:
+            async def send_recording_status(message):
+                if message['type'] == 'http.response.start':
+                    span.set('http_status', message['status'])
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_recording_status)
+            finally:
+                # Named by route pattern once routed: the message key in the path is the secret link itself
+                route = _matched_route(scope)
+                if route is not None:
+                    span.rename(f"{scope['method']} {_route_label(route.path)}")
+
+
+@asynccontextmanager
+async def lifespan(app: Starlette):
+    """Opens the message store (and its pooled DynamoDB client) and the service over it once per worker process."""
+    async with open_async_store(
+        os.environ.get('MESSAGE_STORE', 'dynamodb'),
+        table_name=os.environ.get('MESSAGES_TABLE_NAME', 'dad-pass-messages-dev'),
+        region_name=os.environ.get('AWS_REGION', 'us-east-1'),
+        redis_url=os.environ.get('REDIS_URL'),
+        max_pool_connections=int(os.environ.get('DYNAMODB_MAX_CONNECTIONS', DEFAULT_MAX_POOL_CONNECTIONS)),
+        item_format=int(os.environ.get('DYNAMODB_ITEM_FORMAT', COMPACT_FORMAT))
+    ) as store:
+        app.state.store = store
+        # Create/read logic shared with app.py and the Lambda handler (see dadpass_core.service)
+        app.state.service = AsyncMessageService(
+            store, key_ring,
+            key_length=int(os.environ.get('MESSAGE_KEY_LENGTH', DEFAULT_KEY_LENGTH)),
+            limits=SizeLimits(int(os.environ.get('MAX_MESSAGE_LENGTH', DEFAULT_MAX_MESSAGE_LENGTH)))
+        )
+        yield
+
+
+app = Starlette(
+    routes=[
+        Route("/", health_check),
+        Route("/ready", readiness_check),
+        Route("/metrics", metrics),
+        Route("/dad-pass/batch", create_messages, methods=["POST"]),
+        Route("/dad-pass/{message_key}", get_message, methods=["GET"]),
+        Route("/dad-pass", create_message, methods=["POST"]),
+    ],
+    middleware=[Middleware(TracingMiddleware), Middleware(MetricsMiddleware)],
+    lifespan=lifespan
+)
+
+
+if __name__ == "__main__":
+    # Run a local uvicorn server
+    import uvicorn
+    uvicorn.run(app, host='0.0.0.0', port=int(os.environ.get('PORT', 5001)))
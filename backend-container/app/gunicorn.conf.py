@@ -0,0 +1,166 @@
+"""
+gunicorn settings for the container image (gunicorn --config gunicorn.conf.py).
+
+GUNICORN_WORKER_CLASS picks the worker model:
+
+    sync     one request at a time per worker process (gunicorn's own default)
+    gthread  a pool of threads per worker, so DynamoDB/SSM round trips overlap (default)
+    gevent   greenlets per worker, with the standard library monkey-patched
+    asgi     the async app in asgi.py on uvicorn workers (requires uvicorn-worker)
+
+Worker and thread counts are derived from the container's CPU limit (the cgroup
+CPU quota, e.g. `cpu: 500m` in k8s/deployment.yaml) rather than the node's core
+count, and can be pinned with WEB_CONCURRENCY / GUNICORN_THREADS.
+
+The app is preloaded in the master so the encryption keys and boto3 clients
+are set up once and inherited by every worker; each worker then restarts the
+key ring's background threads (see KeyRing.after_fork).
+"""
+import math
+import os
+import sys
+
+WORKER_CLASSES = {
+    'sync': 'sync',
+    'gthread': 'gthread',
+    'gevent': 'gevent',
+    'asgi': 'uvicorn_worker.UvicornWorker',
+}
+
+DEFAULT_WORKER_CLASS = 'gthread'
+
+# Threads per gthread worker; requests spend most of their time waiting on DynamoDB
+DEFAULT_THREADS = 8
+
+# Concurrent connections per gevent worker
+DEFAULT_WORKER_CONNECTIONS = 1000
+
+# Longer than the ALB idle timeout (60s) so the load balancer, not gunicorn, closes idle connections
+DEFAULT_KEEPALIVE_SECONDS = 75
+
+# Recycle workers periodically to bound memory growth; the jitter keeps them from restarting together
+DEFAULT_MAX_REQUESTS = 1000
+DEFAULT_MAX_REQUESTS_JITTER = 100
+
+# Most DynamoDB connections a gevent worker pools, however many requests it accepts
+MAX_GEVENT_POOL_CONNECTIONS = 100
+
+CGROUP_ROOT = '/sys/fs/cgroup'
+
+
+def cpu_limit(cgroup_root: str = CGROUP_ROOT) -> float:
+    """
+    CPUs available to this container.
+
+    Reads the CFS quota from cgroup v2 (cpu.max) or v1 (cpu.cfs_quota_us) and
+    falls back to the CPUs this process may run on when there is no quota.
+    """
+    try:
+        with open(os.path.join(cgroup_root, 'cpu.max')) as f:
+            quota, period = f.read().split()[:2]
+        if quota != 'max':
+            return int(quota) / int(period)
+    except (OSError, ValueError):
+        try:
+            with open(os.path.join(cgroup_root, 'cpu', 'cpu.cfs_quota_us')) as f:
+                quota = int(f.read())
+            with open(os.path.join(cgroup_root, 'cpu', 'cpu.cfs_period_us')) as f:
+                period = int(f.read())
+            if quota > 0:
+                return quota / period
+        except (OSError, ValueError):
+            pass
+    if hasattr(os, 'sched_getaffinity'):
+        return float(len(os.sched_getaffinity(0)))
+    return float(os.cpu_count() or 1)
+
+
+def default_workers(worker_class: str, cpus: float) -> int:
+    """
+    Worker processes for a CPU limit.
+
+    Sync workers block on every round trip, so they follow gunicorn's
+    (2 x cores) + 1 rule. The concurrent worker classes need only about one
+    process per core, plus one so a pod keeps serving while a worker recycles.
+    """
+    cores = max(1, math.ceil(cpus))
+    if worker_class == 'sync':
+        return 2 * cores + 1
+    return cores + 1
+
+
+def dynamodb_pool_size(worker_class: str, threads: int, worker_connections: int) -> int | None:
+    """
+    DynamoDB connections a worker should keep pooled: one per request it can have in flight.
+
+    botocore pools 10 by default, so a gthread worker with more threads would
+    open and discard a connection per request, while a sync worker needs only
+    one. None for asgi, whose aiobotocore store sizes its own pool.
+    """
+    if worker_class == 'sync':
+        return 1
+    if worker_class == 'gthread':
+        return threads
+    if worker_class == 'gevent':
+        return min(worker_connections, MAX_GEVENT_POOL_CONNECTIONS)
+    return None
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    return os.environ.get(name, str(default)).lower() in ('1', 'true', 'yes')
+
+
+worker_kind = os.environ.get('GUNICORN_WORKER_CLASS', DEFAULT_WORKER_CLASS)
+if worker_kind not in WORKER_CLASSES:
+    raise ValueError(f"Unknown GUNICORN_WORKER_CLASS {worker_kind!r}, expected one of {', '.join(WORKER_CLASSES)}")
+
+if worker_kind == 'gevent':
+    # Patch before the preloaded app imports botocore, urllib3 and threading
+    from gevent import monkey
+    monkey.patch_all()
+
+cpus = float(os.environ.get('GUNICORN_CPUS', 0)) or cpu_limit()
+
+wsgi_app = 'asgi:app' if worker_kind == 'asgi' else 'app:app'
+bind = os.environ.get('GUNICORN_BIND', f"0.0.0.0:{os.environ.get('PORT', '8000')}")
+worker_class = WORKER_CLASSES[worker_kind]
+workers = int(os.environ.get('WEB_CONCURRENCY', 0)) or default_workers(worker_kind, cpus)
+threads = int(os.environ.get('GUNICORN_THREADS', DEFAULT_THREADS)) if worker_kind == 'gthread' else 1
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', DEFAULT_WORKER_CONNECTIONS))
+dynamodb_max_connections = dynamodb_pool_size(worker_kind, threads, worker_connections)
+if dynamodb_max_connections:
+    # Read by app.py's DynamoDB client (see dadpass_core.clients); DYNAMODB_MAX_CONNECTIONS itself wins
+    os.environ.setdefault('DYNAMODB_MAX_CONNECTIONS', str(dynamodb_max_connections))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', DEFAULT_KEEPALIVE_SECONDS))
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', DEFAULT_MAX_REQUESTS))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', DEFAULT_MAX_REQUESTS_JITTER))
+preload_app = _env_flag('GUNICORN_PRELOAD', True)
+timeout = 30
+graceful_timeout = 30
+# Heartbeat files on tmpfs; the container's overlay filesystem can stall them
+worker_tmp_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+
+def _app_module():
+    return sys.modules.get(wsgi_app.partition(':')[0])
+
+
+def when_ready(server):
+    """Finishes the preloaded key load in the master so workers fork with the keys in hand."""
+    module = _app_module()
+    if not preload_app or module is None:
+        return
+    try:
+        module.key_ring.wait_until_ready(module.key_ring.load_timeout)
+    except Exception as e:
+        # Workers retry on first use and /ready stays 503 until they succeed
+        server.log.warning(f"Encryption keys not loaded before forking workers: {str(e)}")
+
+
+def post_fork(server, worker):
+    """Restarts the inherited key ring's and log pipeline's background threads in the new worker."""
+    module = _app_module()
+    if preload_app and module is not None:
+        module.key_ring.after_fork()
+        if module.log_pipeline is not None:
+            module.log_pipeline.after_fork()
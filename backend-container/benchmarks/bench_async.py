@@ -0,0 +1,156 @@
+"""
+Load-test comparison of the Flask app on a single gunicorn sync worker (the
+container's original CMD) against the ASGI app (asgi.py) on uvicorn.
+
+Both servers run as a single worker process against a local fake DynamoDB/SSM
+endpoint (fake_aws.py) that adds a fixed round-trip latency, so the comparison
+shows how many requests one worker can keep in flight while it waits on the
+network. Each virtual user creates a message and reads it back, in a loop.
+Run with: make bench-async
+"""
+import http.client
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+from fake_aws import serve
+
+CONCURRENCY = (1, 16, 64, 256)
+DURATION_SECONDS = 5
+DYNAMODB_LATENCY_SECONDS = 0.010
+
+BENCH_DIR = Path(__file__).parent
+APP_DIR = BENCH_DIR.parent / "app"
+SHARED_SRC = BENCH_DIR.parent.parent / "shared" / "src"
+
+# Server command and environment; the sync baseline pins gunicorn.conf.py back to gunicorn's defaults
+SERVERS = {
+    'flask/gunicorn sync': (
+        ['gunicorn', '--bind', '127.0.0.1:{port}', 'app:app'],
+        {'GUNICORN_WORKER_CLASS': 'sync', 'WEB_CONCURRENCY': '1', 'GUNICORN_PRELOAD': 'false'}
+    ),
+    'asgi/uvicorn': (
+        ['uvicorn', 'asgi:app', '--host', '127.0.0.1', '--port', '{port}', '--no-access-log', '--log-level', 'warning'],
+        {}
+    ),
+}
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(command: list[str], aws_endpoint: str,
+                 extra_env: dict | None = None) -> tuple[subprocess.Popen, int]:
+    """Starts one server process and waits until /ready reports the keys loaded."""
+    port = _free_port()
+    env = dict(
+        os.environ,
+        PYTHONPATH=str(SHARED_SRC),
+        AWS_ACCESS_KEY_ID='bench',
+        AWS_SECRET_ACCESS_KEY='bench',
+        AWS_REGION='us-east-1',
+        AWS_ENDPOINT_URL_DYNAMODB=aws_endpoint,
+        AWS_ENDPOINT_URL_SSM=aws_endpoint,
+        MESSAGES_TABLE_NAME='bench-messages',
+        **(extra_env or {})
+    )
+    process = subprocess.Popen(
+        [part.format(port=port) for part in command], cwd=APP_DIR, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            connection.request('GET', '/ready')
+            if connection.getresponse().status == 200:
+                return process, port
+        except OSError:
+            pass
+        time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f"{command[0]} did not become ready")
+
+
+def run_load(port: int, concurrency: int, duration: float) -> dict:
+    """Runs `concurrency` create-then-read loops for `duration` seconds."""
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def user():
+        nonlocal errors
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        body = json.dumps({'message': 'load test', 'ttlOption': '15min'})
+        mine, failed = [], 0
+        while time.monotonic() < stop_at:
+            try:
+                start = time.perf_counter()
+                connection.request('POST', '/dad-pass', body, {'Content-Type': 'application/json'})
+                response = connection.getresponse()
+                created = json.loads(response.read())
+                mine.append(time.perf_counter() - start)
+                if response.status != 200:
+                    failed += 1
+                    continue
+                start = time.perf_counter()
+                connection.request('GET', f"/dad-pass/{created['messageKey']}")
+                response = connection.getresponse()
+                response.read()
+                mine.append(time.perf_counter() - start)
+            except (OSError, http.client.HTTPException):
+                failed += 1
+                connection.close()
+        with lock:
+            latencies.extend(mine)
+            errors += failed
+
+    threads = [threading.Thread(target=user) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'rps': len(latencies) / elapsed,
+        'p50': statistics.median(latencies) if latencies else float('nan'),
+        'p99': latencies[int(len(latencies) * 0.99)] if latencies else float('nan'),
+        'errors': errors
+    }
+
+
+def main():
+    aws = serve(DYNAMODB_LATENCY_SECONDS)
+    aws_endpoint = f'http://127.0.0.1:{aws.server_address[1]}'
+    print(f"{DURATION_SECONDS}s per level, simulated DynamoDB latency {DYNAMODB_LATENCY_SECONDS * 1000:.0f} ms, "
+          f"one worker process per server\n")
+    print(f"{'server':<22} {'users':>6} {'req/s':>9} {'p50 (ms)':>10} {'p99 (ms)':>10} {'errors':>7}")
+    for name, (command, env) in SERVERS.items():
+        process, port = start_server(command, aws_endpoint, env)
+        try:
+            for concurrency in CONCURRENCY:
+                result = run_load(port, concurrency, DURATION_SECONDS)
+                print(f"{name:<22} {concurrency:>6} {result['rps']:9.0f} {result['p50'] * 1000:10.1f} "
+                      f"{result['p99'] * 1000:10.1f} {result['errors']:>7}")
+        finally:
+            process.terminate()
+            process.wait()
+    aws.shutdown()
+
+
+if __name__ == '__main__':
+    sys.path.insert(0, str(BENCH_DIR))
+    main()
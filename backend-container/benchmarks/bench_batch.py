@@ -0,0 +1,63 @@
+"""
+Throughput of POST /dad-pass/batch against one POST /dad-pass per message.
+
+Runs the Flask app on gunicorn (gunicorn.conf.py, gthread) against the local
+fake DynamoDB/SSM endpoint from bench_async.py, and creates the same number of
+messages both ways from a single client, as the onboarding job does.
+Run with: make bench-batch
+"""
+import http.client
+import json
+import time
+
+from bench_async import DYNAMODB_LATENCY_SECONDS, start_server
+from fake_aws import serve
+
+BATCH_SIZES = (10, 100, 500)
+
+COMMAND = ['gunicorn', '--config', 'gunicorn.conf.py', '--bind', '127.0.0.1:{port}']
+
+
+def create_one_by_one(connection: http.client.HTTPConnection, count: int) -> float:
+    """Creates `count` messages with one request each; returns the elapsed seconds."""
+    body = json.dumps({'message': 'temporary credential', 'ttlOption': '1day'})
+    start = time.perf_counter()
+    for _ in range(count):
+        connection.request('POST', '/dad-pass', body, {'Content-Type': 'application/json'})
+        response = connection.getresponse()
+        response.read()
+        assert response.status == 200
+    return time.perf_counter() - start
+
+
+def create_batch(connection: http.client.HTTPConnection, count: int) -> float:
+    """Creates `count` messages in one batch request; returns the elapsed seconds."""
+    body = json.dumps([{'message': 'temporary credential', 'ttlOption': '1day'}] * count)
+    start = time.perf_counter()
+    connection.request('POST', '/dad-pass/batch', body, {'Content-Type': 'application/json'})
+    response = connection.getresponse()
+    results = json.loads(response.read())['messages']
+    assert response.status == 200 and all('messageKey' in result for result in results)
+    return time.perf_counter() - start
+
+
+def main():
+    aws = serve(DYNAMODB_LATENCY_SECONDS)
+    aws_endpoint = f'http://127.0.0.1:{aws.server_address[1]}'
+    print(f"simulated DynamoDB latency {DYNAMODB_LATENCY_SECONDS * 1000:.0f} ms\n")
+    print(f"{'messages':>9} {'single (msg/s)':>15} {'batch (msg/s)':>14} {'speedup':>8}")
+    process, port = start_server(COMMAND, aws_endpoint, {'GUNICORN_WORKER_CLASS': 'gthread'})
+    try:
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        for count in BATCH_SIZES:
+            single = count / create_one_by_one(connection, count)
+            batch = count / create_batch(connection, count)
+            print(f"{count:>9} {single:15.0f} {batch:14.0f} {batch / single:7.1f}x")
+    finally:
+        process.terminate()
+        process.wait()
+    aws.shutdown()
+
+
+if __name__ == '__main__':
+    main()
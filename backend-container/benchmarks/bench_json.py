@@ -0,0 +1,94 @@
+"""
+End-to-end handler time of the Flask app with each JSON backend
+(dadpass_core.fastjson): stdlib json against orjson.
+
+Drives the app in-process through Flask's test client with the in-memory
+message store, so the time is the handler's own (routing, JSON decode,
+encrypt/decrypt, JSON encode) without a socket or DynamoDB. SSM is mocked.
+Run with: make bench-json
+"""
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+from cryptography.fernet import Fernet
+
+REQUESTS = 2_000
+ROUNDS = 5
+BATCH_SIZE = 100
+
+BENCH_DIR = Path(__file__).parent
+sys.path.insert(0, str(BENCH_DIR.parent / "app"))
+sys.path.insert(0, str(BENCH_DIR.parent.parent / "shared" / "src"))
+
+os.environ['MESSAGE_STORE'] = 'memory'
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+BODY = json.dumps({'message': 'The Netflix password is hunter2 — pas de souci', 'ttlOption': '1day'})
+BATCH_BODY = json.dumps([json.loads(BODY)] * BATCH_SIZE)
+
+
+def _import_app():
+    with patch('boto3.session.Session') as session:
+        ssm = session.return_value.client.return_value = MagicMock()
+        ssm.get_parameter.return_value = {'Parameter': {'Value': Fernet.generate_key().decode()}}
+        ssm.get_paginator.return_value.paginate.return_value = [
+            {'Parameters': [{'Name': '/dad-pass/encryption-keys/v1', 'Value': Fernet.generate_key().decode()}]}
+        ]
+        import app
+        app.key_ring.wait_until_ready()
+    return app.app.test_client()
+
+
+def measure(client, backend: str) -> dict[str, float]:
+    """Returns the mean microseconds per request for create, get and a batch create."""
+    from dadpass_core import fastjson
+    fastjson.set_backend(backend)
+    headers = {'Content-Type': 'application/json'}
+
+    start = time.perf_counter()
+    keys = [client.post('/dad-pass', data=BODY, headers=headers).get_json()['messageKey'] for _ in range(REQUESTS)]
+    create = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for key in keys:
+        assert client.get(f'/dad-pass/{key}').status_code == 200
+    get = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batches = [client.post('/dad-pass/batch', data=BATCH_BODY, headers=headers) for _ in range(REQUESTS // BATCH_SIZE)]
+    batch = time.perf_counter() - start
+
+    # Read the batch messages back, untimed, so the store is the same size for every round
+    for response in batches:
+        for result in response.get_json()['messages']:
+            client.get(f"/dad-pass/{result['messageKey']}")
+
+    return {
+        'POST /dad-pass': create / REQUESTS * 1_000_000,
+        'GET /dad-pass/<key>': get / REQUESTS * 1_000_000,
+        f'POST /dad-pass/batch ({BATCH_SIZE})': batch / (REQUESTS // BATCH_SIZE) * 1_000_000
+    }
+
+
+def main():
+    client = _import_app()
+    results = {'stdlib': {}, 'orjson': {}}
+    # Alternate the backends and keep each route's best round, so drift and warm-up hit both alike
+    for _ in range(ROUNDS):
+        for backend, best in results.items():
+            for route, us in measure(client, backend).items():
+                best[route] = min(us, best.get(route, us))
+
+    print(f"{REQUESTS:,} requests per route, best of {ROUNDS} rounds, Flask test client, in-memory store\n")
+    print(f"{'route':<28} {'stdlib (us)':>12} {'orjson (us)':>12} {'saved':>7}")
+    for route, stdlib in results['stdlib'].items():
+        fast = results['orjson'][route]
+        print(f"{route:<28} {stdlib:12.1f} {fast:12.1f} {(stdlib - fast) / stdlib:6.1%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Requests/sec per pod for each gunicorn worker model in gunicorn.conf.py.
+
+Every mode runs with the worker and thread counts gunicorn.conf.py derives for
+the pod's CPU limit (POD_CPUS, `cpu: 500m` in k8s/deployment.yaml), against the
+same local fake DynamoDB/SSM endpoint as bench_async.py. The benchmark does not
+enforce the CPU quota itself; run it under `docker run --cpus 0.5` (or taskset)
+for numbers that match a pod. Modes whose worker package is not installed are
+skipped. Run with: make bench-workers
+"""
+import importlib.util
+
+from bench_async import DYNAMODB_LATENCY_SECONDS, run_load, start_server
+from fake_aws import serve
+
+POD_CPUS = 0.5
+CONCURRENCY = (16, 64, 256)
+DURATION_SECONDS = 5
+
+# Worker model -> module its worker class needs
+MODES = {
+    'sync': None,
+    'gthread': None,
+    'gevent': 'gevent',
+    'asgi': 'uvicorn_worker',
+}
+
+COMMAND = ['gunicorn', '--config', 'gunicorn.conf.py', '--bind', '127.0.0.1:{port}']
+
+
+def main():
+    aws = serve(DYNAMODB_LATENCY_SECONDS)
+    aws_endpoint = f'http://127.0.0.1:{aws.server_address[1]}'
+    print(f"{DURATION_SECONDS}s per level, simulated DynamoDB latency {DYNAMODB_LATENCY_SECONDS * 1000:.0f} ms, "
+          f"worker counts derived for {POD_CPUS} CPU\n")
+    print(f"{'worker class':<14} {'users':>6} {'req/s':>9} {'p50 (ms)':>10} {'p99 (ms)':>10} {'errors':>7}")
+    for mode, requires in MODES.items():
+        if requires and importlib.util.find_spec(requires) is None:
+            print(f"{mode:<14} skipped ({requires} is not installed)")
+            continue
+        env = {'GUNICORN_WORKER_CLASS': mode, 'GUNICORN_CPUS': str(POD_CPUS)}
+        process, port = start_server(COMMAND, aws_endpoint, env)
+        try:
+            for concurrency in CONCURRENCY:
+                result = run_load(port, concurrency, DURATION_SECONDS)
+                print(f"{mode:<14} {concurrency:>6} {result['rps']:9.0f} {result['p50'] * 1000:10.1f} "
+                      f"{result['p99'] * 1000:10.1f} {result['errors']:>7}")
+        finally:
+            process.terminate()
+            process.wait()
+    aws.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""
+Minimal local stand-in for the AWS endpoints the container backend calls, for
+load tests that must run offline.
+
+Speaks just enough of the DynamoDB and SSM JSON protocols for the app: the
+conditional PutItem / DeleteItem / TransactWriteItems on the messages table and the key ring's
+GetParametersByPath / GetParameter. Every response is held back by a fixed
+latency to model the network round trip. Point the app at it with
+AWS_ENDPOINT_URL_DYNAMODB and AWS_ENDPOINT_URL_SSM.
+"""
+import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from cryptography.fernet import Fernet
+
+KEY_PATH = '/dad-pass/encryption-keys'
+
+
+class FakeAws:
+    """Shared state behind the fake endpoints: one messages table and one encryption key."""
+
+    def __init__(self, latency_seconds: float):
+        self.latency_seconds = latency_seconds
+        self.key = Fernet.generate_key().decode('utf-8')
+        self.items = {}
+        self._lock = threading.Lock()
+
+    def handle(self, target: str, request: dict) -> tuple[int, dict]:
+        time.sleep(self.latency_seconds)
+        service, _, operation = target.partition('.')
+        handler = getattr(self, f'_{operation}', None)
+        if handler is None:
+            return 400, {'__type': 'UnknownOperationException', 'message': target}
+        return handler(request)
+
+    def _GetParametersByPath(self, request: dict) -> tuple[int, dict]:
+        return 200, {'Parameters': [{'Name': f'{KEY_PATH}/v1', 'Type': 'SecureString', 'Value': self.key}]}
+
+    def _GetParameter(self, request: dict) -> tuple[int, dict]:
+        return 400, {'__type': 'ParameterNotFound', 'message': request['Name']}
+
+    def _PutItem(self, request: dict) -> tuple[int, dict]:
+        item = request['Item']
+        now = int(request['ExpressionAttributeValues'][':now']['N'])
+        with self._lock:
+            # attribute_not_exists(messageKey) OR #ttl < :now
+            existing = self.items.get(item['messageKey']['S'])
+            if existing is not None and int(existing['ttl']['N']) >= now:
+                return _conditional_check_failed()
+            self.items[item['messageKey']['S']] = item
+        return 200, {}
+
+    def _TransactWriteItems(self, request: dict) -> tuple[int, dict]:
+        puts = [action['Put'] for action in request['TransactItems']]
+        with self._lock:
+            codes = []
+            for put in puts:
+                existing = self.items.get(put['Item']['messageKey']['S'])
+                now = int(put['ExpressionAttributeValues'][':now']['N'])
+                taken = existing is not None and int(existing['ttl']['N']) >= now
+                codes.append('ConditionalCheckFailed' if taken else 'None')
+            if 'ConditionalCheckFailed' in codes:
+                return 400, {
+                    '__type': 'com.amazonaws.dynamodb.v20120810#TransactionCanceledException',
+                    'message': 'Transaction cancelled',
+                    'CancellationReasons': [{'Code': code} for code in codes]
+                }
+            for put in puts:
+                self.items[put['Item']['messageKey']['S']] = put['Item']
+        return 200, {}
+
+    def _DeleteItem(self, request: dict) -> tuple[int, dict]:
+        message_key = request['Key']['messageKey']['S']
+        now = int(request['ExpressionAttributeValues'][':now']['N'])
+        with self._lock:
+            # attribute_exists(messageKey) AND #ttl >= :now
+            item = self.items.get(message_key)
+            if item is None or int(item['ttl']['N']) < now:
+                return _conditional_check_failed()
+            del self.items[message_key]
+        return 200, {'Attributes': item}
+
+
+def _conditional_check_failed() -> tuple[int, dict]:
+    return 400, {
+        '__type': 'com.amazonaws.dynamodb.v20120810#ConditionalCheckFailedException',
+        'message': 'The conditional request failed'
+    }
+
+
+def serve(latency_seconds: float, port: int = 0) -> ThreadingHTTPServer:
+    """Starts the fake endpoints on a daemon thread and returns the server (see server_address)."""
+    fake = FakeAws(latency_seconds)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def setup(self):
+            super().setup()
+            # Headers and body go out in separate writes; don't let Nagle hold back the body
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            status, payload = fake.handle(self.headers.get('X-Amz-Target', ''), json.loads(body or b'{}'))
+            data = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/x-amz-json-1.0')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='fake-aws', daemon=True).start()
+    return server
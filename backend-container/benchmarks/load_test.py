@@ -0,0 +1,270 @@
+"""
+Closed-loop load test and saturation finder for the container service.
+
+Virtual users each loop create-then-read against CONTAINER_SERVICE_URL (or a
+local stack with --local), at stepped concurrency levels. A user sends its
+next request only once the last one has been answered, so offered load rises
+with the user count until the service saturates. The mix is closer to real
+use than bench_async.py's: message lengths and TTL options vary, a share of
+messages are never read, and a share of reads are for keys that do not exist
+(links opened twice or mistyped).
+
+For every level the tool prints throughput and latency percentiles. It then
+finds the knee of the curve, the level with the highest power (throughput
+divided by p95 latency). Below the knee, more users bring more throughput;
+past it, they only bring queueing. Throughput at the knee, divided by the
+number of pods behind the URL, is the per-pod capacity. With --target-rps it
+also gives the `replicas` for k8s/deployment.yaml at --utilization of that
+capacity.
+
+--local runs fully offline. It starts one pod's worth of gunicorn
+(gunicorn.conf.py with the deployment's `cpu: 500m` limit) against fake_aws.py.
+As with bench_workers.py, the CPU quota itself is only enforced under
+`docker run --cpus 0.5` or similar.
+
+Run with: make load-test, or e.g.
+    python benchmarks/load_test.py --url http://localhost:5001 --levels 1,4,16,64 --csv curve.csv
+"""
+import argparse
+import csv
+import http.client
+import json
+import math
+import os
+import random
+import string
+import sys
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+BENCH_DIR = Path(__file__).parent
+sys.path.insert(0, str(BENCH_DIR))
+
+from bench_async import DYNAMODB_LATENCY_SECONDS, start_server
+from fake_aws import serve
+
+DEFAULT_URL = 'http://localhost:5001'
+DEFAULT_LEVELS = (1, 2, 4, 8, 16, 32, 64, 128)
+DEFAULT_DURATION_SECONDS = 10
+DEFAULT_WARMUP_SECONDS = 2
+
+# k8s/deployment.yaml: resources.limits.cpu
+POD_CPUS = 0.5
+
+TTL_OPTIONS = ('15min', '1hour', '1day', '5days')
+
+# Share of created messages nobody opens, and of reads for a key that does not exist
+UNREAD_RATIO = 0.1
+MISSING_READ_RATIO = 0.05
+
+# Plan to run pods at this share of their knee throughput, leaving room for spikes and a lost pod
+DEFAULT_UTILIZATION = 0.7
+
+LOCAL_COMMAND = ['gunicorn', '--config', 'gunicorn.conf.py', '--bind', '127.0.0.1:{port}']
+
+_ALPHABET = string.ascii_letters + string.digits + ' '
+
+_STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError)
+
+
+class Target:
+    """The host, port and scheme of the service under test, with a connection factory."""
+
+    def __init__(self, url: str):
+        parts = urlsplit(url)
+        self.https = parts.scheme == 'https'
+        self.host = parts.hostname or 'localhost'
+        self.port = parts.port or (443 if self.https else 80)
+        self.prefix = parts.path.rstrip('/')
+        self.url = url
+
+    def connect(self) -> http.client.HTTPConnection:
+        connection_class = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+        return connection_class(self.host, self.port, timeout=30)
+
+
+def _percentile(ordered: list[float], fraction: float) -> float:
+    if not ordered:
+        return float('nan')
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run_level(target: Target, users: int, duration: float, warmup: float = 0.0, seed: int = 0) -> dict:
+    """
+    Runs `users` create-then-read loops for `warmup` + `duration` seconds.
+
+    Only requests started after the warmup count, so connection setup and the
+    ramp to the new level do not skew the figures.
+
+    Returns:
+        Requests per second, p50/p95/p99 latency in seconds, errors and the request count
+    """
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    measure_from = time.monotonic() + warmup
+    stop_at = measure_from + duration
+
+    def user(number: int):
+        nonlocal errors
+        rng = random.Random(seed * 100_003 + number)
+        connection = target.connect()
+        mine, failed = [], 0
+
+        def send(method: str, path: str, body: str | None) -> tuple[int, bytes]:
+            headers = {'Content-Type': 'application/json'} if body is not None else {}
+            connection.request(method, target.prefix + path, body, headers)
+            response = connection.getresponse()
+            return response.status, response.read()
+
+        def request(method: str, path: str, body: str | None = None) -> tuple[int, bytes]:
+            """Status 0 for a connection error; failures after the warmup are counted."""
+            nonlocal connection, failed
+            counted = time.monotonic() >= measure_from
+            start = time.perf_counter()
+            try:
+                try:
+                    status, data = send(method, path, body)
+                except _STALE_CONNECTION_ERRORS:
+                    # A kept-alive connection closed by the server (e.g. gunicorn recycling a worker after
+                    # max_requests) before it read the request; like any HTTP client, retry on a new one
+                    connection.close()
+                    connection = target.connect()
+                    status, data = send(method, path, body)
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                connection = target.connect()
+                status, data = 0, b''
+            if counted:
+                mine.append(time.perf_counter() - start)
+                failed += status != 200
+            return status, data
+
+        while time.monotonic() < stop_at:
+            message = ''.join(rng.choices(_ALPHABET, k=rng.randint(8, 240)))
+            status, data = request('POST', '/dad-pass',
+                                   json.dumps({'message': message, 'ttlOption': rng.choice(TTL_OPTIONS)}))
+            if status != 200 or rng.random() < UNREAD_RATIO:
+                continue
+            message_key = json.loads(data)['messageKey']
+            if rng.random() < MISSING_READ_RATIO:
+                message_key = message_key[::-1]
+            request('GET', f'/dad-pass/{message_key}')
+        connection.close()
+        with lock:
+            latencies.extend(mine)
+            errors += failed
+
+    threads = [threading.Thread(target=user, args=(number,), daemon=True) for number in range(users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    return {
+        'users': users,
+        'rps': len(latencies) / duration,
+        'p50': _percentile(latencies, 0.50),
+        'p95': _percentile(latencies, 0.95),
+        'p99': _percentile(latencies, 0.99),
+        'errors': errors,
+        'requests': len(latencies)
+    }
+
+
+def find_knee(levels: list[dict]) -> dict | None:
+    """
+    The level past which more users only add latency: the one with the highest power (req/s over p95).
+
+    Levels where more than 1% of requests failed are not candidates, since
+    throughput from failing fast is not capacity.
+    """
+    candidates = [level for level in levels
+                  if level['requests'] and level['p95'] > 0 and level['errors'] <= level['requests'] * 0.01]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda level: level['rps'] / level['p95'])
+
+
+def replicas_for(target_rps: float, rps_per_pod: float, utilization: float = DEFAULT_UTILIZATION) -> int:
+    """Pods needed to serve `target_rps` with each at `utilization` of its knee throughput, never fewer than 2."""
+    return max(2, math.ceil(target_rps / (rps_per_pod * utilization)))
+
+
+def _start_local_stack() -> tuple:
+    aws = serve(DYNAMODB_LATENCY_SECONDS)
+    aws_endpoint = f'http://127.0.0.1:{aws.server_address[1]}'
+    process, port = start_server(LOCAL_COMMAND, aws_endpoint, {'GUNICORN_CPUS': str(POD_CPUS)})
+    return aws, process, f'http://127.0.0.1:{port}'
+
+
+def _levels(value: str) -> tuple[int, ...]:
+    return tuple(int(level) for level in value.split(','))
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--url', default=os.environ.get('CONTAINER_SERVICE_URL', DEFAULT_URL),
+                        help="Service to load (default $CONTAINER_SERVICE_URL or %(default)s)")
+    parser.add_argument('--local', action='store_true',
+                        help="Start one pod's gunicorn against fake_aws.py and load that instead")
+    parser.add_argument('--levels', type=_levels, default=DEFAULT_LEVELS,
+                        help="Comma-separated concurrent users per step (default 1,2,4,...,128)")
+    parser.add_argument('--duration', type=float, default=DEFAULT_DURATION_SECONDS, help="Seconds measured per step")
+    parser.add_argument('--warmup', type=float, default=DEFAULT_WARMUP_SECONDS, help="Unmeasured seconds per step")
+    parser.add_argument('--pods', type=int, default=1, help="Pods behind the URL, for the per-pod figure")
+    parser.add_argument('--target-rps', type=float, help="Expected peak requests/sec, to size replicas")
+    parser.add_argument('--utilization', type=float, default=DEFAULT_UTILIZATION,
+                        help="Share of knee throughput to plan each pod for (default %(default)s)")
+    parser.add_argument('--csv', metavar='FILE', help="Also write the throughput/latency curve to FILE")
+    args = parser.parse_args(argv)
+
+    aws = process = None
+    url = args.url
+    if args.local:
+        aws, process, url = _start_local_stack()
+        args.pods = 1
+    target = Target(url)
+
+    try:
+        print(f"{target.url}: {args.duration:g}s per level after {args.warmup:g}s warmup, create-then-read loops"
+              + (f", local stack with {POD_CPUS} CPU and {DYNAMODB_LATENCY_SECONDS * 1000:.0f} ms DynamoDB"
+                 if args.local else '') + "\n")
+        print(f"{'users':>6} {'req/s':>9} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9} {'errors':>7}")
+        levels = []
+        for users in args.levels:
+            level = run_level(target, users, args.duration, args.warmup, seed=users)
+            levels.append(level)
+            print(f"{users:>6} {level['rps']:9.1f} {level['p50'] * 1000:9.1f} {level['p95'] * 1000:9.1f} "
+                  f"{level['p99'] * 1000:9.1f} {level['errors']:>7}")
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+        if aws is not None:
+            aws.shutdown()
+
+    if args.csv:
+        with open(args.csv, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=['users', 'rps', 'p50', 'p95', 'p99', 'errors', 'requests'])
+            writer.writeheader()
+            writer.writerows(levels)
+
+    knee = find_knee(levels)
+    if knee is None:
+        print("\nNo level completed with under 1% errors; no capacity figure")
+        return
+    per_pod = knee['rps'] / args.pods
+    print(f"\nknee: {knee['users']} users, {knee['rps']:.1f} req/s at p95 {knee['p95'] * 1000:.1f} ms "
+          f"(peak {max(level['rps'] for level in levels):.1f} req/s)")
+    print(f"capacity: {per_pod:.1f} req/s per pod ({args.pods} pod{'s' if args.pods != 1 else ''} loaded)")
+    if args.target_rps:
+        print(f"replicas for {args.target_rps:g} req/s at {args.utilization:.0%} of capacity: "
+              f"{replicas_for(args.target_rps, per_pod, args.utilization)}")
+
+
+if __name__ == '__main__':
+    main()
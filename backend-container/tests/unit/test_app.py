@@ -2,14 +2,17 @@
 Unit tests for the dad-pass container backend Flask app.
 These tests mock AWS services and test the application logic.
 """
+import base64
 import pytest
 import sys
 from pathlib import Path
 from unittest.mock import patch, MagicMock
 from cryptography.fernet import Fernet
+import io
 import os
 import json
 import time
+import threading
 
 # Set required environment variables before importing app
 os.environ['MESSAGES_TABLE_NAME'] = 'test-messages-table'
@@ -19,13 +22,14 @@ os.environ['AWS_REGION'] = 'us-east-1'
 mock_key = Fernet.generate_key()
 
 # Mock boto3 before importing app to prevent SSM and DynamoDB calls during import
-with patch('boto3.client') as mock_client, patch('boto3.resource') as mock_resource:
+with patch('boto3.session.Session') as mock_session, patch('boto3.client') as mock_client, patch('boto3.resource') as mock_resource:
     # Mock SSM client
     mock_ssm = MagicMock()
     mock_ssm.get_parameter.return_value = {
         'Parameter': {'Value': mock_key.decode('utf-8')}
     }
     mock_client.return_value = mock_ssm
+    mock_session.return_value.client.return_value = mock_ssm
     
     # Mock DynamoDB resource
     mock_dynamodb = MagicMock()
@@ -38,28 +42,74 @@ with patch('boto3.client') as mock_client, patch('boto3.resource') as mock_resou
     # Add the source directory to the Python path
     src_dir = service_dir / "app"
     sys.path.insert(0, str(src_dir))
+    # Add the shared dad-pass core package to the Python path
+    sys.path.insert(0, str(service_dir.parent / "shared" / "src"))
     
-    from app import generate_random_id, app, encrypt_message, decrypt_message
+    from app import app
+    from dadpass_core.crypto import encrypt_message, decrypt_message
+    from app import key_ring, service
+    # The keys load in the background; finish while SSM is still mocked
+    key_ring.wait_until_ready()
 
+from botocore.exceptions import ClientError
+from dadpass_core import fastjson, tracing
+from dadpass_core.crypto import CLIENT_ENVELOPE_VERSION
+from dadpass_core.items import TTL_OPTION_CODES
+from dadpass_core.store import DynamoDBMessageStore, InMemoryMessageStore
 
-class TestGenerateRandomId:
-    """Unit tests for the generate_random_id function."""
-    
-    def test_returns_correct_length(self):
-        """Test that the function returns an ID of the requested length."""
-        for length in [1, 5, 10, 20]:
-            result = generate_random_id(length)
-            assert len(result) == length
-    
-    def test_contains_only_alphanumeric_characters(self):
-        """Test that the generated ID contains only alphanumeric characters."""
-        result = generate_random_id(100)
-        assert result.isalnum()
-    
-    def test_generates_different_ids(self):
-        """Test that consecutive calls generate different IDs."""
-        ids = [generate_random_id(10) for _ in range(10)]
-        assert len(ids) == len(set(ids))
+
+@pytest.fixture
+def mock_table():
+    """Serve the app from a DynamoDB store backed by a mock table."""
+    table = MagicMock()
+    with patch('app.service.store', DynamoDBMessageStore(table)):
+        yield table
+
+
+def _conditional_check_failed() -> ClientError:
+    return ClientError(
+        {'Error': {'Code': 'ConditionalCheckFailedException', 'Message': 'The conditional request failed'}},
+        'DeleteItem'
+    )
+
+
+class FakeDynamoTable:
+    """
+    Thread-safe in-memory stand-in for the messages table.
+
+    Only models what the app relies on: conditional PutItem on a new key and
+    the conditional consume-once DeleteItem with ReturnValues='ALL_OLD'.
+    """
+    
+    name = 'test-messages-table'
+    
+    def __init__(self):
+        self.items = {}
+        self._lock = threading.Lock()
+    
+    def put_item(self, Item, ConditionExpression=None, ExpressionAttributeNames=None,
+                 ExpressionAttributeValues=None):
+        with self._lock:
+            existing = self.items.get(Item['messageKey'])
+            if ConditionExpression:
+                # attribute_not_exists(messageKey) OR #ttl < :now
+                if existing is not None and existing['ttl'] >= ExpressionAttributeValues[':now']:
+                    raise _conditional_check_failed()
+            self.items[Item['messageKey']] = dict(Item)
+        return {}
+    
+    def delete_item(self, Key, ConditionExpression=None, ExpressionAttributeNames=None,
+                    ExpressionAttributeValues=None, ReturnValues='NONE'):
+        with self._lock:
+            item = self.items.get(Key['messageKey'])
+            if ConditionExpression:
+                # attribute_exists(messageKey) AND #ttl >= :now
+                if item is None or item['ttl'] < ExpressionAttributeValues[':now']:
+                    raise _conditional_check_failed()
+            self.items.pop(Key['messageKey'], None)
+        if ReturnValues == 'ALL_OLD' and item is not None:
+            return {'Attributes': item}
+        return {}
 
 
 class TestEncryption:
@@ -108,8 +158,25 @@ class TestFlaskRoutes:
         assert response.status_code == 200
         data = response.get_json()
         assert data['status'] == 'healthy'
+        assert data['ready'] is True
+    
+    def test_readiness_check(self, client):
+        """Test the readiness endpoint once the encryption keys are loaded."""
+        response = client.get('/ready')
+        assert response.status_code == 200
+        assert response.get_json()['ready'] is True
+    
+    @patch('app.key_ring')
+    def test_readiness_check_while_keys_load(self, mock_key_ring, client):
+        """Test the readiness endpoint reports 503 until the keys are loaded."""
+        mock_key_ring.ready = False
+        
+        response = client.get('/ready')
+        
+        assert response.status_code == 503
+        assert response.get_json()['ready'] is False
+        mock_key_ring.ensure_loading.assert_called_once()
     
-    @patch('app.table')
     def test_create_message_success(self, mock_table, client):
         """Test creating a message successfully."""
         mock_table.put_item.return_value = {}
@@ -126,7 +193,6 @@ class TestFlaskRoutes:
         assert len(data['messageKey']) == 10
         assert data['messageKey'].isalnum()
     
-    @patch('app.table')
     def test_create_message_without_ttl_option(self, mock_table, client):
         """Test creating a message with default TTL option."""
         mock_table.put_item.return_value = {}
@@ -141,6 +207,84 @@ class TestFlaskRoutes:
         data = response.get_json()
         assert 'messageKey' in data
     
+    def test_create_message_key_collision(self, mock_table, client):
+        """Test that a conditional put failure is reported as a key collision."""
+        mock_table.put_item.side_effect = _conditional_check_failed()
+        
+        response = client.post(
+            '/dad-pass',
+            data=json.dumps({'message': 'Test secret message'}),
+            content_type='application/json'
+        )
+        
+        assert response.status_code == 500
+        assert 'collision' in response.get_json()['error']
+    
+    def test_create_message_retries_taken_key(self, mock_table, client):
+        """Test that a collision is retried under a fresh key instead of failing the request."""
+        mock_table.put_item.side_effect = [_conditional_check_failed(), {}]
+        
+        with patch('app.service.new_key', side_effect=['taken00000', 'fresh00000']):
+            response = client.post('/dad-pass', json={'message': 'Test secret message'})
+        
+        assert response.status_code == 200
+        assert response.get_json() == {'messageKey': 'fresh00000'}
+        assert mock_table.put_item.call_count == 2
+    
+    def test_create_and_get_with_in_memory_store(self, client):
+        """Test the full create/read-once flow against the in-memory store."""
+        with patch('app.service.store', InMemoryMessageStore()):
+            create_response = client.post(
+                '/dad-pass',
+                data=json.dumps({'message': 'In memory', 'ttlOption': '15min'}),
+                content_type='application/json'
+            )
+            message_key = create_response.get_json()['messageKey']
+            first = client.get(f'/dad-pass/{message_key}').get_json()
+            second = client.get(f'/dad-pass/{message_key}').get_json()
+        
+        assert first == {'message': 'In memory', 'ttlOption': '15min'}
+        assert second['message'] == 'Message is no longer available'
+    
+    def test_client_encrypted_message(self, client):
+        """Test that zero-knowledge ciphertext is stored and returned as sent, never decrypted."""
+        ciphertext = base64.urlsafe_b64encode(bytes((CLIENT_ENVELOPE_VERSION,)) + os.urandom(40)).decode('ascii')
+        with patch('app.service.store', InMemoryMessageStore()), \
+                patch('dadpass_core.service.decrypt_message', side_effect=AssertionError):
+            create_response = client.post(
+                '/dad-pass',
+                data=json.dumps({'ciphertext': ciphertext, 'ttlOption': '15min'}),
+                content_type='application/json'
+            )
+            message_key = create_response.get_json()['messageKey']
+            read = client.get(f'/dad-pass/{message_key}').get_json()
+            invalid = client.post('/dad-pass', data=json.dumps({'ciphertext': 'gAAAAA=='}),
+                                  content_type='application/json')
+        
+        assert read == {'ciphertext': ciphertext, 'ttlOption': '15min'}
+        assert invalid.status_code == 400
+    
+    @pytest.mark.parametrize('backend', ['stdlib', 'orjson'])
+    def test_json_backends(self, backend, client):
+        """Test that requests are parsed and responses written by each fastjson backend alike."""
+        pytest.importorskip('orjson')
+        previous = fastjson.BACKEND
+        fastjson.set_backend(backend)
+        try:
+            with patch('app.service.store', InMemoryMessageStore()):
+                create_response = client.post(
+                    '/dad-pass',
+                    data=json.dumps({'message': 'Crème brûlée 🔑', 'ttlOption': '1hour'}),
+                    content_type='application/json'
+                )
+                message_key = create_response.get_json()['messageKey']
+                read_response = client.get(f'/dad-pass/{message_key}')
+        finally:
+            fastjson.set_backend(previous)
+        
+        assert create_response.mimetype == 'application/json'
+        assert read_response.data == '{"message":"Crème brûlée 🔑","ttlOption":"1hour"}'.encode()
+    
     def test_create_message_missing_message(self, client):
         """Test creating a message without the required message field."""
         response = client.post(
@@ -153,7 +297,6 @@ class TestFlaskRoutes:
         data = response.get_json()
         assert 'error' in data
     
-    @patch('app.table')
     def test_get_message_success(self, mock_table, client):
         """Test retrieving a message successfully."""
         # Create an encrypted message
@@ -161,15 +304,14 @@ class TestFlaskRoutes:
         encrypted = encrypt_message(test_message)
         future_ttl = int(time.time()) + 3600  # 1 hour from now
         
-        mock_table.get_item.return_value = {
-            'Item': {
+        mock_table.delete_item.return_value = {
+            'Attributes': {
                 'messageKey': 'abc123xyz0',
                 'encryptedMessage': encrypted,
                 'ttl': future_ttl,
                 'ttlOption': '1hour'
             }
         }
-        mock_table.delete_item.return_value = {}
         
         response = client.get('/dad-pass/abc123xyz0')
         
@@ -178,13 +320,17 @@ class TestFlaskRoutes:
         assert data['message'] == test_message
         assert data['ttlOption'] == '1hour'
         
-        # Verify delete was called (one-time access)
-        mock_table.delete_item.assert_called_once_with(Key={'messageKey': 'abc123xyz0'})
+        # Verify the read and delete happened in one conditional call (one-time access)
+        mock_table.get_item.assert_not_called()
+        mock_table.delete_item.assert_called_once()
+        call_kwargs = mock_table.delete_item.call_args[1]
+        assert call_kwargs['Key'] == {'messageKey': 'abc123xyz0'}
+        assert call_kwargs['ReturnValues'] == 'ALL_OLD'
+        assert '#ttl >= :now' in call_kwargs['ConditionExpression']
     
-    @patch('app.table')
     def test_get_message_not_found(self, mock_table, client):
         """Test retrieving a non-existent message."""
-        mock_table.get_item.return_value = {}  # No 'Item' key
+        mock_table.delete_item.side_effect = _conditional_check_failed()
         
         response = client.get('/dad-pass/nonexistent1')
         
@@ -192,32 +338,89 @@ class TestFlaskRoutes:
         data = response.get_json()
         assert data['message'] == 'Message is no longer available'
     
-    @patch('app.table')
-    def test_get_message_expired(self, mock_table, client):
+    def test_get_message_expired(self, client):
         """Test retrieving an expired message."""
         # Create an encrypted message with expired TTL
-        test_message = "Expired secret"
-        encrypted = encrypt_message(test_message)
-        expired_ttl = int(time.time()) - 3600  # 1 hour ago (expired)
+        fake_table = FakeDynamoTable()
+        fake_table.put_item(Item={
+            'messageKey': 'expired123',
+            'encryptedMessage': encrypt_message("Expired secret"),
+            'ttl': int(time.time()) - 3600,  # 1 hour ago (expired)
+            'ttlOption': '1hour'
+        })
         
-        mock_table.get_item.return_value = {
-            'Item': {
-                'messageKey': 'expired123',
-                'encryptedMessage': encrypted,
-                'ttl': expired_ttl,
-                'ttlOption': '1hour'
-            }
-        }
-        mock_table.delete_item.return_value = {}
-        
-        response = client.get('/dad-pass/expired123')
+        with patch('app.service.store', DynamoDBMessageStore(fake_table)):
+            response = client.get('/dad-pass/expired123')
         
         assert response.status_code == 200
         data = response.get_json()
         assert data['message'] == 'Message is no longer available'
+    
+    def test_metrics(self, mock_table, client):
+        """Test that /metrics exposes request and per-stage latency in the Prometheus text format."""
+        mock_table.put_item.return_value = {}
+        client.post('/dad-pass', data=json.dumps({'message': 'Test secret message'}), content_type='application/json')
         
-        # Verify delete was called for cleanup
-        mock_table.delete_item.assert_called_once_with(Key={'messageKey': 'expired123'})
+        response = client.get('/metrics')
+        
+        assert response.status_code == 200
+        assert response.content_type == 'text/plain; version=0.0.4; charset=utf-8'
+        body = response.get_data(as_text=True)
+        assert 'dadpass_requests_total{method="POST",route="/dad-pass",status="200"}' in body
+        assert 'dadpass_request_seconds_count{method="POST",route="/dad-pass"}' in body
+        for stage in ('store', 'encrypt', 'serialize'):
+            assert f'dadpass_stage_seconds_count{{stage="{stage}"}}' in body
+    
+    def test_metrics_route_template(self, client):
+        """Test that requests are labelled by route template, not by message key."""
+        client.get('/dad-pass/abcdef1234')
+        
+        body = client.get('/metrics').get_data(as_text=True)
+        
+        assert 'route="/dad-pass/<message_key>"' in body
+        assert 'abcdef1234' not in body
+
+
+class TestConcurrentRetrieval:
+    """Concurrency tests for one-time retrieval against an in-memory DynamoDB stand-in."""
+    
+    READERS = 32
+    
+    def _read_concurrently(self, message_key):
+        barrier = threading.Barrier(self.READERS)
+        results = []
+        results_lock = threading.Lock()
+        
+        def reader():
+            with app.test_client() as client:
+                barrier.wait()
+                data = client.get(f'/dad-pass/{message_key}').get_json()
+            with results_lock:
+                results.append(data['message'])
+        
+        threads = [threading.Thread(target=reader) for _ in range(self.READERS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+    
+    def test_exactly_one_reader_wins(self):
+        """Test that only one of many simultaneous readers sees the secret."""
+        fake_table = FakeDynamoTable()
+        fake_table.put_item(Item={
+            'messageKey': 'race123456',
+            'encryptedMessage': encrypt_message("Only once"),
+            'ttl': int(time.time()) + 3600,
+            'ttlOption': '1hour'
+        })
+        
+        with patch('app.service.store', DynamoDBMessageStore(fake_table)):
+            results = self._read_concurrently('race123456')
+        
+        assert results.count("Only once") == 1
+        assert results.count('Message is no longer available') == self.READERS - 1
+        assert fake_table.items == {}
 
 
 class TestTTLOptions:
@@ -230,8 +433,7 @@ class TestTTLOptions:
         with app.test_client() as client:
             yield client
     
-    @patch('app.table')
-    @patch('app.time')
+    @patch('dadpass_core.service.time')
     def test_ttl_15min(self, mock_time, mock_table, client):
         """Test that 15min TTL is calculated correctly."""
         mock_time.time.return_value = 1000000
@@ -248,10 +450,9 @@ class TestTTLOptions:
         call_args = mock_table.put_item.call_args
         item = call_args[1]['Item']
         assert item['ttl'] == 1000900  # 1000000 + 900
-        assert item['ttlOption'] == '15min'
+        assert item['o'] == TTL_OPTION_CODES['15min']
     
-    @patch('app.table')
-    @patch('app.time')
+    @patch('dadpass_core.service.time')
     def test_ttl_1hour(self, mock_time, mock_table, client):
         """Test that 1hour TTL is calculated correctly."""
         mock_time.time.return_value = 1000000
@@ -267,10 +468,9 @@ class TestTTLOptions:
         call_args = mock_table.put_item.call_args
         item = call_args[1]['Item']
         assert item['ttl'] == 1003600  # 1000000 + 3600
-        assert item['ttlOption'] == '1hour'
+        assert item['o'] == TTL_OPTION_CODES['1hour']
     
-    @patch('app.table')
-    @patch('app.time')
+    @patch('dadpass_core.service.time')
     def test_ttl_1day(self, mock_time, mock_table, client):
         """Test that 1day TTL is calculated correctly."""
         mock_time.time.return_value = 1000000
@@ -286,10 +486,9 @@ class TestTTLOptions:
         call_args = mock_table.put_item.call_args
         item = call_args[1]['Item']
         assert item['ttl'] == 1086400  # 1000000 + 86400
-        assert item['ttlOption'] == '1day'
+        assert item['o'] == TTL_OPTION_CODES['1day']
     
-    @patch('app.table')
-    @patch('app.time')
+    @patch('dadpass_core.service.time')
     def test_ttl_5days(self, mock_time, mock_table, client):
         """Test that 5days TTL is calculated correctly."""
         mock_time.time.return_value = 1000000
@@ -305,10 +504,9 @@ class TestTTLOptions:
         call_args = mock_table.put_item.call_args
         item = call_args[1]['Item']
         assert item['ttl'] == 1432000  # 1000000 + 432000
-        assert item['ttlOption'] == '5days'
+        assert item['o'] == TTL_OPTION_CODES['5days']
     
-    @patch('app.table')
-    @patch('app.time')
+    @patch('dadpass_core.service.time')
     def test_ttl_invalid_defaults_to_5days(self, mock_time, mock_table, client):
         """Test that an invalid TTL option defaults to 5 days."""
         mock_time.time.return_value = 1000000
@@ -324,3 +522,172 @@ class TestTTLOptions:
         call_args = mock_table.put_item.call_args
         item = call_args[1]['Item']
         assert item['ttl'] == 1432000  # Defaults to 5days (432000)
+
+
+class TestBatchCreate:
+    """Unit tests for the batch create route."""
+    
+    @pytest.fixture
+    def client(self):
+        """Create a test client for the Flask app."""
+        app.config['TESTING'] = True
+        with app.test_client() as client:
+            yield client
+    
+    def test_create_batch_and_read_each(self, client):
+        """Test that every entry is created and readable once, in request order."""
+        entries = [{'message': f'secret {i}', 'ttlOption': '15min'} for i in range(3)]
+        with patch('app.service.store', InMemoryMessageStore()):
+            response = client.post('/dad-pass/batch', json=entries)
+            keys = [result['messageKey'] for result in response.get_json()['messages']]
+            reads = [client.get(f'/dad-pass/{key}').get_json() for key in keys]
+        
+        assert response.status_code == 200
+        assert len(set(keys)) == 3
+        assert reads == [{'message': f'secret {i}', 'ttlOption': '15min'} for i in range(3)]
+    
+    def test_batch_is_one_transaction(self, mock_table, client):
+        """Test that a batch is written with one conditional TransactWriteItems call."""
+        response = client.post('/dad-pass/batch', json=[{'message': f'secret {i}'} for i in range(10)])
+        
+        assert response.status_code == 200
+        mock_table.put_item.assert_not_called()
+        mock_table.meta.client.transact_write_items.assert_called_once()
+        actions = mock_table.meta.client.transact_write_items.call_args[1]['TransactItems']
+        assert len(actions) == 10
+        assert all('attribute_not_exists(messageKey)' in action['Put']['ConditionExpression'] for action in actions)
+    
+    def test_batch_collision_gets_a_new_key(self, mock_table, client):
+        """Test that only the entry whose key is taken is rewritten, under a fresh key."""
+        mock_table.meta.client.transact_write_items.side_effect = [
+            ClientError({
+                'Error': {'Code': 'TransactionCanceledException', 'Message': 'Transaction cancelled'},
+                'CancellationReasons': [{'Code': 'ConditionalCheckFailed'}, {'Code': 'None'}]
+            }, 'TransactWriteItems'),
+            {},
+            {}
+        ]
+        
+        with patch('app.service.new_key', side_effect=['taken00000', 'second0000', 'fresh00000']):
+            response = client.post('/dad-pass/batch', json=[{'message': 'first'}, {'message': 'second'}])
+        
+        assert response.get_json() == {'messages': [{'messageKey': 'fresh00000'}, {'messageKey': 'second0000'}]}
+        calls = mock_table.meta.client.transact_write_items.call_args_list
+        assert [len(call[1]['TransactItems']) for call in calls] == [2, 1, 1]
+    
+    def test_batch_requires_array_of_messages(self, client):
+        """Test that malformed batches are rejected with 400."""
+        with patch('app.service.store', InMemoryMessageStore()):
+            not_array = client.post('/dad-pass/batch', json={'message': 'one'})
+            missing = client.post('/dad-pass/batch', json=[{'message': 'ok'}, {'ttlOption': '1hour'}])
+            too_many = client.post('/dad-pass/batch', json=[{'message': 'x'}] * 501)
+        
+        assert not_array.status_code == 400
+        assert missing.status_code == 400
+        assert 'entry 1' in missing.get_json()['error']
+        assert too_many.status_code == 400
+    
+    def test_batch_rejects_malformed_json(self, client):
+        """Test that a batch body that is not valid JSON is rejected with 400, as in the Lambda."""
+        response = client.post('/dad-pass/batch', data=b'[{"message": ', content_type='application/json')
+        
+        assert response.status_code == 400
+        assert response.get_json()['error'] == 'A non-empty array of messages is required'
+
+
+class TestRequestSize:
+    """Unit tests for the request size limits."""
+    
+    @pytest.fixture
+    def client(self):
+        """Create a test client for the Flask app."""
+        app.config['TESTING'] = True
+        with app.test_client() as client:
+            yield client
+    
+    def test_oversize_body_is_refused_before_parsing(self, client):
+        """Test that a body over the limit gets a 413 from its Content-Length, without being parsed."""
+        body = b'{' * (service.limits.max_body_bytes + 1)
+        with patch('app.service.create_message') as create_message:
+            response = client.post('/dad-pass', data=body, content_type='application/json')
+        
+        assert response.status_code == 413
+        assert response.get_json() == {'error': f'Request body is larger than {service.limits.max_body_bytes} bytes'}
+        create_message.assert_not_called()
+    
+    def test_chunked_body_stops_at_the_limit(self, client):
+        """Test that a body without a Content-Length is cut off at the limit."""
+        body = json.dumps({'message': 'x' * service.limits.max_body_bytes}).encode()
+        response = client.post(
+            '/dad-pass',
+            input_stream=io.BytesIO(body),
+            content_type='application/json',
+            environ_base={'wsgi.input_terminated': True}
+        )
+        
+        assert response.status_code == 413
+    
+    def test_long_message_is_refused(self, client):
+        """Test that a message over MAX_MESSAGE_LENGTH characters is refused with a 413."""
+        long_message = 'x' * (service.limits.max_message_length + 1)
+        with patch('app.service.store', InMemoryMessageStore()):
+            single = client.post('/dad-pass', json={'message': long_message})
+            batch = client.post('/dad-pass/batch', json=[{'message': 'ok'}, {'message': long_message}])
+            at_limit = client.post('/dad-pass', json={'message': long_message[1:]})
+        
+        assert (single.status_code, batch.status_code, at_limit.status_code) == (413, 413, 200)
+        assert 'longer than' in single.get_json()['error']
+    
+    def test_batch_body_limit(self, client):
+        """Test that the batch route has its own, larger, body limit."""
+        body = b'[' * (service.limits.max_batch_body_bytes + 1)
+        response = client.post('/dad-pass/batch', data=body, content_type='application/json')
+        
+        assert service.limits.max_batch_body_bytes > service.limits.max_body_bytes
+        assert response.status_code == 413
+
+
+class TestTracing:
+    """Tests for request tracing through the Flask app."""
+    
+    TRACE_ID = '4bf92f3577b34da6a3ce929d0e0e4736'
+    
+    @pytest.fixture
+    def spans(self):
+        """Record every request's spans in a list."""
+        spans = []
+        exporter = MagicMock()
+        exporter.export.side_effect = spans.append
+        previous = tracing.get_tracer()
+        tracing.set_tracer(tracing.Tracer(exporter, sample_rate=1.0))
+        yield spans
+        tracing.set_tracer(previous)
+    
+    @pytest.fixture
+    def client(self):
+        """Create a test client for the Flask app."""
+        app.config['TESTING'] = True
+        with app.test_client() as client:
+            yield client
+    
+    def test_incoming_trace_is_continued(self, spans, mock_table, client):
+        """Test that a traceparent header is continued with spans for DynamoDB and encryption."""
+        mock_table.put_item.return_value = {}
+        
+        client.post('/dad-pass', json={'message': 'Test secret message'},
+                    headers={'traceparent': f'00-{self.TRACE_ID}-00f067aa0ba902b7-01'})
+        
+        root = spans[-1]
+        assert [span.name for span in spans] == ['Fernet.encrypt', 'DynamoDB.PutItem', 'POST /dad-pass']
+        assert {span.trace_id for span in spans} == {self.TRACE_ID}
+        assert root.parent_id == '00f067aa0ba902b7'
+        assert root.attributes == {'http_status': 200}
+        assert all(span.parent_id == root.span_id for span in spans[:-1])
+    
+    def test_message_key_is_not_recorded(self, spans, client):
+        """Test that a read is named by its route, so the message key never reaches the trace."""
+        with patch('app.service.store', InMemoryMessageStore()):
+            client.get('/dad-pass/abcdef1234')
+        
+        assert spans[-1].name == 'GET /dad-pass/<message_key>'
+        assert 'abcdef1234' not in str([span.to_dict() for span in spans])
@@ -0,0 +1,322 @@
+"""
+Unit tests for the dad-pass container backend ASGI app.
+These tests mock AWS services and run the app through Starlette's test client.
+"""
+import asyncio
+import pytest
+import sys
+from contextlib import asynccontextmanager
+from pathlib import Path
+from unittest.mock import patch, MagicMock
+from cryptography.fernet import Fernet
+import os
+import time
+
+# Set required environment variables before importing the app
+os.environ['MESSAGES_TABLE_NAME'] = 'test-messages-table'
+os.environ['AWS_REGION'] = 'us-east-1'
+
+mock_key = Fernet.generate_key()
+
+# Mock boto3 before importing the app to prevent SSM calls during import
+with patch('boto3.session.Session') as mock_session, patch('boto3.client') as mock_client:
+    mock_ssm = MagicMock()
+    mock_ssm.get_parameter.return_value = {
+        'Parameter': {'Value': mock_key.decode('utf-8')}
+    }
+    mock_client.return_value = mock_ssm
+    mock_session.return_value.client.return_value = mock_ssm
+
+    service_dir = Path(__file__).parent.parent.parent
+    sys.path.insert(0, str(service_dir / "app"))
+    sys.path.insert(0, str(service_dir.parent / "shared" / "src"))
+
+    from asgi import app, key_ring, _matched_route
+    from dadpass_core.crypto import encrypt_message
+    # The keys load in the background; finish while SSM is still mocked
+    key_ring.wait_until_ready()
+
+from starlette.testclient import TestClient
+from botocore.exceptions import ClientError
+from dadpass_core import tracing
+from dadpass_core.async_store import AsyncDynamoDBMessageStore
+
+
+class FakeAsyncDynamoClient:
+    """In-memory stand-in for the aiobotocore client's conditional PutItem/DeleteItem."""
+
+    def __init__(self):
+        self.items = {}
+        self.calls = []
+
+    async def put_item(self, **kwargs):
+        self.calls.append(('PutItem', kwargs))
+        await asyncio.sleep(0)
+        existing = self.items.get(kwargs['Item']['messageKey']['S'])
+        if existing is not None and int(existing['ttl']['N']) >= int(kwargs['ExpressionAttributeValues'][':now']['N']):
+            raise ClientError({'Error': {'Code': 'ConditionalCheckFailedException'}}, 'PutItem')
+        self.items[kwargs['Item']['messageKey']['S']] = kwargs['Item']
+        return {}
+
+    async def delete_item(self, **kwargs):
+        self.calls.append(('DeleteItem', kwargs))
+        await asyncio.sleep(0)
+        item = self.items.get(kwargs['Key']['messageKey']['S'])
+        if item is None or int(item['ttl']['N']) < int(kwargs['ExpressionAttributeValues'][':now']['N']):
+            raise ClientError({'Error': {'Code': 'ConditionalCheckFailedException'}}, 'DeleteItem')
+        del self.items[kwargs['Key']['messageKey']['S']]
+        return {'Attributes': item}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """Serve the ASGI app from the in-memory store."""
+    monkeypatch.setenv('MESSAGE_STORE', 'memory')
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def dynamo_client():
+    """Serve the ASGI app from a DynamoDB store backed by a fake aiobotocore client."""
+    fake = FakeAsyncDynamoClient()
+
+    @asynccontextmanager
+    async def open_fake_store(*args, **kwargs):
+        yield AsyncDynamoDBMessageStore(fake, kwargs['table_name'])
+
+    with patch('asgi.open_async_store', open_fake_store):
+        with TestClient(app) as client:
+            client.fake = fake
+            yield client
+
+
+class TestAsgiRoutes:
+    """Unit tests for the ASGI route handlers."""
+
+    def test_health_check(self, client):
+        """Test the health check endpoint returns healthy status."""
+        response = client.get('/')
+        assert response.status_code == 200
+        assert response.json() == {'status': 'healthy', 'ready': True}
+
+    def test_readiness_check(self, client):
+        """Test the readiness endpoint once the encryption keys are loaded."""
+        response = client.get('/ready')
+        assert response.status_code == 200
+        assert response.json()['ready'] is True
+
+    @patch('asgi.key_ring')
+    def test_readiness_check_while_keys_load(self, mock_key_ring, client):
+        """Test the readiness endpoint reports 503 until the keys are loaded."""
+        mock_key_ring.ready = False
+
+        response = client.get('/ready')
+
+        assert response.status_code == 503
+        assert response.json()['ready'] is False
+        mock_key_ring.ensure_loading.assert_called_once()
+
+    def test_create_and_get_once(self, client):
+        """Test the full create/read-once flow."""
+        create_response = client.post('/dad-pass', json={'message': 'Async secret', 'ttlOption': '15min'})
+        message_key = create_response.json()['messageKey']
+
+        first = client.get(f'/dad-pass/{message_key}').json()
+        second = client.get(f'/dad-pass/{message_key}').json()
+
+        assert create_response.status_code == 200
+        assert len(message_key) == 10 and message_key.isalnum()
+        assert first == {'message': 'Async secret', 'ttlOption': '15min'}
+        assert second == {'message': 'Message is no longer available'}
+
+    def test_metrics(self, client):
+        """Test that /metrics exposes request and per-stage latency under the same series as the Flask app."""
+        client.post('/dad-pass', json={'message': 'Async secret'})
+
+        response = client.get('/metrics')
+
+        assert response.status_code == 200
+        assert response.headers['content-type'] == 'text/plain; version=0.0.4; charset=utf-8'
+        assert 'dadpass_requests_total{method="POST",route="/dad-pass",status="200"}' in response.text
+        assert 'dadpass_request_seconds_count{method="POST",route="/dad-pass"}' in response.text
+        assert 'dadpass_stage_seconds_count{stage="encrypt"}' in response.text
+
+    def test_metrics_route_template(self, client):
+        """Test that requests are labelled by route template, not by message key, and unknown paths as unmatched."""
+        client.get('/dad-pass/abcdef1234')
+        client.get('/no-such-path')
+
+        body = client.get('/metrics').text
+
+        assert 'dadpass_requests_total{method="GET",route="/dad-pass/<message_key>",status="200"}' in body
+        assert 'dadpass_requests_total{method="GET",route="unmatched",status="404"}' in body
+        assert 'abcdef1234' not in body
+
+    def test_route_matched_without_starlette_recording_it(self):
+        """Test that the route is found from the app's routes on Starlette versions that do not put it in the scope."""
+        def scope(method: str, path: str) -> dict:
+            return {'type': 'http', 'method': method, 'path': path, 'root_path': '', 'app': app}
+
+        assert _matched_route(scope('GET', '/dad-pass/abcdef1234')).path == '/dad-pass/{message_key}'
+        assert _matched_route(scope('GET', '/dad-pass/batch')).path == '/dad-pass/{message_key}'
+        assert _matched_route(scope('PUT', '/dad-pass')).path == '/dad-pass'
+        assert _matched_route(scope('GET', '/no-such-path')) is None
+
+    def test_create_message_missing_message(self, client):
+        """Test creating a message without the required message field."""
+        response = client.post('/dad-pass', json={'ttlOption': '1hour'})
+        assert response.status_code == 400
+        assert 'error' in response.json()
+
+    def test_create_message_invalid_json(self, client):
+        """Test that an unparseable body is reported as a failed create, like the Flask app."""
+        response = client.post('/dad-pass', content=b'not json', headers={'Content-Type': 'application/json'})
+        assert response.status_code == 500
+        assert response.json() == {'error': 'Failed to create message'}
+
+    def test_get_message_not_found(self, client):
+        """Test retrieving a non-existent message."""
+        response = client.get('/dad-pass/nonexistent1')
+        assert response.status_code == 200
+        assert response.json() == {'message': 'Message is no longer available'}
+
+
+class TestAsgiDynamoDB:
+    """Unit tests for the ASGI app against the async DynamoDB store."""
+
+    @patch('dadpass_core.service.time')
+    def test_create_message_writes_conditionally(self, mock_time, dynamo_client):
+        """Test that the item is written with its TTL and the put-if-absent condition."""
+        mock_time.time.return_value = 1000000
+
+        response = dynamo_client.post('/dad-pass', json={'message': 'Test', 'ttlOption': '1day'})
+
+        assert response.status_code == 200
+        operation, kwargs = dynamo_client.fake.calls[-1]
+        assert operation == 'PutItem'
+        assert kwargs['TableName'] == 'test-messages-table'
+        assert kwargs['Item']['ttl'] == {'N': '1086400'}
+        assert kwargs['Item']['o'] == {'N': '3'}
+        assert set(kwargs['Item']['c']) == {'B'}
+        assert 'attribute_not_exists(messageKey)' in kwargs['ConditionExpression']
+
+    def test_get_message_success(self, dynamo_client):
+        """Test retrieving a message with a single conditional delete."""
+        dynamo_client.fake.items['abc123xyz0'] = {
+            'messageKey': {'S': 'abc123xyz0'},
+            'encryptedMessage': {'S': encrypt_message('Secret message')},
+            'ttl': {'N': str(int(time.time()) + 3600)},
+            'ttlOption': {'S': '1hour'}
+        }
+
+        response = dynamo_client.get('/dad-pass/abc123xyz0')
+
+        assert response.json() == {'message': 'Secret message', 'ttlOption': '1hour'}
+        assert [operation for operation, _ in dynamo_client.fake.calls] == ['DeleteItem']
+        assert dynamo_client.fake.calls[0][1]['ReturnValues'] == 'ALL_OLD'
+
+    def test_create_message_key_collision(self, dynamo_client):
+        """Test that a conditional put failure is reported as a key collision."""
+        with patch('dadpass_core.service.AsyncMessageService.new_key', return_value='taken12345'):
+            dynamo_client.post('/dad-pass', json={'message': 'First'})
+            response = dynamo_client.post('/dad-pass', json={'message': 'Second'})
+
+        assert response.status_code == 500
+        assert 'collision' in response.json()['error']
+
+    def test_create_message_retries_taken_key(self, dynamo_client):
+        """Test that a collision is retried under a fresh key instead of failing the request."""
+        with patch('dadpass_core.service.AsyncMessageService.new_key', side_effect=['taken12345', 'taken12345', 'fresh12345']):
+            dynamo_client.post('/dad-pass', json={'message': 'First'})
+            response = dynamo_client.post('/dad-pass', json={'message': 'Second'})
+
+        assert response.status_code == 200
+        assert response.json() == {'messageKey': 'fresh12345'}
+        assert [operation for operation, _ in dynamo_client.fake.calls] == ['PutItem'] * 3
+
+
+class TestAsgiBatch:
+    """Unit tests for the ASGI batch create route."""
+
+    def test_create_batch_and_read_each(self, client):
+        """Test that every entry is created and readable once, in request order."""
+        entries = [{'message': f'secret {i}', 'ttlOption': '1hour'} for i in range(3)]
+
+        response = client.post('/dad-pass/batch', json=entries)
+        keys = [result['messageKey'] for result in response.json()['messages']]
+        reads = [client.get(f'/dad-pass/{key}').json() for key in keys]
+
+        assert response.status_code == 200
+        assert reads == [{'message': f'secret {i}', 'ttlOption': '1hour'} for i in range(3)]
+
+    def test_batch_requires_array_of_messages(self, client):
+        """Test that a non-array body is rejected with 400."""
+        response = client.post('/dad-pass/batch', json={'message': 'one'})
+        assert response.status_code == 400
+
+    def test_batch_rejects_malformed_json(self, client):
+        """Test that a batch body that is not valid JSON is rejected with 400, as in the Lambda."""
+        response = client.post('/dad-pass/batch', content=b'[{"message": ', headers={'Content-Type': 'application/json'})
+
+        assert response.status_code == 400
+        assert response.json()['error'] == 'A non-empty array of messages is required'
+
+
+class TestAsgiRequestSize:
+    """Unit tests for the ASGI request size limits."""
+
+    def test_oversize_body_is_refused_before_reading(self, client):
+        """Test that a body over the limit gets a 413 from its Content-Length, without being parsed."""
+        limit = app.state.service.limits.max_body_bytes
+        response = client.post('/dad-pass', content=b'{' * (limit + 1), headers={'Content-Type': 'application/json'})
+
+        assert response.status_code == 413
+        assert response.json() == {'error': f'Request body is larger than {limit} bytes'}
+
+    def test_chunked_body_stops_at_the_limit(self, client):
+        """Test that a streamed body without a Content-Length is cut off at the limit."""
+        limit = app.state.service.limits.max_batch_body_bytes
+
+        def chunks():
+            for _ in range(limit // 1024 + 2):
+                yield b' ' * 1024
+
+        response = client.post('/dad-pass/batch', content=chunks(), headers={'Content-Type': 'application/json'})
+
+        assert response.status_code == 413
+
+    def test_long_message_is_refused(self, client):
+        """Test that a message over MAX_MESSAGE_LENGTH characters is refused with a 413."""
+        long_message = 'x' * (app.state.service.limits.max_message_length + 1)
+
+        assert client.post('/dad-pass', json={'message': long_message}).status_code == 413
+        assert client.post('/dad-pass/batch', json=[{'message': long_message}]).status_code == 413
+
+
+class TestAsgiTracing:
+    """Tests for request tracing through the ASGI app."""
+
+    @pytest.fixture
+    def spans(self):
+        """Record every request's spans in a list."""
+        spans = []
+        exporter = MagicMock()
+        exporter.export.side_effect = spans.append
+        previous = tracing.get_tracer()
+        tracing.set_tracer(tracing.Tracer(exporter, sample_rate=1.0))
+        yield spans
+        tracing.set_tracer(previous)
+
+    def test_request_spans(self, spans, dynamo_client):
+        """Test that an X-Amzn-Trace-Id header is continued and the span is named by route, not message key."""
+        message_key = dynamo_client.post('/dad-pass', json={'message': 'Async secret'}).json()['messageKey']
+        spans.clear()
+
+        dynamo_client.get(f'/dad-pass/{message_key}',
+                          headers={'X-Amzn-Trace-Id': 'Root=1-5759e988-bd862e3fe1be46a994272793;Sampled=1'})
+
+        assert [span.name for span in spans] == ['DynamoDB.DeleteItem', 'Fernet.decrypt', 'GET /dad-pass/<message_key>']
+        assert {span.trace_id for span in spans} == {'5759e988bd862e3fe1be46a994272793'}
+        assert spans[-1].attributes == {'http_status': 200}
+        assert message_key not in str([span.to_dict() for span in spans])
@@ -0,0 +1,136 @@
+"""
+Unit tests for the container's gunicorn configuration module.
+"""
+import os
+import pytest
+import runpy
+import sys
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+CONFIG_PATH = Path(__file__).parent.parent.parent / "app" / "gunicorn.conf.py"
+
+GUNICORN_ENV = (
+    'GUNICORN_WORKER_CLASS', 'GUNICORN_CPUS', 'WEB_CONCURRENCY', 'GUNICORN_THREADS',
+    'GUNICORN_PRELOAD', 'GUNICORN_BIND', 'GUNICORN_KEEPALIVE', 'PORT', 'DYNAMODB_MAX_CONNECTIONS'
+)
+
+
+@pytest.fixture
+def load_config(monkeypatch):
+    """Evaluate gunicorn.conf.py under the given environment and return its settings."""
+    def load(**env):
+        for name in GUNICORN_ENV:
+            monkeypatch.delenv(name, raising=False)
+        for name, value in env.items():
+            monkeypatch.setenv(name, value)
+        # The config exports DYNAMODB_MAX_CONNECTIONS for the app; keep it out of other tests
+        with patch.dict(os.environ):
+            return runpy.run_path(str(CONFIG_PATH))
+    return load
+
+
+class TestCpuLimit:
+    """Unit tests for reading the container CPU limit."""
+    
+    def test_cgroup_v2_quota(self, load_config, tmp_path):
+        """Test that a cgroup v2 quota of 50ms per 100ms reads as half a CPU."""
+        (tmp_path / 'cpu.max').write_text('50000 100000\n')
+        assert load_config(GUNICORN_CPUS='1')['cpu_limit'](str(tmp_path)) == 0.5
+    
+    def test_cgroup_v1_quota(self, load_config, tmp_path):
+        """Test that the cgroup v1 CFS quota files are used when cpu.max is absent."""
+        (tmp_path / 'cpu').mkdir()
+        (tmp_path / 'cpu' / 'cpu.cfs_quota_us').write_text('200000\n')
+        (tmp_path / 'cpu' / 'cpu.cfs_period_us').write_text('100000\n')
+        assert load_config(GUNICORN_CPUS='1')['cpu_limit'](str(tmp_path)) == 2.0
+    
+    def test_unlimited_falls_back_to_cpu_count(self, load_config, tmp_path):
+        """Test that an unlimited quota falls back to the CPUs the process can use."""
+        (tmp_path / 'cpu.max').write_text('max 100000\n')
+        assert load_config(GUNICORN_CPUS='1')['cpu_limit'](str(tmp_path)) >= 1
+
+
+class TestWorkerSettings:
+    """Unit tests for the worker model and counts."""
+    
+    def test_defaults_for_half_cpu_pod(self, load_config):
+        """Test the defaults for the 500m CPU limit in k8s/deployment.yaml."""
+        config = load_config(GUNICORN_CPUS='0.5')
+        assert config['worker_class'] == 'gthread'
+        assert config['workers'] == 2
+        assert config['threads'] == 8
+        assert config['preload_app'] is True
+        assert config['wsgi_app'] == 'app:app'
+        assert config['bind'] == '0.0.0.0:8000'
+        assert config['keepalive'] > 60
+        assert config['max_requests_jitter'] > 0
+    
+    def test_sync_workers_follow_core_rule(self, load_config):
+        """Test that sync workers use (2 x cores) + 1 and a single thread."""
+        config = load_config(GUNICORN_WORKER_CLASS='sync', GUNICORN_CPUS='2')
+        assert config['workers'] == 5
+        assert config['threads'] == 1
+    
+    def test_asgi_uses_uvicorn_workers(self, load_config):
+        """Test that the asgi mode serves asgi.py on uvicorn workers."""
+        config = load_config(GUNICORN_WORKER_CLASS='asgi', GUNICORN_CPUS='0.5')
+        assert config['worker_class'] == 'uvicorn_worker.UvicornWorker'
+        assert config['wsgi_app'] == 'asgi:app'
+    
+    def test_explicit_overrides(self, load_config):
+        """Test that WEB_CONCURRENCY, GUNICORN_THREADS and PORT win over derived values."""
+        config = load_config(GUNICORN_CPUS='0.5', WEB_CONCURRENCY='4', GUNICORN_THREADS='16',
+                             GUNICORN_PRELOAD='false', PORT='5001')
+        assert config['workers'] == 4
+        assert config['threads'] == 16
+        assert config['preload_app'] is False
+        assert config['bind'] == '0.0.0.0:5001'
+    
+    def test_unknown_worker_class(self, load_config):
+        """Test that an unknown worker class is rejected."""
+        with pytest.raises(ValueError, match='eventlet'):
+            load_config(GUNICORN_WORKER_CLASS='eventlet')
+
+
+class TestDynamoDBPool:
+    """Unit tests for sizing each worker's DynamoDB connection pool."""
+    
+    def test_pool_matches_worker_concurrency(self, load_config):
+        """Test that each worker pools one connection per request it can have in flight."""
+        assert load_config(GUNICORN_CPUS='0.5')['dynamodb_max_connections'] == 8
+        assert load_config(GUNICORN_CPUS='0.5', GUNICORN_THREADS='32')['dynamodb_max_connections'] == 32
+        assert load_config(GUNICORN_CPUS='0.5', GUNICORN_WORKER_CLASS='sync')['dynamodb_max_connections'] == 1
+        assert load_config(GUNICORN_CPUS='0.5', GUNICORN_WORKER_CLASS='asgi')['dynamodb_max_connections'] is None
+    
+    def test_gevent_pool_is_capped(self, load_config):
+        """Test that a gevent worker does not pool a connection for each of its 1000 greenlets."""
+        config = load_config(GUNICORN_CPUS='0.5')
+        assert config['dynamodb_pool_size']('gevent', 1, 1000) == config['MAX_GEVENT_POOL_CONNECTIONS']
+
+
+class TestForkHooks:
+    """Unit tests for the preload hooks."""
+    
+    def test_post_fork_rearms_key_ring(self, load_config, monkeypatch):
+        """Test that each worker restarts the preloaded key ring's and log pipeline's threads."""
+        config = load_config(GUNICORN_CPUS='0.5')
+        app_module = MagicMock()
+        monkeypatch.setitem(sys.modules, 'app', app_module)
+        
+        config['post_fork'](MagicMock(), MagicMock())
+        
+        app_module.key_ring.after_fork.assert_called_once()
+        app_module.log_pipeline.after_fork.assert_called_once()
+    
+    def test_when_ready_tolerates_key_load_failure(self, load_config, monkeypatch):
+        """Test that the master still forks workers if the keys cannot be loaded yet."""
+        config = load_config(GUNICORN_CPUS='0.5')
+        app_module = MagicMock()
+        app_module.key_ring.wait_until_ready.side_effect = TimeoutError()
+        monkeypatch.setitem(sys.modules, 'app', app_module)
+        server = MagicMock()
+        
+        config['when_ready'](server)
+        
+        server.log.warning.assert_called_once()
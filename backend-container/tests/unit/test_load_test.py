@@ -0,0 +1,50 @@
+"""
+Unit tests for the load test's curve analysis (benchmarks/load_test.py).
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "benchmarks"))
+
+from load_test import Target, find_knee, replicas_for
+
+
+def _level(users: int, rps: float, p95_ms: float, errors: int = 0, requests: int = 1000) -> dict:
+    return {'users': users, 'rps': rps, 'p50': p95_ms / 2000, 'p95': p95_ms / 1000, 'p99': p95_ms / 1000,
+            'errors': errors, 'requests': requests}
+
+
+class TestFindKnee:
+    """Unit tests for picking the saturation point of a throughput/latency curve."""
+
+    def test_knee_is_where_throughput_stops_paying_for_latency(self):
+        """Test that the knee is the last level before latency grows faster than throughput."""
+        levels = [_level(1, 60, 16), _level(4, 200, 20), _level(16, 230, 70), _level(64, 235, 280)]
+
+        assert find_knee(levels)['users'] == 4
+
+    def test_failing_levels_are_not_capacity(self):
+        """Test that a level answering fast because it errors is never the knee."""
+        levels = [_level(1, 60, 16), _level(4, 200, 20, errors=50), _level(16, 230, 70)]
+
+        assert find_knee(levels)['users'] == 1
+
+    def test_no_usable_level(self):
+        """Test that there is no knee when every level failed."""
+        assert find_knee([_level(1, 0, 0, requests=0), _level(4, 10, 5, errors=500)]) is None
+
+
+class TestSizing:
+    """Unit tests for the replica count and target parsing."""
+
+    def test_replicas_leave_headroom(self):
+        """Test that pods are planned at the utilization share of their capacity, with at least two."""
+        assert replicas_for(500, 175, utilization=0.7) == 5
+        assert replicas_for(10, 175) == 2
+
+    def test_target_from_url(self):
+        """Test that the URL's scheme, port and path prefix are honoured."""
+        target = Target('https://dad-pass.example.com/api/')
+
+        assert (target.https, target.host, target.port, target.prefix) == (True, 'dad-pass.example.com', 443, '/api')
+        assert Target('http://localhost:5001').port == 5001
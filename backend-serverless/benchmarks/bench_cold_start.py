@@ -0,0 +1,96 @@
+"""
+Cold-start benchmark for the Lambda handler: time from `import lambda_function`
+to the first successful POST /dad-pass invocation, with eager vs lazy
+encryption key loading.
+
+Each sample runs in a fresh interpreter. botocore clients are built for real;
+only the network calls are replaced with fixed simulated latencies, so the
+benchmark runs offline. Run with: make bench-cold-start
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+SAMPLES = 5
+SSM_LATENCY_SECONDS = 0.150
+DYNAMODB_LATENCY_SECONDS = 0.010
+
+BENCH_DIR = Path(__file__).parent
+SRC_DIR = BENCH_DIR.parent / "src"
+SHARED_SRC = BENCH_DIR.parent.parent / "shared" / "src"
+
+CONTEXT = SimpleNamespace(
+    function_name='dad-pass-service-bench',
+    memory_limit_in_mb=128,
+    invoked_function_arn='arn:aws:lambda:us-east-2:000000000000:function:dad-pass-service-bench',
+    aws_request_id='bench'
+)
+
+
+def _fake_api_call(self, operation_name, api_params):
+    """Stands in for botocore's network layer with fixed latencies."""
+    from cryptography.fernet import Fernet
+    if operation_name == 'GetParametersByPath':
+        time.sleep(SSM_LATENCY_SECONDS)
+        return {'Parameters': [{'Name': '/dad-pass/encryption-keys/v1', 'Value': Fernet.generate_key().decode()}]}
+    if operation_name == 'GetParameter':
+        time.sleep(SSM_LATENCY_SECONDS)
+        return {'Parameter': {'Name': api_params['Name'], 'Value': Fernet.generate_key().decode()}}
+    time.sleep(DYNAMODB_LATENCY_SECONDS)
+    return {}
+
+
+def child():
+    """Measures one cold start in this (fresh) interpreter."""
+    import botocore.client
+    botocore.client.BaseClient._make_api_call = _fake_api_call
+    sys.path[:0] = [str(SRC_DIR), str(SHARED_SRC)]
+
+    start = time.perf_counter()
+    import lambda_function
+    imported = time.perf_counter()
+    sys.path.insert(0, str(BENCH_DIR.parent))
+    from events import create_rest_event
+    result = lambda_function.handler(create_rest_event('POST', '/dad-pass', body={'message': 'cold start'}), CONTEXT)
+    done = time.perf_counter()
+    assert result['statusCode'] == 200, result
+    print(json.dumps({'import': imported - start, 'first_response': done - start}))
+
+
+def sample(mode: str) -> dict:
+    env = dict(
+        os.environ,
+        KEY_LOAD_MODE=mode,
+        AWS_ACCESS_KEY_ID='bench',
+        AWS_SECRET_ACCESS_KEY='bench',
+        AWS_DEFAULT_REGION='us-east-2',
+        MESSAGES_TABLE_NAME='bench-messages',
+        POWERTOOLS_SERVICE_NAME='dad-pass-bench',
+        LOG_LEVEL='WARNING'
+    )
+    output = subprocess.run(
+        [sys.executable, __file__, '--child'], env=env, check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    print(f"{SAMPLES} cold starts per mode, simulated SSM latency {SSM_LATENCY_SECONDS * 1000:.0f} ms\n")
+    print(f"{'mode':<8} {'import (ms)':>12} {'first response (ms)':>20}")
+    for mode in ('eager', 'lazy'):
+        results = [sample(mode) for _ in range(SAMPLES)]
+        import_ms = statistics.median(r['import'] for r in results) * 1000
+        first_ms = statistics.median(r['first_response'] for r in results) * 1000
+        print(f"{mode:<8} {import_ms:12.1f} {first_ms:20.1f}")
+
+
+if __name__ == '__main__':
+    if '--child' in sys.argv:
+        child()
+    else:
+        main()
@@ -0,0 +1,98 @@
+"""
+Powertools resolver vs the direct router (LAMBDA_ROUTER), cold and warm.
+
+For each router, in fresh interpreters:
+
+    import (ms)       `import lambda_function`, best of SAMPLES
+    GET / POST (us)   one warm handler invocation, median of ITERATIONS
+
+Warm invocations run against MESSAGE_STORE=memory with the keys already
+loaded, so what differs between the rows is routing, event wrapping and the
+Powertools logger's context injection. GET reads a missing key, which does no
+decryption; POST creates a short message.
+Run with: make bench-router
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from bench_cold_start import CONTEXT, SHARED_SRC, SRC_DIR, _fake_api_call
+
+SAMPLES = 5
+ITERATIONS = 2_000
+ROUTERS = ('powertools', 'direct')
+
+
+def _time_invocations(handler, event: dict) -> float:
+    """Median microseconds per invocation of `handler` with `event`."""
+    timings = []
+    for _ in range(ITERATIONS):
+        start = time.perf_counter()
+        handler(event, CONTEXT)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1_000_000
+
+
+def child():
+    """Measures one import and the warm invocations in this (fresh) interpreter."""
+    import contextlib
+    import io
+    import botocore.client
+    botocore.client.BaseClient._make_api_call = _fake_api_call
+    sys.path[:0] = [str(SRC_DIR), str(SHARED_SRC)]
+
+    start = time.perf_counter()
+    import lambda_function
+    imported = time.perf_counter() - start
+    sys.path.insert(0, str(Path(__file__).parent.parent))
+    from events import create_rest_event
+    lambda_function.key_ring.wait_until_ready()
+
+    get_event = create_rest_event('GET', '/dad-pass/aB3dE6gH9j')
+    post_event = create_rest_event('POST', '/dad-pass', body={'message': 'warm', 'ttlOption': '1hour'})
+    # The handler prints an EMF line per invocation; keep it out of the timings' output
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert lambda_function.handler(post_event, CONTEXT)['statusCode'] == 200
+        get_us = _time_invocations(lambda_function.handler, get_event)
+        post_us = _time_invocations(lambda_function.handler, post_event)
+    print(json.dumps({'import': imported, 'get': get_us, 'post': post_us}))
+
+
+def sample(router: str) -> dict:
+    env = dict(
+        os.environ,
+        LAMBDA_ROUTER=router,
+        MESSAGE_STORE='memory',
+        KEY_LOAD_MODE='lazy',
+        AWS_ACCESS_KEY_ID='bench',
+        AWS_SECRET_ACCESS_KEY='bench',
+        AWS_DEFAULT_REGION='us-east-2',
+        POWERTOOLS_SERVICE_NAME='dad-pass-bench',
+        LOG_LEVEL='WARNING'
+    )
+    output = subprocess.run(
+        [sys.executable, __file__, '--child'], env=env, check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    print(f"{SAMPLES} fresh interpreters per router, {ITERATIONS} warm invocations each\n")
+    print(f"{'router':<11} {'import (ms)':>12} {'GET (us)':>9} {'POST (us)':>10}")
+    for router in ROUTERS:
+        results = [sample(router) for _ in range(SAMPLES)]
+        import_ms = min(r['import'] for r in results) * 1000
+        get_us = statistics.median(r['get'] for r in results)
+        post_us = statistics.median(r['post'] for r in results)
+        print(f"{router:<11} {import_ms:12.1f} {get_us:9.1f} {post_us:10.1f}")
+
+
+if __name__ == '__main__':
+    if '--child' in sys.argv:
+        child()
+    else:
+        main()
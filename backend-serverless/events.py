@@ -0,0 +1,53 @@
+"""
+API Gateway v2 (HTTP API) event builders for running the Lambda locally and in tests.
+
+Kept out of src/ so none of this is imported (or deployed) with the handler.
+"""
+import json
+from typing import Optional
+
+
+def create_rest_event(method: str, path: str, body: Optional[dict] = None) -> dict:
+    """
+    Creates a REST API Gateway event payload similar to those in run_local.py
+
+    Args:
+        method: HTTP method (GET, POST, PUT, DELETE, etc.)
+        path: API path (e.g., '/students', '/students/123')
+        body: Optional request body as a dictionary
+
+    Returns:
+        A dictionary representing an API Gateway event payload
+    """
+    # Ensure path starts with a forward slash
+    if not path.startswith('/'):
+        path = '/' + path
+
+    # Build routeKey with the method and path
+    route_key = f"{method} {path}"
+
+    # Create the basic event structure
+    event = {
+        "version": "2.0",
+        "routeKey": route_key,
+        "rawPath": path,
+        "headers": {
+            "accept": "application/json"
+        },
+        "requestContext": {
+            "http": {
+                "method": method,
+                "path": path
+            },
+            "stage": "$default"
+        },
+        "isBase64Encoded": False
+    }
+
+    # Add body if provided
+    if body:
+        # Escape JSON string for embedding in another JSON string
+        event["body"] = json.dumps(body)
+
+    return event
+
@@ -0,0 +1,141 @@
+"""
+In-memory stand-ins for the SSM and DynamoDB calls the handler makes, for replaying events offline.
+
+Installed under botocore's network layer (BaseClient._make_request), so the
+real boto3 clients and DynamoDB resource still validate, serialize and parse
+every call the way they do in Lambda; only the HTTP round trip is replaced,
+by a fixed simulated latency per service.
+
+Kept out of src/ so none of this is imported (or deployed) with the handler.
+"""
+import base64
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+from cryptography.fernet import Fernet
+
+KEY_PATH = '/dad-pass/encryption-keys'
+
+_OK = SimpleNamespace(status_code=200, headers={})
+_BAD_REQUEST = SimpleNamespace(status_code=400, headers={})
+
+
+def _parsed(value):
+    """A DynamoDB attribute value from the wire (binary as base64) in the form botocore's parser returns."""
+    (kind, inner), = value.items()
+    if kind == 'B':
+        return {'B': base64.b64decode(inner)}
+    if kind == 'M':
+        return {'M': {name: _parsed(item) for name, item in inner.items()}}
+    if kind == 'L':
+        return {'L': [_parsed(item) for item in inner]}
+    return value
+
+
+def _error(code: str, message: str, **extra) -> tuple:
+    return _BAD_REQUEST, {'Error': {'Code': code, 'Message': message}, 'ResponseMetadata': {}, **extra}
+
+
+class LocalAws:
+    """
+    SSM parameters and DynamoDB items held in memory, shared by every client built while installed.
+
+    Like the real services, they outlive any one Lambda container: a message
+    created before a simulated cold start can be read after it.
+    """
+
+    def __init__(self, ssm_latency: float = 0.0, dynamodb_latency: float = 0.0):
+        self.ssm_latency = ssm_latency
+        self.dynamodb_latency = dynamodb_latency
+        self.parameters = {f'{KEY_PATH}/v1': Fernet.generate_key().decode()}
+        # Items by messageKey, as sent on the wire
+        self.items: dict[str, dict] = {}
+        self.calls: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._original = None
+
+    def install(self):
+        """Routes every botocore client's requests here until `uninstall`."""
+        import botocore.client
+
+        local_aws = self
+        self._original = botocore.client.BaseClient._make_request
+
+        def _make_request(client, operation_model, request_dict, request_context):
+            return local_aws.handle(operation_model.service_model.endpoint_prefix, operation_model.name,
+                                    json.loads(request_dict['body'] or b'{}'))
+
+        botocore.client.BaseClient._make_request = _make_request
+        return self
+
+    def uninstall(self):
+        import botocore.client
+
+        if self._original is not None:
+            botocore.client.BaseClient._make_request = self._original
+            self._original = None
+
+    def handle(self, service: str, operation: str, params: dict) -> tuple:
+        """The (http response, parsed response) botocore expects for one call."""
+        handler = getattr(self, f'_{service}_{operation}', None)
+        if handler is None:
+            raise NotImplementedError(f"{service} {operation} has no local stand-in")
+        time.sleep(self.ssm_latency if service == 'ssm' else self.dynamodb_latency)
+        with self._lock:
+            self.calls[operation] = self.calls.get(operation, 0) + 1
+            return handler(params)
+
+    # SSM
+
+    def _ssm_GetParametersByPath(self, params: dict) -> tuple:
+        prefix = params['Path'].rstrip('/') + '/'
+        return _OK, {'Parameters': [
+            {'Name': name, 'Value': value, 'Type': 'SecureString'}
+            for name, value in self.parameters.items() if name.startswith(prefix)
+        ]}
+
+    def _ssm_GetParameter(self, params: dict) -> tuple:
+        value = self.parameters.get(params['Name'])
+        if value is None:
+            return _error('ParameterNotFound', f"Parameter {params['Name']} not found")
+        return _OK, {'Parameter': {'Name': params['Name'], 'Value': value, 'Type': 'SecureString'}}
+
+    # DynamoDB, only the conditions DynamoDBMessageStore sends
+
+    def _live(self, key: str, now: dict) -> bool:
+        item = self.items.get(key)
+        return item is not None and int(item['ttl']['N']) >= int(now['N'])
+
+    def _dynamodb_PutItem(self, params: dict) -> tuple:
+        # attribute_not_exists(messageKey) OR #ttl < :now
+        key = params['Item']['messageKey']['S']
+        if self._live(key, params['ExpressionAttributeValues'][':now']):
+            return _error('ConditionalCheckFailedException', 'The conditional request failed')
+        self.items[key] = params['Item']
+        return _OK, {}
+
+    def _dynamodb_DeleteItem(self, params: dict) -> tuple:
+        # attribute_exists(messageKey) AND #ttl >= :now
+        key = params['Key']['messageKey']['S']
+        if not self._live(key, params['ExpressionAttributeValues'][':now']):
+            return _error('ConditionalCheckFailedException', 'The conditional request failed')
+        item = self.items.pop(key)
+        if params.get('ReturnValues') == 'ALL_OLD':
+            return _OK, {'Attributes': {name: _parsed(value) for name, value in item.items()}}
+        return _OK, {}
+
+    def _dynamodb_TransactWriteItems(self, params: dict) -> tuple:
+        puts = [entry['Put'] for entry in params['TransactItems']]
+        reasons = [
+            {'Code': 'ConditionalCheckFailed'}
+            if self._live(put['Item']['messageKey']['S'], put['ExpressionAttributeValues'][':now'])
+            else {'Code': 'None'}
+            for put in puts
+        ]
+        if any(reason['Code'] != 'None' for reason in reasons):
+            return _error('TransactionCanceledException', 'Transaction cancelled', CancellationReasons=reasons)
+        for put in puts:
+            self.items[put['Item']['messageKey']['S']] = put['Item']
+        return _OK, {}
@@ -1,15 +1,27 @@
-# This file creates a simple sandbox for iterating on and debugging lambda functions locally
+# This file creates a simple sandbox for iterating on and debugging lambda functions locally.
+#
+#   python run_local.py CREATE_MESSAGE      one event against the AWS account in your environment
+#   python run_local.py replay [options]    thousands of events in process against in-memory AWS (see replay)
 
+import argparse
+import contextlib
+import importlib
 import json
+import random
+import re
+import statistics
 import sys
 import os
+from time import perf_counter
+from types import SimpleNamespace
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'shared', 'src'))
 from aws_lambda_powertools.utilities.typing import LambdaContext
-import utils
+import events as local_events
 
 events = {
-    "CREATE_MESSAGE": utils.create_rest_event("POST", "/dad-pass", body={"message": "Hello, world!"}),
-    "GET_MESSAGE": utils.create_rest_event("GET", "/dad-pass/test"),
+    "CREATE_MESSAGE": local_events.create_rest_event("POST", "/dad-pass", body={"message": "Hello, world!"}),
+    "GET_MESSAGE": local_events.create_rest_event("GET", "/dad-pass/test"),
 }
 
 
@@ -48,8 +60,190 @@ def run(event_key, handler_function):
     return result
 
 
+#
+# Replay harness
+#
+
+# Modules a Lambda container initialises itself; a simulated cold start imports them afresh
+CONTAINER_MODULES = ('lambda_function', 'utils', 'router', 'dadpass_core')
+
+# A GET for the message the N-th create in the workload returned
+CREATED_KEY = re.compile(r'\{created:(\d+)\}')
+
+
+def generate_workload(count: int, read_ratio: float = 0.5, miss_ratio: float = 0.05,
+                      seed: int | None = None) -> list[dict]:
+    """
+    API Gateway v2 events for `count` requests: creates, reads of earlier creates and reads of unknown keys.
+
+    A read names the create it follows as {created:N} in its path, resolved to
+    the key that create returned when the workload is replayed.
+    """
+    rng = random.Random(seed)
+    workload, unread = [], []
+    creates = 0
+    for _ in range(count):
+        if unread and rng.random() < read_ratio:
+            index = unread.pop(rng.randrange(len(unread)))
+            workload.append(local_events.create_rest_event('GET', f'/dad-pass/{{created:{index}}}'))
+        elif creates and rng.random() < miss_ratio:
+            workload.append(local_events.create_rest_event('GET', '/dad-pass/' + 'x' * 10))
+        else:
+            message = ''.join(rng.choices('abcdefghijklmnopqrstuvwxyz0123456789 ', k=rng.randint(8, 200)))
+            workload.append(local_events.create_rest_event(
+                'POST', '/dad-pass', body={'message': message, 'ttlOption': rng.choice(['1hour', '1day', '5days'])}))
+            unread.append(creates)
+            creates += 1
+    return workload
+
+
+def _resolve_created_keys(event: dict, created: list[str]) -> dict:
+    if '{created:' not in event.get('rawPath', ''):
+        return event
+
+    def key(match):
+        index = int(match.group(1))
+        return created[index] if index < len(created) else 'x' * 10
+
+    event = json.loads(json.dumps(event))
+    event['rawPath'] = CREATED_KEY.sub(key, event['rawPath'])
+    event['requestContext']['http']['path'] = event['rawPath']
+    event['routeKey'] = f"{event['requestContext']['http']['method']} {event['rawPath']}"
+    return event
+
+
+def start_container():
+    """
+    Simulates a cold start: drops the handler's modules and imports lambda_function afresh.
+
+    Module-level initialisation (the key ring's SSM load, the store and its
+    clients) runs again against the stand-ins; third-party libraries stay
+    imported, so `make bench-cold-start` remains the measure of cold import cost.
+
+    Returns:
+        The new lambda_function module and its initialisation time in seconds
+    """
+    utils = sys.modules.get('utils')
+    if utils is not None:
+        utils.key_ring.stop()
+    for name in list(sys.modules):
+        if name.split('.')[0] in CONTAINER_MODULES:
+            del sys.modules[name]
+    start = perf_counter()
+    lambda_function = importlib.import_module('lambda_function')
+    return lambda_function, perf_counter() - start
+
+
+def replay(workload: list[dict], cold_every: int = 0) -> dict:
+    """
+    Runs every event through lambda_function.handler, starting a new container every `cold_every` events.
+
+    The first event always lands on a cold container. The handler's EMF lines
+    are discarded.
+
+    Returns:
+        Latencies by (temperature, route), cold initialisation times, status code counts and wall time
+    """
+    latencies: dict[tuple[str, str], list[float]] = {}
+    inits, statuses, created = [], {}, []
+    lambda_function = None
+    start = perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for number, event in enumerate(workload):
+            temperature = 'warm'
+            if lambda_function is None or (cold_every and number % cold_every == 0):
+                lambda_function, init_seconds = start_container()
+                inits.append(init_seconds)
+                temperature = 'cold'
+            event = _resolve_created_keys(event, created)
+            context = SimpleNamespace(function_name='dad-pass-replay', memory_limit_in_mb=128,
+                                      invoked_function_arn='arn:aws:lambda:us-east-2:000000000000:function:dad-pass-replay',
+                                      aws_request_id=f'replay-{number}')
+            invoked = perf_counter()
+            response = lambda_function.handler(event, context)
+            elapsed = perf_counter() - invoked
+            method = event['requestContext']['http']['method']
+            route = 'POST /dad-pass' if method == 'POST' else 'GET /dad-pass/{key}'
+            latencies.setdefault((temperature, route), []).append(elapsed)
+            statuses[response['statusCode']] = statuses.get(response['statusCode'], 0) + 1
+            if method == 'POST' and response['statusCode'] == 200:
+                created.append(json.loads(response['body'])['messageKey'])
+    return {'latencies': latencies, 'inits': inits, 'statuses': statuses, 'seconds': perf_counter() - start}
+
+
+def _percentiles_ms(values: list[float]) -> tuple[float, float, float]:
+    if len(values) < 2:
+        return (values[0] * 1000,) * 3
+    quantiles = statistics.quantiles(values, n=100)
+    return quantiles[49] * 1000, quantiles[94] * 1000, quantiles[98] * 1000
+
+
+def report(results: dict):
+    count = sum(len(values) for values in results['latencies'].values())
+    handler_seconds = sum(sum(values) for values in results['latencies'].values())
+    print(f"{count} invocations in {results['seconds']:.2f} s: {count / results['seconds']:,.0f} invocations/s, "
+          f"{count / handler_seconds:,.0f}/s of handler time")
+    print(f"{len(results['inits'])} cold starts, median init {statistics.median(results['inits']) * 1000:.1f} ms")
+    print("status codes: " + ', '.join(f"{status} x{n}" for status, n in sorted(results['statuses'].items())))
+    print(f"\n{'':<5} {'route':<20} {'count':>7} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9}")
+    rows = sorted(results['latencies'].items(), key=lambda row: (row[0][0] != 'warm', row[0][1]))
+    warm = [value for (temperature, _), values in rows if temperature == 'warm' for value in values]
+    if warm:
+        rows.append((('warm', 'all'), warm))
+    for (temperature, route), values in rows:
+        p50, p95, p99 = _percentiles_ms(values)
+        print(f"{temperature:<5} {route:<20} {len(values):>7} {p50:9.2f} {p95:9.2f} {p99:9.2f}")
+
+
+def main_replay(argv: list[str]):
+    parser = argparse.ArgumentParser(
+        prog='run_local.py replay',
+        description="Replay API Gateway events through the handler in process, against in-memory SSM and "
+                    "DynamoDB, and report throughput and handler latency."
+    )
+    parser.add_argument('--events', type=int, default=5000, help="Events to generate (default 5000)")
+    parser.add_argument('--read-ratio', type=float, default=0.5,
+                        help="Share of events reading an earlier message (default 0.5)")
+    parser.add_argument('--seed', type=int, help="Random seed for a repeatable workload")
+    parser.add_argument('--load', metavar='FILE', help="Replay the events in FILE (one JSON event per line)")
+    parser.add_argument('--save', metavar='FILE', help="Write the workload to FILE and exit")
+    parser.add_argument('--cold-every', type=int, default=0, metavar='N',
+                        help="Start a new container every N events (default 0: only the first is cold)")
+    parser.add_argument('--ssm-latency-ms', type=float, default=0.0, help="Simulated SSM latency")
+    parser.add_argument('--dynamodb-latency-ms', type=float, default=0.0, help="Simulated DynamoDB latency")
+    args = parser.parse_args(argv)
+
+    if args.load:
+        with open(args.load) as f:
+            workload = [json.loads(line) for line in f if line.strip()]
+    else:
+        workload = generate_workload(args.events, args.read_ratio, seed=args.seed)
+    if args.save:
+        with open(args.save, 'w') as f:
+            f.writelines(json.dumps(event) + '\n' for event in workload)
+        print(f"Wrote {len(workload)} events to {args.save}")
+        return
+
+    from local_aws import LocalAws
+
+    for name, value in (('AWS_DEFAULT_REGION', 'us-east-2'), ('AWS_ACCESS_KEY_ID', 'replay'),
+                        ('AWS_SECRET_ACCESS_KEY', 'replay'), ('MESSAGES_TABLE_NAME', 'dad-pass-replay-messages'),
+                        ('POWERTOOLS_SERVICE_NAME', 'dad-pass-replay'), ('LOG_LEVEL', 'WARNING')):
+        os.environ.setdefault(name, value)
+    local_aws = LocalAws(args.ssm_latency_ms / 1000, args.dynamodb_latency_ms / 1000).install()
+    try:
+        results = replay(workload, args.cold_every)
+    finally:
+        local_aws.uninstall()
+    report(results)
+
+
 if __name__ == '__main__':
     sys.path.append(os.getcwd())
+    if sys.argv[1:2] == ['replay']:
+        main_replay(sys.argv[2:])
+        sys.exit()
+
     from src import lambda_function
 
     event_name = sys.argv[1]
@@ -1,119 +1,178 @@
-from aws_lambda_powertools import Logger
-from aws_lambda_powertools.event_handler import APIGatewayHttpResolver
-from aws_lambda_powertools.event_handler.exceptions import InternalServerError
-from aws_lambda_powertools.utilities.typing import LambdaContext
 import logging
-import random
-import boto3
-from botocore.exceptions import ClientError
 import os
-import time
-from decimal import Decimal
-from utils import encrypt_message, decrypt_message
+from time import perf_counter
+from typing import TYPE_CHECKING
+from utils import key_ring  # Importing utils starts loading the encryption keys
+from dadpass_core import fastjson, tracing
+from dadpass_core.keys import DEFAULT_KEY_LENGTH
+from dadpass_core.logs import RedactingFilter, redact_handlers
+from dadpass_core.metrics import REGISTRY, emf_line, recorded_since
+from dadpass_core.service import (
+    MessageService, InvalidMessageError, RequestTooLargeError, SizeLimits, COLLISION_ERROR, DEFAULT_MAX_MESSAGE_LENGTH,
+    SERIALIZE_SECONDS, STAGE_SECONDS
+)
+from dadpass_core.items import COMPACT_FORMAT
+from dadpass_core.store import create_store, MessageKeyExistsError
 
-log: Logger = Logger()
-Logger("botocore").setLevel(logging.INFO)
-Logger("urllib3").setLevel(logging.INFO)
+if TYPE_CHECKING:
+    from aws_lambda_powertools.utilities.typing import LambdaContext
 
-app = APIGatewayHttpResolver()
+# 'powertools' (default) routes through APIGatewayHttpResolver and logs with the Powertools Logger.
+# 'direct' dispatches the same routes with router.DirectRouter and logs through the standard library
+# (the runtime's handler stamps each line with the request id), so Powertools is never imported.
+LAMBDA_ROUTERS = ('powertools', 'direct')
+LAMBDA_ROUTER = os.environ.get('LAMBDA_ROUTER', 'powertools')
+if LAMBDA_ROUTER not in LAMBDA_ROUTERS:
+    raise ValueError(f"Unknown LAMBDA_ROUTER {LAMBDA_ROUTER}; expected one of {', '.join(LAMBDA_ROUTERS)}")
 
-# DynamoDB setup
-dynamodb = boto3.resource('dynamodb')
-table = dynamodb.Table(os.environ['MESSAGES_TABLE_NAME'])
+if LAMBDA_ROUTER == 'direct':
+    from router import BadRequestError, DirectRouter as Resolver, InternalServerError, ServiceError
+    log = logging.getLogger('dad-pass')
+    log.setLevel(os.environ.get('LOG_LEVEL', 'INFO'))
+    logging.getLogger("botocore").setLevel(logging.INFO)
+    logging.getLogger("urllib3").setLevel(logging.INFO)
+else:
+    from aws_lambda_powertools import Logger
+    from aws_lambda_powertools.event_handler import APIGatewayHttpResolver as Resolver
+    from aws_lambda_powertools.event_handler.exceptions import BadRequestError, InternalServerError, ServiceError
+    log = Logger()
+    Logger("botocore").setLevel(logging.INFO)
+    Logger("urllib3").setLevel(logging.INFO)
+# Message bodies and keys never reach CloudWatch, from this logger or dadpass_core's (through the root handlers).
+# Logging stays synchronous: a queue thread would be frozen with the process between invocations
+log.addFilter(RedactingFilter())
+redact_handlers(logging.getLogger())
 
-# TTL duration options in seconds
-TTL_OPTIONS = {
-    '15min': 900,
-    '1hour': 3600,
-    '1day': 86400,
-    '5days': 432000
-}
+# CloudWatch namespace for the Embedded Metric Format line logged per invocation
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'DadPass')
+
+
+def _serialize(body: dict) -> str:
+    """Compact JSON response body through dadpass_core.fastjson (orjson when installed), timed as the 'serialize' stage."""
+    start = perf_counter()
+    text = fastjson.dumps_str(body)
+    SERIALIZE_SECONDS.observe(perf_counter() - start)
+    return text
+
+
+def _json_body(limit: int):
+    """The event's JSON body, refused from its raw length before decoding if over `limit` bytes."""
+    event = app.current_event
+    if event.body is not None:
+        # A base64 body decodes to 3 bytes for every 4 characters
+        length = len(event.body) * 3 // 4 if event.is_base64_encoded else len(event.body)
+        service.limits.check_body(length, limit)
+    # Instead of current_event.json_body, which always decodes with the standard library
+    body = event.decoded_body
+    return None if body is None else fastjson.loads(body)
+
+
+app = Resolver(serializer=_serialize)
+
+# Message storage: DynamoDB by default, or MESSAGE_STORE=memory|redis (see dadpass_core.store)
+store = create_store(
+    os.environ.get('MESSAGE_STORE', 'dynamodb'),
+    table_name=os.environ.get('MESSAGES_TABLE_NAME'),
+    redis_url=os.environ.get('REDIS_URL'),
+    item_format=int(os.environ.get('DYNAMODB_ITEM_FORMAT', COMPACT_FORMAT))
+)
+
+# Create/read logic shared with the container backend (see dadpass_core.service)
+service = MessageService(
+    store,
+    key_length=int(os.environ.get('MESSAGE_KEY_LENGTH', DEFAULT_KEY_LENGTH)),
+    limits=SizeLimits(int(os.environ.get('MAX_MESSAGE_LENGTH', DEFAULT_MAX_MESSAGE_LENGTH)))
+)
 
 # Handler
-@log.inject_lambda_context()
-def handler(event: dict, context: LambdaContext) -> dict:
-    print(event)
-    return app.resolve(event, context)
+def handler(event: dict, context: 'LambdaContext') -> dict:
+    # Not the event itself: its body holds the plaintext message
+    log.debug(f"Handling {event.get('routeKey', 'unknown')}")
+    before = REGISTRY.totals()
+    start = perf_counter()
+    with tracing.trace(event.get('routeKey', 'unknown'), parent=trace_context(event)) as span:
+        response = app.resolve(event, context)
+        span.set('http_status', response.get('statusCode'))
+    print(invocation_metrics(event, response, perf_counter() - start, before))
+    return response
+
+
+if LAMBDA_ROUTER != 'direct':
+    handler = log.inject_lambda_context()(handler)
+
+
+def trace_context(event: dict) -> 'tracing.TraceContext | None':
+    """
+    The trace this invocation belongs to.
+
+    With active tracing the runtime puts the invocation's own X-Ray segment in
+    _X_AMZN_TRACE_ID (already linked to API Gateway's), so spans nest under it;
+    otherwise the caller's traceparent or X-Amzn-Trace-Id header is continued.
+    """
+    return (tracing.parse_xray_header(os.environ.get('_X_AMZN_TRACE_ID'))
+            or tracing.context_from_headers(event.get('headers')))
+
+
+def invocation_metrics(event: dict, response: dict, seconds: float, before: dict) -> str:
+    """
+    EMF line with this invocation's latency and the time it spent in each stage.
+
+    A Lambda environment runs one invocation at a time, so what the stage
+    histograms recorded since `before` belongs to this request alone.
+    """
+    values = {'RequestLatency': seconds * 1000}
+    for (name, labels), (_, stage_seconds) in recorded_since(before, REGISTRY.totals()).items():
+        if name == STAGE_SECONDS.name:
+            values[f"{labels[0].title()}Latency"] = stage_seconds * 1000
+    # The route pattern (e.g. "GET /dad-pass/{proxy+}"), not the path, keeps the dimension small
+    return emf_line(METRICS_NAMESPACE, {'Route': event.get('routeKey', 'unknown')}, values,
+                    properties={'StatusCode': response.get('statusCode')})
 
 
 # Now expects /message/<message_key> as path param
 @app.get("/dad-pass/<message_key>")
 def get_message(message_key) -> dict:
-    try:
-        response = table.get_item(Key={'messageKey': message_key})
-        
-        if 'Item' not in response:
-            return {'message': 'Message is no longer available'}
-        
-        item = response['Item']
-        current_time = int(time.time())
-        
-        # Check if message has expired
-        ttl = item.get('ttl', 0)
-        ttl_value = int(ttl) if isinstance(ttl, (int, Decimal)) else 0
-        
-        if ttl_value < current_time:
-            # Delete expired message
-            table.delete_item(Key={'messageKey': message_key})
-            return {'message': 'Message is no longer available'}
-        
-        # Delete message after retrieval (one-time access)
-        table.delete_item(Key={'messageKey': message_key})
-        
-        # Decrypt the message
-        encrypted_message = item.get('encryptedMessage', '')
-        decrypted_message = decrypt_message(encrypted_message)
-        
-        # Return the decrypted message (maintaining API contract)
-        return {'message': decrypted_message, 'ttlOption': item.get('ttlOption', '5days')}
-        
-    except Exception as e:
-        log.error(f"Error retrieving message: {str(e)}")
-        return {'message': 'Message is no longer available'}
+    return service.get_message(message_key)
 
 
 @app.post("/dad-pass")
 def create_message() -> dict:
     try:
-        # Generate a random message key
-        message_key = generate_random_id(10)  # Longer for better uniqueness
-        message_in = app.current_event.json_body
-        
-        # Get TTL option from request, default to 5 days
-        ttl_option = message_in.pop('ttlOption', '5days')
-        ttl_duration = TTL_OPTIONS.get(ttl_option, TTL_OPTIONS['5days'])
-        ttl_timestamp = int(time.time()) + ttl_duration
-        
-        # Encrypt the message before storing
-        encrypted_message = encrypt_message(message_in['message'])
-        
-        # Prepare item for DynamoDB (store encrypted message)
-        item = {
-            'messageKey': message_key,
-            'ttl': ttl_timestamp,
-            'encryptedMessage': encrypted_message,
-            'ttlOption': ttl_option
-        }
-        
-        # Store in DynamoDB with condition to prevent overwriting existing key
-        table.put_item(
-            Item=item,
-            ConditionExpression='attribute_not_exists(messageKey)'
-        )
-        
-        return {'messageKey': message_key}
-    
-    except ClientError as e:
-        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
-            log.error(f"Key collision detected for message key: {message_key}")
-            raise InternalServerError("Key collision occurred, this is rare. Please try again.")
-        log.error(f"Error creating message: {str(e)}")
-        raise InternalServerError("Failed to create message")
-        
+        return service.create_message(_json_body(service.limits.max_body_bytes))
+
+    except InvalidMessageError as e:
+        raise BadRequestError(str(e))
+
+    except RequestTooLargeError as e:
+        raise ServiceError(413, str(e))
+
+    except MessageKeyExistsError:
+        raise InternalServerError(COLLISION_ERROR)
+
     except Exception as e:
         log.error(f"Error creating message: {str(e)}")
         raise InternalServerError("Failed to create message")
 
 
-def generate_random_id(length: int) -> str:
-    return ''.join(random.choices("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789", k=length))
+@app.post("/dad-pass/batch")
+def create_messages() -> dict:
+    """Creates every {message, ttlOption} entry of a JSON array, returning keys (or errors) in order."""
+    try:
+        entries = _json_body(service.limits.max_batch_body_bytes)
+    except RequestTooLargeError as e:
+        raise ServiceError(413, str(e))
+    except ValueError:
+        entries = None
+
+    try:
+        return service.create_messages(entries)
+
+    except InvalidMessageError as e:
+        raise BadRequestError(str(e))
+
+    except RequestTooLargeError as e:
+        raise ServiceError(413, str(e))
+
+    except Exception as e:
+        log.error(f"Error creating messages: {str(e)}")
+        raise InternalServerError("Failed to create messages")
@@ -0,0 +1,143 @@
+"""
+Minimal API Gateway v2 (HTTP API) dispatch for the handler's routes (LAMBDA_ROUTER=direct).
+
+Implements just the slice of Powertools' APIGatewayHttpResolver that
+lambda_function.py uses: `get`/`post` route decorators with `<name>` path
+parameters, `current_event` for the body, the BadRequestError /
+InternalServerError / ServiceError exceptions and `resolve`. Responses have
+the same shape, and errors the same {"statusCode", "message"} body, so
+clients cannot tell the two apart.
+
+Routes are matched on the event's method and rawPath (the routeKey is the
+API's proxy pattern, not the route): an exact dict lookup for static paths,
+then a segment-by-segment comparison for the few with parameters. No regexes
+are compiled and nothing from Powertools is imported, which is the point.
+"""
+import base64
+from typing import Any, Callable
+
+JSON_CONTENT_TYPE = 'application/json'
+
+
+class ServiceError(Exception):
+    """An error response with `status_code` and message `msg`, as Powertools' ServiceError."""
+
+    def __init__(self, status_code: int, msg: str):
+        super().__init__(msg)
+        self.status_code = status_code
+        self.msg = msg
+
+
+class BadRequestError(ServiceError):
+    """A 400 response."""
+
+    def __init__(self, msg: str):
+        super().__init__(400, msg)
+
+
+class InternalServerError(ServiceError):
+    """A 500 response."""
+
+    def __init__(self, msg: str):
+        super().__init__(500, msg)
+
+
+class HttpEvent:
+    """The request's body, under the attribute names Powertools' event wrapper uses."""
+
+    __slots__ = ('raw_event',)
+
+    def __init__(self, raw_event: dict):
+        self.raw_event = raw_event
+
+    @property
+    def body(self) -> str | None:
+        return self.raw_event.get('body')
+
+    @property
+    def is_base64_encoded(self) -> bool:
+        return bool(self.raw_event.get('isBase64Encoded'))
+
+    @property
+    def decoded_body(self) -> str | None:
+        body = self.body
+        if body is not None and self.is_base64_encoded:
+            return base64.b64decode(body).decode('utf-8')
+        return body
+
+
+class DirectRouter:
+    """Dispatches API Gateway v2 events to the routes registered with `get` and `post`."""
+
+    def __init__(self, serializer: Callable[[Any], str]):
+        self._serializer = serializer
+        # (method, path) -> function for paths without parameters
+        self._static: dict[tuple[str, str], Callable] = {}
+        # (method, path segments, function); '<name>' segments are parameters
+        self._dynamic: list[tuple[str, tuple[str, ...], Callable]] = []
+        self.current_event: HttpEvent | None = None
+
+    def route(self, method: str, path: str) -> Callable:
+        def register(func: Callable) -> Callable:
+            segments = tuple(path.split('/'))
+            if any(segment.startswith('<') for segment in segments):
+                self._dynamic.append((method, segments, func))
+            else:
+                self._static[(method, path)] = func
+            return func
+        return register
+
+    def get(self, path: str) -> Callable:
+        return self.route('GET', path)
+
+    def post(self, path: str) -> Callable:
+        return self.route('POST', path)
+
+    def _match(self, method: str, path: str) -> tuple[Callable, dict[str, str]] | None:
+        func = self._static.get((method, path))
+        if func is not None:
+            return func, {}
+        segments = path.split('/')
+        for route_method, pattern, func in self._dynamic:
+            if route_method != method or len(pattern) != len(segments):
+                continue
+            params = {}
+            for expected, actual in zip(pattern, segments):
+                if expected.startswith('<'):
+                    if not actual:
+                        break
+                    params[expected[1:-1]] = actual
+                elif expected != actual:
+                    break
+            else:
+                return func, params
+        return None
+
+    def resolve(self, event: dict, context: Any = None) -> dict:
+        """
+        Runs the matching route and returns its API Gateway v2 response.
+
+        A ServiceError becomes its status code and message; any other
+        exception propagates, as with Powertools.
+        """
+        method = event.get('requestContext', {}).get('http', {}).get('method', '')
+        match = self._match(method, event.get('rawPath', ''))
+        if match is None:
+            return self._response(404, {'statusCode': 404, 'message': 'Not found'})
+        func, params = match
+        self.current_event = HttpEvent(event)
+        try:
+            return self._response(200, func(**params))
+        except ServiceError as e:
+            return self._response(e.status_code, {'statusCode': e.status_code, 'message': e.msg})
+        finally:
+            self.current_event = None
+
+    def _response(self, status_code: int, body: Any) -> dict:
+        return {
+            'statusCode': status_code,
+            'body': self._serializer(body),
+            'isBase64Encoded': False,
+            'headers': {'Content-Type': JSON_CONTENT_TYPE},
+            'cookies': []
+        }
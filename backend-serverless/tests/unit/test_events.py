@@ -0,0 +1,31 @@
+import sys
+from pathlib import Path
+
+# Add the service directory (where events.py lives) to the Python path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from events import create_rest_event
+
+
+class TestCreateRestEvent:
+    """Unit tests for the create_rest_event function."""
+    
+    def test_creates_get_event(self):
+        """Test creating a GET event."""
+        event = create_rest_event('GET', '/message/abc123')
+        assert event['routeKey'] == 'GET /message/abc123'
+        assert event['requestContext']['http']['method'] == 'GET'
+        assert event['requestContext']['http']['path'] == '/message/abc123'
+    
+    def test_creates_post_event_with_body(self):
+        """Test creating a POST event with a body."""
+        body = {'message': 'Hello, world!'}
+        event = create_rest_event('POST', '/message', body=body)
+        assert event['routeKey'] == 'POST /message'
+        assert 'body' in event
+        assert '"message"' in event['body']
+    
+    def test_adds_leading_slash(self):
+        """Test that path gets a leading slash if missing."""
+        event = create_rest_event('GET', 'message')
+        assert event['rawPath'] == '/message'
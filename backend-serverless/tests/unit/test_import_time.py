@@ -0,0 +1,37 @@
+import os
+import sys
+from pathlib import Path
+
+# Add the benchmarks directory (import profiler) to the Python path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "benchmarks"))
+
+import import_profile
+
+# Allow slower CI machines to raise the budget without editing the code
+IMPORT_BUDGET_MS = float(os.environ.get('IMPORT_BUDGET_MS', import_profile.IMPORT_BUDGET_MS))
+
+
+class TestColdImport:
+    """Regression tests for the Lambda handler's cold import."""
+    
+    def test_cold_import_within_budget(self):
+        """Test that importing lambda_function stays under the cold-start budget."""
+        best_ms = import_profile.best_import_ms()
+        assert best_ms <= IMPORT_BUDGET_MS, f"Cold import took {best_ms:.1f} ms (budget {IMPORT_BUDGET_MS} ms)"
+    
+    def test_profile_tolerates_the_key_load_thread(self):
+        """Test that the handler is found however the background key load's imports shift its depth."""
+        entries = [('botocore.endpoint', 2, 10, 10), ('lambda_function', 1, 100, 350_000), ('json', 0, 5, 5)]
+        assert import_profile.total_import_ms(entries) == 350
+    
+    def test_runtime_does_not_import_local_helpers(self):
+        """Test that test/local helpers and unused modules stay out of the runtime import graph."""
+        imported = {name for name, _, _, _ in import_profile.profile()}
+        assert 'events' not in imported
+        assert 'cryptography.fernet' not in imported
+    
+    def test_direct_router_does_not_import_powertools(self):
+        """Test that LAMBDA_ROUTER=direct keeps Powertools out of the import graph altogether."""
+        imported = {name for name, _, _, _ in import_profile.profile(LAMBDA_ROUTER='direct')}
+        assert 'router' in imported
+        assert not any(name.startswith('aws_lambda_powertools') for name in imported)
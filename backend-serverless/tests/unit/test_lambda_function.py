@@ -1,22 +1,28 @@
+import base64
 import pytest
 import sys
 from pathlib import Path
 from unittest.mock import patch, MagicMock
 from cryptography.fernet import Fernet
+import json
 import os
+import threading
+import time
+from botocore.exceptions import ClientError
 
 # Set required environment variable
 os.environ['MESSAGES_TABLE_NAME'] = 'test-messages-table'
 
 # Mock boto3 before importing lambda_function to prevent SSM and DynamoDB calls during import
 mock_key = Fernet.generate_key()
-with patch('boto3.client') as mock_client, patch('boto3.resource') as mock_resource:
+with patch('boto3.session.Session') as mock_session, patch('boto3.client') as mock_client, patch('boto3.resource') as mock_resource:
     # Mock SSM client
     mock_ssm = MagicMock()
     mock_ssm.get_parameter.return_value = {
         'Parameter': {'Value': mock_key.decode('utf-8')}
     }
     mock_client.return_value = mock_ssm
+    mock_session.return_value.client.return_value = mock_ssm
     
     # Mock DynamoDB resource
     mock_dynamodb = MagicMock()
@@ -27,25 +33,255 @@ with patch('boto3.client') as mock_client, patch('boto3.resource') as mock_resou
     # Add the source directory to the Python path
     src_dir = service_dir / "src"
     sys.path.insert(0, str(src_dir))
+    # Add the shared dad-pass core package to the Python path
+    sys.path.insert(0, str(service_dir.parent / "shared" / "src"))
+    # Add the service directory (where events.py lives) to the Python path
+    sys.path.insert(0, str(service_dir))
     
-    from lambda_function import generate_random_id
+    from lambda_function import get_message, app, invocation_metrics, service, trace_context
+    from dadpass_core.metrics import REGISTRY
+    from utils import encrypt_message
+    from utils import key_ring
+    from dadpass_core.store import DynamoDBMessageStore, InMemoryMessageStore
+    from events import create_rest_event
+    # The keys load in the background; finish while SSM is still mocked
+    key_ring.wait_until_ready()
 
 
-class TestGenerateRandomId:
-    """Unit tests for the generate_random_id function."""
+def _conditional_check_failed() -> ClientError:
+    return ClientError(
+        {'Error': {'Code': 'ConditionalCheckFailedException', 'Message': 'The conditional request failed'}},
+        'DeleteItem'
+    )
+
+
+class FakeDynamoTable:
+    """
+    Thread-safe in-memory stand-in for the messages table.
+
+    Only models the conditional consume-once DeleteItem with ReturnValues='ALL_OLD'.
+    """
+    
+    name = 'test-messages-table'
+    
+    def __init__(self):
+        self.items = {}
+        self._lock = threading.Lock()
+    
+    def delete_item(self, Key, ConditionExpression=None, ExpressionAttributeNames=None,
+                    ExpressionAttributeValues=None, ReturnValues='NONE'):
+        with self._lock:
+            item = self.items.get(Key['messageKey'])
+            if ConditionExpression:
+                # attribute_exists(messageKey) AND #ttl >= :now
+                if item is None or item['ttl'] < ExpressionAttributeValues[':now']:
+                    raise _conditional_check_failed()
+            self.items.pop(Key['messageKey'], None)
+        if ReturnValues == 'ALL_OLD' and item is not None:
+            return {'Attributes': item}
+        return {}
+
+
+@pytest.fixture
+def mock_table():
+    """Serve the handler from a DynamoDB store backed by a mock table."""
+    table = MagicMock()
+    with patch('lambda_function.service.store', DynamoDBMessageStore(table)):
+        yield table
+
+
+class TestGetMessage:
+    """Unit tests for the get_message route."""
+    
+    def test_consumes_message_in_one_call(self, mock_table):
+        """Test that the message is read and deleted with a single conditional DeleteItem."""
+        mock_table.delete_item.return_value = {
+            'Attributes': {
+                'messageKey': 'abc123xyz0',
+                'encryptedMessage': encrypt_message("Secret message"),
+                'ttl': int(time.time()) + 3600,
+                'ttlOption': '1hour'
+            }
+        }
+        
+        result = get_message('abc123xyz0')
+        
+        assert result == {'message': 'Secret message', 'ttlOption': '1hour'}
+        mock_table.get_item.assert_not_called()
+        call_kwargs = mock_table.delete_item.call_args[1]
+        assert call_kwargs['ReturnValues'] == 'ALL_OLD'
+        assert '#ttl >= :now' in call_kwargs['ConditionExpression']
+    
+    def test_missing_or_expired_message(self, mock_table):
+        """Test that a failed delete condition reports the message as unavailable."""
+        mock_table.delete_item.side_effect = _conditional_check_failed()
+        
+        result = get_message('nonexistent')
+        
+        assert result == {'message': 'Message is no longer available'}
+    
+    def test_exactly_one_concurrent_reader_wins(self):
+        """Test that only one of many simultaneous readers sees the secret."""
+        readers = 32
+        fake_table = FakeDynamoTable()
+        fake_table.items['race123456'] = {
+            'messageKey': 'race123456',
+            'encryptedMessage': encrypt_message("Only once"),
+            'ttl': int(time.time()) + 3600,
+            'ttlOption': '1hour'
+        }
+        barrier = threading.Barrier(readers)
+        results = []
+        results_lock = threading.Lock()
+        
+        def reader():
+            barrier.wait()
+            message = get_message('race123456')['message']
+            with results_lock:
+                results.append(message)
+        
+        with patch('lambda_function.service.store', DynamoDBMessageStore(fake_table)):
+            threads = [threading.Thread(target=reader) for _ in range(readers)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        
+        assert results.count("Only once") == 1
+        assert results.count('Message is no longer available') == readers - 1
+        assert fake_table.items == {}
+
+
+class TestCreateMessage:
+    """Unit tests for the create_message route."""
+    
+    def _post(self, body) -> tuple[int, dict]:
+        response = app.resolve(create_rest_event('POST', '/dad-pass', body), MagicMock())
+        return response['statusCode'], json.loads(response['body'])
     
-    def test_returns_correct_length(self):
-        """Test that the function returns an ID of the requested length."""
-        for length in [1, 5, 10, 20]:
-            result = generate_random_id(length)
-            assert len(result) == length
+    def test_taken_key_is_retried(self, mock_table):
+        """Test that a collision is retried under a fresh key instead of failing the request."""
+        mock_table.put_item.side_effect = [_conditional_check_failed(), {}]
+        
+        with patch('lambda_function.service.new_key', side_effect=['taken12345', 'fresh12345']):
+            status, body = self._post({'message': 'secret'})
+        
+        assert status == 200
+        assert body == {'messageKey': 'fresh12345'}
+    
+    def test_collision_after_every_attempt(self, mock_table):
+        """Test that the collision error is returned once every key attempt is taken."""
+        mock_table.put_item.side_effect = _conditional_check_failed()
+        
+        status, body = self._post({'message': 'secret'})
+        
+        assert status == 500
+        assert 'collision' in body['message']
+        assert mock_table.put_item.call_count == 3
+
+
+    def test_oversize_body_is_refused_before_parsing(self):
+        """Test that a raw body over the limit gets a 413, base64 encoded or not, without being decoded."""
+        limit = service.limits.max_body_bytes
+        event = create_rest_event('POST', '/dad-pass', None)
+        event['body'] = '{' * (limit + 1)
+        encoded = dict(event, body=base64.b64encode(b'{' * (limit + 1)).decode(), isBase64Encoded=True)
+        
+        with patch('lambda_function.service.create_message') as create_message:
+            responses = [app.resolve(event, MagicMock()), app.resolve(encoded, MagicMock())]
+        
+        assert [response['statusCode'] for response in responses] == [413, 413]
+        assert json.loads(responses[0]['body'])['message'] == f'Request body is larger than {limit} bytes'
+        create_message.assert_not_called()
+    
+    def test_long_message_is_refused(self):
+        """Test that a message over MAX_MESSAGE_LENGTH characters is refused with a 413."""
+        with patch('lambda_function.service.store', InMemoryMessageStore()):
+            status, body = self._post({'message': 'x' * (service.limits.max_message_length + 1)})
+        
+        assert status == 413
+        assert 'longer than' in body['message']
+
+
+class TestCreateMessages:
+    """Unit tests for the batch create route."""
+    
+    def _post_batch(self, entries) -> tuple[int, dict]:
+        response = app.resolve(create_rest_event('POST', '/dad-pass/batch', entries), MagicMock())
+        return response['statusCode'], json.loads(response['body'])
+    
+    def test_creates_every_entry_in_order(self):
+        """Test that each entry gets its own key, returned in request order."""
+        store = InMemoryMessageStore()
+        entries = [{'message': f'secret {i}', 'ttlOption': '1hour'} for i in range(5)]
+        
+        with patch('lambda_function.service.store', store):
+            status, body = self._post_batch(entries)
+            keys = [result['messageKey'] for result in body['messages']]
+            messages = [get_message(key)['message'] for key in keys]
+        
+        assert status == 200
+        assert len(set(keys)) == 5
+        assert messages == [f'secret {i}' for i in range(5)]
+    
+    def test_taken_key_is_replaced(self):
+        """Test that an entry whose key collides is stored under a fresh key."""
+        store = InMemoryMessageStore()
+        store.put_if_absent({'messageKey': 'taken12345', 'ttl': int(time.time()) + 3600,
+                             'encryptedMessage': 'x', 'ttlOption': '1hour'})
+        
+        with patch('lambda_function.service.store', store), \
+                patch('lambda_function.service.new_key', side_effect=['taken12345', 'fresh12345']):
+            status, body = self._post_batch([{'message': 'secret'}])
+        
+        assert status == 200
+        assert body['messages'] == [{'messageKey': 'fresh12345'}]
+    
+    def test_invalid_entry_is_rejected(self):
+        """Test that an entry without a message fails the whole request with 400."""
+        with patch('lambda_function.service.store', InMemoryMessageStore()):
+            status, body = self._post_batch([{'message': 'ok'}, {'ttlOption': '1hour'}])
+        
+        assert status == 400
+        assert 'entry 1' in body['message']
+
+
+class TestInvocationMetrics:
+    """Unit tests for the per-invocation EMF line."""
+    
+    def test_stage_latencies_for_one_invocation(self):
+        """Test that the line carries the route, the request latency and only this invocation's stages."""
+        event = create_rest_event('POST', '/dad-pass', {'message': 'secret'})
+        with patch('lambda_function.service.store', InMemoryMessageStore()):
+            before = REGISTRY.totals()
+            response = app.resolve(event, MagicMock())
+        
+        line = json.loads(invocation_metrics(event, response, 0.0125, before))
+        
+        metric_names = {metric['Name'] for metric in line['_aws']['CloudWatchMetrics'][0]['Metrics']}
+        assert metric_names == {'RequestLatency', 'EncryptLatency', 'StoreLatency', 'SerializeLatency'}
+        assert line['Route'] == 'POST /dad-pass'
+        assert line['RequestLatency'] == 12.5
+        assert line['StatusCode'] == 200
+
+
+class TestTraceContext:
+    """Unit tests for picking the trace an invocation belongs to."""
     
-    def test_contains_only_alphanumeric_characters(self):
-        """Test that the generated ID contains only alphanumeric characters."""
-        result = generate_random_id(100)
-        assert result.isalnum()
+    def test_runtime_segment_wins(self, monkeypatch):
+        """Test that with active tracing the spans nest under the invocation's own X-Ray segment."""
+        monkeypatch.setenv('_X_AMZN_TRACE_ID', 'Root=1-5759e988-bd862e3fe1be46a994272793;Parent=53995c3f42cd8ad8;Sampled=1')
+        event = create_rest_event('GET', '/dad-pass/abc', None)
+        event['headers'] = {'traceparent': '00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01'}
+        
+        context = trace_context(event)
+        
+        assert (context.trace_id, context.parent_id) == ('5759e988bd862e3fe1be46a994272793', '53995c3f42cd8ad8')
     
-    def test_generates_different_ids(self):
-        """Test that consecutive calls generate different IDs."""
-        ids = [generate_random_id(10) for _ in range(10)]
-        assert len(ids) == len(set(ids))
+    def test_caller_header_without_active_tracing(self, monkeypatch):
+        """Test that the caller's traceparent is continued when the runtime has no segment."""
+        monkeypatch.delenv('_X_AMZN_TRACE_ID', raising=False)
+        event = create_rest_event('GET', '/dad-pass/abc', None)
+        event['headers'] = {'traceparent': '00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01'}
+        
+        assert trace_context(event).trace_id == '4bf92f3577b34da6a3ce929d0e0e4736'
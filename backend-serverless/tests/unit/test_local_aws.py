@@ -0,0 +1,83 @@
+import sys
+import time
+from pathlib import Path
+
+import boto3
+import pytest
+
+# Add the service directory (where local_aws.py lives) and the shared package to the Python path
+service_dir = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(service_dir))
+sys.path.insert(0, str(service_dir.parent / "shared" / "src"))
+
+from local_aws import KEY_PATH, LocalAws
+from dadpass_core.keyring import load_keys_from_ssm
+from dadpass_core.store import DynamoDBMessageStore, MessageKeyExistsError
+
+
+@pytest.fixture
+def local_aws():
+    local_aws = LocalAws().install()
+    yield local_aws
+    local_aws.uninstall()
+
+
+def _session() -> boto3.session.Session:
+    return boto3.session.Session(aws_access_key_id='test', aws_secret_access_key='test', region_name='us-east-2')
+
+
+def _item(message_key: str, ttl_offset: int = 3600) -> dict:
+    return {'messageKey': message_key, 'ttl': int(time.time()) + ttl_offset,
+            'encryptedMessage': 'v1:gHRva2Vu', 'ttlOption': '1hour'}
+
+
+class TestLocalAws:
+    """Unit tests for the in-memory SSM and DynamoDB stand-ins, through real boto3 clients."""
+
+    def test_keys_load_from_ssm(self, local_aws):
+        """Test that the key ring's SSM calls find the generated key and no legacy key."""
+        keys, active_key_id = load_keys_from_ssm(_session().client('ssm'))
+
+        assert active_key_id == 'v1'
+        assert keys == {'v1': local_aws.parameters[f'{KEY_PATH}/v1'].encode()}
+
+    def test_messages_are_consumed_once(self, local_aws):
+        """Test that a stored item is returned by exactly one consume, and its key refused while live."""
+        store = DynamoDBMessageStore(_session().resource('dynamodb').Table('messages'))
+
+        store.put_if_absent(_item('abc123xyz0'))
+        with pytest.raises(MessageKeyExistsError):
+            store.put_if_absent(_item('abc123xyz0'))
+        first, second = store.consume('abc123xyz0'), store.consume('abc123xyz0')
+
+        assert first['encryptedMessage'] == 'v1:gHRva2Vu'
+        assert second is None
+        assert local_aws.calls == {'PutItem': 2, 'DeleteItem': 2}
+
+    def test_expired_items_are_unreadable_and_replaceable(self, local_aws):
+        """Test that an expired item reads as missing and its key can be reused."""
+        store = DynamoDBMessageStore(_session().resource('dynamodb').Table('messages'))
+        store.put_if_absent(_item('old1234567', ttl_offset=-60))
+
+        assert store.consume('old1234567') is None
+        store.put_if_absent(_item('old1234567'))
+        assert store.consume('old1234567') is not None
+
+    def test_batch_reports_taken_keys(self, local_aws):
+        """Test that a transaction with a taken key is cancelled and only the free entries are written."""
+        store = DynamoDBMessageStore(_session().resource('dynamodb').Table('messages'))
+        store.put_if_absent(_item('taken12345'))
+
+        collided = store.put_many_if_absent([_item('free123456'), _item('taken12345')])
+
+        assert [item['messageKey'] for item in collided] == ['taken12345']
+        assert set(local_aws.items) == {'taken12345', 'free123456'}
+
+    def test_uninstall_restores_botocore(self):
+        """Test that uninstalling puts botocore's network layer back."""
+        import botocore.client
+        original = botocore.client.BaseClient._make_request
+
+        LocalAws().install().uninstall()
+
+        assert botocore.client.BaseClient._make_request is original
@@ -0,0 +1,164 @@
+import base64
+import importlib.util
+import json
+import os
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import patch, MagicMock
+from cryptography.fernet import Fernet
+
+import pytest
+
+os.environ.setdefault('MESSAGES_TABLE_NAME', 'test-messages-table')
+
+service_dir = Path(__file__).parent.parent.parent
+src_dir = service_dir / "src"
+sys.path.insert(0, str(src_dir))
+sys.path.insert(0, str(service_dir.parent / "shared" / "src"))
+sys.path.insert(0, str(service_dir))
+
+from router import BadRequestError, DirectRouter, ServiceError
+from dadpass_core.store import InMemoryMessageStore
+from events import create_rest_event
+
+
+def _load_direct_handler():
+    """
+    A copy of lambda_function built with LAMBDA_ROUTER=direct.
+
+    Loaded under its own module name, so it coexists with the Powertools
+    lambda_function other tests import.
+    """
+    mock_ssm = MagicMock()
+    mock_ssm.get_parameter.return_value = {'Parameter': {'Value': Fernet.generate_key().decode('utf-8')}}
+    with patch('boto3.session.Session') as mock_session, patch('boto3.client', return_value=mock_ssm), \
+            patch('boto3.resource'), patch.dict(os.environ, {'LAMBDA_ROUTER': 'direct'}):
+        mock_session.return_value.client.return_value = mock_ssm
+        spec = importlib.util.spec_from_file_location('lambda_function_direct', src_dir / 'lambda_function.py')
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        # The keys load in the background; finish while SSM is still mocked
+        module.key_ring.wait_until_ready()
+    return module
+
+
+CONTEXT = SimpleNamespace(function_name='dad-pass-test', aws_request_id='test')
+
+
+@pytest.fixture(scope='module')
+def direct():
+    return _load_direct_handler()
+
+
+class TestDirectRouter:
+    """Unit tests for the DirectRouter class."""
+
+    def _router(self) -> DirectRouter:
+        router = DirectRouter(serializer=json.dumps)
+
+        @router.get("/dad-pass/<message_key>")
+        def get_message(message_key):
+            if message_key == 'missing':
+                raise ServiceError(410, 'Gone')
+            return {'key': message_key}
+
+        @router.post("/dad-pass")
+        def create_message():
+            if router.current_event.decoded_body is None:
+                raise BadRequestError('No body')
+            return {'body': router.current_event.decoded_body}
+
+        return router
+
+    def test_routes_on_method_and_path(self):
+        """Test that static paths and path parameters reach their route."""
+        router = self._router()
+
+        response = router.resolve(create_rest_event('GET', '/dad-pass/abc123'))
+
+        assert response == {
+            'statusCode': 200,
+            'body': '{"key": "abc123"}',
+            'isBase64Encoded': False,
+            'headers': {'Content-Type': 'application/json'},
+            'cookies': []
+        }
+        assert json.loads(router.resolve(create_rest_event('POST', '/dad-pass', {'a': 1}))['body']) == {
+            'body': '{"a": 1}'
+        }
+
+    def test_base64_body_is_decoded(self):
+        """Test that a base64 encoded body reads back as text."""
+        router = self._router()
+        event = dict(create_rest_event('POST', '/dad-pass'), body=base64.b64encode(b'{"a": 1}').decode(),
+                     isBase64Encoded=True)
+
+        assert json.loads(router.resolve(event)['body']) == {'body': '{"a": 1}'}
+
+    def test_unmatched_requests_are_not_found(self):
+        """Test that an unknown path, a wrong method or an empty parameter gets Powertools' 404 body."""
+        router = self._router()
+
+        for event in (create_rest_event('GET', '/other'), create_rest_event('DELETE', '/dad-pass/abc'),
+                      create_rest_event('GET', '/dad-pass/'), create_rest_event('GET', '/dad-pass/a/b')):
+            response = router.resolve(event)
+            assert response['statusCode'] == 404
+            assert json.loads(response['body']) == {'statusCode': 404, 'message': 'Not found'}
+
+    def test_service_errors_become_responses(self):
+        """Test that a raised ServiceError returns its status code and message."""
+        router = self._router()
+
+        gone = router.resolve(create_rest_event('GET', '/dad-pass/missing'))
+        bad = router.resolve(create_rest_event('POST', '/dad-pass'))
+
+        assert (gone['statusCode'], json.loads(gone['body'])) == (410, {'statusCode': 410, 'message': 'Gone'})
+        assert (bad['statusCode'], json.loads(bad['body'])) == (400, {'statusCode': 400, 'message': 'No body'})
+
+    def test_other_exceptions_propagate(self):
+        """Test that an unexpected error fails the invocation instead of becoming a response."""
+        router = DirectRouter(serializer=json.dumps)
+
+        @router.post("/dad-pass")
+        def create_message():
+            raise RuntimeError('boom')
+
+        with pytest.raises(RuntimeError):
+            router.resolve(create_rest_event('POST', '/dad-pass', {'message': 'x'}))
+        assert router.current_event is None
+
+
+class TestDirectHandler:
+    """Tests for the handler built with LAMBDA_ROUTER=direct."""
+
+    def test_round_trip(self, direct):
+        """Test that a message created through the direct handler is read back once."""
+        with patch.object(direct.service, 'store', InMemoryMessageStore()):
+            created = direct.handler(create_rest_event('POST', '/dad-pass', {'message': 'secret', 'ttlOption': '1hour'}), CONTEXT)
+            key = json.loads(created['body'])['messageKey']
+            first = direct.handler(create_rest_event('GET', f'/dad-pass/{key}'), CONTEXT)
+            second = direct.handler(create_rest_event('GET', f'/dad-pass/{key}'), CONTEXT)
+
+        assert isinstance(direct.app, DirectRouter)
+        assert created['headers'] == {'Content-Type': 'application/json'}
+        assert json.loads(first['body']) == {'message': 'secret', 'ttlOption': '1hour'}
+        assert json.loads(second['body']) == {'message': 'Message is no longer available'}
+
+    def test_errors_match_the_powertools_shape(self, direct):
+        """Test that refused requests get the same status codes and bodies as through Powertools."""
+        limit = direct.service.limits.max_body_bytes
+        oversize = create_rest_event('POST', '/dad-pass')
+        oversize['body'] = '{' * (limit + 1)
+
+        with patch.object(direct.service, 'store', InMemoryMessageStore()):
+            responses = [direct.handler(event, CONTEXT) for event in (
+                oversize,
+                create_rest_event('POST', '/dad-pass/batch', [{'message': 'ok'}, {'ttlOption': '1hour'}])
+            )]
+
+        assert [response['statusCode'] for response in responses] == [413, 400]
+        assert json.loads(responses[0]['body']) == {
+            'statusCode': 413, 'message': f'Request body is larger than {limit} bytes'
+        }
+        assert 'entry 1' in json.loads(responses[1]['body'])['message']
@@ -6,21 +6,26 @@ from cryptography.fernet import Fernet
 
 # Mock boto3 before importing utils to prevent SSM call during import
 mock_key = Fernet.generate_key()
-with patch('boto3.client') as mock_client:
+with patch('boto3.session.Session') as mock_session, patch('boto3.client') as mock_client:
     mock_ssm = MagicMock()
     mock_ssm.get_parameter.return_value = {
         'Parameter': {'Value': mock_key.decode('utf-8')}
     }
     mock_client.return_value = mock_ssm
+    mock_session.return_value.client.return_value = mock_ssm
     
     # Get the service module's base directory
     service_dir = Path(__file__).parent.parent.parent
     # Add the source directory to the Python path
     src_dir = service_dir / "src"
     sys.path.insert(0, str(src_dir))
+    # Add the shared dad-pass core package to the Python path
+    sys.path.insert(0, str(service_dir.parent / "shared" / "src"))
     
-    from utils import encrypt_message, decrypt_message, create_rest_event
+    from utils import encrypt_message, decrypt_message
     import utils
+    # The keys load in the background; finish while SSM is still mocked
+    utils.key_ring.wait_until_ready()
 
 
 class TestEncryptDecrypt:
@@ -62,27 +67,3 @@ class TestEncryptDecrypt:
         """Test that decrypting invalid ciphertext raises an exception."""
         with pytest.raises(Exception):
             decrypt_message("invalid_ciphertext_string")
-
-
-class TestCreateRestEvent:
-    """Unit tests for the create_rest_event function."""
-    
-    def test_creates_get_event(self):
-        """Test creating a GET event."""
-        event = create_rest_event('GET', '/message/abc123')
-        assert event['routeKey'] == 'GET /message/abc123'
-        assert event['requestContext']['http']['method'] == 'GET'
-        assert event['requestContext']['http']['path'] == '/message/abc123'
-    
-    def test_creates_post_event_with_body(self):
-        """Test creating a POST event with a body."""
-        body = {'message': 'Hello, world!'}
-        event = create_rest_event('POST', '/message', body=body)
-        assert event['routeKey'] == 'POST /message'
-        assert 'body' in event
-        assert '"message"' in event['body']
-    
-    def test_adds_leading_slash(self):
-        """Test that path gets a leading slash if missing."""
-        event = create_rest_event('GET', 'message')
-        assert event['rawPath'] == '/message'
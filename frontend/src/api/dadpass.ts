@@ -4,19 +4,34 @@
 
 const API_BASE_URL = 'https://twyukas531.execute-api.us-east-2.amazonaws.com';
 
-export interface CreateMessageRequest {
-    message: string;
-    ttlOption: string;
-}
+/**
+ * Zero-knowledge mode: messages are encrypted here with a fresh AES-GCM key that
+ * only ever travels in the share link's #fragment, which browsers never send to
+ * the server. The API stores and returns the ciphertext without being able to read it.
+ */
+export const CLIENT_ENCRYPTION = import.meta.env.VITE_CLIENT_ENCRYPTION === 'true';
+
+// First byte of a client envelope: version, 12-byte IV, then AES-GCM ciphertext and tag
+const CLIENT_ENVELOPE_VERSION = 0x03;
+const IV_BYTES = 12;
+
+export type CreateMessageRequest = { message: string; ttlOption: string } | { ciphertext: string; ttlOption: string };
 
 export interface CreateMessageResponse {
     messageKey: string;
+    /** Key for the share link's #fragment, set when the message was encrypted client-side */
+    fragmentKey?: string;
 }
 
 export interface GetMessageResponse {
     message: string;
 }
 
+interface GetMessageBody {
+    message?: string;
+    ciphertext?: string;
+}
+
 export class ApiError extends Error {
     constructor(message: string, public statusCode?: number) {
         super(message);
@@ -24,34 +39,93 @@ export class ApiError extends Error {
     }
 }
 
+function toBase64Url(bytes: Uint8Array, padded = true): string {
+    let binary = '';
+    bytes.forEach((byte) => {
+        binary += String.fromCharCode(byte);
+    });
+    const encoded = btoa(binary).replace(/\+/g, '-').replace(/\//g, '_');
+    return padded ? encoded : encoded.replace(/=+$/, '');
+}
+
+function fromBase64Url(encoded: string): Uint8Array {
+    const base64 = encoded.replace(/-/g, '+').replace(/_/g, '/');
+    const binary = atob(base64.padEnd(base64.length + ((4 - (base64.length % 4)) % 4), '='));
+    return Uint8Array.from(binary, (char) => char.charCodeAt(0));
+}
+
+/**
+ * Encrypt a message in the browser
+ * Returns the ciphertext for the API and the key for the link's #fragment
+ */
+async function encryptMessage(message: string): Promise<{ ciphertext: string; fragmentKey: string }> {
+    const key = await crypto.subtle.generateKey({ name: 'AES-GCM', length: 256 }, true, ['encrypt']);
+    const iv = crypto.getRandomValues(new Uint8Array(IV_BYTES));
+    const sealed = new Uint8Array(
+        await crypto.subtle.encrypt({ name: 'AES-GCM', iv }, key, new TextEncoder().encode(message))
+    );
+
+    const envelope = new Uint8Array(1 + IV_BYTES + sealed.length);
+    envelope[0] = CLIENT_ENVELOPE_VERSION;
+    envelope.set(iv, 1);
+    envelope.set(sealed, 1 + IV_BYTES);
+
+    const rawKey = new Uint8Array(await crypto.subtle.exportKey('raw', key));
+    return { ciphertext: toBase64Url(envelope), fragmentKey: toBase64Url(rawKey, false) };
+}
+
+/**
+ * Decrypt a message encrypted by encryptMessage with the key from the link's #fragment
+ */
+async function decryptMessage(ciphertext: string, fragmentKey: string): Promise<string> {
+    const envelope = fromBase64Url(ciphertext);
+    if (envelope[0] !== CLIENT_ENVELOPE_VERSION) {
+        throw new ApiError('This message was encrypted in a format this page cannot read.');
+    }
+    const key = await crypto.subtle.importKey('raw', fromBase64Url(fragmentKey), 'AES-GCM', false, ['decrypt']);
+    const plaintext = await crypto.subtle.decrypt(
+        { name: 'AES-GCM', iv: envelope.slice(1, 1 + IV_BYTES) },
+        key,
+        envelope.slice(1 + IV_BYTES)
+    );
+    return new TextDecoder().decode(plaintext);
+}
+
 /**
  * Create a new secret message
+ * With CLIENT_ENCRYPTION the message is encrypted before it leaves the browser
  */
 export async function createMessage(message: string, ttlOption: string): Promise<CreateMessageResponse> {
+    let request: CreateMessageRequest = { message, ttlOption };
+    let fragmentKey: string | undefined;
+    if (CLIENT_ENCRYPTION) {
+        const encrypted = await encryptMessage(message);
+        request = { ciphertext: encrypted.ciphertext, ttlOption };
+        fragmentKey = encrypted.fragmentKey;
+    }
+
     const response = await fetch(`${API_BASE_URL}/dad-pass`, {
         method: 'POST',
         headers: {
             'Content-Type': 'application/json',
         },
-        body: JSON.stringify({
-            message,
-            ttlOption,
-        } satisfies CreateMessageRequest),
+        body: JSON.stringify(request),
     });
 
     if (!response.ok) {
         throw new ApiError('Failed to create message. Please try again.', response.status);
     }
 
-    const data = await response.json();
-    return data as CreateMessageResponse;
+    const data = (await response.json()) as CreateMessageResponse;
+    return { messageKey: data.messageKey, fragmentKey };
 }
 
 /**
  * Retrieve a secret message by its key
  * Note: The message is deleted after retrieval (one-time access)
+ * A client-encrypted message is decrypted with fragmentKey, from the link's #fragment
  */
-export async function getMessage(messageKey: string): Promise<GetMessageResponse> {
+export async function getMessage(messageKey: string, fragmentKey?: string): Promise<GetMessageResponse> {
     const response = await fetch(`${API_BASE_URL}/dad-pass/${messageKey}`, {
         method: 'GET',
         headers: {
@@ -63,6 +137,19 @@ export async function getMessage(messageKey: string): Promise<GetMessageResponse
         throw new ApiError('Failed to retrieve message. Please try again.', response.status);
     }
 
-    const data = await response.json();
-    return data as GetMessageResponse;
+    const data = (await response.json()) as GetMessageBody;
+    if (data.ciphertext === undefined) {
+        return { message: data.message ?? '' };
+    }
+    if (!fragmentKey) {
+        throw new ApiError('This link is missing the part after # that unlocks the message.');
+    }
+    try {
+        return { message: await decryptMessage(data.ciphertext, fragmentKey) };
+    } catch (error) {
+        if (error instanceof ApiError) {
+            throw error;
+        }
+        throw new ApiError('This message could not be decrypted. Check that the whole link was copied.');
+    }
 }
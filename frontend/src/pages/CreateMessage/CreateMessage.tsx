@@ -20,6 +20,7 @@ export function CreateMessage() {
     const [ttlOption, setTtlOption] = useState('1day');
     const [isLoading, setIsLoading] = useState(false);
     const [messageKey, setMessageKey] = useState<string | null>(null);
+    const [fragmentKey, setFragmentKey] = useState<string | undefined>(undefined);
     const { toasts, showToast, dismissToast } = useToast();
 
     // Load saved TTL preference from localStorage
@@ -46,6 +47,7 @@ export function CreateMessage() {
         try {
             const response = await createMessage(message, ttlOption);
             setMessageKey(response.messageKey);
+            setFragmentKey(response.fragmentKey);
             localStorage.setItem('dadpass.preferredTtl', ttlOption);
         } catch (error) {
             const errorMessage = error instanceof Error ? error.message : 'Something went wrong. Please try again.';
@@ -58,9 +60,11 @@ export function CreateMessage() {
     const handleNewMessage = () => {
         setMessage('');
         setMessageKey(null);
+        setFragmentKey(undefined);
     };
 
-    const shareLink = messageKey ? `${SITE_URL}/${messageKey}` : '';
+    // The decryption key rides in the #fragment, which browsers never send to the server
+    const shareLink = messageKey ? `${SITE_URL}/${messageKey}${fragmentKey ? `#${fragmentKey}` : ''}` : '';
 
     return (
         <div className="create-message">
@@ -1,5 +1,5 @@
 import { useEffect, useState, useRef } from 'react';
-import { useParams, Link } from 'react-router-dom';
+import { useParams, useLocation, Link } from 'react-router-dom';
 import { getMessage } from '../../api/dadpass';
 import { CopyButton } from '../../components/CopyButton/CopyButton';
 import { Spinner } from '../../components/Spinner/Spinner';
@@ -10,6 +10,7 @@ const UNAVAILABLE_MESSAGE = 'Message is no longer available';
 
 export function ViewMessage() {
     const { messageKey } = useParams<{ messageKey: string }>();
+    const { hash } = useLocation();
     const [message, setMessage] = useState<string | null>(null);
     const [isLoading, setIsLoading] = useState(true);
     const [isUnavailable, setIsUnavailable] = useState(false);
@@ -31,7 +32,12 @@ export function ViewMessage() {
 
         const fetchMessage = async () => {
             try {
-                const response = await getMessage(messageKey);
+                const fragmentKey = hash.slice(1) || undefined;
+                // The key is single-use like the link; keep it out of the history once read
+                if (fragmentKey) {
+                    window.history.replaceState(null, '', window.location.pathname);
+                }
+                const response = await getMessage(messageKey, fragmentKey);
 
                 // Check if message is unavailable
                 if (response.message === UNAVAILABLE_MESSAGE) {
@@ -49,7 +55,7 @@ export function ViewMessage() {
         };
 
         fetchMessage();
-    }, [messageKey, showToast]);
+    }, [messageKey, hash, showToast]);
 
     if (isLoading) {
         return (
@@ -1,5 +1,10 @@
 /// <reference types="vite/client" />
 
+interface ImportMetaEnv {
+    /** 'true' to encrypt messages in the browser (zero-knowledge mode) */
+    readonly VITE_CLIENT_ENCRYPTION?: string;
+}
+
 declare module '*.css' {
     const content: Record<string, string>;
     export default content;
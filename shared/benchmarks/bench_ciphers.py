@@ -0,0 +1,70 @@
+"""
+Throughput and ciphertext size, Fernet vs the AES-GCM envelope.
+
+For each message length, encrypts and decrypts with both ciphers (compression
+off, so only the cipher differs) and reports operations per second, the
+ciphertext string the service handles, and the compact DynamoDB item it is
+stored as (dadpass_core.items.item_size).
+Run with: make bench-ciphers
+"""
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from cryptography.fernet import Fernet
+
+from dadpass_core.crypto import AES_GCM_CIPHER, FERNET_CIPHER, CipherEngine
+from dadpass_core.items import item_size, to_compact
+
+# 256 is the default MAX_MESSAGE_LENGTH
+MESSAGE_LENGTHS = (16, 64, 256, 1024, 4096)
+ITERATIONS = 5_000
+
+
+def stored_size(ciphertext: str) -> int:
+    return item_size(to_compact({
+        'messageKey': 'aB3dE6gH9j',
+        'ttl': int(time.time()) + 86400,
+        'encryptedMessage': ciphertext,
+        'ttlOption': '1day'
+    }))
+
+
+def throughput(engines: dict[str, CipherEngine], message: str) -> dict[str, tuple[float, float]]:
+    """Encrypts and decrypts per second with each engine, best of 5 alternating rounds."""
+    best = {name: (0.0, 0.0) for name in engines}
+    for _ in range(5):
+        for name, engine in engines.items():
+            start = time.perf_counter()
+            for _ in range(ITERATIONS):
+                ciphertext = engine.encrypt(message)
+            encrypt = ITERATIONS / (time.perf_counter() - start)
+            start = time.perf_counter()
+            for _ in range(ITERATIONS):
+                engine.decrypt(ciphertext)
+            decrypt = ITERATIONS / (time.perf_counter() - start)
+            best[name] = (max(best[name][0], encrypt), max(best[name][1], decrypt))
+    return best
+
+
+def main():
+    key = Fernet.generate_key()
+    engines = {cipher: CipherEngine({'v1': key}, compress_threshold=0, cipher=cipher)
+               for cipher in (FERNET_CIPHER, AES_GCM_CIPHER)}
+
+    print(f"{'chars':>6} {'cipher':>8} {'encrypt/s':>10} {'decrypt/s':>10} {'chars out':>10} {'item bytes':>11}")
+    for length in MESSAGE_LENGTHS:
+        message = 'x' * length
+        rates = throughput(engines, message)
+        for name, engine in engines.items():
+            ciphertext = engine.encrypt(message)
+            encrypt, decrypt = rates[name]
+            print(f"{length:>6} {name:>8} {encrypt:>10,.0f} {decrypt:>10,.0f} {len(ciphertext):>10} "
+                  f"{stored_size(ciphertext):>11}")
+        print()
+
+
+if __name__ == '__main__':
+    main()
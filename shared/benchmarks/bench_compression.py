@@ -0,0 +1,105 @@
+"""
+Stored size and encrypt/decrypt latency per message, with and without compression.
+
+Runs a corpus of realistic secret shapes through CipherEngine at the default
+COMPRESSION_THRESHOLD and with compression off, and reports the compact
+DynamoDB item size (dadpass_core.items.item_size) and the time for one
+encrypt plus decrypt. Short secrets fall under the threshold and should cost
+nothing extra; structured text (config, JSON, recovery codes) is where
+compression pays. Random key material barely compresses, since base64 only
+carries 6 bits per character.
+Run with: make bench-compression
+"""
+import base64
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from cryptography.fernet import Fernet
+
+from dadpass_core.crypto import DEFAULT_COMPRESS_THRESHOLD, CipherEngine
+from dadpass_core.items import item_size, to_compact
+
+ITERATIONS = 2_000
+
+
+def _pem(label: str, size: int) -> str:
+    body = base64.b64encode(os.urandom(size)).decode()
+    lines = [body[i:i + 64] for i in range(0, len(body), 64)]
+    return '\n'.join([f"-----BEGIN {label}-----", *lines, f"-----END {label}-----"])
+
+
+def corpus() -> dict[str, str]:
+    """Secrets people actually share, from a password up to a service account key."""
+    return {
+        'password': 'correct-horse-battery-staple-42',
+        'wifi': 'Network: Smith-Family-5G\nPassword: Tr0ub4dor&3-kitchen',
+        'recovery codes': '\n'.join(f"{os.urandom(4).hex()[:4]}-{os.urandom(4).hex()[:4]}" for _ in range(16)),
+        '.env file': '\n'.join((
+            'DATABASE_URL=postgres://app:' + os.urandom(12).hex() + '@db.internal:5432/app',
+            'REDIS_URL=redis://cache.internal:6379/0',
+            'STRIPE_SECRET_KEY=sk_live_' + os.urandom(16).hex(),
+            'STRIPE_WEBHOOK_SECRET=whsec_' + os.urandom(16).hex(),
+            'AWS_ACCESS_KEY_ID=AKIA' + os.urandom(8).hex().upper(),
+            'AWS_SECRET_ACCESS_KEY=' + base64.b64encode(os.urandom(30)).decode(),
+            'SENTRY_DSN=https://' + os.urandom(16).hex() + '@o0.ingest.sentry.io/0',
+            'LOG_LEVEL=info',
+            'FEATURE_FLAGS=checkout_v2,new_onboarding,dark_mode',
+        )),
+        'ssh private key': _pem('OPENSSH PRIVATE KEY', 400),
+        'service account json': json.dumps({
+            'type': 'service_account',
+            'project_id': 'dadpass-prod',
+            'private_key_id': os.urandom(20).hex(),
+            'private_key': _pem('PRIVATE KEY', 1200) + '\n',
+            'client_email': 'deployer@dadpass-prod.iam.gserviceaccount.com',
+            'client_id': str(int.from_bytes(os.urandom(8), 'big')),
+            'auth_uri': 'https://accounts.google.com/o/oauth2/auth',
+            'token_uri': 'https://oauth2.googleapis.com/token',
+            'auth_provider_x509_cert_url': 'https://www.googleapis.com/oauth2/v1/certs',
+            'client_x509_cert_url': 'https://www.googleapis.com/robot/v1/metadata/x509/deployer%40dadpass-prod.iam.gserviceaccount.com',
+        }, indent=2),
+    }
+
+
+def stored_size(engine: CipherEngine, message: str) -> int:
+    return item_size(to_compact({
+        'messageKey': 'aB3dE6gH9j',
+        'ttl': int(time.time()) + 86400,
+        'encryptedMessage': engine.encrypt(message),
+        'ttlOption': '1day'
+    }))
+
+
+def roundtrip_costs(engines: tuple[CipherEngine, ...], message: str) -> list[float]:
+    """Microseconds for one encrypt plus decrypt with each engine, best of 5 alternating rounds."""
+    best = [float('inf')] * len(engines)
+    for _ in range(5):
+        for i, engine in enumerate(engines):
+            start = time.perf_counter()
+            for _ in range(ITERATIONS):
+                engine.decrypt(engine.encrypt(message))
+            best[i] = min(best[i], (time.perf_counter() - start) / ITERATIONS * 1_000_000)
+    return best
+
+
+def main():
+    key = Fernet.generate_key()
+    plain = CipherEngine({'v1': key}, compress_threshold=0)
+    compressing = CipherEngine({'v1': key}, compress_threshold=DEFAULT_COMPRESS_THRESHOLD)
+
+    print(f"threshold {DEFAULT_COMPRESS_THRESHOLD} bytes\n")
+    print(f"{'secret':>22} {'bytes':>6} {'item':>6} {'item z':>7} {'saved':>6} {'us':>7} {'us z':>7}")
+    for name, message in corpus().items():
+        size, compressed_size = stored_size(plain, message), stored_size(compressing, message)
+        cost, compressed_cost = roundtrip_costs((plain, compressing), message)
+        print(f"{name:>22} {len(message.encode()):>6} {size:>6} {compressed_size:>7} "
+              f"{1 - compressed_size / size:>6.0%} {cost:>7.1f} {compressed_cost:>7.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+"""
+Micro-benchmark for message encryption.
+
+Compares building a Fernet per call (the original implementation) with the
+cached CipherEngine. Run with: make bench
+"""
+import sys
+import timeit
+from pathlib import Path
+from cryptography.fernet import Fernet
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from dadpass_core.crypto import CipherEngine, LEGACY_KEY_ID
+
+ITERATIONS = 20000
+MESSAGE = "The Netflix password is hunter2"
+
+
+def report(name: str, seconds: float):
+    per_call_us = seconds / ITERATIONS * 1_000_000
+    print(f"{name:<32} {per_call_us:8.2f} us/op {ITERATIONS / seconds:12,.0f} ops/sec")
+
+
+def main():
+    key = Fernet.generate_key()
+    engine = CipherEngine({LEGACY_KEY_ID: key})
+    token = engine.encrypt(MESSAGE)
+    
+    def encrypt_per_call():
+        Fernet(key).encrypt(MESSAGE.encode('utf-8')).decode('utf-8')
+    
+    def decrypt_per_call():
+        Fernet(key).decrypt(token.encode('utf-8')).decode('utf-8')
+    
+    print(f"{ITERATIONS:,} operations, {len(MESSAGE)} character message\n")
+    report("encrypt (Fernet per call)", timeit.timeit(encrypt_per_call, number=ITERATIONS))
+    report("encrypt (cached engine)", timeit.timeit(lambda: engine.encrypt(MESSAGE), number=ITERATIONS))
+    report("decrypt (Fernet per call)", timeit.timeit(decrypt_per_call, number=ITERATIONS))
+    report("decrypt (cached engine)", timeit.timeit(lambda: engine.decrypt(token), number=ITERATIONS))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Envelope encryption latency with the data key cache hit and missed.
+
+Runs entirely offline against LocalDataKeyProvider, which sleeps
+KMS_LATENCY_MS (default 5, a typical in-region KMS call) per request to
+stand in for the KMS round trip. Reports the time per message to encrypt
+and decrypt:
+
+    fernet / aes-gcm   keys from SSM, no provider (for reference)
+    data-key hit       the cached data key (every message but one per DATA_KEY_MAX_MESSAGES)
+    data-key miss      a new data key for each message, i.e. no cache
+
+and the compact item size, which grows by the wrapped data key.
+Run with: make bench-datakeys
+"""
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from cryptography.fernet import Fernet
+
+from dadpass_core.crypto import AES_GCM_CIPHER, DATA_KEY_CIPHER, FERNET_CIPHER, CipherEngine
+from dadpass_core.datakeys import DataKeyCache, LocalDataKeyProvider
+from dadpass_core.items import item_size, to_compact
+
+MESSAGE = "Network: Smith-Family-5G / Password: Tr0ub4dor&3-kitchen"
+HIT_ITERATIONS = 20_000
+MISS_ITERATIONS = 200
+
+
+def _per_message_us(operation, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        operation()
+    return (time.perf_counter() - start) / iterations * 1_000_000
+
+
+def _stored_size(ciphertext: str) -> int:
+    return item_size(to_compact({
+        'messageKey': 'aB3dE6gH9j',
+        'ttl': int(time.time()) + 86400,
+        'encryptedMessage': ciphertext,
+        'ttlOption': '1day'
+    }))
+
+
+def main():
+    latency = float(os.environ.get('KMS_LATENCY_MS', 5)) / 1000
+    provider = LocalDataKeyProvider(latency=latency)
+    keys = {'v1': Fernet.generate_key()}
+
+    def engine(cipher: str, **cache_options) -> CipherEngine:
+        data_keys = DataKeyCache(provider, **cache_options) if cipher == DATA_KEY_CIPHER else None
+        return CipherEngine(keys, cipher=cipher, data_keys=data_keys)
+
+    hit = engine(DATA_KEY_CIPHER)
+    miss = engine(DATA_KEY_CIPHER, max_messages=1)
+    hit_ciphertext = hit.encrypt(MESSAGE)
+
+    def cold_decrypt():
+        # A reader that has not seen this data key yet
+        CipherEngine(keys, data_keys=DataKeyCache(provider)).decrypt(hit_ciphertext)
+
+    cold_engine_us = _per_message_us(lambda: CipherEngine(keys, data_keys=DataKeyCache(provider)), MISS_ITERATIONS)
+
+    print(f"simulated KMS latency {latency * 1000:g} ms\n")
+    print(f"{'':>16} {'encrypt us':>11} {'decrypt us':>11} {'item bytes':>11}")
+    for name, cipher in (('fernet', FERNET_CIPHER), ('aes-gcm', AES_GCM_CIPHER)):
+        reference = engine(cipher)
+        ciphertext = reference.encrypt(MESSAGE)
+        print(f"{name:>16} {_per_message_us(lambda: reference.encrypt(MESSAGE), HIT_ITERATIONS):>11.1f} "
+              f"{_per_message_us(lambda: reference.decrypt(ciphertext), HIT_ITERATIONS):>11.1f} "
+              f"{_stored_size(ciphertext):>11}")
+    print(f"{'data-key hit':>16} {_per_message_us(lambda: hit.encrypt(MESSAGE), HIT_ITERATIONS):>11.1f} "
+          f"{_per_message_us(lambda: hit.decrypt(hit_ciphertext), HIT_ITERATIONS):>11.1f} "
+          f"{_stored_size(hit_ciphertext):>11}")
+    print(f"{'data-key miss':>16} {_per_message_us(lambda: miss.encrypt(MESSAGE), MISS_ITERATIONS):>11.1f} "
+          f"{_per_message_us(cold_decrypt, MISS_ITERATIONS) - cold_engine_us:>11.1f} "
+          f"{_stored_size(hit_ciphertext):>11}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Stored size and DynamoDB capacity per message, original item format vs compact.
+
+For each message length, encrypts a message as the service does and sizes
+both item formats by DynamoDB's rules (dadpass_core.items.item_size). From
+that size it derives the capacity each operation is billed:
+
+    PutItem             1 WCU per started KB (create)
+    DeleteItem          1 WCU per started KB of the deleted item (read-once consume;
+                        ReturnValues=ALL_OLD costs no RCU)
+    TransactWriteItems  2 WCU per started KB, per item (batch create)
+    GetItem             1 RCU per started 4 KB, strongly consistent (not on the hot path)
+
+With DYNAMODB_ENDPOINT_URL (and optionally DYNAMODB_TABLE) set, also writes and
+consumes each item for real and prints the ConsumedCapacity DynamoDB reports.
+Run with: make bench-items
+"""
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from cryptography.fernet import Fernet
+
+from dadpass_core.crypto import CipherEngine
+from dadpass_core.items import from_stored, item_size, to_compact
+
+# 256 is the default MAX_MESSAGE_LENGTH; the longer ones show where capacity units start to differ
+MESSAGE_LENGTHS = (16, 64, 256, 1024, 4096)
+CODEC_ITERATIONS = 50_000
+
+
+def _units(size: int, unit: int) -> int:
+    return -(-size // unit)
+
+
+def _logical_item(engine: CipherEngine, length: int) -> dict:
+    return {
+        'messageKey': 'aB3dE6gH9j',
+        'ttl': int(time.time()) + 86400,
+        'encryptedMessage': engine.encrypt('x' * length),
+        'ttlOption': '1day'
+    }
+
+
+def measured_capacity(item: dict, stored: dict) -> tuple[float, float]:
+    """WCU DynamoDB reports for writing and then consuming `stored`."""
+    sys.path.insert(0, str(Path(__file__).parent))
+    from bench_store import _dynamodb_store
+
+    table = _dynamodb_store().table
+    put = table.put_item(Item=stored, ReturnConsumedCapacity='TOTAL')
+    delete = table.delete_item(Key={'messageKey': item['messageKey']}, ReturnValues='ALL_OLD',
+                               ReturnConsumedCapacity='TOTAL')
+    return put['ConsumedCapacity']['CapacityUnits'], delete['ConsumedCapacity']['CapacityUnits']
+
+
+def codec_cost(item: dict) -> tuple[float, float]:
+    """Microseconds to convert one item to the compact format and back."""
+    start = time.perf_counter()
+    for _ in range(CODEC_ITERATIONS):
+        compact = to_compact(item)
+    encode = (time.perf_counter() - start) / CODEC_ITERATIONS * 1_000_000
+    start = time.perf_counter()
+    for _ in range(CODEC_ITERATIONS):
+        from_stored(compact)
+    decode = (time.perf_counter() - start) / CODEC_ITERATIONS * 1_000_000
+    return encode, decode
+
+
+def main():
+    engine = CipherEngine({'v1': Fernet.generate_key()})
+    live = bool(os.environ.get('DYNAMODB_ENDPOINT_URL'))
+
+    print(f"{'chars':>6} {'format':>8} {'bytes':>7} {'put WCU':>8} {'consume WCU':>12} "
+          f"{'batch WCU':>10} {'get RCU':>8}" + (f" {'measured put/consume':>21}" if live else ''))
+    for length in MESSAGE_LENGTHS:
+        item = _logical_item(engine, length)
+        for name, stored in (('original', item), ('compact', to_compact(item))):
+            size = item_size(stored)
+            line = (f"{length:>6} {name:>8} {size:>7} {_units(size, 1024):>8} {_units(size, 1024):>12} "
+                    f"{2 * _units(size, 1024):>10} {_units(size, 4096):>8}")
+            if live:
+                put, consume = measured_capacity(item, stored)
+                line += f" {f'{put:g}/{consume:g}':>21}"
+            print(line)
+        saved = 1 - item_size(to_compact(item)) / item_size(item)
+        print(f"{'':>6} {'':>8} {saved:>6.0%} smaller\n")
+
+    encode, decode = codec_cost(_logical_item(engine, 256))
+    print(f"compact format cost per item: {encode:.2f} us to write, {decode:.2f} us to read")
+
+
+if __name__ == '__main__':
+    main()
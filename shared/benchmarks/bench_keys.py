@@ -0,0 +1,46 @@
+"""
+Micro-benchmark for message key generation.
+
+Compares random.choices (the original, not cryptographically secure), a
+per-character secrets.choice loop, bulk os.urandom generation and the key
+pool. Run with: make bench-keys
+"""
+import random
+import secrets
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from dadpass_core.keys import ALPHABET, DEFAULT_KEY_LENGTH, KeyPool, generate_key, generate_keys
+
+ITERATIONS = 100000
+BATCH_SIZE = 500
+
+
+def report(name: str, seconds: float):
+    per_key_us = seconds / ITERATIONS * 1_000_000
+    print(f"{name:<32} {per_key_us:8.2f} us/key {ITERATIONS / seconds:12,.0f} keys/sec")
+
+
+def main():
+    pool = KeyPool()
+
+    def random_choices():
+        ''.join(random.choices(ALPHABET, k=DEFAULT_KEY_LENGTH))
+
+    def secrets_choice():
+        ''.join(secrets.choice(ALPHABET) for _ in range(DEFAULT_KEY_LENGTH))
+
+    print(f"{ITERATIONS:,} keys of {DEFAULT_KEY_LENGTH} characters\n")
+    report("random.choices (insecure)", timeit.timeit(random_choices, number=ITERATIONS))
+    report("secrets.choice per character", timeit.timeit(secrets_choice, number=ITERATIONS))
+    report("generate_key (one draw per key)", timeit.timeit(generate_key, number=ITERATIONS))
+    report(f"generate_keys ({BATCH_SIZE} per draw)",
+           timeit.timeit(lambda: generate_keys(BATCH_SIZE), number=ITERATIONS // BATCH_SIZE))
+    report(f"KeyPool.take (refill {pool.size})", timeit.timeit(pool.take, number=ITERATIONS))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark of the logging cost one request pays on its own thread.
+
+Each simulated request logs what a create does: one application INFO line and
+the DEBUG records botocore emits around a DynamoDB call (about 20, including
+the request and response bodies).
+
+    before    print(event) plus root logging at DEBUG, formatted and written synchronously
+    INFO      dadpass_core.logs at the default LOG_LEVEL=INFO: botocore's DEBUG calls stop at the level check
+    DEBUG     the same 20 DEBUG records let through (botocore is held at INFO in practice): sampled and queued
+
+Output goes to a temporary file, standing in for the container's log pipe.
+Run with: make bench-logging
+"""
+import json
+import logging
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from dadpass_core.logs import DebugSampler, LOG_FORMAT, LogPipeline, RedactingFormatter
+
+REQUESTS = 20_000
+BOTOCORE_RECORDS = 20
+
+EVENT = {
+    'routeKey': 'POST /dad-pass',
+    'headers': {'content-type': 'application/json', 'user-agent': 'bench'},
+    'body': json.dumps({'message': 'The Netflix password is hunter2', 'ttlOption': '1day'})
+}
+
+
+def _logger(name: str, level: int, handler: logging.Handler) -> tuple[logging.Logger, logging.Logger]:
+    app = logging.getLogger(f'{name}.app')
+    botocore = logging.getLogger(f'{name}.botocore')
+    for logger in (app, botocore):
+        logger.propagate = False
+        logger.setLevel(level)
+        logger.addHandler(handler)
+    return app, botocore
+
+
+def _request(app: logging.Logger, botocore: logging.Logger, print_event=None):
+    if print_event is not None:
+        print(EVENT, file=print_event)
+    for index in range(BOTOCORE_RECORDS):
+        botocore.debug('Event %s: calling handler %s with params %s', index, 'parse_response', EVENT['headers'])
+    app.info('Created message for %s', EVENT['routeKey'])
+
+
+def measure(name: str, app: logging.Logger, botocore: logging.Logger, print_event=None) -> float:
+    start = time.perf_counter()
+    for _ in range(REQUESTS):
+        _request(app, botocore, print_event)
+    per_request_us = (time.perf_counter() - start) / REQUESTS * 1_000_000
+    print(f"{name:<10} {per_request_us:8.1f} us/request on the request thread")
+    return per_request_us
+
+
+def main():
+    print(f"{REQUESTS:,} requests, {BOTOCORE_RECORDS} botocore DEBUG records each\n")
+    with tempfile.TemporaryFile('w') as output:
+        handler = logging.StreamHandler(output)
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        before = measure('before', *_logger('before', logging.DEBUG, handler), print_event=output)
+
+        # As configure_logging does
+        logging.logThreads = logging.logProcesses = logging.logMultiprocessing = False
+        formatted = logging.StreamHandler(output)
+        formatted.setFormatter(RedactingFormatter(LOG_FORMAT))
+
+        pipeline = LogPipeline(formatted)
+        pipeline.start()
+        app, botocore = _logger('info', logging.INFO, pipeline.handler)
+        # botocore is held at INFO whatever LOG_LEVEL is
+        botocore.setLevel(logging.INFO)
+        info = measure('INFO', app, botocore)
+        pipeline.stop()
+
+        pipeline = LogPipeline(formatted, sampler=DebugSampler())
+        pipeline.start()
+        debug = measure('DEBUG', *_logger('debug', logging.DEBUG, pipeline.handler))
+        start = time.perf_counter()
+        pipeline.stop()
+        print(f"{'':<10} {time.perf_counter() - start:8.3f} s for the listener to drain the queue")
+
+    print(f"\nINFO is {before / info:.0f}x and sampled DEBUG {before / debug:.1f}x cheaper per request than before")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""
+Micro-benchmark for recording metrics on the request path.
+
+Measures one histogram observation and one counter increment (on a child
+looked up ahead of time, as the backends do), a label lookup per call, the
+perf_counter pair around a timed stage, and rendering /metrics.
+Run with: make bench-metrics
+"""
+import sys
+import timeit
+from pathlib import Path
+from time import perf_counter
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from dadpass_core.metrics import MetricsRegistry
+
+ITERATIONS = 1_000_000
+
+
+def report(name: str, seconds: float, iterations: int = ITERATIONS):
+    per_call_ns = seconds / iterations * 1_000_000_000
+    print(f"{name:<36} {per_call_ns:8.0f} ns/op {iterations / seconds:14,.0f} ops/sec")
+
+
+def main():
+    registry = MetricsRegistry()
+    stages = registry.histogram('dadpass_stage_seconds', 'Stages', labels=('stage',))
+    requests = registry.counter('dadpass_requests_total', 'Requests', labels=('method', 'route', 'status'))
+    store_seconds = stages.labels('store')
+    created = requests.labels('POST', '/dad-pass', '200')
+
+    def timed_stage():
+        start = perf_counter()
+        store_seconds.observe(perf_counter() - start)
+
+    print(f"{ITERATIONS:,} operations\n")
+    report("Histogram.observe", timeit.timeit(lambda: store_seconds.observe(0.0042), number=ITERATIONS))
+    report("Counter.inc", timeit.timeit(created.inc, number=ITERATIONS))
+    report("labels() lookup + Counter.inc",
+           timeit.timeit(lambda: requests.labels('POST', '/dad-pass', '200').inc(), number=ITERATIONS))
+    report("perf_counter pair + observe", timeit.timeit(timed_stage, number=ITERATIONS))
+    report("baseline (empty lambda call)", timeit.timeit(lambda: None, number=ITERATIONS))
+    report("render /metrics", timeit.timeit(registry.render, number=10_000), 10_000)
+
+
+if __name__ == '__main__':
+    main()
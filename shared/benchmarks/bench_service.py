@@ -0,0 +1,64 @@
+"""
+Benchmark of the message service hot path, independent of any web framework.
+
+Times MessageService.create_message, get_message and create_messages (key
+generation, encryption, storage and decryption) on each store bench_store.py
+can reach, so both backends' request handling is measured in one place. The
+"client-encrypted" rows send zero-knowledge ciphertext instead, which the
+service stores and returns without any server-side crypto.
+
+Run with: make bench-service (or make bench-all for every shared benchmark)
+"""
+import base64
+import os
+import sys
+import time
+from pathlib import Path
+from cryptography.fernet import Fernet
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from bench_store import _stores
+from dadpass_core import crypto
+from dadpass_core.crypto import CLIENT_ENVELOPE_VERSION, CipherEngine
+from dadpass_core.service import MessageService
+
+ITERATIONS = 5000
+BATCH_SIZE = 100
+MESSAGE = {'message': "The Netflix password is hunter2", 'ttlOption': '15min'}
+# The same message as the browser encrypts it: version, IV, ciphertext and tag
+CLIENT_MESSAGE = {
+    'ciphertext': base64.urlsafe_b64encode(bytes((CLIENT_ENVELOPE_VERSION,)) + os.urandom(12 + 31 + 16)).decode(),
+    'ttlOption': '15min'
+}
+
+
+def report(name: str, seconds: float, operations: int):
+    per_op_us = seconds / operations * 1_000_000
+    print(f"  {name:<34} {per_op_us:8.2f} us/op {operations / seconds:12,.0f} ops/sec")
+
+
+def main():
+    crypto.set_engine(CipherEngine({'v1': Fernet.generate_key()}))
+    print(f"{ITERATIONS:,} messages per operation, batches of {BATCH_SIZE}\n")
+    for name, store in _stores().items():
+        service = MessageService(store)
+        print(name)
+        for label, body in (('', MESSAGE), (' client-encrypted', CLIENT_MESSAGE)):
+            start = time.perf_counter()
+            keys = [service.create_message(body)['messageKey'] for _ in range(ITERATIONS)]
+            report(f"create_message{label}", time.perf_counter() - start, ITERATIONS)
+
+            start = time.perf_counter()
+            for message_key in keys:
+                service.get_message(message_key)
+            report(f"get_message{label}", time.perf_counter() - start, ITERATIONS)
+
+            start = time.perf_counter()
+            for _ in range(ITERATIONS // BATCH_SIZE):
+                service.create_messages([body] * BATCH_SIZE)
+            report(f"create_messages{label}", time.perf_counter() - start, ITERATIONS)
+
+
+if __name__ == '__main__':
+    main()
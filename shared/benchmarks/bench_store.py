@@ -0,0 +1,93 @@
+"""
+Benchmark of the message stores: put-if-absent + consume round trips.
+
+The in-memory store always runs. The others run when pointed at a server:
+
+    REDIS_URL=redis://localhost:6379/0              (e.g. docker run -p 6379:6379 redis)
+    DYNAMODB_ENDPOINT_URL=http://localhost:8000     (e.g. docker run -p 8000:8000 amazon/dynamodb-local)
+    DYNAMODB_TABLE=dad-pass-bench                   (created if missing)
+
+Run with: make bench-store
+"""
+import os
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from dadpass_core.store import DynamoDBMessageStore, InMemoryMessageStore, RedisMessageStore
+
+OPERATIONS = 2000
+THREADS = 8
+
+
+def _dynamodb_store() -> DynamoDBMessageStore:
+    import boto3
+    dynamodb = boto3.resource(
+        'dynamodb',
+        endpoint_url=os.environ['DYNAMODB_ENDPOINT_URL'],
+        region_name=os.environ.get('AWS_REGION', 'us-east-1')
+    )
+    table_name = os.environ.get('DYNAMODB_TABLE', 'dad-pass-bench')
+    if table_name not in [table.name for table in dynamodb.tables.all()]:
+        dynamodb.create_table(
+            TableName=table_name,
+            KeySchema=[{'AttributeName': 'messageKey', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[{'AttributeName': 'messageKey', 'AttributeType': 'S'}],
+            BillingMode='PAY_PER_REQUEST'
+        ).wait_until_exists()
+    return DynamoDBMessageStore(dynamodb.Table(table_name))
+
+
+def _stores() -> dict:
+    stores = {'memory': InMemoryMessageStore()}
+    if os.environ.get('REDIS_URL'):
+        stores['redis'] = RedisMessageStore.from_url(os.environ['REDIS_URL'])
+    if os.environ.get('DYNAMODB_ENDPOINT_URL'):
+        stores['dynamodb'] = _dynamodb_store()
+    return stores
+
+
+def run(store, threads: int) -> tuple[float, list[float]]:
+    """Runs OPERATIONS put+consume pairs split over `threads` threads."""
+    latencies = []
+    lock = threading.Lock()
+    per_thread = OPERATIONS // threads
+
+    def worker(n):
+        local = []
+        for i in range(per_thread):
+            key = f"bench-{n}-{i}-{time.time_ns()}"
+            start = time.perf_counter()
+            store.put_if_absent({'messageKey': key, 'ttl': int(time.time()) + 60,
+                                 'encryptedMessage': 'v1:' + 'x' * 140, 'ttlOption': '15min'})
+            store.consume(key)
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return time.perf_counter() - start, latencies
+
+
+def main():
+    print(f"{OPERATIONS:,} put+consume pairs per run\n")
+    print(f"{'store':<10} {'threads':>7} {'pairs/sec':>12} {'p50 (us)':>10} {'p99 (us)':>10}")
+    for name, store in _stores().items():
+        for threads in (1, THREADS):
+            elapsed, latencies = run(store, threads)
+            quantiles = statistics.quantiles(latencies, n=100)
+            print(f"{name:<10} {threads:>7} {len(latencies) / elapsed:12,.0f} "
+                  f"{quantiles[49] * 1e6:10.1f} {quantiles[98] * 1e6:10.1f}")
+
+
+if __name__ == '__main__':
+    main()
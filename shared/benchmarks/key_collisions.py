@@ -0,0 +1,40 @@
+"""
+Collision-probability calculator for the configured message key length.
+
+Prints, for a range of live (unexpired) message counts, the chance that one
+create hits a taken key and has to retry, and the chance that it still fails
+after every retry. Run with: make key-collisions [MESSAGE_KEY_LENGTH=12]
+"""
+import argparse
+import math
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from dadpass_core.keys import ALPHABET, DEFAULT_KEY_LENGTH, birthday_probability, collision_probability, keyspace
+
+LIVE_MESSAGES = [10 ** 3, 10 ** 5, 10 ** 7, 10 ** 9]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--length', type=int, default=int(os.environ.get('MESSAGE_KEY_LENGTH', DEFAULT_KEY_LENGTH)),
+                        help='Characters per key (default: $MESSAGE_KEY_LENGTH or %(default)s)')
+    parser.add_argument('--attempts', type=int, default=3, help='Keys tried per create (default: %(default)s)')
+    args = parser.parse_args()
+
+    space = keyspace(args.length)
+    print(f"{args.length} characters from a {len(ALPHABET)}-character alphabet: "
+          f"{space:,} keys ({math.log2(space):.1f} bits)\n")
+    print(f"{'live messages':>14} {'retry per create':>18} {f'fail after {args.attempts} tries':>20} "
+          f"{'any pair collides':>18}")
+    for live in LIVE_MESSAGES:
+        retry = collision_probability(live, args.length)
+        print(f"{live:>14,} {retry:>18.3e} {retry ** args.attempts:>20.3e} "
+              f"{birthday_probability(live, args.length):>18.3e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,3 @@
+"""
+Core building blocks shared by the dad-pass container and serverless backends.
+"""
@@ -0,0 +1,286 @@
+"""
+Asyncio message storage backends, for the ASGI entry point.
+
+Same items and the same three guarantees as dadpass_core.store (put-if-absent,
+consume-once, expiry), but every round trip is awaited, so a single event loop
+can keep hundreds of requests in flight while they wait on the network.
+
+Open one store per process with open_async_store() and share it: the DynamoDB
+store holds a single aiobotocore client whose connection pool is reused by
+every request.
+"""
+import asyncio
+import json
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from botocore.exceptions import ClientError
+
+from dadpass_core import tracing
+from dadpass_core.clients import config_options
+from dadpass_core.items import COMPACT_FORMAT, from_stored
+from dadpass_core.store import (
+    MESSAGE_STORES, TRANSACT_BACKOFF_SECONDS, TRANSACT_MAX_ATTEMPTS, InMemoryMessageStore,
+    MessageKeyExistsError, RedisMessageStore, _to_json, is_own_write, split_cancelled, stored_form,
+    transaction_chunks
+)
+
+# Connections kept open to DynamoDB per process (botocore defaults to 10)
+DEFAULT_MAX_POOL_CONNECTIONS = 100
+
+
+class AsyncMessageStore(ABC):
+    """Storage for one-time messages, with awaitable operations."""
+
+    @abstractmethod
+    async def put_if_absent(self, item: dict):
+        """
+        Stores a new message unless a live message already has its key.
+
+        Raises:
+            MessageKeyExistsError: The key is taken
+        """
+
+    @abstractmethod
+    async def consume(self, message_key: str) -> dict | None:
+        """
+        Atomically removes and returns a message.
+
+        Returns:
+            The stored item, or None if it does not exist, was already consumed or has expired
+        """
+
+    async def put_many_if_absent(self, items: list[dict]) -> list[dict]:
+        """
+        Stores a batch of new messages, each unless a live message already has its key.
+
+        Returns:
+            The items that were not stored because their key is taken, in input order
+        """
+        collided = []
+        for item in items:
+            try:
+                await self.put_if_absent(item)
+            except MessageKeyExistsError:
+                collided.append(item)
+        return collided
+
+
+class AsyncDynamoDBMessageStore(AsyncMessageStore):
+    """
+    Messages in a DynamoDB table through an aiobotocore client.
+
+    Issues the same conditional PutItem and DeleteItem as DynamoDBMessageStore,
+    using the low-level client API (attribute values in DynamoDB JSON), with
+    items in the same formats. consume goes through `consume_client` when
+    given, a client that makes a single attempt (see dadpass_core.clients).
+    """
+
+    def __init__(self, client, table_name: str, item_format: int = COMPACT_FORMAT, consume_client=None):
+        # Deferred with the client: boto3 is only needed for its attribute (de)serializers
+        from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+
+        self.client = client
+        self.consume_client = consume_client or client
+        self.table_name = table_name
+        self._stored = stored_form(item_format)
+        self._serializer = TypeSerializer()
+        self._deserializer = TypeDeserializer()
+
+    @classmethod
+    @asynccontextmanager
+    async def open(cls, table_name: str, region_name: str | None = None,
+                   max_pool_connections: int = DEFAULT_MAX_POOL_CONNECTIONS,
+                   item_format: int = COMPACT_FORMAT) -> AsyncIterator['AsyncDynamoDBMessageStore']:
+        """Creates a store with its own pooled aiobotocore clients, closed on exit (aiobotocore is an optional dependency)."""
+        from aiobotocore.config import AioConfig
+        from aiobotocore.session import get_session
+
+        # Same timeouts and retries as the sync clients, and the same single attempt for consume
+        # (see dadpass_core.clients)
+        session = get_session()
+        config = AioConfig(**config_options(max_pool_connections))
+        consume_config = AioConfig(**config_options(max_pool_connections, single_attempt=True))
+        async with session.create_client('dynamodb', region_name=region_name, config=config) as client, \
+                session.create_client('dynamodb', region_name=region_name, config=consume_config) as consume_client:
+            yield cls(client, table_name, item_format, consume_client)
+
+    async def put_if_absent(self, item: dict):
+        serialized = self._serialize(item)
+        try:
+            # DynamoDB's TTL reaper can lag, so an expired item does not block its key
+            with tracing.span('DynamoDB.PutItem', table=self.table_name):
+                await self.client.put_item(
+                    TableName=self.table_name,
+                    Item=serialized,
+                    ConditionExpression='attribute_not_exists(messageKey) OR #ttl < :now',
+                    ExpressionAttributeNames={'#ttl': 'ttl'},
+                    ExpressionAttributeValues={':now': {'N': str(int(time.time()))}},
+                    ReturnValuesOnConditionCheckFailure='ALL_OLD'
+                )
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                if is_own_write(serialized, e):
+                    return
+                raise MessageKeyExistsError(item['messageKey']) from e
+            raise
+
+    async def consume(self, message_key: str) -> dict | None:
+        try:
+            with tracing.span('DynamoDB.DeleteItem', table=self.table_name):
+                response = await self.consume_client.delete_item(
+                    TableName=self.table_name,
+                    Key={'messageKey': {'S': message_key}},
+                    ConditionExpression='attribute_exists(messageKey) AND #ttl >= :now',
+                    ExpressionAttributeNames={'#ttl': 'ttl'},
+                    ExpressionAttributeValues={':now': {'N': str(int(time.time()))}},
+                    ReturnValues='ALL_OLD'
+                )
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                # Missing, already consumed or expired (DynamoDB TTL reaps the rest)
+                return None
+            raise
+        attributes = response.get('Attributes')
+        if attributes is None:
+            return None
+        return from_stored({key: self._deserializer.deserialize(value) for key, value in attributes.items()})
+
+    def _serialize(self, item: dict) -> dict:
+        return {key: self._serializer.serialize(value) for key, value in self._stored(item).items()}
+
+    async def put_many_if_absent(self, items: list[dict]) -> list[dict]:
+        # Same chunked TransactWriteItems as DynamoDBMessageStore.put_many_if_absent
+        collided = []
+        for chunk in transaction_chunks(items, collided):
+            collided.extend(await self._put_chunk(chunk))
+        return collided
+
+    async def _put_chunk(self, chunk: list[dict]) -> list[dict]:
+        collided = []
+        pending = chunk
+        for attempt in range(TRANSACT_MAX_ATTEMPTS):
+            if attempt:
+                await asyncio.sleep(TRANSACT_BACKOFF_SECONDS * 2 ** (attempt - 1))
+            now = {'N': str(int(time.time()))}
+            try:
+                with tracing.span('DynamoDB.TransactWriteItems', table=self.table_name, items=len(pending)):
+                    await self.client.transact_write_items(ClientRequestToken=str(uuid.uuid4()), TransactItems=[
+                        {'Put': {
+                            'TableName': self.table_name,
+                            'Item': self._serialize(item),
+                            'ConditionExpression': 'attribute_not_exists(messageKey) OR #ttl < :now',
+                            'ExpressionAttributeNames': {'#ttl': 'ttl'},
+                            'ExpressionAttributeValues': {':now': now}
+                        }}
+                        for item in pending
+                    ])
+                return collided
+            except ClientError as e:
+                taken, pending = split_cancelled(pending, e)
+                collided.extend(taken)
+                if not pending:
+                    return collided
+                last_error = e
+        raise last_error
+
+
+class AsyncInMemoryMessageStore(AsyncMessageStore):
+    """
+    Awaitable wrapper around InMemoryMessageStore.
+
+    Its operations never wait on I/O and hold a stripe lock only briefly, so
+    they run inline on the event loop.
+    """
+
+    def __init__(self, store: InMemoryMessageStore | None = None):
+        self.store = store if store is not None else InMemoryMessageStore()
+
+    async def put_if_absent(self, item: dict):
+        self.store.put_if_absent(item)
+
+    async def consume(self, message_key: str) -> dict | None:
+        return self.store.consume(message_key)
+
+    async def put_many_if_absent(self, items: list[dict]) -> list[dict]:
+        return self.store.put_many_if_absent(items)
+
+
+class AsyncRedisMessageStore(AsyncMessageStore):
+    """Messages in Redis through redis.asyncio, with the same commands as RedisMessageStore."""
+
+    KEY_PREFIX = RedisMessageStore.KEY_PREFIX
+
+    def __init__(self, client):
+        self.client = client
+
+    @classmethod
+    @asynccontextmanager
+    async def open(cls, url: str) -> AsyncIterator['AsyncRedisMessageStore']:
+        """Creates a store with a pooled redis.asyncio client, closed on exit (redis is an optional dependency)."""
+        import redis.asyncio
+
+        client = redis.asyncio.Redis.from_url(url)
+        try:
+            yield cls(client)
+        finally:
+            await client.aclose()
+
+    async def put_if_absent(self, item: dict):
+        expires_in = int(item['ttl']) - int(time.time())
+        if expires_in <= 0:
+            # Already expired; storing it would only make it unreadable
+            return
+        value = json.dumps({key: _to_json(value) for key, value in item.items()})
+        if not await self.client.set(self.KEY_PREFIX + item['messageKey'], value, nx=True, ex=expires_in):
+            raise MessageKeyExistsError(item['messageKey'])
+
+    async def put_many_if_absent(self, items: list[dict]) -> list[dict]:
+        now = int(time.time())
+        live = [item for item in items if int(item['ttl']) > now]
+        pipeline = self.client.pipeline(transaction=False)
+        for item in live:
+            value = json.dumps({key: _to_json(value) for key, value in item.items()})
+            pipeline.set(self.KEY_PREFIX + item['messageKey'], value, nx=True, ex=int(item['ttl']) - now)
+        return [item for item, stored in zip(live, await pipeline.execute()) if not stored]
+
+    async def consume(self, message_key: str) -> dict | None:
+        value = await self.client.getdel(self.KEY_PREFIX + message_key)
+        if value is None:
+            return None
+        item = json.loads(value)
+        if item['ttl'] < int(time.time()):
+            return None
+        return item
+
+
+@asynccontextmanager
+async def open_async_store(kind: str = 'dynamodb', *, table_name: str | None = None,
+                           region_name: str | None = None, redis_url: str | None = None,
+                           max_pool_connections: int = DEFAULT_MAX_POOL_CONNECTIONS,
+                           item_format: int = COMPACT_FORMAT) -> AsyncIterator[AsyncMessageStore]:
+    """
+    Opens the async message store for a deployment and closes its client on exit.
+
+    Args:
+        kind: One of 'dynamodb', 'memory' or 'redis'
+        table_name: DynamoDB table name (dynamodb)
+        region_name: AWS region, or None for the default chain (dynamodb)
+        redis_url: Server URL such as redis://localhost:6379/0 (redis)
+        max_pool_connections: Size of the DynamoDB connection pool (dynamodb)
+        item_format: Item format to write, 1 or 2 (dynamodb, see dadpass_core.items)
+    """
+    if kind == 'dynamodb':
+        async with AsyncDynamoDBMessageStore.open(table_name, region_name, max_pool_connections,
+                                                  item_format) as store:
+            yield store
+    elif kind == 'memory':
+        yield AsyncInMemoryMessageStore()
+    elif kind == 'redis':
+        async with AsyncRedisMessageStore.open(redis_url or 'redis://localhost:6379/0') as store:
+            yield store
+    else:
+        raise ValueError(f"Unknown message store {kind!r}, expected one of {', '.join(MESSAGE_STORES)}")
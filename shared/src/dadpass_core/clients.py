@@ -0,0 +1,120 @@
+"""
+botocore client configuration shared by every backend's DynamoDB, SSM and KMS clients.
+
+botocore's defaults suit batch jobs rather than request handlers: a 60 s
+connect and read timeout, longer than the 30 s API Gateway integration
+timeout (template.yaml) and gunicorn's 30 s worker timeout, so a hung
+connection outlives the request it serves. Legacy retries and a 10-connection
+pool, smaller than a gthread worker's concurrency, are the other problems.
+Every client built here instead gets:
+
+- connect and read timeouts sized so that all attempts, plus backoff, fit
+  well inside those deadlines (see worst_case_seconds)
+- adaptive retries: standard mode's exponential backoff and retry quota, a
+  budget that stops retries when most calls are failing, plus client-side
+  rate limiting once DynamoDB starts throttling
+- TCP keep-alive on pooled connections, so NAT gateways and load balancers
+  do not silently drop them between bursts
+- a connection pool sized by the caller to its concurrency
+
+Retrying is only safe for calls that can be repeated. The read-once
+DeleteItem (ReturnValues=ALL_OLD) is not: if an attempt deletes the item but
+its response misses the read timeout, the retry finds nothing and the reader
+is told the message is gone while nobody received it. Clients for such calls
+are built with single_attempt=True instead, which makes one attempt and waits
+longer for its answer (AWS_SINGLE_ATTEMPT_READ_TIMEOUT_SECONDS). That makes a
+lost message far less likely, but cannot rule it out: a response that never
+arrives still loses the message. Conditional puts are made safe to retry
+instead. PutItem asks for the existing item when its condition fails, and
+the stores treat their own earlier write as success rather than as a key
+collision (see dadpass_core.store.is_own_write). TransactWriteItems carries
+a ClientRequestToken, so a retry of an applied transaction succeeds without
+writing again.
+
+AWS_CONNECT_TIMEOUT_SECONDS, AWS_READ_TIMEOUT_SECONDS, AWS_MAX_ATTEMPTS and
+AWS_RETRY_MODE override the defaults.
+"""
+import os
+from typing import Any
+
+DEFAULT_CONNECT_TIMEOUT_SECONDS = 1.0
+
+# DynamoDB answers in milliseconds; an attempt still waiting after this is better retried
+DEFAULT_READ_TIMEOUT_SECONDS = 3.0
+
+# Attempts per call, the first included
+DEFAULT_MAX_ATTEMPTS = 3
+
+DEFAULT_RETRY_MODE = 'adaptive'
+
+# Calls that must not be retried wait this long for their one attempt, still well inside the deadlines
+DEFAULT_SINGLE_ATTEMPT_READ_TIMEOUT_SECONDS = 10.0
+
+# botocore's own pool size, for callers that leave it unset
+DEFAULT_MAX_POOL_CONNECTIONS = 10
+
+# Standard and adaptive retry modes sleep up to 2**n seconds before retry n+1, capped at this
+_MAX_BACKOFF_SECONDS = 20
+
+
+def config_options(max_pool_connections: int | None = None, single_attempt: bool = False) -> dict[str, Any]:
+    """
+    The keyword arguments for botocore's Config (or aiobotocore's AioConfig), from the environment.
+
+    Args:
+        max_pool_connections: Connections to keep open, e.g. one per request a
+            worker can have in flight (default 10)
+        single_attempt: For calls that are not safe to repeat: one attempt,
+            with the longer single-attempt read timeout
+    """
+    if single_attempt:
+        read_timeout = float(os.environ.get('AWS_SINGLE_ATTEMPT_READ_TIMEOUT_SECONDS',
+                                            DEFAULT_SINGLE_ATTEMPT_READ_TIMEOUT_SECONDS))
+        max_attempts = 1
+    else:
+        read_timeout = float(os.environ.get('AWS_READ_TIMEOUT_SECONDS', DEFAULT_READ_TIMEOUT_SECONDS))
+        max_attempts = int(os.environ.get('AWS_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS))
+    return {
+        'connect_timeout': float(os.environ.get('AWS_CONNECT_TIMEOUT_SECONDS', DEFAULT_CONNECT_TIMEOUT_SECONDS)),
+        'read_timeout': read_timeout,
+        'retries': {
+            'mode': os.environ.get('AWS_RETRY_MODE', DEFAULT_RETRY_MODE),
+            'total_max_attempts': max_attempts
+        },
+        'tcp_keepalive': True,
+        'max_pool_connections': max_pool_connections or DEFAULT_MAX_POOL_CONNECTIONS
+    }
+
+
+def client_config(max_pool_connections: int | None = None, single_attempt: bool = False):
+    """A botocore Config with config_options."""
+    from botocore.config import Config
+
+    return Config(**config_options(max_pool_connections, single_attempt))
+
+
+def worst_case_seconds(options: dict[str, Any] | None = None) -> float:
+    """
+    The longest one call can take before it fails: every attempt timing out, plus the backoff between them.
+
+    Adaptive mode can also wait for its rate limiter while DynamoDB is
+    throttling; that wait is not included.
+    """
+    options = options or config_options()
+    attempts = options['retries']['total_max_attempts']
+    backoff = sum(min(_MAX_BACKOFF_SECONDS, 2 ** retry) for retry in range(attempts - 1))
+    return attempts * (options['connect_timeout'] + options['read_timeout']) + backoff
+
+
+def create_client(service: str, region_name: str | None = None, max_pool_connections: int | None = None):
+    """
+    A boto3 client for `service` with the shared configuration.
+
+    Each client gets its own session: boto3's default session is not safe to
+    share with clients or resources being built on other threads, such as
+    the key ring's background load.
+    """
+    import boto3
+
+    return boto3.session.Session().client(service, region_name=region_name,
+                                          config=client_config(max_pool_connections))
@@ -0,0 +1,461 @@
+"""
+Encryption utilities shared by the container and serverless backends.
+
+Constructing a Fernet splits and validates the key every time, so the cipher is
+built once per key set and reused for every message instead of per call.
+
+Ciphertext is tagged with the id of the key that produced it ("<key id>:<token>")
+so decryption goes straight to the right key. Tokens written with the legacy
+single master key carry no tag and stay readable as-is.
+
+Messages of at least compress_threshold bytes (config snippets, SSH keys,
+recovery-code lists) are deflated before encryption when that makes them
+smaller, and the codec joins the header: "<key id>:<codec>:<token>".
+Decompression stops at MAX_DECOMPRESSED_BYTES, so even a validly encrypted
+zip bomb cannot exhaust memory. Each message is one sender's text, so the
+length compression reveals says nothing about anyone else's secret.
+
+With cipher=AES_GCM_CIPHER (CIPHER=aes-gcm) new messages are written as a
+versioned binary envelope instead, base64 encoded without a tag:
+
+    version (1) | key id length (1) | key id | codec (1) | nonce (12) | ciphertext and tag
+
+One AES-256-GCM pass replaces Fernet's AES-CBC plus HMAC, and the envelope
+drops Fernet's timestamp, IV-sized padding and separate MAC. The header is
+authenticated as associated data. The AES key is derived from the same
+Fernet key material with HKDF, so rotation is unchanged. Both ciphers are
+always read, so Fernet messages stay readable after switching.
+
+With cipher=DATA_KEY_CIPHER (CIPHER=data-key) messages are encrypted under
+data keys from a KMS-style provider (see dadpass_core.datakeys), and the
+envelope carries the wrapped data key in place of a key id:
+
+    version (1) | wrapped key length (2) | wrapped key | codec (1) | nonce (12) | ciphertext and tag
+
+Any engine given a data key cache can read these, whatever it writes with.
+
+Client-encrypted messages (zero-knowledge mode) are encrypted in the browser
+with a key that never reaches the server, so no engine can read them. They
+are stored and returned as the client sent them, base64 encoded:
+
+    version (1) | nonce (12) | AES-GCM ciphertext and tag
+
+client_ciphertext_length bounds their size. Stored items say whether they
+hold one (the service's 'clientEncrypted' attribute) rather than leaving it
+to be guessed from the bytes: a base64 prefix can look like this envelope's
+version byte whatever the key id in front of it.
+"""
+import base64
+import logging
+import os
+import zlib
+from typing import Callable, Mapping
+
+from dadpass_core import tracing
+from dadpass_core.datakeys import DataKeyCache
+
+log = logging.getLogger(__name__)
+
+# Key id of the original single master key (/dad-pass/encryption-key)
+LEGACY_KEY_ID = 'legacy'
+
+KEY_ID_SEPARATOR = ':'
+
+# Longest key id and codec header allowed for when sizing ciphertext (ids are SSM parameter name suffixes, e.g. "v3")
+MAX_KEY_ID_LENGTH = 64
+
+# Raw deflate (no zlib header or checksum: the Fernet HMAC already authenticates the data)
+DEFLATE_CODEC = 'z'
+
+# Smallest message, in UTF-8 bytes, worth compressing (COMPRESSION_THRESHOLD; 0 turns it off)
+DEFAULT_COMPRESS_THRESHOLD = 512
+
+# Most bytes a compressed message may inflate to, far above the longest message a store can hold
+MAX_DECOMPRESSED_BYTES = 1024 * 1024
+
+# Ciphers new messages can be written with (CIPHER)
+FERNET_CIPHER = 'fernet'
+AES_GCM_CIPHER = 'aes-gcm'
+DATA_KEY_CIPHER = 'data-key'
+CIPHERS = (FERNET_CIPHER, AES_GCM_CIPHER, DATA_KEY_CIPHER)
+
+# First byte of an AES-GCM envelope; Fernet tokens start with 0x80 and key ids are printable ASCII
+ENVELOPE_VERSION = 0x01
+DATA_KEY_ENVELOPE_VERSION = 0x02
+
+# First byte of a browser-encrypted message (frontend/src/api/dadpass.ts), which only the client can read
+CLIENT_ENVELOPE_VERSION = 0x03
+_CLIENT_ENVELOPE_OVERHEAD = 1 + 12 + 16
+
+# Longest wrapped data key an envelope may carry (a KMS AES_256 data key wraps to under 200 bytes)
+MAX_WRAPPED_KEY_BYTES = 512
+# The most it adds to stored ciphertext, base64 encoded with the rest of the envelope
+MAX_WRAPPED_KEY_LENGTH = 4 * -(-MAX_WRAPPED_KEY_BYTES // 3)
+_NO_CODEC = 0
+# Trace span prefix per cipher: 'Fernet.encrypt', 'AESGCM.decrypt', ...
+_SPAN_PREFIXES = {FERNET_CIPHER: 'Fernet', AES_GCM_CIPHER: 'AESGCM', DATA_KEY_CIPHER: 'DataKey'}
+_GCM_NONCE_BYTES = 12
+_GCM_TAG_BYTES = 16
+_GCM_KEY_INFO = b'dadpass aes-256-gcm v1'
+
+
+def encrypted_length(plaintext_bytes: int, key_id_length: int = MAX_KEY_ID_LENGTH) -> int:
+    """
+    Length of the ciphertext encrypt_message writes for `plaintext_bytes` of UTF-8.
+
+    A Fernet token is a version byte, timestamp, IV, the AES-CBC ciphertext
+    padded to whole 16-byte blocks and an HMAC, base64 encoded (4 characters
+    per 3 bytes), then tagged with the key id. Compression only ever makes
+    it shorter: a message is only compressed when that saves a whole block,
+    which more than pays for the codec in the header. An AES-GCM envelope
+    is always shorter than the Fernet token for the same message. A data key
+    envelope is not: its wrapped key is base64 encoded along with the rest, so
+    it can be up to MAX_WRAPPED_KEY_LENGTH characters longer.
+    """
+    token_bytes = 1 + 8 + 16 + (plaintext_bytes // 16 + 1) * 16 + 32
+    return key_id_length + len(KEY_ID_SEPARATOR) + 4 * -(-token_bytes // 3)
+
+
+# An 8 KB window covers any message a store accepts and, unlike zlib's 256 KB default state,
+# stays small enough to be allocated from the heap rather than mmapped on every call
+_DEFLATE_WBITS = 13
+_DEFLATE_MEM_LEVEL = 6
+
+
+def client_ciphertext_length(plaintext_bytes: int) -> int:
+    """Length of the base64 (padded) client ciphertext for `plaintext_bytes` of UTF-8."""
+    return 4 * -(-(plaintext_bytes + _CLIENT_ENVELOPE_OVERHEAD) // 3)
+
+
+def check_client_ciphertext(ciphertext) -> str | None:
+    """Returns why `ciphertext` is not a well-formed client-encrypted message, or None if it is."""
+    if not isinstance(ciphertext, str):
+        return 'Ciphertext must be a string'
+    try:
+        raw = base64.b64decode(ciphertext, altchars=b'-_', validate=True)
+    except ValueError:
+        return 'Ciphertext must be URL-safe base64'
+    if raw[:1] != bytes((CLIENT_ENVELOPE_VERSION,)) or len(raw) < _CLIENT_ENVELOPE_OVERHEAD:
+        return 'Ciphertext is not a client-encrypted message'
+    return None
+
+
+def _deflate(data: bytes) -> bytes:
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -_DEFLATE_WBITS, _DEFLATE_MEM_LEVEL)
+    return compressor.compress(data) + compressor.flush()
+
+
+def _inflate(codec: str, data: bytes) -> bytes:
+    if codec != DEFLATE_CODEC:
+        raise ValueError(f"Unknown compression codec: {codec}")
+    decompressor = zlib.decompressobj(wbits=-zlib.MAX_WBITS)
+    plaintext = decompressor.decompress(data, MAX_DECOMPRESSED_BYTES)
+    if decompressor.unconsumed_tail or not decompressor.eof:
+        raise ValueError(f"Compressed message is truncated or inflates past {MAX_DECOMPRESSED_BYTES} bytes")
+    return plaintext
+
+
+class UnknownKeyError(Exception):
+    """Raised when ciphertext was produced by a key this engine does not hold."""
+
+    def __init__(self, key_id: str):
+        super().__init__(f"Unknown encryption key id: {key_id}")
+        self.key_id = key_id
+
+
+def _gcm_key(fernet_key: bytes) -> bytes:
+    """The AES-256 key for a Fernet key: HKDF-SHA256 over its signing and encryption halves."""
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+    return HKDF(algorithm=hashes.SHA256(), length=32, salt=None, info=_GCM_KEY_INFO).derive(
+        base64.urlsafe_b64decode(fernet_key))
+
+
+def is_envelope(raw: bytes) -> bool:
+    """Whether decoded ciphertext bytes are an AES-GCM or data key envelope rather than a Fernet token."""
+    return raw[:1] in (bytes((ENVELOPE_VERSION,)), bytes((DATA_KEY_ENVELOPE_VERSION,)))
+
+
+def cipher_of(ciphertext: str) -> str:
+    """
+    The cipher server-side `ciphertext` was written with, from its format as CipherEngine.decrypt reads it.
+
+    Tagged ciphertext is always a Fernet token; untagged ciphertext is a legacy
+    Fernet token or an envelope, told apart by its decoded first byte.
+    """
+    if KEY_ID_SEPARATOR in ciphertext:
+        return FERNET_CIPHER
+    try:
+        version = base64.urlsafe_b64decode(ciphertext[:4])[:1]
+    except ValueError:
+        return FERNET_CIPHER
+    if version == bytes((ENVELOPE_VERSION,)):
+        return AES_GCM_CIPHER
+    if version == bytes((DATA_KEY_ENVELOPE_VERSION,)):
+        return DATA_KEY_CIPHER
+    return FERNET_CIPHER
+
+
+class CipherEngine:
+    """
+    A pre-built set of Fernet and AES-GCM ciphers that can be shared across requests and threads.
+
+    Neither keeps per-message state (GCM nonces are random), so a single
+    instance is safe to use concurrently. The active key encrypts with the
+    configured cipher; every key in the ring can decrypt either.
+    """
+
+    def __init__(self, keys: Mapping[str, bytes], active_key_id: str | None = None,
+                 compress_threshold: int = DEFAULT_COMPRESS_THRESHOLD, cipher: str = FERNET_CIPHER,
+                 data_keys: DataKeyCache | None = None):
+        # Deferred: with a background key load (KeyRing.install(wait=False)) this keeps
+        # the cryptography import off the cold-start import path
+        from cryptography.fernet import Fernet, MultiFernet
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+        if not keys:
+            raise ValueError("At least one encryption key is required")
+        if cipher not in CIPHERS:
+            raise ValueError(f"Unknown cipher {cipher}; expected one of {', '.join(CIPHERS)}")
+        if cipher == DATA_KEY_CIPHER and data_keys is None:
+            raise ValueError("The data-key cipher requires a data key provider (DATA_KEY_PROVIDER)")
+        self._fernets = {key_id: Fernet(key) for key_id, key in keys.items()}
+        self._aeads = {key_id: AESGCM(_gcm_key(key)) for key_id, key in keys.items()}
+        self.active_key_id = active_key_id or next(iter(keys))
+        if self.active_key_id not in self._fernets:
+            raise ValueError(f"Active key id {self.active_key_id} is not in the key ring")
+        if KEY_ID_SEPARATOR in self.active_key_id:
+            raise ValueError(f"Key ids may not contain '{KEY_ID_SEPARATOR}'")
+        self._active = self._fernets[self.active_key_id]
+        self.compress_threshold = compress_threshold
+        self.cipher = cipher
+        self.data_keys = data_keys
+        if cipher == AES_GCM_CIPHER:
+            if not self.active_key_id.isascii() or len(self.active_key_id) > MAX_KEY_ID_LENGTH:
+                raise ValueError(f"AES-GCM key ids must be ASCII and at most {MAX_KEY_ID_LENGTH} characters")
+            # Envelope header up to the codec byte, the same for every message
+            self._envelope_prefix = bytes((ENVELOPE_VERSION, len(self.active_key_id))) + self.active_key_id.encode('ascii')
+        # Untagged tokens come from the legacy key; before any rotation that is the only key
+        self._untagged = self._fernets.get(LEGACY_KEY_ID) or MultiFernet(list(self._fernets.values()))
+
+    @property
+    def key_ids(self) -> list[str]:
+        """Ids of every key this engine can decrypt with."""
+        return list(self._fernets)
+
+    def encrypt(self, plaintext: str) -> str:
+        """Encrypts a message, compressed if that pays, and returns the key-id-tagged URL-safe Fernet token or GCM envelope."""
+        data = plaintext.encode('utf-8')
+        if self.compress_threshold and len(data) >= self.compress_threshold:
+            compressed = _deflate(data)
+            # Only when it saves a whole cipher block, so the codec header never makes the token longer
+            if len(compressed) // 16 < len(data) // 16:
+                if self.cipher != FERNET_CIPHER:
+                    return self._seal(compressed, ord(DEFLATE_CODEC))
+                token = self._active.encrypt(compressed).decode('utf-8')
+                return KEY_ID_SEPARATOR.join((self.active_key_id, DEFLATE_CODEC, token))
+        if self.cipher != FERNET_CIPHER:
+            return self._seal(data, _NO_CODEC)
+        token = self._active.encrypt(data).decode('utf-8')
+        if self.active_key_id == LEGACY_KEY_ID:
+            # Keep legacy output untagged so not-yet-upgraded readers can still decrypt it
+            return token
+        return f"{self.active_key_id}{KEY_ID_SEPARATOR}{token}"
+
+    def decrypt(self, ciphertext: str) -> str:
+        """Decrypts a GCM envelope or (possibly key-id-tagged, possibly compressed) Fernet token back to the plaintext message."""
+        header, separator, token = ciphertext.rpartition(KEY_ID_SEPARATOR)
+        key_id, _, codec = header.partition(KEY_ID_SEPARATOR)
+        if not separator:
+            # Envelopes are untagged, as are legacy Fernet tokens; only the decoded first byte tells them apart
+            raw = base64.urlsafe_b64decode(token)
+            if is_envelope(raw):
+                return self._open(raw).decode('utf-8')
+            fernet = self._untagged
+        else:
+            fernet = self._fernets.get(key_id)
+            if fernet is None:
+                raise UnknownKeyError(key_id)
+        data = fernet.decrypt(token.encode('utf-8'))
+        if codec:
+            data = _inflate(codec, data)
+        return data.decode('utf-8')
+
+    def _seal(self, data: bytes, codec: int) -> str:
+        if self.cipher == DATA_KEY_CIPHER:
+            aead, wrapped = self.data_keys.encryption_key()
+            if len(wrapped) > MAX_WRAPPED_KEY_BYTES:
+                raise ValueError(f"Wrapped data key is {len(wrapped)} bytes, over {MAX_WRAPPED_KEY_BYTES}")
+            header = bytes((DATA_KEY_ENVELOPE_VERSION,)) + len(wrapped).to_bytes(2, 'big') + wrapped + bytes((codec,))
+        else:
+            aead = self._aeads[self.active_key_id]
+            header = self._envelope_prefix + bytes((codec,))
+        nonce = os.urandom(_GCM_NONCE_BYTES)
+        sealed = aead.encrypt(nonce, data, header)
+        return base64.urlsafe_b64encode(header + nonce + sealed).decode('ascii')
+
+    def _open(self, raw: bytes) -> bytes:
+        """
+        Decrypts an AES-GCM envelope.
+
+        Raises:
+            UnknownKeyError: The envelope names a key this engine does not hold
+            ValueError: The envelope is truncated, its codec is unknown, or it holds
+                a wrapped data key and this engine has no data key provider
+            cryptography.exceptions.InvalidTag: The envelope was tampered with or the key is wrong
+        """
+        if raw[0] == DATA_KEY_ENVELOPE_VERSION:
+            wrapped_at = 3
+            codec_at = wrapped_at + int.from_bytes(raw[1:wrapped_at], 'big')
+        else:
+            wrapped_at = 2
+            codec_at = wrapped_at + (raw[1] if len(raw) > 1 else 0)
+        nonce_at = codec_at + 1
+        if len(raw) < max(wrapped_at, nonce_at + _GCM_NONCE_BYTES + _GCM_TAG_BYTES):
+            raise ValueError("Truncated AES-GCM envelope")
+        if raw[0] == DATA_KEY_ENVELOPE_VERSION:
+            if self.data_keys is None:
+                raise ValueError("Message was encrypted with a data key but no DATA_KEY_PROVIDER is configured")
+            aead = self.data_keys.decryption_key(raw[wrapped_at:codec_at])
+        else:
+            key_id = raw[wrapped_at:codec_at].decode('ascii')
+            aead = self._aeads.get(key_id)
+            if aead is None:
+                raise UnknownKeyError(key_id)
+        data = aead.decrypt(raw[nonce_at:nonce_at + _GCM_NONCE_BYTES], raw[nonce_at + _GCM_NONCE_BYTES:], raw[:nonce_at])
+        codec = raw[codec_at]
+        if codec != _NO_CODEC:
+            data = _inflate(chr(codec), data)
+        return data
+
+
+_engine: CipherEngine | None = None
+_engine_loader: Callable[[], CipherEngine] | None = None
+_unknown_key_handler: Callable[[str], CipherEngine | None] | None = None
+
+
+def configure(keys: Mapping[str, bytes], active_key_id: str | None = None,
+              compress_threshold: int = DEFAULT_COMPRESS_THRESHOLD, cipher: str = FERNET_CIPHER,
+              data_keys: DataKeyCache | None = None) -> CipherEngine:
+    """Builds the process-wide cipher from the given keys and installs it."""
+    return set_engine(CipherEngine(keys, active_key_id, compress_threshold, cipher, data_keys))
+
+
+def set_engine(engine: CipherEngine) -> CipherEngine:
+    """
+    Installs the process-wide cipher engine.
+
+    Swapping the engine is a single reference assignment, so requests already
+    holding the previous engine finish with it safely.
+    """
+    global _engine
+    _engine = engine
+    return engine
+
+
+def set_engine_loader(loader: Callable[[], CipherEngine] | None):
+    """
+    Registers a callback that blocks until the engine is available.
+
+    Used when the keys are fetched in the background at startup (see
+    KeyRing.install): the first encrypt/decrypt waits for that fetch instead of
+    the module import doing so.
+    """
+    global _engine_loader
+    _engine_loader = loader
+
+
+def is_configured() -> bool:
+    """Returns True once an engine has been installed."""
+    return _engine is not None
+
+
+def set_unknown_key_handler(handler: Callable[[str], CipherEngine | None] | None):
+    """
+    Registers a callback used when ciphertext names a key the engine does not hold.
+
+    The handler may reload the keys and return a newer engine to retry with
+    (see KeyRing), or None to give up.
+    """
+    global _unknown_key_handler
+    _unknown_key_handler = handler
+
+
+def get_engine() -> CipherEngine:
+    """Returns the configured cipher engine, waiting for a pending key load if there is one."""
+    engine = _engine
+    if engine is None:
+        if _engine_loader is None:
+            raise RuntimeError("Encryption keys have not been configured")
+        engine = _engine_loader()
+    return engine
+
+
+def encrypt_message(plaintext: str) -> str:
+    """
+    Encrypts a plaintext message with the engine's cipher (Fernet, AES-GCM or a data key envelope).
+
+    The trace span is named after that cipher, e.g. 'AESGCM.encrypt'.
+
+    Args:
+        plaintext: The message text to encrypt
+
+    Returns:
+        Key-id-tagged Fernet token or envelope, base64-encoded (URL-safe)
+    """
+    try:
+        with tracing.span('Cipher.encrypt') as span:
+            engine = get_engine()
+            span.rename(f'{_SPAN_PREFIXES[engine.cipher]}.encrypt')
+            return engine.encrypt(plaintext)
+    except Exception as e:
+        log.error(f"Encryption failed: {str(e)}")
+        raise
+
+
+def encrypt_messages(plaintexts: list[str]) -> list[str]:
+    """
+    Encrypts a batch of messages with one engine lookup, like encrypt_message.
+
+    Args:
+        plaintexts: The message texts to encrypt
+
+    Returns:
+        Key-id-tagged Fernet tokens or envelopes, base64-encoded (URL-safe), in input order
+    """
+    try:
+        with tracing.span('Cipher.encrypt', messages=len(plaintexts)) as span:
+            engine = get_engine()
+            span.rename(f'{_SPAN_PREFIXES[engine.cipher]}.encrypt')
+            return [engine.encrypt(plaintext) for plaintext in plaintexts]
+    except Exception as e:
+        log.error(f"Encryption failed: {str(e)}")
+        raise
+
+
+def decrypt_message(ciphertext: str) -> str:
+    """
+    Decrypts a message written with any cipher (Fernet, AES-GCM or a data key envelope).
+
+    The trace span is named after the cipher the message was written with (see cipher_of).
+
+    Args:
+        ciphertext: Key-id-tagged (or legacy untagged) Fernet token, or envelope
+
+    Returns:
+        Decrypted plaintext message
+    """
+    try:
+        with tracing.span(f'{_SPAN_PREFIXES[cipher_of(ciphertext)]}.decrypt'):
+            try:
+                return get_engine().decrypt(ciphertext)
+            except UnknownKeyError as e:
+                # Another instance may already be writing with a key we have not loaded yet
+                engine = _unknown_key_handler(e.key_id) if _unknown_key_handler else None
+                if engine is None:
+                    raise
+                return engine.decrypt(ciphertext)
+    except Exception as e:
+        log.error(f"Decryption failed: {str(e)}")
+        raise
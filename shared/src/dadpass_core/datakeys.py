@@ -0,0 +1,201 @@
+"""
+Data keys for envelope encryption (CIPHER=data-key).
+
+Instead of encrypting every message with a master key from SSM, a KMS-style
+provider issues AES-256 data keys: the plaintext key encrypts messages and
+the provider-wrapped copy is stored with each one. Only the provider can
+unwrap it, so the master key never leaves KMS.
+
+A KMS round trip per message would cost more than everything else on the
+request path, so DataKeyCache reuses one data key for at most max_messages
+messages or max_age seconds, whichever comes first, and keeps unwrapped keys
+for reading in a small LRU with the same age limit. Each data key encrypts
+far fewer than the 2**32 messages random 96-bit GCM nonces allow.
+
+Providers:
+
+    kms    AWS KMS GenerateDataKey / Decrypt under KMS_KEY_ID
+    local  A process-local master key, for tests, benchmarks and running
+           offline. Messages it wraps are unreadable in any other process.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable
+
+from dadpass_core import tracing
+
+DATA_KEY_PROVIDERS = ('kms', 'local')
+
+# Messages encrypted under one data key before another is requested (DATA_KEY_MAX_MESSAGES)
+DEFAULT_DATA_KEY_MAX_MESSAGES = 10_000
+
+# Seconds a data key is used or kept unwrapped (DATA_KEY_MAX_AGE_SECONDS)
+DEFAULT_DATA_KEY_MAX_AGE_SECONDS = 300
+
+# Unwrapped data keys kept for decryption
+DEFAULT_MAX_CACHED_KEYS = 1024
+
+# Binds wrapped keys to this service; KMS refuses to unwrap them under any other context
+ENCRYPTION_CONTEXT = {'service': 'dad-pass'}
+
+_LOCAL_NONCE_BYTES = 12
+
+
+class KmsDataKeyProvider:
+    """
+    Data keys from AWS KMS, with the client created on first use.
+
+    Like the SSM client, building it costs tens of milliseconds, which this
+    keeps off the cold-start import path.
+    """
+
+    def __init__(self, client_factory: Callable[[], Any], key_id: str):
+        self._client_factory = client_factory
+        self.key_id = key_id
+        self._kms = None
+
+    def _client(self):
+        if self._kms is None:
+            with tracing.span('KMS.CreateClient'):
+                self._kms = self._client_factory()
+        return self._kms
+
+    def generate_data_key(self) -> tuple[bytes, bytes]:
+        """A new plaintext data key and its wrapped copy."""
+        with tracing.span('KMS.GenerateDataKey', key_id=self.key_id):
+            response = self._client().generate_data_key(
+                KeyId=self.key_id, KeySpec='AES_256', EncryptionContext=ENCRYPTION_CONTEXT)
+        return response['Plaintext'], response['CiphertextBlob']
+
+    def decrypt_data_key(self, wrapped: bytes) -> bytes:
+        """The plaintext of a wrapped data key."""
+        with tracing.span('KMS.Decrypt'):
+            response = self._client().decrypt(CiphertextBlob=wrapped, EncryptionContext=ENCRYPTION_CONTEXT)
+        return response['Plaintext']
+
+    def reset(self):
+        """Drops the client so the next call builds a new one (its pooled connections must not cross a fork)."""
+        self._kms = None
+
+
+class LocalDataKeyProvider:
+    """
+    A KMS stand-in that wraps data keys with AES-GCM under a master key held in memory.
+
+    `latency` seconds are slept per call to stand in for the KMS round trip
+    when benchmarking cache hits against misses.
+    """
+
+    def __init__(self, master_key: bytes | None = None, latency: float = 0.0):
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+        self._master = AESGCM(master_key or AESGCM.generate_key(bit_length=256))
+        self.latency = latency
+        self.calls = 0
+
+    def generate_data_key(self) -> tuple[bytes, bytes]:
+        """A new plaintext data key and its wrapped copy."""
+        self._round_trip()
+        plaintext = os.urandom(32)
+        nonce = os.urandom(_LOCAL_NONCE_BYTES)
+        return plaintext, nonce + self._master.encrypt(nonce, plaintext, None)
+
+    def decrypt_data_key(self, wrapped: bytes) -> bytes:
+        """The plaintext of a wrapped data key."""
+        self._round_trip()
+        return self._master.decrypt(wrapped[:_LOCAL_NONCE_BYTES], wrapped[_LOCAL_NONCE_BYTES:], None)
+
+    def _round_trip(self):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+
+class DataKeyCache:
+    """
+    Hands out AES-GCM ciphers for data keys, calling the provider only when the cached ones run out.
+
+    Thread-safe: one instance serves every request in the process.
+    """
+
+    def __init__(self, provider, max_messages: int = DEFAULT_DATA_KEY_MAX_MESSAGES,
+                 max_age: float = DEFAULT_DATA_KEY_MAX_AGE_SECONDS,
+                 max_cached_keys: int = DEFAULT_MAX_CACHED_KEYS):
+        if max_messages < 1 or max_age <= 0:
+            raise ValueError("Data keys must be usable for at least one message and a positive time")
+        self.provider = provider
+        self.max_messages = max_messages
+        self.max_age = max_age
+        self.max_cached_keys = max_cached_keys
+        self._lock = threading.Lock()
+        self._current: tuple[Any, bytes] | None = None
+        self._current_uses = 0
+        self._current_expires = 0.0
+        # Wrapped key -> (cipher, expiry), least recently used first
+        self._unwrapped: OrderedDict[bytes, tuple[Any, float]] = OrderedDict()
+
+    def encryption_key(self) -> tuple[Any, bytes]:
+        """The AES-GCM cipher to encrypt the next message with, and the wrapped key to store with it."""
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+        with self._lock:
+            now = time.monotonic()
+            if self._current is None or self._current_uses >= self.max_messages or now >= self._current_expires:
+                plaintext, wrapped = self.provider.generate_data_key()
+                self._current = (AESGCM(plaintext), bytes(wrapped))
+                self._current_uses = 0
+                self._current_expires = now + self.max_age
+                self._remember(self._current[1], self._current[0], self._current_expires)
+            self._current_uses += 1
+            return self._current
+
+    def decryption_key(self, wrapped: bytes) -> Any:
+        """The AES-GCM cipher for a wrapped data key, unwrapping it through the provider on a miss."""
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+        with self._lock:
+            cached = self._unwrapped.get(wrapped)
+            if cached is not None and time.monotonic() < cached[1]:
+                self._unwrapped.move_to_end(wrapped)
+                return cached[0]
+        # Unwrap outside the lock so one slow provider call does not hold up cache hits
+        cipher = AESGCM(self.provider.decrypt_data_key(wrapped))
+        with self._lock:
+            self._remember(wrapped, cipher, time.monotonic() + self.max_age)
+        return cipher
+
+    def _remember(self, wrapped: bytes, cipher: Any, expires: float):
+        self._unwrapped[wrapped] = (cipher, expires)
+        self._unwrapped.move_to_end(wrapped)
+        while len(self._unwrapped) > self.max_cached_keys:
+            self._unwrapped.popitem(last=False)
+
+    def after_fork(self):
+        """Gives a forked child its own lock and provider client; the cached keys stay valid."""
+        self._lock = threading.Lock()
+        reset = getattr(self.provider, 'reset', None)
+        if reset is not None:
+            reset()
+
+
+def create_data_key_cache(kind: str, *, kms_client_factory: Callable[[], Any] | None = None,
+                          kms_key_id: str | None = None,
+                          max_messages: int = DEFAULT_DATA_KEY_MAX_MESSAGES,
+                          max_age: float = DEFAULT_DATA_KEY_MAX_AGE_SECONDS) -> DataKeyCache:
+    """
+    Creates the data key cache for a DATA_KEY_PROVIDER setting.
+
+    Raises:
+        ValueError: The provider is unknown, or 'kms' is missing its client factory or key id
+    """
+    if kind == 'kms':
+        if kms_client_factory is None or not kms_key_id:
+            raise ValueError("DATA_KEY_PROVIDER=kms requires KMS_KEY_ID")
+        provider = KmsDataKeyProvider(kms_client_factory, kms_key_id)
+    elif kind == 'local':
+        provider = LocalDataKeyProvider()
+    else:
+        raise ValueError(f"Unknown data key provider {kind}; expected one of {', '.join(DATA_KEY_PROVIDERS)}")
+    return DataKeyCache(provider, max_messages=max_messages, max_age=max_age)
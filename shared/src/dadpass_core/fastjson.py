@@ -0,0 +1,75 @@
+"""
+JSON encoding and decoding for request and response bodies.
+
+Every adapter (Flask, ASGI, Lambda) parses and writes bodies through this
+module instead of its framework's default. JSON_BACKEND picks the library:
+
+    auto     orjson if it is installed, otherwise the standard library (default)
+    orjson   orjson, failing at import if it is missing
+    stdlib   the standard library json module
+
+Both write compact UTF-8 (no spaces, non-ASCII unescaped), so responses are
+byte-for-byte the same whichever is in use. Decoding errors are ValueErrors
+either way (orjson.JSONDecodeError subclasses json.JSONDecodeError).
+
+Call through the module (fastjson.dumps), not names imported from it, so
+set_backend() reaches every caller.
+"""
+import json
+import os
+from decimal import Decimal
+from functools import partial
+from typing import Any, Callable
+
+JSON_BACKENDS = ('auto', 'orjson', 'stdlib')
+
+
+def _default(value: Any) -> Any:
+    # DynamoDB hands numbers back as Decimal
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _orjson() -> tuple[Callable[[Any], bytes], Callable[[Any], str], Callable]:
+    import orjson
+
+    dumps = partial(orjson.dumps, default=_default)
+    return dumps, lambda obj: dumps(obj).decode(), orjson.loads
+
+
+def _stdlib() -> tuple[Callable[[Any], bytes], Callable[[Any], str], Callable]:
+    encode = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'), default=_default).encode
+    return lambda obj: encode(obj).encode(), encode, json.loads
+
+
+def set_backend(name: str) -> str:
+    """
+    Switches every caller to a JSON_BACKENDS library.
+
+    Returns:
+        The library now in use, 'orjson' or 'stdlib'
+    """
+    global BACKEND, dumps, dumps_str, loads
+    if name not in JSON_BACKENDS:
+        raise ValueError(f"Unknown JSON_BACKEND {name!r}, expected one of {', '.join(JSON_BACKENDS)}")
+    if name != 'stdlib':
+        try:
+            dumps, dumps_str, loads = _orjson()
+            BACKEND = 'orjson'
+            return BACKEND
+        except ImportError:
+            if name == 'orjson':
+                raise
+    dumps, dumps_str, loads = _stdlib()
+    BACKEND = 'stdlib'
+    return BACKEND
+
+
+BACKEND: str
+# dumps(obj) -> bytes, dumps_str(obj) -> str, loads(bytes | str) -> object
+dumps: Callable[[Any], bytes]
+dumps_str: Callable[[Any], str]
+loads: Callable[[bytes | str], Any]
+
+set_backend(os.environ.get('JSON_BACKEND', 'auto'))
@@ -0,0 +1,124 @@
+"""
+The compact DynamoDB item format.
+
+The service and every store deal in logical items,
+{'messageKey', 'ttl', 'encryptedMessage', 'ttlOption'}, whose ciphertext is a
+key-id-tagged base64 Fernet token, plus 'clientEncrypted': True for a message
+the browser encrypted. The DynamoDB stores write them in the compact format 2
+instead, which cuts the stored bytes DynamoDB bills by:
+
+    messageKey  S  the table's partition key, unchanged
+    ttl         N  the table's TTL attribute, unchanged
+    v           N  format version (2)
+    c           B  key id (and codec, for compressed messages), ':', then the raw
+                   Fernet token (base64 decoded); or the raw AES-GCM or client envelope
+    o           N  TTL option code (TTL_OPTION_CODES), or S for an option without one
+    e           BOOL  true for a client-encrypted message, absent otherwise
+
+Format 1 is the logical item stored as it is. Items without a 'v' are read
+as format 1, so both formats can sit in the table while the older items
+expire. To roll out without breaking not-yet-upgraded readers, deploy with
+DYNAMODB_ITEM_FORMAT=1 first, then switch to 2.
+"""
+import base64
+from decimal import Decimal
+
+from dadpass_core.crypto import CLIENT_ENVELOPE_VERSION, KEY_ID_SEPARATOR, LEGACY_KEY_ID, is_envelope
+
+ITEM_FORMATS = (1, 2)
+COMPACT_FORMAT = 2
+
+TTL_OPTION_CODES = {'15min': 1, '1hour': 2, '1day': 3, '5days': 4}
+_TTL_OPTION_LABELS = {code: label for label, code in TTL_OPTION_CODES.items()}
+
+_SEPARATOR = KEY_ID_SEPARATOR.encode()
+# Every Fernet token starts with its version byte, which no ASCII header can contain
+_TOKEN_START = _SEPARATOR + b'\x80'
+_CLIENT_ENVELOPE_START = bytes((CLIENT_ENVELOPE_VERSION,))
+
+
+def _is_raw_envelope(raw: bytes) -> bool:
+    # Envelopes carry their own key id, or none at all when the client encrypted them
+    return is_envelope(raw) or raw[:1] == _CLIENT_ENVELOPE_START
+
+
+def pack_ciphertext(ciphertext: str) -> bytes:
+    """Header, ':' and the raw token of a key-id-tagged (or legacy untagged) Fernet token, or a raw envelope."""
+    header, _, token = ciphertext.rpartition(KEY_ID_SEPARATOR)
+    raw = base64.urlsafe_b64decode(token)
+    if not header and _is_raw_envelope(raw):
+        return raw
+    return (header or LEGACY_KEY_ID).encode() + _SEPARATOR + raw
+
+
+def unpack_ciphertext(packed: bytes) -> str:
+    """The ciphertext pack_ciphertext was given, untagged again for the legacy key."""
+    packed = bytes(packed)
+    if _is_raw_envelope(packed):
+        return base64.urlsafe_b64encode(packed).decode()
+    # The header may hold separators itself ("v1:z"), so split where the token's version byte begins
+    header, _, raw = packed.partition(_TOKEN_START)
+    token = base64.urlsafe_b64encode(b'\x80' + raw).decode()
+    if header == LEGACY_KEY_ID.encode():
+        return token
+    return f"{header.decode()}{KEY_ID_SEPARATOR}{token}"
+
+
+def to_compact(item: dict) -> dict:
+    """The format 2 item for a logical item."""
+    ttl_option = item['ttlOption']
+    compact = {
+        'messageKey': item['messageKey'],
+        'ttl': item['ttl'],
+        'v': COMPACT_FORMAT,
+        'c': pack_ciphertext(item['encryptedMessage']),
+        'o': TTL_OPTION_CODES.get(ttl_option, ttl_option)
+    }
+    if item.get('clientEncrypted'):
+        compact['e'] = True
+    return compact
+
+
+def from_stored(item: dict) -> dict:
+    """
+    The logical item for a stored item of either format.
+
+    Raises:
+        ValueError: The item is in a format this version does not know
+    """
+    version = item.get('v')
+    if version is None:
+        return item
+    if version != COMPACT_FORMAT:
+        raise ValueError(f"Unknown item format {version}")
+    # DynamoDB hands numbers back as Decimal, which hash like the int codes
+    ttl_option = item['o']
+    logical = {
+        'messageKey': item['messageKey'],
+        'ttl': item['ttl'],
+        'encryptedMessage': unpack_ciphertext(item['c']),
+        'ttlOption': _TTL_OPTION_LABELS.get(ttl_option, ttl_option)
+    }
+    if item.get('e'):
+        logical['clientEncrypted'] = True
+    return logical
+
+
+def item_size(item: dict) -> int:
+    """
+    The size DynamoDB bills an item by: attribute names plus values.
+
+    Strings count their UTF-8 bytes, binary its bytes, and numbers about one
+    byte per two significant digits plus one.
+    """
+    size = 0
+    for name, value in item.items():
+        size += len(name.encode())
+        if isinstance(value, str):
+            size += len(value.encode())
+        elif isinstance(value, (int, float, Decimal)) and not isinstance(value, bool):
+            digits = Decimal(value).normalize().as_tuple().digits
+            size += (len(digits) + 1) // 2 + 1
+        else:
+            size += len(bytes(value))
+    return size
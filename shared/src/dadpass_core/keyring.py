@@ -0,0 +1,313 @@
+"""
+Versioned encryption key ring loaded from AWS SSM Parameter Store.
+
+Keys live under a parameter path, one SecureString per version:
+
+    /dad-pass/encryption-keys/v1
+    /dad-pass/encryption-keys/v2    <- highest version encrypts new messages
+
+The original single key at /dad-pass/encryption-key is loaded too, as key id
+'legacy', so messages written before the first rotation stay readable.
+
+To rotate, put the next version under the path. Every instance picks it up on
+its next background refresh, and an instance that meets a message tagged with a
+key it has not loaded yet refreshes right away instead of failing. Only delete
+an old version once the longest TTL (5 days) has passed since it was replaced.
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable
+
+from botocore.exceptions import ClientError
+
+from dadpass_core import crypto, tracing
+from dadpass_core.crypto import CipherEngine, DEFAULT_COMPRESS_THRESHOLD, FERNET_CIPHER, LEGACY_KEY_ID
+from dadpass_core.datakeys import (
+    DEFAULT_DATA_KEY_MAX_AGE_SECONDS, DEFAULT_DATA_KEY_MAX_MESSAGES, DataKeyCache, create_data_key_cache
+)
+
+log = logging.getLogger(__name__)
+
+KEY_PATH = '/dad-pass/encryption-keys'
+LEGACY_PARAMETER = '/dad-pass/encryption-key'
+
+# How often the background thread reloads the keys
+DEFAULT_REFRESH_SECONDS = 300
+
+# Minimum gap between on-demand reloads triggered by unknown key ids
+MIN_FORCED_REFRESH_SECONDS = 10
+
+# How long the first encrypt/decrypt waits for a background startup load
+DEFAULT_LOAD_TIMEOUT_SECONDS = 10
+
+KeyLoader = Callable[[], tuple[dict[str, bytes], str]]
+
+
+def _version_order(key_id: str) -> tuple:
+    """Sorts 'v10' after 'v9'; non-numeric ids sort before any numbered version."""
+    digits = key_id[1:] if key_id.startswith('v') else key_id
+    return (1, int(digits), key_id) if digits.isdigit() else (0, 0, key_id)
+
+
+def load_keys_from_ssm(ssm, path: str = KEY_PATH,
+                       legacy_parameter: str = LEGACY_PARAMETER) -> tuple[dict[str, bytes], str]:
+    """
+    Retrieves every versioned key under `path` plus the legacy master key.
+
+    Args:
+        ssm: A boto3 SSM client
+        path: Parameter path holding one parameter per key version
+        legacy_parameter: Name of the original single-key parameter
+
+    Returns:
+        The keys by key id (active key first) and the active key id
+    """
+    keys = {}
+    with tracing.span('SSM.GetParametersByPath', path=path):
+        paginator = ssm.get_paginator('get_parameters_by_path')
+        for page in paginator.paginate(Path=path, WithDecryption=True):
+            for parameter in page['Parameters']:
+                key_id = parameter['Name'].rsplit('/', 1)[-1]
+                keys[key_id] = parameter['Value'].encode('utf-8')
+
+    try:
+        with tracing.span('SSM.GetParameter', parameter=legacy_parameter):
+            response = ssm.get_parameter(Name=legacy_parameter, WithDecryption=True)
+        keys.setdefault(LEGACY_KEY_ID, response['Parameter']['Value'].encode('utf-8'))
+    except ClientError as e:
+        # The legacy key is optional once versioned keys exist
+        if e.response['Error']['Code'] != 'ParameterNotFound' or not keys:
+            raise
+
+    active_key_id = max(keys, key=lambda key_id: (key_id != LEGACY_KEY_ID, _version_order(key_id)))
+    ordered = {active_key_id: keys.pop(active_key_id), **keys}
+    return ordered, active_key_id
+
+
+class SsmKeyLoader:
+    """
+    Key loader that creates its SSM client on first use.
+
+    Building a botocore client costs tens of milliseconds, so with a background
+    startup load both the client and the round trip stay off the import path.
+    """
+
+    def __init__(self, client_factory: Callable[[], Any], path: str = KEY_PATH,
+                 legacy_parameter: str = LEGACY_PARAMETER):
+        self._client_factory = client_factory
+        self._path = path
+        self._legacy_parameter = legacy_parameter
+        self._ssm = None
+
+    def __call__(self) -> tuple[dict[str, bytes], str]:
+        # Startup and background loads run outside any request, so they start a trace of their own
+        with tracing.trace('load_encryption_keys', path=self._path):
+            if self._ssm is None:
+                with tracing.span('SSM.CreateClient'):
+                    self._ssm = self._client_factory()
+            return load_keys_from_ssm(self._ssm, self._path, self._legacy_parameter)
+
+    def reset(self):
+        """Drops the client so the next load builds a new one (its pooled connections must not cross a fork)."""
+        self._ssm = None
+
+
+class KeyRing:
+    """
+    Keeps the process-wide cipher engine in sync with the key store.
+
+    Reloads happen on a daemon thread and swap in a freshly built engine, so
+    requests never wait on SSM once the first load has completed.
+    """
+
+    def __init__(self, loader: KeyLoader, refresh_interval: float = DEFAULT_REFRESH_SECONDS,
+                 load_timeout: float = DEFAULT_LOAD_TIMEOUT_SECONDS,
+                 compress_threshold: int = DEFAULT_COMPRESS_THRESHOLD, cipher: str = FERNET_CIPHER,
+                 data_keys: DataKeyCache | None = None):
+        self._loader = loader
+        self.refresh_interval = refresh_interval
+        self.load_timeout = load_timeout
+        self.compress_threshold = compress_threshold
+        self.cipher = cipher
+        # Outlives each reload's engine, so refreshing the SSM keys keeps the cached data keys
+        self.data_keys = data_keys
+        self._refresh_lock = threading.Lock()
+        self._pending_lock = threading.Lock()
+        self._pending: Future | None = None
+        self._last_refresh = 0.0
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def load(self) -> CipherEngine:
+        """Loads the keys and installs a new engine. Raises if the keys cannot be loaded."""
+        keys, active_key_id = self._loader()
+        engine = crypto.configure(keys, active_key_id, self.compress_threshold, self.cipher, self.data_keys)
+        self._last_refresh = time.monotonic()
+        log.info(f"Encryption key ring loaded: {engine.key_ids} (active: {active_key_id})")
+        return engine
+
+    def install(self, wait: bool = True) -> CipherEngine | None:
+        """
+        Performs the initial load and lets decryption reload on unknown key ids.
+
+        Args:
+            wait: Load synchronously (raising on failure). When False the load
+                runs on a background thread and the first encrypt/decrypt waits
+                for it, so startup work can overlap with the SSM round trip.
+
+        Returns:
+            The engine when loaded synchronously, otherwise None
+        """
+        crypto.set_unknown_key_handler(self.refresh_for_key)
+        if wait:
+            engine = self.load()
+            self._pending = Future()
+            self._pending.set_result(engine)
+            return engine
+        crypto.set_engine_loader(lambda: self.wait_until_ready(self.load_timeout))
+        self.ensure_loading()
+        return None
+
+    @property
+    def ready(self) -> bool:
+        """True once the keys have been loaded."""
+        return crypto.is_configured()
+
+    def ensure_loading(self) -> Future:
+        """
+        Returns the startup load, starting a new background attempt if the last one failed.
+
+        Never blocks, so it is safe to call from health checks.
+        """
+        with self._pending_lock:
+            pending = self._pending
+            if pending is None or (pending.done() and pending.exception() is not None):
+                pending = self._pending = Future()
+                threading.Thread(
+                    target=self._load_into, args=(pending,), name='dadpass-key-load', daemon=True
+                ).start()
+            return pending
+
+    def wait_until_ready(self, timeout: float | None = None) -> CipherEngine:
+        """Blocks until the keys are loaded, retrying a failed startup load once."""
+        if crypto.is_configured():
+            return crypto.get_engine()
+        return self.ensure_loading().result(timeout)
+
+    def _load_into(self, future: Future):
+        try:
+            future.set_result(self.load())
+        except Exception as e:
+            log.error(f"Failed to load encryption keys: {str(e)}")
+            future.set_exception(e)
+
+    def refresh(self) -> bool:
+        """Reloads the keys, keeping the current engine if the reload fails."""
+        try:
+            self.load()
+            return True
+        except Exception as e:
+            log.error(f"Encryption key refresh failed, keeping current keys: {str(e)}")
+            return False
+
+    def refresh_for_key(self, key_id: str) -> CipherEngine | None:
+        """
+        Reloads the keys because ciphertext names `key_id`.
+
+        Returns:
+            An engine holding the key, or None if it is still unknown
+        """
+        with self._refresh_lock:
+            engine = crypto.get_engine()
+            if key_id in engine.key_ids:
+                # Another thread loaded it while we waited for the lock
+                return engine
+            if time.monotonic() - self._last_refresh < MIN_FORCED_REFRESH_SECONDS:
+                return None
+            if not self.refresh():
+                return None
+            engine = crypto.get_engine()
+            return engine if key_id in engine.key_ids else None
+
+    def start(self):
+        """Starts refreshing the keys in the background every `refresh_interval` seconds."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='dadpass-key-refresh', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops the background refresh thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def after_fork(self):
+        """
+        Re-arms the key ring in a forked child, e.g. a gunicorn worker when the app is preloaded.
+
+        The child inherits the loaded engine but none of the threads, so this
+        restarts the background refresh and any startup load that was still in
+        flight, and gives the child its own SSM (and KMS) client.
+        """
+        self._refresh_lock = threading.Lock()
+        self._pending_lock = threading.Lock()
+        reset = getattr(self._loader, 'reset', None)
+        if reset is not None:
+            reset()
+        if self.data_keys is not None:
+            self.data_keys.after_fork()
+        if self._pending is not None and not self._pending.done():
+            self._pending = None
+            self.ensure_loading()
+        if self._thread is not None:
+            self._thread = None
+            self.start()
+
+    def _run(self):
+        while not self._stop.wait(self.refresh_interval):
+            self.refresh()
+
+
+def start_key_ring(ssm_client_factory: Callable[[], Any],
+                   kms_client_factory: Callable[[], Any] | None = None) -> KeyRing:
+    """
+    Creates, installs and starts the process's key ring from the environment.
+
+    KEY_LOAD_MODE=lazy (default) fetches the keys from SSM in the background
+    while the rest of startup continues, and the first encrypt/decrypt waits for
+    them; 'eager' loads them here and raises if SSM is unavailable.
+    KEY_REFRESH_SECONDS sets how often rotated keys are picked up, and
+    COMPRESSION_THRESHOLD the message size in bytes from which messages are
+    compressed before encryption (0 turns compression off). CIPHER picks
+    what new messages are written with, 'fernet' (default), 'aes-gcm' or
+    'data-key'; all are always read.
+
+    DATA_KEY_PROVIDER ('kms' with KMS_KEY_ID, or 'local') enables envelope
+    encryption with data keys, which CIPHER=data-key writes with. Each data
+    key serves DATA_KEY_MAX_MESSAGES messages or DATA_KEY_MAX_AGE_SECONDS.
+    """
+    data_keys = None
+    if os.environ.get('DATA_KEY_PROVIDER'):
+        data_keys = create_data_key_cache(
+            os.environ['DATA_KEY_PROVIDER'],
+            kms_client_factory=kms_client_factory,
+            kms_key_id=os.environ.get('KMS_KEY_ID'),
+            max_messages=int(os.environ.get('DATA_KEY_MAX_MESSAGES', DEFAULT_DATA_KEY_MAX_MESSAGES)),
+            max_age=float(os.environ.get('DATA_KEY_MAX_AGE_SECONDS', DEFAULT_DATA_KEY_MAX_AGE_SECONDS))
+        )
+    key_ring = KeyRing(
+        SsmKeyLoader(ssm_client_factory),
+        refresh_interval=float(os.environ.get('KEY_REFRESH_SECONDS', DEFAULT_REFRESH_SECONDS)),
+        compress_threshold=int(os.environ.get('COMPRESSION_THRESHOLD', DEFAULT_COMPRESS_THRESHOLD)),
+        cipher=os.environ.get('CIPHER', FERNET_CIPHER),
+        data_keys=data_keys
+    )
+    key_ring.install(wait=os.environ.get('KEY_LOAD_MODE', 'lazy') == 'eager')
+    key_ring.start()
+    return key_ring
@@ -0,0 +1,112 @@
+"""
+Message key generation from the operating system's CSPRNG.
+
+Keys are drawn in bulk: one os.urandom call supplies the bytes for many keys,
+and bytes.translate maps them onto the alphabet in a single C-level pass. Bytes
+at or above the largest multiple of the alphabet size are rejected rather than
+wrapped, so every character is equally likely (no modulo bias).
+
+A message key is the only thing standing between a link and its secret, so it
+must be unpredictable, not just unique: random.choices (Mersenne Twister) can
+be reconstructed from enough observed keys.
+"""
+import math
+import os
+import string
+import threading
+from functools import lru_cache
+
+ALPHABET = string.ascii_lowercase + string.ascii_uppercase + string.digits
+
+DEFAULT_KEY_LENGTH = 10
+
+# Keys generated per pool refill
+DEFAULT_POOL_SIZE = 256
+
+
+@lru_cache(maxsize=8)
+def _translation(alphabet: str) -> tuple[bytes, bytes, int]:
+    """Returns the byte -> character table, the bytes to reject and the accepted byte count."""
+    if not 1 < len(alphabet) <= 256 or not alphabet.isascii() or len(set(alphabet)) != len(alphabet):
+        raise ValueError("The alphabet must be 2 to 256 distinct ASCII characters")
+    limit = 256 - 256 % len(alphabet)
+    table = bytes(ord(alphabet[value % len(alphabet)]) for value in range(256))
+    return table, bytes(range(limit, 256)), limit
+
+
+def generate_keys(count: int, length: int = DEFAULT_KEY_LENGTH, alphabet: str = ALPHABET) -> list[str]:
+    """
+    Generates `count` random keys of `length` characters.
+
+    Args:
+        count: Number of keys to generate
+        length: Characters per key
+        alphabet: Characters to draw from
+
+    Returns:
+        The keys; duplicates are possible only with the probability given by collision_probability
+    """
+    table, reject, limit = _translation(alphabet)
+    needed = count * length
+    chars = b''
+    while len(chars) < needed:
+        # Over-draw by the expected rejection rate plus a margin well beyond its
+        # variance, so one call practically always suffices
+        missing = needed - len(chars)
+        chars += os.urandom(missing * 256 // limit + missing // 16 + 64).translate(table, reject)
+    text = chars[:needed].decode('ascii')
+    return [text[start:start + length] for start in range(0, needed, length)]
+
+
+def generate_key(length: int = DEFAULT_KEY_LENGTH, alphabet: str = ALPHABET) -> str:
+    """Generates one random key of `length` characters."""
+    return generate_keys(1, length, alphabet)[0]
+
+
+class KeyPool:
+    """
+    Thread-safe supply of pre-generated keys, refilled in bulk.
+
+    A forked child (e.g. a preloaded gunicorn worker) discards the keys it
+    inherited, so two processes never hand out the same key.
+    """
+
+    def __init__(self, length: int = DEFAULT_KEY_LENGTH, size: int = DEFAULT_POOL_SIZE):
+        self.length = length
+        self.size = size
+        self._keys: list[str] = []
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def take(self) -> str:
+        """Returns an unused key."""
+        return self.take_many(1)[0]
+
+    def take_many(self, count: int) -> list[str]:
+        """Returns `count` unused keys."""
+        with self._lock:
+            if self._pid != os.getpid():
+                self._keys.clear()
+                self._pid = os.getpid()
+            if len(self._keys) < count:
+                self._keys.extend(generate_keys(max(self.size, count - len(self._keys)), self.length))
+            taken = self._keys[-count:]
+            del self._keys[-count:]
+            return taken
+
+
+def keyspace(length: int = DEFAULT_KEY_LENGTH, alphabet_size: int = len(ALPHABET)) -> int:
+    """Number of distinct keys of `length` characters."""
+    return alphabet_size ** length
+
+
+def collision_probability(live_keys: int, length: int = DEFAULT_KEY_LENGTH,
+                          alphabet_size: int = len(ALPHABET)) -> float:
+    """Probability that a new key matches one of `live_keys` existing keys (one conditional-put retry)."""
+    return min(1.0, live_keys / keyspace(length, alphabet_size))
+
+
+def birthday_probability(keys: int, length: int = DEFAULT_KEY_LENGTH,
+                         alphabet_size: int = len(ALPHABET)) -> float:
+    """Probability that any two of `keys` independently generated keys are equal."""
+    return -math.expm1(-keys * (keys - 1) / (2 * keyspace(length, alphabet_size)))
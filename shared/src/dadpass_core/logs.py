@@ -0,0 +1,188 @@
+"""
+Logging for the dad-pass backends: off the request thread, redacted and sampled.
+
+configure_logging() routes the root logger through a queue. A request thread
+only filters a record and puts it on the queue; formatting and the write to
+stderr happen on a listener thread. The formatter redacts secrets from
+everything it writes:
+
+- the value of any "message" field, in JSON or a printed dict
+- the message key in /dad-pass/<messageKey> paths (it is the secret link)
+
+DEBUG records pass freely up to LOG_DEBUG_BURST per second; past that only a
+LOG_DEBUG_SAMPLE_RATE fraction of them are kept, so turning on DEBUG in
+production cannot swamp the listener. botocore and urllib3 stay at INFO
+whatever LOG_LEVEL is, so their wire-level dumps never reach the log.
+
+Lambda freezes the process between invocations, so a listener thread could
+hold records back until the next one. The handler keeps its synchronous
+Powertools logger and adds RedactingFilter instead.
+"""
+import atexit
+import logging
+import os
+import queue
+import random
+import re
+import sys
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_FORMAT = '%(asctime)s %(levelname)s %(name)s: %(message)s'
+
+REDACTED = '[REDACTED]'
+
+# Loggers that dump request/response wire detail at DEBUG
+NOISY_LOGGERS = ('botocore', 'boto3', 'urllib3', 'aiobotocore')
+
+DEFAULT_DEBUG_BURST = 100
+DEFAULT_DEBUG_SAMPLE_RATE = 0.01
+
+# "message": "..." or 'message': '...', also inside a JSON string (\"message\": \"...\", e.g. an
+# API Gateway event's body). The value runs to the first quote not escaped one level deeper,
+# or to the end of the text if there is none (a value ending in a backslash): over-redacting is safe
+_MESSAGE_FIELD = re.compile(r"""(\\*)(["'])message\1\2(\s*:\s*)(\1["']).*?(?:(?<!\\)\4|\Z)""", re.DOTALL)
+# /dad-pass/<messageKey>, but not /dad-pass/batch
+_MESSAGE_PATH = re.compile(r'(/dad-pass/)(?!batch\b)[A-Za-z0-9]+')
+
+
+def redact(text: str) -> str:
+    """Replaces message bodies and message keys in `text` with REDACTED."""
+    if 'message' in text:
+        text = _MESSAGE_FIELD.sub(rf'\1\2message\1\2\3\4{REDACTED}\4', text)
+    if '/dad-pass/' in text:
+        text = _MESSAGE_PATH.sub(rf'\1{REDACTED}', text)
+    return text
+
+
+class RedactingFormatter(logging.Formatter):
+    """A Formatter whose output, tracebacks included, has message bodies and keys redacted."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        return redact(super().format(record))
+
+
+class RedactingFilter(logging.Filter):
+    """
+    Redacts a record's message in place, for handlers this module does not own.
+
+    Formats the message on the calling thread; prefer RedactingFormatter where
+    the handler's formatter can be chosen.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        message = record.getMessage()
+        redacted = redact(message)
+        if redacted != message or record.args:
+            record.msg, record.args = redacted, None
+        return True
+
+
+def redact_handlers(logger: logging.Logger):
+    """Adds a RedactingFilter to each of `logger`'s handlers, covering records propagated from child loggers too."""
+    for handler in logger.handlers:
+        handler.addFilter(RedactingFilter())
+
+
+class DebugSampler(logging.Filter):
+    """Keeps every record above DEBUG, and DEBUG records up to `burst` per second, then a `rate` fraction of them."""
+
+    def __init__(self, burst: int = DEFAULT_DEBUG_BURST, rate: float = DEFAULT_DEBUG_SAMPLE_RATE):
+        super().__init__()
+        self.burst = burst
+        self.rate = rate
+        self._second = 0
+        self._seen = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG:
+            return True
+        # Unlocked: a race between threads only miscounts the budget by a record or two
+        second = int(time.monotonic())
+        if second != self._second:
+            self._second, self._seen = second, 0
+        self._seen += 1
+        return self._seen <= self.burst or random.random() < self.rate
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    Enqueues records as they are, leaving formatting to the listener thread.
+
+    QueueHandler.prepare formats each record on the calling thread so it can
+    be pickled to another process; this queue never leaves the process.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class LogPipeline:
+    """The queue, the handler that feeds it and the listener thread that drains it into `handlers`."""
+
+    def __init__(self, *handlers: logging.Handler, sampler: logging.Filter | None = None):
+        self.handlers = handlers
+        self.handler = DeferredQueueHandler(queue.SimpleQueue())
+        if sampler is not None:
+            self.handler.addFilter(sampler)
+        self.listener = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self.listener is None:
+                self.listener = QueueListener(self.handler.queue, *self.handlers, respect_handler_level=True)
+                self.listener.start()
+
+    def stop(self):
+        """Writes out everything still queued and stops the listener."""
+        with self._lock:
+            if self.listener is not None:
+                self.listener.stop()
+                self.listener = None
+
+    def after_fork(self):
+        """
+        Starts a listener in a forked child (e.g. a preloaded gunicorn worker).
+
+        Only the forking thread survives a fork, so the inherited listener is
+        gone. It may have died holding the queue's lock, so the child gets a
+        fresh queue; records the parent had not written yet stay the parent's.
+        """
+        self._lock = threading.Lock()
+        self.listener = None
+        self.handler.queue = queue.SimpleQueue()
+        self.start()
+
+
+def configure_logging(level: str | int | None = None, stream=None) -> LogPipeline | None:
+    """
+    Sends the root logger's records through a LogPipeline writing to stderr.
+
+    LOG_LEVEL (default INFO) sets the level, LOG_DEBUG_BURST and
+    LOG_DEBUG_SAMPLE_RATE the DEBUG sampling. Like logging.basicConfig it does
+    nothing, and returns None, if the root logger already has handlers.
+    """
+    root = logging.getLogger()
+    if root.handlers:
+        return None
+    level = level or os.environ.get('LOG_LEVEL', 'INFO')
+    if isinstance(level, str):
+        level = logging.getLevelName(level.upper())
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(RedactingFormatter(LOG_FORMAT))
+    sampler = DebugSampler(int(os.environ.get('LOG_DEBUG_BURST', DEFAULT_DEBUG_BURST)),
+                           float(os.environ.get('LOG_DEBUG_SAMPLE_RATE', DEFAULT_DEBUG_SAMPLE_RATE)))
+    pipeline = LogPipeline(output, sampler=sampler)
+
+    # LOG_FORMAT shows no thread or process; looking them up is ~40% of creating each record
+    logging.logThreads = logging.logProcesses = logging.logMultiprocessing = False
+    root.setLevel(level)
+    root.addHandler(pipeline.handler)
+    for name in NOISY_LOGGERS:
+        logging.getLogger(name).setLevel(max(level, logging.INFO))
+    pipeline.start()
+    atexit.register(pipeline.stop)
+    return pipeline
@@ -0,0 +1,405 @@
+"""
+The dad-pass message service: create, batch-create and read-once, independent of the web layer.
+
+Every backend is a thin adapter over this module. The Flask app, the ASGI app
+and the Lambda handler parse the request, call MessageService (or
+AsyncMessageService) and turn the result or exception into their framework's
+response, so the hot path is written, tuned and benchmarked once.
+
+Results are the JSON-ready response bodies of the public API. The exceptions
+map onto HTTP statuses:
+
+    InvalidMessageError    400, with its message as the error text
+    RequestTooLargeError   413, with its message as the error text
+    MessageKeyExistsError  500, COLLISION_ERROR (every key attempt was taken)
+
+Size limits (SizeLimits) all follow from the longest message allowed. The
+adapters check the raw body length against them before reading or parsing it,
+so an oversize request is refused without being decoded or encrypted.
+
+In zero-knowledge mode the browser encrypts the message itself and sends
+{ciphertext, ttlOption} instead of {message, ttlOption}. The service only
+checks the ciphertext's shape and size, stores it as sent with
+'clientEncrypted': True, and hands items carrying that marker back as
+{ciphertext, ttlOption}: no server-side crypto, and no wait for the keys.
+"""
+import logging
+import time
+from time import perf_counter
+
+from dadpass_core.crypto import (
+    MAX_WRAPPED_KEY_LENGTH, check_client_ciphertext, client_ciphertext_length, encrypt_message, encrypt_messages,
+    decrypt_message, encrypted_length
+)
+from dadpass_core.keys import DEFAULT_KEY_LENGTH, KeyPool
+from dadpass_core.metrics import REGISTRY
+from dadpass_core.store import MessageKeyExistsError
+
+log = logging.getLogger(__name__)
+
+# TTL duration options in seconds
+TTL_OPTIONS = {
+    '15min': 900,
+    '1hour': 3600,
+    '1day': 86400,
+    '5days': 432000
+}
+
+DEFAULT_TTL_OPTION = '5days'
+
+# Most messages one batch request may create
+MAX_BATCH_SIZE = 500
+
+# Longest message accepted, in characters: the frontend's limit (adapters read MAX_MESSAGE_LENGTH)
+DEFAULT_MAX_MESSAGE_LENGTH = 256
+
+# Largest item DynamoDB will store
+DYNAMODB_MAX_ITEM_BYTES = 400 * 1024
+# An item's attributes besides the ciphertext (names, message key, ttl, ttlOption), generously
+ITEM_OVERHEAD_BYTES = 1024
+# A create body besides the message text: braces, the ttlOption field and whitespace
+BODY_OVERHEAD_BYTES = 256
+# Most bytes a character of the message can take in a JSON body: an escaped surrogate pair, \uXXXX\uXXXX
+MAX_JSON_BYTES_PER_CHAR = 12
+
+# Keys tried for a message before reporting a collision for it
+KEY_ATTEMPTS = 3
+
+UNAVAILABLE = 'Message is no longer available'
+COLLISION_ERROR = 'Key collision occurred, this is rare. Please try again.'
+
+# Where request time goes; the adapters add 'serialize' for writing the JSON response
+STAGE_SECONDS = REGISTRY.histogram(
+    'dadpass_stage_seconds', 'Time spent in each stage of handling a message request', labels=('stage',)
+)
+STORE_SECONDS = STAGE_SECONDS.labels('store')
+ENCRYPT_SECONDS = STAGE_SECONDS.labels('encrypt')
+DECRYPT_SECONDS = STAGE_SECONDS.labels('decrypt')
+SERIALIZE_SECONDS = STAGE_SECONDS.labels('serialize')
+
+
+class InvalidMessageError(ValueError):
+    """Raised when a create request body is not a valid message or batch."""
+
+
+class RequestTooLargeError(ValueError):
+    """Raised when a create request body, or a message in it, is over the size limits."""
+
+
+class SizeLimits:
+    """
+    Size limits for create requests, derived from the longest message allowed.
+
+    The body limits are the most bytes a valid request can take, with every
+    character of every message written as a JSON escape, so no request
+    refused on its length could have been accepted after parsing it.
+    """
+
+    def __init__(self, max_message_length: int = DEFAULT_MAX_MESSAGE_LENGTH):
+        # Fernet grows the message's UTF-8 (up to 4 bytes a character) by about 4/3 once base64 encoded;
+        # with CIPHER=data-key the wrapped data key, base64 encoded too, comes on top
+        item_bytes = encrypted_length(max_message_length * 4) + MAX_WRAPPED_KEY_LENGTH + ITEM_OVERHEAD_BYTES
+        if item_bytes > DYNAMODB_MAX_ITEM_BYTES:
+            raise ValueError(f"A {max_message_length} character message can encrypt to {item_bytes} bytes, "
+                             f"over DynamoDB's {DYNAMODB_MAX_ITEM_BYTES} byte item limit")
+        self.max_message_length = max_message_length
+        # The same message encrypted in the browser, every character at 4 UTF-8 bytes
+        self.max_ciphertext_length = client_ciphertext_length(max_message_length * 4)
+        self.max_body_bytes = max_message_length * MAX_JSON_BYTES_PER_CHAR + BODY_OVERHEAD_BYTES
+        # Every entry at its largest, the commas between them and the brackets
+        self.max_batch_body_bytes = MAX_BATCH_SIZE * (self.max_body_bytes + 1) + 1
+
+    def check_body(self, length: int | None, limit: int):
+        """Raises RequestTooLargeError if a body of `length` bytes is over `limit` (an unknown length passes)."""
+        if length is not None and length > limit:
+            raise RequestTooLargeError(f'Request body is larger than {limit} bytes')
+
+    def check_message(self, message):
+        """Raises RequestTooLargeError if `message` is longer than max_message_length characters."""
+        if isinstance(message, str) and len(message) > self.max_message_length:
+            raise RequestTooLargeError(f'Message is longer than {self.max_message_length} characters')
+
+    def check_ciphertext(self, ciphertext: str):
+        """Raises RequestTooLargeError if client `ciphertext` could not hold a message within the limit."""
+        if len(ciphertext) > self.max_ciphertext_length:
+            raise RequestTooLargeError(f'Ciphertext is longer than {self.max_ciphertext_length} characters')
+
+
+def _validate_ciphertext(entry: dict) -> str | None:
+    if 'message' in entry:
+        return 'Send either a message or a ciphertext, not both'
+    return check_client_ciphertext(entry['ciphertext'])
+
+
+def validate_message(body) -> str | None:
+    """Returns why a create request body is invalid, or None if it is valid."""
+    if isinstance(body, dict) and 'ciphertext' in body:
+        return _validate_ciphertext(body)
+    if not isinstance(body, dict) or not isinstance(body.get('message'), str):
+        return 'Message is required'
+    return None
+
+
+def validate_batch(entries) -> str | None:
+    """Returns why a batch request body is invalid, or None if it is valid."""
+    if not isinstance(entries, list) or not entries:
+        return 'A non-empty array of messages is required'
+    if len(entries) > MAX_BATCH_SIZE:
+        return f'At most {MAX_BATCH_SIZE} messages can be created per request'
+    for index, entry in enumerate(entries):
+        if isinstance(entry, dict) and 'ciphertext' in entry:
+            error = _validate_ciphertext(entry)
+            if error:
+                return f'{error} (entry {index})'
+        elif not isinstance(entry, dict) or not isinstance(entry.get('message'), str):
+            return f'Message is required (entry {index})'
+    return None
+
+
+def _needs_keys(entries: list[dict]) -> bool:
+    return any('ciphertext' not in entry for entry in entries)
+
+
+def _raise_if_invalid(error: str | None):
+    if error:
+        raise InvalidMessageError(error)
+
+
+class _MessageServiceBase:
+    """Request handling shared by the sync and async services; only the store calls differ."""
+
+    def __init__(self, store, key_length: int = DEFAULT_KEY_LENGTH, key_attempts: int = KEY_ATTEMPTS,
+                 limits: SizeLimits | None = None):
+        self.store = store
+        self.key_attempts = key_attempts
+        self.limits = limits or SizeLimits()
+        # Keys are pre-generated in bulk and handed out one per message
+        self.key_pool = KeyPool(key_length)
+
+    def _check_sizes(self, entries: list[dict]):
+        for entry in entries:
+            if 'ciphertext' in entry:
+                self.limits.check_ciphertext(entry['ciphertext'])
+            else:
+                self.limits.check_message(entry['message'])
+
+    def new_key(self) -> str:
+        """Returns a fresh random message key."""
+        return self.key_pool.take()
+
+    def _new_item(self, entry: dict, encrypted_message: str, now: int) -> dict:
+        ttl_option = entry.get('ttlOption', DEFAULT_TTL_OPTION)
+        item = {
+            'messageKey': self.new_key(),
+            'ttl': now + TTL_OPTIONS.get(ttl_option, TTL_OPTIONS[DEFAULT_TTL_OPTION]),
+            'encryptedMessage': encrypted_message,
+            'ttlOption': ttl_option
+        }
+        if 'ciphertext' in entry:
+            item['clientEncrypted'] = True
+        return item
+
+    @staticmethod
+    def _encrypt(entry: dict) -> str:
+        # Client-encrypted messages are stored as sent
+        if 'ciphertext' in entry:
+            return entry['ciphertext']
+        start = perf_counter()
+        encrypted_message = encrypt_message(entry['message'])
+        ENCRYPT_SECONDS.observe(perf_counter() - start)
+        return encrypted_message
+
+    @staticmethod
+    def _encrypt_batch(entries: list[dict]) -> list[str]:
+        # Every server-side message in one pass before storing; client-encrypted ones as sent
+        messages = [entry['message'] for entry in entries if 'ciphertext' not in entry]
+        encrypted_messages = iter(())
+        if messages:
+            start = perf_counter()
+            encrypted_messages = iter(encrypt_messages(messages))
+            ENCRYPT_SECONDS.observe(perf_counter() - start)
+        return [entry['ciphertext'] if 'ciphertext' in entry else next(encrypted_messages) for entry in entries]
+
+    def _reveal(self, item: dict | None) -> dict:
+        if item is None:
+            return {'message': UNAVAILABLE}
+        if item.get('clientEncrypted'):
+            # Only the holder of the link's #fragment key can read it
+            return {'ciphertext': item['encryptedMessage'], 'ttlOption': item.get('ttlOption', DEFAULT_TTL_OPTION)}
+        start = perf_counter()
+        message = decrypt_message(item.get('encryptedMessage', ''))
+        DECRYPT_SECONDS.observe(perf_counter() - start)
+        # Return the decrypted message (maintaining API contract)
+        return {'message': message, 'ttlOption': item.get('ttlOption', DEFAULT_TTL_OPTION)}
+
+    @staticmethod
+    def _batch_result(items: list[dict], failed: list[dict]) -> dict:
+        failed_ids = {id(item) for item in failed}
+        return {'messages': [
+            {'error': COLLISION_ERROR} if id(item) in failed_ids else {'messageKey': item['messageKey']}
+            for item in items
+        ]}
+
+
+class MessageService(_MessageServiceBase):
+    """Message operations over a MessageStore (see dadpass_core.store)."""
+
+    def get_message(self, message_key: str) -> dict:
+        """
+        Retrieves and deletes a message by its key (one-time access).
+
+        Returns:
+            {"message", "ttlOption"}, {"ciphertext", "ttlOption"} for a client-encrypted message,
+            or {"message": UNAVAILABLE} if it is gone or cannot be read
+        """
+        try:
+            start = perf_counter()
+            item = self.store.consume(message_key)
+            STORE_SECONDS.observe(perf_counter() - start)
+            return self._reveal(item)
+        except Exception as e:
+            log.error(f"Error retrieving message: {str(e)}")
+            return {'message': UNAVAILABLE}
+
+    def create_message(self, body) -> dict:
+        """
+        Encrypts and stores one {message, ttlOption} body, or stores one {ciphertext, ttlOption}, under a new key.
+
+        Returns:
+            {"messageKey"}
+
+        Raises:
+            InvalidMessageError: The body has no message, or a malformed ciphertext
+            RequestTooLargeError: The message is longer than the limit
+            MessageKeyExistsError: Every key tried was taken
+        """
+        _raise_if_invalid(validate_message(body))
+        self._check_sizes([body])
+        item = self._new_item(body, self._encrypt(body), int(time.time()))
+
+        # Store without overwriting an existing key; a taken key is replaced with a fresh one
+        for attempt in range(self.key_attempts):
+            start = perf_counter()
+            try:
+                self.store.put_if_absent(item)
+                break
+            except MessageKeyExistsError:
+                # Not the key itself: it belongs to someone else's live message
+                log.error("Key collision detected, retrying with a new message key")
+                if attempt == self.key_attempts - 1:
+                    raise
+                item['messageKey'] = self.new_key()
+            finally:
+                STORE_SECONDS.observe(perf_counter() - start)
+        return {'messageKey': item['messageKey']}
+
+    def create_messages(self, entries) -> dict:
+        """
+        Encrypts and stores a JSON array of {message, ttlOption} (or {ciphertext, ttlOption}) entries.
+
+        Returns:
+            {"messages": [...]} in request order, each {"messageKey"} or {"error": COLLISION_ERROR}
+
+        Raises:
+            InvalidMessageError: The batch is empty, too large or has an entry without a message (or well-formed ciphertext)
+            RequestTooLargeError: A message is longer than the limit
+        """
+        _raise_if_invalid(validate_batch(entries))
+        self._check_sizes(entries)
+        encrypted_messages = self._encrypt_batch(entries)
+        now = int(time.time())
+        items = [self._new_item(entry, encrypted, now) for entry, encrypted in zip(entries, encrypted_messages)]
+
+        # Write in as few round trips as the store allows; entries whose key is taken get a new one
+        pending = items
+        for attempt in range(self.key_attempts):
+            if attempt:
+                log.error(f"Key collision detected for {len(pending)} batch message keys, retrying with new keys")
+                for item in pending:
+                    item['messageKey'] = self.new_key()
+            start = perf_counter()
+            pending = self.store.put_many_if_absent(pending)
+            STORE_SECONDS.observe(perf_counter() - start)
+            if not pending:
+                break
+        return self._batch_result(items, pending)
+
+
+class AsyncMessageService(_MessageServiceBase):
+    """
+    Message operations over an AsyncMessageStore (see dadpass_core.async_store).
+
+    Given the process's key ring, a key load still in flight is awaited on a
+    worker thread instead of blocking the event loop.
+    """
+
+    def __init__(self, store, key_ring=None, key_length: int = DEFAULT_KEY_LENGTH,
+                 key_attempts: int = KEY_ATTEMPTS, limits: SizeLimits | None = None):
+        super().__init__(store, key_length, key_attempts, limits)
+        self.key_ring = key_ring
+
+    async def _wait_for_keys(self):
+        # Deferred: the Lambda handler imports this module but never the async service
+        import asyncio
+
+        if self.key_ring is not None and not self.key_ring.ready:
+            await asyncio.to_thread(self.key_ring.wait_until_ready, self.key_ring.load_timeout)
+
+    async def get_message(self, message_key: str) -> dict:
+        """Same as MessageService.get_message."""
+        try:
+            start = perf_counter()
+            item = await self.store.consume(message_key)
+            STORE_SECONDS.observe(perf_counter() - start)
+            if item is not None and not item.get('clientEncrypted'):
+                await self._wait_for_keys()
+            return self._reveal(item)
+        except Exception as e:
+            log.error(f"Error retrieving message: {str(e)}")
+            return {'message': UNAVAILABLE}
+
+    async def create_message(self, body) -> dict:
+        """Same as MessageService.create_message."""
+        _raise_if_invalid(validate_message(body))
+        self._check_sizes([body])
+        if _needs_keys([body]):
+            await self._wait_for_keys()
+        item = self._new_item(body, self._encrypt(body), int(time.time()))
+
+        for attempt in range(self.key_attempts):
+            start = perf_counter()
+            try:
+                await self.store.put_if_absent(item)
+                break
+            except MessageKeyExistsError:
+                # Not the key itself: it belongs to someone else's live message
+                log.error("Key collision detected, retrying with a new message key")
+                if attempt == self.key_attempts - 1:
+                    raise
+                item['messageKey'] = self.new_key()
+            finally:
+                STORE_SECONDS.observe(perf_counter() - start)
+        return {'messageKey': item['messageKey']}
+
+    async def create_messages(self, entries) -> dict:
+        """Same as MessageService.create_messages."""
+        _raise_if_invalid(validate_batch(entries))
+        self._check_sizes(entries)
+        if _needs_keys(entries):
+            await self._wait_for_keys()
+        encrypted_messages = self._encrypt_batch(entries)
+        now = int(time.time())
+        items = [self._new_item(entry, encrypted, now) for entry, encrypted in zip(entries, encrypted_messages)]
+
+        pending = items
+        for attempt in range(self.key_attempts):
+            if attempt:
+                log.error(f"Key collision detected for {len(pending)} batch message keys, retrying with new keys")
+                for item in pending:
+                    item['messageKey'] = self.new_key()
+            start = perf_counter()
+            pending = await self.store.put_many_if_absent(pending)
+            STORE_SECONDS.observe(perf_counter() - start)
+            if not pending:
+                break
+        return self._batch_result(items, pending)
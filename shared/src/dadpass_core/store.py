@@ -0,0 +1,385 @@
+"""
+Message storage backends.
+
+Every store keeps items shaped like the original DynamoDB items
+({'messageKey', 'ttl', 'encryptedMessage', 'ttlOption'}) and provides the same
+three guarantees:
+
+- put-if-absent: a new message never overwrites a live one with the same key
+- consume-once: reading a message deletes it atomically, so only one reader wins
+- expiry: a message is gone once its 'ttl' (epoch seconds) has passed
+
+put_many_if_absent writes a batch with the same put-if-absent guarantee per
+item and reports the items whose keys were taken, so callers can re-key them.
+
+The DynamoDB stores write those items in a compact format and read either
+(see dadpass_core.items).
+
+Pick one per deployment with MESSAGE_STORE=dynamodb|memory|redis (see create_store).
+"""
+import json
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from decimal import Decimal
+from typing import Any
+
+from botocore.exceptions import ClientError
+
+from dadpass_core import tracing
+from dadpass_core.items import COMPACT_FORMAT, ITEM_FORMATS, from_stored, item_size, to_compact
+
+MESSAGE_STORES = ('dynamodb', 'memory', 'redis')
+
+# TransactWriteItems limits: 100 actions and 4 MB per transaction (budget below the hard cap)
+TRANSACT_MAX_ITEMS = 100
+TRANSACT_MAX_BYTES = 3_500_000
+
+# Attempts per transaction chunk while items are cancelled by throttling or conflicts
+TRANSACT_MAX_ATTEMPTS = 5
+TRANSACT_BACKOFF_SECONDS = 0.05
+
+# Cancellation reasons worth resubmitting as-is; 'None' means the item was fine but rolled back
+RETRYABLE_CANCELLATION_CODES = ('None', 'ThrottlingError', 'TransactionConflict', 'ProvisionedThroughputExceeded')
+
+
+class MessageKeyExistsError(Exception):
+    """Raised when a live message already uses the key being written."""
+
+    def __init__(self, message_key: str):
+        super().__init__(f"Message key already exists: {message_key}")
+        self.message_key = message_key
+
+
+class MessageStore(ABC):
+    """Storage for one-time messages."""
+
+    @abstractmethod
+    def put_if_absent(self, item: dict):
+        """
+        Stores a new message unless a live message already has its key.
+
+        Raises:
+            MessageKeyExistsError: The key is taken
+        """
+
+    @abstractmethod
+    def consume(self, message_key: str) -> dict | None:
+        """
+        Atomically removes and returns a message.
+
+        Returns:
+            The stored item, or None if it does not exist, was already consumed or has expired
+        """
+
+    def put_many_if_absent(self, items: list[dict]) -> list[dict]:
+        """
+        Stores a batch of new messages, each unless a live message already has its key.
+
+        Returns:
+            The items that were not stored because their key is taken, in input order
+        """
+        collided = []
+        for item in items:
+            try:
+                self.put_if_absent(item)
+            except MessageKeyExistsError:
+                collided.append(item)
+        return collided
+
+
+class DynamoDBMessageStore(MessageStore):
+    """
+    Messages in a DynamoDB table, expired by the table's TTL on the 'ttl' attribute.
+
+    Writes items in `item_format` (see dadpass_core.items) and reads either format.
+    consume goes through `consume_table` when given, a handle on the same table
+    whose client makes a single attempt (see dadpass_core.clients).
+    """
+
+    def __init__(self, table, item_format: int = COMPACT_FORMAT, consume_table=None):
+        # Deferred with the table: boto3 is only needed for its attribute serializer
+        from boto3.dynamodb.types import TypeSerializer
+
+        self.table = table
+        self.consume_table = consume_table or table
+        self._stored = stored_form(item_format)
+        self._serializer = TypeSerializer()
+
+    def put_if_absent(self, item: dict):
+        stored = self._stored(item)
+        try:
+            # DynamoDB's TTL reaper can lag, so an expired item does not block its key
+            with tracing.span('DynamoDB.PutItem', table=self.table.name):
+                self.table.put_item(
+                    Item=stored,
+                    ConditionExpression='attribute_not_exists(messageKey) OR #ttl < :now',
+                    ExpressionAttributeNames={'#ttl': 'ttl'},
+                    ExpressionAttributeValues={':now': int(time.time())},
+                    ReturnValuesOnConditionCheckFailure='ALL_OLD'
+                )
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                if is_own_write({key: self._serializer.serialize(value) for key, value in stored.items()}, e):
+                    return
+                raise MessageKeyExistsError(item['messageKey']) from e
+            raise
+
+    def consume(self, message_key: str) -> dict | None:
+        # One conditional DeleteItem returning the old item: a single round trip,
+        # and only one concurrent reader can satisfy the condition
+        try:
+            with tracing.span('DynamoDB.DeleteItem', table=self.table.name):
+                response = self.consume_table.delete_item(
+                    Key={'messageKey': message_key},
+                    ConditionExpression='attribute_exists(messageKey) AND #ttl >= :now',
+                    ExpressionAttributeNames={'#ttl': 'ttl'},
+                    ExpressionAttributeValues={':now': int(time.time())},
+                    ReturnValues='ALL_OLD'
+                )
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                # Missing, already consumed or expired (DynamoDB TTL reaps the rest)
+                return None
+            raise
+        attributes = response.get('Attributes')
+        return None if attributes is None else from_stored(attributes)
+
+    def put_many_if_absent(self, items: list[dict]) -> list[dict]:
+        # BatchWriteItem cannot carry a condition, so each chunk is one TransactWriteItems
+        # call: a single round trip for up to 100 conditional puts
+        collided = []
+        for chunk in transaction_chunks(items, collided):
+            collided.extend(self._put_chunk(chunk))
+        return collided
+
+    def _put_chunk(self, chunk: list[dict]) -> list[dict]:
+        collided = []
+        pending = chunk
+        for attempt in range(TRANSACT_MAX_ATTEMPTS):
+            if attempt:
+                time.sleep(TRANSACT_BACKOFF_SECONDS * 2 ** (attempt - 1))
+            now = int(time.time())
+            try:
+                with tracing.span('DynamoDB.TransactWriteItems', table=self.table.name, items=len(pending)):
+                    self.table.meta.client.transact_write_items(ClientRequestToken=str(uuid.uuid4()), TransactItems=[
+                        {'Put': {
+                            'TableName': self.table.name,
+                            'Item': self._stored(item),
+                            'ConditionExpression': 'attribute_not_exists(messageKey) OR #ttl < :now',
+                            'ExpressionAttributeNames': {'#ttl': 'ttl'},
+                            'ExpressionAttributeValues': {':now': now}
+                        }}
+                        for item in pending
+                    ])
+                return collided
+            except ClientError as e:
+                taken, pending = split_cancelled(pending, e)
+                collided.extend(taken)
+                if not pending:
+                    return collided
+                last_error = e
+        raise last_error
+
+
+def stored_form(item_format: int):
+    """The function turning a logical item into what a DynamoDB store writes in `item_format`."""
+    if item_format not in ITEM_FORMATS:
+        raise ValueError(f"Unknown item format {item_format!r}, expected one of {', '.join(map(str, ITEM_FORMATS))}")
+    return to_compact if item_format == COMPACT_FORMAT else dict
+
+
+def transaction_chunks(items: list[dict], collided: list[dict]):
+    """
+    Splits items into TransactWriteItems-sized chunks.
+
+    A transaction may not touch the same key twice, so a repeated key is
+    appended to `collided` instead of being sent.
+    """
+    chunk, chunk_bytes, keys = [], 0, set()
+    for item in items:
+        if item['messageKey'] in keys:
+            collided.append(item)
+            continue
+        size = item_size(item)
+        if chunk and (len(chunk) == TRANSACT_MAX_ITEMS or chunk_bytes + size > TRANSACT_MAX_BYTES):
+            yield chunk
+            chunk, chunk_bytes = [], 0
+        chunk.append(item)
+        chunk_bytes += size
+        keys.add(item['messageKey'])
+    if chunk:
+        yield chunk
+
+
+def is_own_write(written: dict, error: ClientError) -> bool:
+    """
+    Whether a conditional put failed only because an earlier attempt of the same call succeeded.
+
+    Retried puts (see dadpass_core.clients) ask for the existing item on a failed
+    condition. If an attempt was applied but its response was lost, the retry
+    finds exactly the item it is writing, `written` in DynamoDB JSON. Every item
+    carries fresh ciphertext, so no other write can match it. Reporting that as
+    a collision would store the message a second time under a new key, and the
+    first copy would stay readable until it expired.
+    """
+    return error.response.get('Item') == written
+
+
+def split_cancelled(items: list[dict], error: ClientError) -> tuple[list[dict], list[dict]]:
+    """
+    Sorts the items of a cancelled transaction by their cancellation reason.
+
+    Returns:
+        The items whose key is taken and the items to resubmit
+
+    Raises:
+        ClientError: The transaction failed for a reason other than conflicts,
+            throttling or taken keys
+    """
+    if error.response['Error']['Code'] != 'TransactionCanceledException':
+        raise error
+    reasons = error.response.get('CancellationReasons') or []
+    if len(reasons) != len(items):
+        raise error
+    taken, retry = [], []
+    for item, reason in zip(items, reasons):
+        code = reason.get('Code', 'None')
+        if code == 'ConditionalCheckFailed':
+            taken.append(item)
+        elif code in RETRYABLE_CANCELLATION_CODES:
+            retry.append(item)
+        else:
+            raise error
+    return taken, retry
+
+
+class InMemoryMessageStore(MessageStore):
+    """
+    Process-local store for single-node deployments and tests.
+
+    Keys are spread over independently locked stripes so concurrent requests
+    for different keys rarely contend. Each gunicorn worker process gets its
+    own copy, so only use this with a single worker process.
+    """
+
+    def __init__(self, stripes: int = 64):
+        self._stripes = [({}, threading.Lock()) for _ in range(stripes)]
+
+    def _stripe(self, message_key: str) -> tuple[dict, threading.Lock]:
+        return self._stripes[hash(message_key) % len(self._stripes)]
+
+    def put_if_absent(self, item: dict):
+        items, lock = self._stripe(item['messageKey'])
+        with lock:
+            existing = items.get(item['messageKey'])
+            if existing is not None and existing['ttl'] >= int(time.time()):
+                raise MessageKeyExistsError(item['messageKey'])
+            items[item['messageKey']] = dict(item)
+
+    def consume(self, message_key: str) -> dict | None:
+        items, lock = self._stripe(message_key)
+        with lock:
+            item = items.pop(message_key, None)
+        if item is None or item['ttl'] < int(time.time()):
+            return None
+        return item
+
+    def purge_expired(self) -> int:
+        """Drops expired messages. Returns how many were removed."""
+        now = int(time.time())
+        removed = 0
+        for items, lock in self._stripes:
+            with lock:
+                expired = [key for key, item in items.items() if item['ttl'] < now]
+                for key in expired:
+                    del items[key]
+                removed += len(expired)
+        return removed
+
+    def __len__(self) -> int:
+        return sum(len(items) for items, _ in self._stripes)
+
+
+class RedisMessageStore(MessageStore):
+    """
+    Messages in Redis (or any server speaking the Redis protocol, 6.2+).
+
+    Writes use SET NX EX so the server enforces both put-if-absent and expiry,
+    and reads use GETDEL so consuming is a single atomic command.
+    """
+
+    KEY_PREFIX = 'dad-pass:'
+
+    def __init__(self, client):
+        self.client = client
+
+    @classmethod
+    def from_url(cls, url: str) -> 'RedisMessageStore':
+        """Creates a store with a pooled redis-py client (redis is an optional dependency)."""
+        import redis
+        return cls(redis.Redis.from_url(url))
+
+    def put_if_absent(self, item: dict):
+        expires_in = int(item['ttl']) - int(time.time())
+        if expires_in <= 0:
+            # Already expired; storing it would only make it unreadable
+            return
+        value = json.dumps({key: _to_json(value) for key, value in item.items()})
+        if not self.client.set(self.KEY_PREFIX + item['messageKey'], value, nx=True, ex=expires_in):
+            raise MessageKeyExistsError(item['messageKey'])
+
+    def put_many_if_absent(self, items: list[dict]) -> list[dict]:
+        # One pipelined round trip; SET NX still decides each key on its own
+        now = int(time.time())
+        live = [item for item in items if int(item['ttl']) > now]
+        pipeline = self.client.pipeline(transaction=False)
+        for item in live:
+            value = json.dumps({key: _to_json(value) for key, value in item.items()})
+            pipeline.set(self.KEY_PREFIX + item['messageKey'], value, nx=True, ex=int(item['ttl']) - now)
+        return [item for item, stored in zip(live, pipeline.execute()) if not stored]
+
+    def consume(self, message_key: str) -> dict | None:
+        value = self.client.getdel(self.KEY_PREFIX + message_key)
+        if value is None:
+            return None
+        item = json.loads(value)
+        if item['ttl'] < int(time.time()):
+            return None
+        return item
+
+
+def _to_json(value: Any) -> Any:
+    # DynamoDB hands numbers back as Decimal
+    return int(value) if isinstance(value, Decimal) else value
+
+
+def create_store(kind: str = 'dynamodb', *, table_name: str | None = None, region_name: str | None = None,
+                 redis_url: str | None = None, item_format: int = COMPACT_FORMAT,
+                 max_pool_connections: int | None = None) -> MessageStore:
+    """
+    Builds the message store for a deployment.
+
+    Args:
+        kind: One of 'dynamodb', 'memory' or 'redis'
+        table_name: DynamoDB table name (dynamodb)
+        region_name: AWS region, or None for the default chain (dynamodb)
+        redis_url: Server URL such as redis://localhost:6379/0 (redis)
+        item_format: Item format to write, 1 or 2 (dynamodb, see dadpass_core.items)
+        max_pool_connections: Size of the DynamoDB connection pool (dynamodb, default 10)
+    """
+    if kind == 'dynamodb':
+        import boto3
+        from dadpass_core.clients import client_config
+        # Timeouts, retries and pooling shared with the other AWS clients (see dadpass_core.clients)
+        dynamodb = boto3.resource('dynamodb', region_name=region_name, config=client_config(max_pool_connections))
+        # A retried read-once DeleteItem could delete the message and then report it missing
+        consuming = boto3.resource('dynamodb', region_name=region_name,
+                                   config=client_config(max_pool_connections, single_attempt=True))
+        return DynamoDBMessageStore(dynamodb.Table(table_name), item_format, consuming.Table(table_name))
+    if kind == 'memory':
+        return InMemoryMessageStore()
+    if kind == 'redis':
+        return RedisMessageStore.from_url(redis_url or 'redis://localhost:6379/0')
+    raise ValueError(f"Unknown message store {kind!r}, expected one of {', '.join(MESSAGE_STORES)}")
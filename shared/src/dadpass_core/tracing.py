@@ -0,0 +1,346 @@
+"""
+Request tracing shared by the container and serverless backends.
+
+A trace starts where a request arrives (or where a background key load
+begins) and collects one span per DynamoDB call, SSM call and encrypt/decrypt
+beneath it:
+
+    with tracing.trace('GET /dad-pass/<message_key>', parent=context_from_headers(headers)):
+        ...
+        with tracing.span('DynamoDB.DeleteItem', table=name):
+            ...
+
+The current span travels in a context variable, so it follows the request
+through Flask's worker threads and asyncio tasks without being passed around.
+Outside a sampled trace, span() is a shared no-op.
+
+An incoming trace context is continued: a W3C `traceparent` header, an
+`X-Amzn-Trace-Id` header (from an ALB or API Gateway), or the Lambda runtime's
+_X_AMZN_TRACE_ID. Its sampling decision is kept; new traces are sampled at
+TRACE_SAMPLE_RATE. Finished spans go to the TRACE_EXPORTER:
+
+    none     tracing is off (default)
+    console  one JSON line per span on stdout (CloudWatch Logs under Lambda)
+    file     one JSON line per span appended to TRACE_FILE
+    xray     X-Ray subsegments sent to the X-Ray daemon (Lambda with `Tracing: Active`)
+"""
+import contextvars
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from typing import Mapping, NamedTuple, Protocol
+
+log = logging.getLogger(__name__)
+
+TRACE_EXPORTERS = ('none', 'console', 'file', 'xray')
+
+# Fraction of new traces recorded when the caller did not already decide
+DEFAULT_SAMPLE_RATE = 0.05
+
+DEFAULT_TRACE_FILE = 'traces.jsonl'
+
+DEFAULT_XRAY_DAEMON_ADDRESS = '127.0.0.1:2000'
+
+
+class TraceContext(NamedTuple):
+    """Where a trace came from: its id, the caller's span id and whether the caller is recording it."""
+    trace_id: str
+    parent_id: str | None
+    sampled: bool | None
+
+
+def parse_traceparent(header: str | None) -> TraceContext | None:
+    """Parses a W3C traceparent header (version-traceid-parentid-flags)."""
+    parts = (header or '').strip().split('-')
+    if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16 or parts[1] == '0' * 32:
+        return None
+    try:
+        flags = int(parts[3][:2], 16)
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None
+    return TraceContext(parts[1], parts[2], bool(flags & 1))
+
+
+def parse_xray_header(header: str | None) -> TraceContext | None:
+    """Parses an X-Ray trace header (Root=1-<8 hex>-<24 hex>;Parent=<16 hex>;Sampled=0|1|?)."""
+    fields = dict(part.strip().partition('=')[::2] for part in (header or '').split(';') if '=' in part)
+    root = fields.get('Root', '').split('-')
+    if len(root) != 3 or len(root[1]) != 8 or len(root[2]) != 24:
+        return None
+    sampled = {'1': True, '0': False}.get(fields.get('Sampled'))
+    return TraceContext(root[1] + root[2], fields.get('Parent'), sampled)
+
+
+def context_from_headers(headers: Mapping[str, str] | None) -> TraceContext | None:
+    """The trace context of an incoming request, from its traceparent or X-Amzn-Trace-Id header."""
+    if not headers:
+        return None
+    # Header names are case-insensitive; API Gateway and WSGI environs differ in how they case them
+    lowered = {name.lower(): value for name, value in headers.items()}
+    return parse_traceparent(lowered.get('traceparent')) or parse_xray_header(lowered.get('x-amzn-trace-id'))
+
+
+def xray_trace_id(trace_id: str) -> str:
+    """A 32-hex-digit trace id in X-Ray's 1-<epoch hex>-<random> form."""
+    return f"1-{trace_id[:8]}-{trace_id[8:]}"
+
+
+class Span:
+    """One timed operation within a trace."""
+
+    __slots__ = ('tracer', 'trace_id', 'span_id', 'parent_id', 'name', 'attributes',
+                 'start', 'end', 'error', '_token')
+
+    def __init__(self, tracer: 'Tracer', trace_id: str, parent_id: str | None, name: str, attributes: dict):
+        self.tracer = tracer
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = attributes
+        self.start = self.end = 0.0
+        self.error = None
+        self._token = None
+
+    def set(self, name: str, value):
+        """Adds or replaces an attribute."""
+        self.attributes[name] = value
+
+    def rename(self, name: str):
+        """Renames the span before it ends, e.g. once the request's route is known."""
+        self.name = name
+
+    def __enter__(self) -> 'Span':
+        self.start = time.time()
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.end = time.time()
+        _current_span.reset(self._token)
+        if exc_type is not None:
+            self.error = exc_type.__name__
+        self.tracer.exporter.export(self)
+        return False
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end - self.start) * 1000
+
+    def to_dict(self) -> dict:
+        return {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'parentId': self.parent_id,
+            'name': self.name,
+            'start': self.start,
+            'durationMs': round(self.duration_ms, 3),
+            'attributes': self.attributes,
+            'error': self.error
+        }
+
+
+class _NoopSpan:
+    """Stands in for a span that is not recorded."""
+
+    __slots__ = ()
+
+    def set(self, name: str, value):
+        pass
+
+    def rename(self, name: str):
+        pass
+
+    def __enter__(self) -> '_NoopSpan':
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+_current_span: contextvars.ContextVar[Span | None] = contextvars.ContextVar('dadpass_current_span', default=None)
+
+
+class SpanExporter(Protocol):
+    def export(self, span: Span):
+        ...
+
+
+class ConsoleExporter:
+    """Writes each finished span as one JSON line to a stream (stdout by default)."""
+
+    def __init__(self, stream=None):
+        self.stream = stream
+
+    def export(self, span: Span):
+        print(json.dumps(span.to_dict(), default=str), file=self.stream or sys.stdout, flush=True)
+
+
+class FileExporter:
+    """Appends each finished span as one JSON line to a file."""
+
+    def __init__(self, path: str = DEFAULT_TRACE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        line = json.dumps(span.to_dict(), default=str) + '\n'
+        with self._lock, open(self.path, 'a', encoding='utf-8') as trace_file:
+            trace_file.write(line)
+
+
+class XRayDaemonExporter:
+    """
+    Sends each finished span to the X-Ray daemon as a subsegment over UDP.
+
+    Under Lambda the daemon runs next to the function and the runtime's own
+    segment is the parent of the invocation's root span, so the spans nest
+    under the function in the X-Ray console. A span without a parent is sent
+    as a segment of its own, named after the service.
+    """
+
+    HEADER = b'{"format": "json", "version": 1}\n'
+
+    def __init__(self, address: str | None = None, service_name: str = 'dad-pass'):
+        import socket
+
+        address = address or os.environ.get('AWS_XRAY_DAEMON_ADDRESS', DEFAULT_XRAY_DAEMON_ADDRESS)
+        # The variable may list both transports ("tcp:host:port udp:host:port"); segments go over UDP
+        for entry in address.split():
+            if entry.startswith('udp:'):
+                address = entry.removeprefix('udp:')
+        host, _, port = address.rpartition(':')
+        self.address = (host, int(port))
+        self.service_name = service_name
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def document(self, span: Span) -> dict:
+        document = {
+            'name': span.name if span.parent_id else self.service_name,
+            'id': span.span_id,
+            'trace_id': xray_trace_id(span.trace_id),
+            'start_time': span.start,
+            'end_time': span.end,
+            # Annotation keys may only hold letters, digits and underscores
+            'annotations': {name.replace('.', '_'): value for name, value in span.attributes.items()
+                            if isinstance(value, (str, int, float, bool))}
+        }
+        if span.parent_id:
+            document.update(type='subsegment', parent_id=span.parent_id)
+        if span.name.startswith(('DynamoDB.', 'SSM.')):
+            document['namespace'] = 'aws'
+        if span.error:
+            document.update(fault=True, cause={'exceptions': [{'type': span.error}]})
+        return document
+
+    def export(self, span: Span):
+        try:
+            self._socket.sendto(self.HEADER + json.dumps(self.document(span), default=str).encode(), self.address)
+        except OSError as e:
+            # Tracing must never fail the request it is tracing
+            log.debug(f"Could not send span to the X-Ray daemon: {str(e)}")
+
+
+class Tracer:
+    """Starts traces, sampling new ones at `sample_rate`, and hands finished spans to `exporter`."""
+
+    def __init__(self, exporter: SpanExporter | None = None, sample_rate: float = DEFAULT_SAMPLE_RATE):
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None
+
+    def trace(self, name: str, parent: TraceContext | None = None, **attributes) -> Span | _NoopSpan:
+        """
+        A span that starts a trace, or continues `parent` (an incoming request's trace context).
+
+        Inside a span that is already recording, it nests under that span instead.
+        """
+        if self.exporter is None:
+            return _NOOP_SPAN
+        if parent is None:
+            current = _current_span.get()
+            if current is not None:
+                return Span(self, current.trace_id, current.span_id, name, attributes)
+            parent = TraceContext(self._new_trace_id(), None, None)
+        sampled = parent.sampled if parent.sampled is not None else random.random() < self.sample_rate
+        if not sampled:
+            return _NOOP_SPAN
+        return Span(self, parent.trace_id, parent.parent_id, name, attributes)
+
+    @staticmethod
+    def _new_trace_id() -> str:
+        # Epoch seconds first, so the id is also a valid X-Ray trace id
+        return f"{int(time.time()):08x}{random.getrandbits(96):024x}"
+
+
+_tracer = Tracer()
+
+
+def get_tracer() -> Tracer:
+    return _tracer
+
+
+def set_tracer(tracer: Tracer) -> Tracer:
+    """Installs the process-wide tracer used by trace() and span()."""
+    global _tracer
+    _tracer = tracer
+    return tracer
+
+
+def trace(name: str, parent: TraceContext | None = None, **attributes) -> Span | _NoopSpan:
+    """Tracer.trace on the process-wide tracer."""
+    return _tracer.trace(name, parent, **attributes)
+
+
+def span(name: str, **attributes) -> Span | _NoopSpan:
+    """A span under the current one, exported by its trace's tracer; a no-op outside a sampled trace."""
+    current = _current_span.get()
+    if current is None:
+        return _NOOP_SPAN
+    return Span(current.tracer, current.trace_id, current.span_id, name, attributes)
+
+
+def current_span() -> Span | None:
+    return _current_span.get()
+
+
+def create_exporter(kind: str, *, trace_file: str | None = None) -> SpanExporter | None:
+    """
+    Creates the span exporter for a TRACE_EXPORTER setting.
+
+    Args:
+        kind: One of TRACE_EXPORTERS
+        trace_file: Output path for the 'file' exporter
+    """
+    if kind == 'none':
+        return None
+    if kind == 'console':
+        return ConsoleExporter()
+    if kind == 'file':
+        return FileExporter(trace_file or DEFAULT_TRACE_FILE)
+    if kind == 'xray':
+        return XRayDaemonExporter(service_name=os.environ.get('POWERTOOLS_SERVICE_NAME', 'dad-pass'))
+    raise ValueError(f"Unknown TRACE_EXPORTER {kind!r}, expected one of {', '.join(TRACE_EXPORTERS)}")
+
+
+def configure_tracing() -> Tracer:
+    """
+    Installs the process-wide tracer from the environment.
+
+    TRACE_EXPORTER picks where spans go (none by default), TRACE_FILE the file
+    exporter's path and TRACE_SAMPLE_RATE the fraction of new traces recorded.
+    Call it before start_key_ring so the first key load is traced too.
+    """
+    exporter = create_exporter(os.environ.get('TRACE_EXPORTER', 'none'), trace_file=os.environ.get('TRACE_FILE'))
+    sample_rate = float(os.environ.get('TRACE_SAMPLE_RATE', DEFAULT_SAMPLE_RATE))
+    return set_tracer(Tracer(exporter, sample_rate))
@@ -0,0 +1,250 @@
+import asyncio
+import pytest
+import sys
+import time
+from pathlib import Path
+from unittest.mock import patch
+from botocore.exceptions import ClientError
+
+# Add the shared source directory to the Python path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "src"))
+
+from dadpass_core.async_store import (
+    AsyncDynamoDBMessageStore, AsyncInMemoryMessageStore, AsyncRedisMessageStore, open_async_store
+)
+from dadpass_core.store import MessageKeyExistsError
+
+
+def _conditional_check_failed(item: dict | None = None) -> ClientError:
+    response = {'Error': {'Code': 'ConditionalCheckFailedException', 'Message': 'The conditional request failed'}}
+    if item is not None:
+        response['Item'] = item
+    return ClientError(response, 'ConditionalOperation')
+
+
+class FakeAsyncDynamoClient:
+    """In-memory stand-in for the aiobotocore PutItem/DeleteItem calls the store makes (DynamoDB JSON)."""
+
+    def __init__(self):
+        self.items = {}
+
+    async def put_item(self, TableName, Item, ConditionExpression, ExpressionAttributeNames,
+                       ExpressionAttributeValues, ReturnValuesOnConditionCheckFailure='NONE'):
+        # Yield to the loop like a real round trip would
+        await asyncio.sleep(0)
+        # attribute_not_exists(messageKey) OR #ttl < :now
+        existing = self.items.get(Item['messageKey']['S'])
+        if existing is not None and int(existing['ttl']['N']) >= int(ExpressionAttributeValues[':now']['N']):
+            raise _conditional_check_failed(existing if ReturnValuesOnConditionCheckFailure == 'ALL_OLD' else None)
+        self.items[Item['messageKey']['S']] = dict(Item)
+        return {}
+
+    async def delete_item(self, TableName, Key, ConditionExpression, ExpressionAttributeNames,
+                          ExpressionAttributeValues, ReturnValues):
+        await asyncio.sleep(0)
+        # attribute_exists(messageKey) AND #ttl >= :now
+        item = self.items.get(Key['messageKey']['S'])
+        if item is None or int(item['ttl']['N']) < int(ExpressionAttributeValues[':now']['N']):
+            raise _conditional_check_failed()
+        del self.items[Key['messageKey']['S']]
+        return {'Attributes': item}
+
+    async def transact_write_items(self, TransactItems, ClientRequestToken=None):
+        await asyncio.sleep(0)
+        puts = [action['Put'] for action in TransactItems]
+        codes = [
+            'ConditionalCheckFailed'
+            if put['Item']['messageKey']['S'] in self.items
+            and int(self.items[put['Item']['messageKey']['S']]['ttl']['N'])
+            >= int(put['ExpressionAttributeValues'][':now']['N'])
+            else 'None'
+            for put in puts
+        ]
+        if any(code != 'None' for code in codes):
+            raise ClientError({
+                'Error': {'Code': 'TransactionCanceledException', 'Message': 'Transaction cancelled'},
+                'CancellationReasons': [{'Code': code} for code in codes]
+            }, 'TransactWriteItems')
+        for put in puts:
+            self.items[put['Item']['messageKey']['S']] = dict(put['Item'])
+        return {}
+
+
+class FakeAsyncRedis:
+    """In-memory stand-in for the redis.asyncio SET NX EX / GETDEL calls the store makes."""
+
+    def __init__(self):
+        self.values = {}
+
+    async def set(self, name, value, nx=False, ex=None):
+        entry = self.values.get(name)
+        if nx and entry is not None and entry[1] > time.time():
+            return None
+        self.values[name] = (value.encode('utf-8'), time.time() + ex)
+        return True
+
+    async def getdel(self, name):
+        entry = self.values.pop(name, None)
+        if entry is None or entry[1] <= time.time():
+            return None
+        return entry[0]
+
+    def pipeline(self, transaction=True):
+        return FakeAsyncRedisPipeline(self)
+
+
+class FakeAsyncRedisPipeline:
+    """Queues SET calls and runs them on execute(), like a redis.asyncio pipeline."""
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def set(self, *args, **kwargs):
+        self.commands.append((args, kwargs))
+
+    async def execute(self):
+        return [await self.redis.set(*args, **kwargs) for args, kwargs in self.commands]
+
+
+def _item(message_key: str, ttl_offset: int = 3600) -> dict:
+    return {
+        'messageKey': message_key,
+        'ttl': int(time.time()) + ttl_offset,
+        'encryptedMessage': 'v1:gHRva2Vu',
+        'ttlOption': '1hour'
+    }
+
+
+@pytest.fixture(params=['dynamodb', 'memory', 'redis'])
+def store(request):
+    if request.param == 'dynamodb':
+        return AsyncDynamoDBMessageStore(FakeAsyncDynamoClient(), 'test-messages-table')
+    if request.param == 'memory':
+        return AsyncInMemoryMessageStore()
+    return AsyncRedisMessageStore(FakeAsyncRedis())
+
+
+class TestAsyncMessageStoreContract:
+    """Behaviour every async store implementation must share."""
+
+    def test_put_then_consume(self, store):
+        """Test that a stored message comes back once."""
+        item = _item('abc123')
+
+        async def scenario():
+            await store.put_if_absent(item)
+            return await store.consume('abc123'), await store.consume('abc123')
+
+        first, second = asyncio.run(scenario())
+        assert first == item
+        assert second is None
+
+    def test_consume_missing(self, store):
+        """Test that an unknown key is reported as gone."""
+        assert asyncio.run(store.consume('missing')) is None
+
+    def test_put_if_absent_rejects_live_key(self, store):
+        """Test that a live message cannot be overwritten."""
+        async def scenario():
+            await store.put_if_absent(_item('abc123'))
+            await store.put_if_absent({**_item('abc123'), 'encryptedMessage': 'v1:b3RoZXI='})
+
+        with pytest.raises(MessageKeyExistsError):
+            asyncio.run(scenario())
+
+    def test_expired_message_is_gone(self, store):
+        """Test that a message past its ttl cannot be read."""
+        asyncio.run(store.put_if_absent(_item('abc123', ttl_offset=60)))
+        later = time.time() + 120
+        with patch('dadpass_core.async_store.time.time', return_value=later), \
+                patch('dadpass_core.store.time.time', return_value=later):
+            assert asyncio.run(store.consume('abc123')) is None
+
+    def test_exactly_one_concurrent_reader_wins(self, store):
+        """Test that only one of many interleaved readers gets the message."""
+        async def scenario():
+            await store.put_if_absent(_item('race'))
+            return await asyncio.gather(*(store.consume('race') for _ in range(32)))
+
+        results = asyncio.run(scenario())
+        assert sum(result is not None for result in results) == 1
+
+    def test_put_many_reports_taken_keys(self, store):
+        """Test that a batch stores every free key and returns the taken ones in order."""
+        batch = [_item('free1'), _item('taken2'), _item('free2'), _item('taken1')]
+
+        async def scenario():
+            await store.put_if_absent(_item('taken1'))
+            await store.put_if_absent(_item('taken2'))
+            collided = await store.put_many_if_absent(batch)
+            return collided, await store.consume('free1'), await store.consume('free2')
+
+        collided, free1, free2 = asyncio.run(scenario())
+        assert [item['messageKey'] for item in collided] == ['taken2', 'taken1']
+        assert (free1, free2) == (batch[0], batch[2])
+
+
+class TestAsyncDynamoDBMessageStore:
+    """Unit tests specific to the aiobotocore-backed store."""
+
+    def test_items_are_sent_as_dynamodb_json(self):
+        """Test that attribute values are serialized for the low-level client."""
+        client = FakeAsyncDynamoClient()
+        store = AsyncDynamoDBMessageStore(client, 'test-messages-table')
+        item = _item('abc123')
+
+        asyncio.run(store.put_if_absent(item))
+
+        assert client.items['abc123'] == {
+            'messageKey': {'S': 'abc123'},
+            'ttl': {'N': str(item['ttl'])},
+            'v': {'N': '2'},
+            'c': {'B': b'v1:\x80token'},
+            'o': {'N': '2'}
+        }
+
+    def test_retry_of_applied_put_succeeds(self):
+        """Test that a put finding exactly its own item, as a retry after a lost response does, succeeds."""
+        client = FakeAsyncDynamoClient()
+        store = AsyncDynamoDBMessageStore(client, 'test-messages-table')
+        item = _item('abc123')
+
+        asyncio.run(store.put_if_absent(item))
+        asyncio.run(store.put_if_absent(item))
+
+        assert list(client.items) == ['abc123']
+
+    def test_original_item_format(self):
+        """Test that item_format=1 writes the logical item as it is, and both formats read back alike."""
+        client = FakeAsyncDynamoClient()
+        original = AsyncDynamoDBMessageStore(client, 'test-messages-table', item_format=1)
+        compact = AsyncDynamoDBMessageStore(client, 'test-messages-table')
+
+        asyncio.run(original.put_if_absent(_item('old123')))
+        asyncio.run(compact.put_if_absent(_item('new123')))
+
+        assert client.items['old123']['encryptedMessage'] == {'S': 'v1:gHRva2Vu'}
+        for read in (asyncio.run(compact.consume('old123')), asyncio.run(original.consume('new123'))):
+            assert (read['encryptedMessage'], read['ttlOption']) == ('v1:gHRva2Vu', '1hour')
+
+
+class TestOpenAsyncStore:
+    """Unit tests for open_async_store."""
+
+    def test_memory(self):
+        """Test that the in-memory store needs no configuration."""
+        async def scenario():
+            async with open_async_store('memory') as store:
+                return store
+
+        assert isinstance(asyncio.run(scenario()), AsyncInMemoryMessageStore)
+
+    def test_unknown_store(self):
+        """Test that an unknown kind is rejected."""
+        async def scenario():
+            async with open_async_store('sqlite'):
+                pass
+
+        with pytest.raises(ValueError, match='sqlite'):
+            asyncio.run(scenario())
@@ -0,0 +1,230 @@
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+from botocore.exceptions import ReadTimeoutError
+
+# Add the shared source directory to the Python path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "src"))
+
+from dadpass_core.clients import client_config, config_options, worst_case_seconds
+from dadpass_core.store import MessageKeyExistsError, create_store
+
+# The API Gateway integration timeout in template.yaml, and gunicorn's worker timeout
+UPSTREAM_DEADLINE_SECONDS = 30
+
+
+class SlowDynamoDB:
+    """
+    A local DynamoDB endpoint that holds back its responses by the given delays, one per request.
+
+    Writes are applied before their response is held back, as DynamoDB does when only the
+    response is slow. A PutItem stores its item unless the key is taken, and a DeleteItem
+    removes it; either answers with a failed condition otherwise, a PutItem returning the
+    existing item when asked to.
+    """
+
+    def __init__(self, delays: list[float]):
+        self.delays = list(delays)
+        self.requests = 0
+        self.items = {}
+        self._released = threading.Event()
+        endpoint = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                endpoint.requests += 1
+                status, response = endpoint.apply(self.headers['X-Amz-Target'].split('.')[-1], request)
+                delay = endpoint.delays.pop(0) if endpoint.delays else 0
+                endpoint._released.wait(delay)
+                data = json.dumps(response).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/x-amz-json-1.0')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        class Server(ThreadingHTTPServer):
+            daemon_threads = True
+
+            def handle_error(self, request, client_address):
+                # The client gave up on a held-back response; that is the point
+                pass
+
+        self.server = Server(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def apply(self, operation: str, request: dict) -> tuple[int, dict]:
+        failed = {
+            '__type': 'com.amazonaws.dynamodb.v20120810#ConditionalCheckFailedException',
+            'message': 'The conditional request failed'
+        }
+        if operation == 'PutItem':
+            existing = self.items.setdefault(request['Item']['messageKey']['S'], request['Item'])
+            if existing is request['Item']:
+                return 200, {}
+            if request.get('ReturnValuesOnConditionCheckFailure') == 'ALL_OLD':
+                failed['Item'] = existing
+            return 400, failed
+        item = self.items.pop(request['Key']['messageKey']['S'], None)
+        if item is None:
+            return 400, failed
+        return 200, {'Attributes': item}
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self.server.server_address[1]}'
+
+    def close(self):
+        self._released.set()
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def slow_dynamodb(monkeypatch):
+    """
+    Points DynamoDB clients at a SlowDynamoDB, call it with the per-request delays.
+
+    Retried calls time out after 200 ms, and single-attempt calls after 1 s.
+    """
+    endpoints = []
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'test')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'test')
+    monkeypatch.setenv('AWS_CONNECT_TIMEOUT_SECONDS', '0.2')
+    monkeypatch.setenv('AWS_READ_TIMEOUT_SECONDS', '0.2')
+    monkeypatch.setenv('AWS_SINGLE_ATTEMPT_READ_TIMEOUT_SECONDS', '1')
+    monkeypatch.setenv('AWS_MAX_ATTEMPTS', '2')
+
+    def start(delays: list[float]) -> SlowDynamoDB:
+        endpoint = SlowDynamoDB(delays)
+        endpoints.append(endpoint)
+        monkeypatch.setenv('AWS_ENDPOINT_URL_DYNAMODB', endpoint.url)
+        return endpoint
+
+    yield start
+    for endpoint in endpoints:
+        endpoint.close()
+
+
+def _store():
+    return create_store('dynamodb', table_name='messages', region_name='us-east-2')
+
+
+def _item(message_key: str = 'abc123xyz0') -> dict:
+    return {'messageKey': message_key, 'ttl': int(time.time()) + 3600, 'encryptedMessage': 'v1:gHRva2Vu',
+            'ttlOption': '1hour'}
+
+
+class TestClientConfig:
+    """Unit tests for the shared botocore client configuration."""
+
+    def test_defaults(self, monkeypatch):
+        """Test that clients get short timeouts, adaptive retries and keep-alive."""
+        for name in ('AWS_CONNECT_TIMEOUT_SECONDS', 'AWS_READ_TIMEOUT_SECONDS', 'AWS_MAX_ATTEMPTS', 'AWS_RETRY_MODE'):
+            monkeypatch.delenv(name, raising=False)
+
+        config = client_config(max_pool_connections=8)
+
+        assert (config.connect_timeout, config.read_timeout) == (1.0, 3.0)
+        assert config.retries == {'mode': 'adaptive', 'total_max_attempts': 3}
+        assert config.tcp_keepalive is True
+        assert config.max_pool_connections == 8
+
+    def test_every_attempt_fits_the_upstream_deadline(self, monkeypatch):
+        """Test that a call failing every attempt still gives up before API Gateway or gunicorn would."""
+        for name in ('AWS_CONNECT_TIMEOUT_SECONDS', 'AWS_READ_TIMEOUT_SECONDS', 'AWS_MAX_ATTEMPTS'):
+            monkeypatch.delenv(name, raising=False)
+
+        # 3 attempts of 1 s + 3 s, and up to 1 s then 2 s of backoff between them
+        assert worst_case_seconds() == 15
+        assert worst_case_seconds() < UPSTREAM_DEADLINE_SECONDS
+
+    def test_single_attempt(self, monkeypatch):
+        """Test that calls unsafe to repeat make one attempt, waiting longer but still inside the deadline."""
+        for name in ('AWS_CONNECT_TIMEOUT_SECONDS', 'AWS_SINGLE_ATTEMPT_READ_TIMEOUT_SECONDS', 'AWS_MAX_ATTEMPTS'):
+            monkeypatch.delenv(name, raising=False)
+        monkeypatch.setenv('AWS_MAX_ATTEMPTS', '5')
+
+        options = config_options(single_attempt=True)
+
+        assert options['retries']['total_max_attempts'] == 1
+        assert options['read_timeout'] == 10.0
+        assert worst_case_seconds(options) == 11
+        assert worst_case_seconds(options) < UPSTREAM_DEADLINE_SECONDS
+
+    def test_environment_overrides(self, monkeypatch):
+        """Test that the timeouts and attempts can be tuned per deployment."""
+        monkeypatch.setenv('AWS_READ_TIMEOUT_SECONDS', '0.5')
+        monkeypatch.setenv('AWS_MAX_ATTEMPTS', '5')
+        monkeypatch.setenv('AWS_RETRY_MODE', 'standard')
+
+        options = config_options()
+
+        assert options['read_timeout'] == 0.5
+        assert options['retries'] == {'mode': 'standard', 'total_max_attempts': 5}
+
+
+class TestSlowDynamoDB:
+    """Fault injection: DynamoDB holding back responses far longer than the read timeout."""
+
+    def test_slow_put_is_retried(self, slow_dynamodb):
+        """Test that a hung put costs one read timeout and a backoff, not the hang."""
+        endpoint = slow_dynamodb([5])
+        store = _store()
+
+        start = time.monotonic()
+        store.put_if_absent(_item())
+        elapsed = time.monotonic() - start
+
+        # The first attempt was applied, so the retry finds its own item and succeeds
+        assert endpoint.requests == 2
+        assert list(endpoint.items) == ['abc123xyz0']
+        assert elapsed < worst_case_seconds()
+
+    def test_retried_put_still_detects_collisions(self, slow_dynamodb):
+        """Test that a put finding another message under its key still reports the collision."""
+        endpoint = slow_dynamodb([])
+        store = _store()
+        store.put_if_absent(_item())
+
+        with pytest.raises(MessageKeyExistsError):
+            store.put_if_absent({**_item(), 'encryptedMessage': 'v1:b3RoZXI='})
+
+        assert endpoint.requests == 2
+
+    def test_slow_delete_is_not_retried(self, slow_dynamodb):
+        """Test that a consume whose delete is applied but answered late still returns the message."""
+        endpoint = slow_dynamodb([0, 0.5])
+        store = _store()
+        store.put_if_absent(_item())
+
+        # With retries, the 200 ms timeout would abandon this attempt and the retry find the item gone
+        consumed = store.consume('abc123xyz0')
+
+        assert endpoint.requests == 2
+        assert consumed['encryptedMessage'] == 'v1:gHRva2Vu'
+
+    def test_unresponsive_dynamodb_fails_within_the_deadline(self, slow_dynamodb):
+        """Test that when the delete hangs the call fails in bounded time instead of waiting 60 s per attempt."""
+        endpoint = slow_dynamodb([5, 5, 5])
+        store = _store()
+
+        start = time.monotonic()
+        with pytest.raises(ReadTimeoutError):
+            store.consume('abc123xyz0')
+        elapsed = time.monotonic() - start
+
+        assert endpoint.requests == 1
+        # One attempt of 0.2 s + 1 s, plus client overhead
+        assert elapsed < worst_case_seconds(config_options(single_attempt=True)) + 0.5
@@ -0,0 +1,158 @@
+import pytest
+import sys
+import threading
+from pathlib import Path
+from unittest.mock import patch
+
+# Add the shared source directory to the Python path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "src"))
+
+from dadpass_core.datakeys import (
+    DataKeyCache, ENCRYPTION_CONTEXT, KmsDataKeyProvider, LocalDataKeyProvider, create_data_key_cache
+)
+
+
+class FakeKms:
+    """Minimal KMS client: wraps data keys by tagging them, and checks the encryption context."""
+
+    def __init__(self):
+        self.calls = []
+
+    def generate_data_key(self, KeyId, KeySpec, EncryptionContext):
+        self.calls.append('GenerateDataKey')
+        assert (KeySpec, EncryptionContext) == ('AES_256', ENCRYPTION_CONTEXT)
+        plaintext = bytes([len(self.calls)]) * 32
+        return {'Plaintext': plaintext, 'CiphertextBlob': KeyId.encode() + b'/' + plaintext}
+
+    def decrypt(self, CiphertextBlob, EncryptionContext):
+        self.calls.append('Decrypt')
+        assert EncryptionContext == ENCRYPTION_CONTEXT
+        return {'Plaintext': CiphertextBlob.rsplit(b'/', 1)[1]}
+
+
+def _seal(aead, message: bytes = b'secret') -> bytes:
+    return aead.encrypt(b'\0' * 12, message, None)
+
+
+class TestProviders:
+    """Unit tests for the KMS and local data key providers."""
+
+    def test_local_provider_unwraps_its_own_keys(self):
+        """Test that the local stand-in wraps keys it alone can unwrap."""
+        provider = LocalDataKeyProvider()
+        plaintext, wrapped = provider.generate_data_key()
+
+        assert len(plaintext) == 32
+        assert plaintext not in wrapped
+        assert provider.decrypt_data_key(wrapped) == plaintext
+        with pytest.raises(Exception):
+            LocalDataKeyProvider().decrypt_data_key(wrapped)
+
+    def test_kms_provider_creates_its_client_lazily(self):
+        """Test that the KMS client is only built on the first call, and rebuilt after reset."""
+        clients = []
+
+        def client_factory():
+            clients.append(FakeKms())
+            return clients[-1]
+
+        provider = KmsDataKeyProvider(client_factory, 'alias/dad-pass')
+        assert clients == []
+
+        plaintext, wrapped = provider.generate_data_key()
+        assert provider.decrypt_data_key(wrapped) == plaintext
+        assert wrapped.startswith(b'alias/dad-pass/')
+        provider.reset()
+        provider.decrypt_data_key(wrapped)
+
+        assert [client.calls for client in clients] == [['GenerateDataKey', 'Decrypt'], ['Decrypt']]
+
+
+class TestDataKeyCache:
+    """Unit tests for the DataKeyCache class."""
+
+    def test_data_key_reused_up_to_max_messages(self):
+        """Test that one data key serves max_messages messages before another is requested."""
+        provider = LocalDataKeyProvider()
+        cache = DataKeyCache(provider, max_messages=3)
+
+        wrapped = [cache.encryption_key()[1] for _ in range(7)]
+
+        assert wrapped[0] == wrapped[1] == wrapped[2] != wrapped[3]
+        assert len(set(wrapped)) == 3
+        assert provider.calls == 3
+
+    @patch('dadpass_core.datakeys.time')
+    def test_data_key_expires(self, mock_time):
+        """Test that a data key is replaced, and forgotten for reading, after max_age seconds."""
+        mock_time.monotonic.return_value = 1000.0
+        provider = LocalDataKeyProvider()
+        cache = DataKeyCache(provider, max_age=60)
+        first_wrapped = cache.encryption_key()[1]
+
+        mock_time.monotonic.return_value = 1060.0
+        assert cache.encryption_key()[1] != first_wrapped
+        cache.decryption_key(first_wrapped)
+
+        assert provider.calls == 3
+
+    def test_own_data_keys_decrypt_without_the_provider(self):
+        """Test that messages this process encrypted are read back without an unwrap call."""
+        provider = LocalDataKeyProvider()
+        cache = DataKeyCache(provider)
+        aead, wrapped = cache.encryption_key()
+
+        assert cache.decryption_key(wrapped).decrypt(b'\0' * 12, _seal(aead), None) == b'secret'
+        assert provider.calls == 1
+
+    def test_unwrapped_keys_are_cached_and_bounded(self):
+        """Test that keys from other processes are unwrapped once, and the least recently used dropped."""
+        writer = DataKeyCache(LocalDataKeyProvider(), max_messages=1)
+        wrapped_keys = [writer.encryption_key()[1] for _ in range(3)]
+        provider = writer.provider
+        reader = DataKeyCache(provider, max_cached_keys=2)
+        provider.calls = 0
+
+        for wrapped in (wrapped_keys[0], wrapped_keys[1], wrapped_keys[0], wrapped_keys[2], wrapped_keys[1]):
+            reader.decryption_key(wrapped)
+
+        # 0 and 1 unwrapped, 0 a hit, 2 evicts 1 (least recently used), 1 unwrapped again
+        assert provider.calls == 4
+
+    def test_concurrent_encryption_shares_one_key(self):
+        """Test that threads encrypting at once share a data key instead of each requesting one."""
+        provider = LocalDataKeyProvider(latency=0.01)
+        cache = DataKeyCache(provider)
+        wrapped = []
+
+        threads = [threading.Thread(target=lambda: wrapped.append(cache.encryption_key()[1])) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(set(wrapped)) == 1
+        assert provider.calls == 1
+
+    def test_limits_must_be_positive(self):
+        """Test that a cache that could never encrypt is refused."""
+        with pytest.raises(ValueError):
+            DataKeyCache(LocalDataKeyProvider(), max_messages=0)
+
+
+class TestCreateDataKeyCache:
+    """Unit tests for the create_data_key_cache factory."""
+
+    def test_providers(self):
+        """Test that each DATA_KEY_PROVIDER setting builds its provider."""
+        assert isinstance(create_data_key_cache('local').provider, LocalDataKeyProvider)
+        cache = create_data_key_cache('kms', kms_client_factory=FakeKms, kms_key_id='alias/dad-pass', max_messages=5)
+        assert isinstance(cache.provider, KmsDataKeyProvider)
+        assert cache.max_messages == 5
+
+    def test_invalid_settings(self):
+        """Test that an unknown provider, or KMS without a key id, is refused."""
+        with pytest.raises(ValueError, match='Unknown data key provider'):
+            create_data_key_cache('vault')
+        with pytest.raises(ValueError, match='KMS_KEY_ID'):
+            create_data_key_cache('kms', kms_client_factory=FakeKms)
@@ -0,0 +1,49 @@
+import json
+import pytest
+import sys
+from decimal import Decimal
+from pathlib import Path
+
+# Add the shared source directory to the Python path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "src"))
+
+from dadpass_core import fastjson
+
+pytest.importorskip('orjson')
+
+
+@pytest.fixture
+def restore_backend():
+    previous = fastjson.BACKEND
+    yield
+    fastjson.set_backend(previous)
+
+
+class TestFastJson:
+    """Unit tests for the JSON backends."""
+
+    @pytest.mark.parametrize('backend', ['orjson', 'stdlib'])
+    def test_same_bytes_from_every_backend(self, backend, restore_backend):
+        """Test that both backends write the same compact UTF-8 and read it back."""
+        body = {'message': 'Mot de passe: crème brûlée 🔑', 'ttl': Decimal('1700000000'), 'ratio': Decimal('0.5')}
+
+        assert fastjson.set_backend(backend) == backend
+        encoded = fastjson.dumps(body)
+
+        assert encoded == '{"message":"Mot de passe: crème brûlée 🔑","ttl":1700000000,"ratio":0.5}'.encode()
+        assert fastjson.dumps_str(body) == encoded.decode()
+        assert fastjson.loads(encoded) == json.loads(encoded)
+
+    @pytest.mark.parametrize('backend', ['orjson', 'stdlib'])
+    def test_invalid_json_is_a_value_error(self, backend, restore_backend):
+        """Test that callers catching ValueError handle bad bodies whichever backend is in use."""
+        fastjson.set_backend(backend)
+
+        with pytest.raises(ValueError):
+            fastjson.loads(b'not json')
+
+    def test_unknown_backend(self, restore_backend):
+        """Test that a mistyped JSON_BACKEND fails instead of silently falling back."""
+        with pytest.raises(ValueError):
+            fastjson.set_backend('simdjson')
+        assert fastjson.set_backend('auto') == 'orjson'
@@ -0,0 +1,137 @@
+import base64
+import pytest
+import sys
+from decimal import Decimal
+from pathlib import Path
+from boto3.dynamodb.types import Binary
+from cryptography.fernet import Fernet
+
+# Add the shared source directory to the Python path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "src"))
+
+from dadpass_core.crypto import AES_GCM_CIPHER, CLIENT_ENVELOPE_VERSION, CipherEngine, ENVELOPE_VERSION, LEGACY_KEY_ID
+from dadpass_core.items import from_stored, item_size, pack_ciphertext, to_compact, unpack_ciphertext
+
+
+def _item(ciphertext: str, ttl_option: str = '1day') -> dict:
+    return {'messageKey': 'aB3dE6gH9j', 'ttl': 1_700_086_400, 'encryptedMessage': ciphertext, 'ttlOption': ttl_option}
+
+
+class TestCiphertext:
+    """Unit tests for packing Fernet tokens into raw bytes."""
+
+    def test_tagged_and_legacy_tokens_roundtrip(self):
+        """Test that tagged and untagged tokens come back exactly, and still decrypt."""
+        for key_id in ('v1', LEGACY_KEY_ID):
+            engine = CipherEngine({key_id: Fernet.generate_key()})
+            ciphertext = engine.encrypt('Wi-Fi: hunter2')
+
+            packed = pack_ciphertext(ciphertext)
+
+            assert packed.startswith(key_id.encode() + b':')
+            assert unpack_ciphertext(packed) == ciphertext
+            assert engine.decrypt(unpack_ciphertext(Binary(packed))) == 'Wi-Fi: hunter2'
+
+    def test_separator_inside_the_token_bytes(self):
+        """Test that a raw token containing ':' bytes is not mistaken for part of the key id."""
+        ciphertext = 'v2:' + 'gDo6Ojo6'  # base64 of b'\x80:::::', a Fernet version byte then separators
+
+        assert pack_ciphertext(ciphertext) == b'v2:' + b'\x80:::::'
+        assert unpack_ciphertext(pack_ciphertext(ciphertext)) == ciphertext
+
+    def test_compressed_tokens_roundtrip(self):
+        """Test that the codec in a compressed token's header is kept."""
+        for key_id in ('v1', LEGACY_KEY_ID):
+            engine = CipherEngine({key_id: Fernet.generate_key()}, compress_threshold=16)
+            ciphertext = engine.encrypt('hunter2 ' * 20)
+
+            packed = pack_ciphertext(ciphertext)
+
+            assert packed.startswith(f'{key_id}:z:'.encode())
+            assert unpack_ciphertext(packed) == ciphertext
+            assert engine.decrypt(unpack_ciphertext(Binary(packed))) == 'hunter2 ' * 20
+
+
+    def test_gcm_envelopes_are_stored_raw(self):
+        """Test that an AES-GCM envelope is stored as its bytes alone, since it names its own key."""
+        engine = CipherEngine({'v1': Fernet.generate_key()}, cipher=AES_GCM_CIPHER)
+        ciphertext = engine.encrypt('Wi-Fi: hunter2')
+
+        packed = pack_ciphertext(ciphertext)
+
+        assert packed[0] == ENVELOPE_VERSION
+        assert len(packed) == 5 + 12 + len('Wi-Fi: hunter2') + 16
+        assert unpack_ciphertext(Binary(packed)) == ciphertext
+        assert engine.decrypt(unpack_ciphertext(packed)) == 'Wi-Fi: hunter2'
+
+
+    def test_client_ciphertext_is_stored_raw(self):
+        """Test that browser-encrypted ciphertext is stored as its bytes and returned exactly as sent."""
+        raw = bytes((CLIENT_ENVELOPE_VERSION,)) + b'\x00' * 12 + b':' * 20
+        ciphertext = base64.urlsafe_b64encode(raw).decode()
+
+        assert pack_ciphertext(ciphertext) == raw
+        assert unpack_ciphertext(Binary(raw)) == ciphertext
+
+
+class TestItemFormats:
+    """Unit tests for converting between logical and stored items."""
+
+    def test_compact_roundtrip(self):
+        """Test that a compact item, as DynamoDB returns it, reads back as the logical item."""
+        item = _item(CipherEngine({'v1': Fernet.generate_key()}).encrypt('secret'))
+        compact = to_compact(item)
+        # What the boto3 resource returns for it
+        returned = {**compact, 'ttl': Decimal(compact['ttl']), 'v': Decimal(2), 'o': Decimal(compact['o']),
+                    'c': Binary(compact['c'])}
+
+        assert set(compact) == {'messageKey', 'ttl', 'v', 'c', 'o'}
+        assert compact['o'] == 3
+        assert from_stored(returned) == {**item, 'ttl': Decimal(item['ttl'])}
+
+    def test_client_encrypted_marker_roundtrip(self):
+        """Test that the client-encrypted marker is kept, and only written for client-encrypted messages."""
+        raw = bytes((CLIENT_ENVELOPE_VERSION,)) + b'\x00' * 28
+        item = {**_item(base64.urlsafe_b64encode(raw).decode()), 'clientEncrypted': True}
+
+        compact = to_compact(item)
+
+        assert compact['e'] is True
+        assert from_stored(compact) == item
+        assert 'e' not in to_compact(_item('Az01:gHRva2Vu'))
+        assert 'clientEncrypted' not in from_stored(to_compact(_item('Az01:gHRva2Vu')))
+
+    def test_original_items_read_as_they_are(self):
+        """Test that items written before the compact format are returned unchanged."""
+        item = _item('v1:gHRva2Vu')
+
+        assert from_stored(item) is item
+
+    def test_option_without_a_code_is_kept(self):
+        """Test that a ttlOption outside the known options is stored and returned as its label."""
+        compact = to_compact(_item('v1:gHRva2Vu', ttl_option='2weeks'))
+
+        assert compact['o'] == '2weeks'
+        assert from_stored(compact)['ttlOption'] == '2weeks'
+
+    def test_unknown_format(self):
+        """Test that an item from a newer format is an error rather than a wrong message."""
+        with pytest.raises(ValueError, match='Unknown item format 3'):
+            from_stored({**to_compact(_item('v1:gHRva2Vu')), 'v': Decimal(3)})
+
+
+class TestItemSize:
+    """Unit tests for the item_size function."""
+
+    def test_size_by_attribute_type(self):
+        """Test DynamoDB's size rules for string, number and binary attributes."""
+        assert item_size({'s': 'héllo'}) == 1 + 6
+        assert item_size({'n': 1_700_086_400}) == 1 + 4 + 1
+        assert item_size({'n': Decimal('1.50')}) == 1 + 1 + 1
+        assert item_size({'b': b'\x00' * 10, 'bb': Binary(b'\x00')}) == 1 + 10 + 2 + 1
+
+    def test_compact_item_is_smaller(self):
+        """Test that the compact format stores a typical message in fewer bytes."""
+        item = _item(CipherEngine({'v1': Fernet.generate_key()}).encrypt('x' * 100))
+
+        assert item_size(to_compact(item)) < item_size(item) * 0.8
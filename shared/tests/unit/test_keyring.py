@@ -0,0 +1,343 @@
+import os
+import pytest
+import sys
+import threading
+import time
+from pathlib import Path
+from cryptography.fernet import Fernet
+from botocore.exceptions import ClientError
+
+# Add the shared source directory to the Python path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "src"))
+
+from dadpass_core import crypto, keyring
+from dadpass_core.crypto import CipherEngine, LEGACY_KEY_ID
+from dadpass_core.keyring import (
+    KeyRing, SsmKeyLoader, load_keys_from_ssm, start_key_ring, KEY_PATH, LEGACY_PARAMETER
+)
+
+
+class FakeSsm:
+    """In-memory stand-in for the SSM client calls used by the key ring."""
+    
+    def __init__(self, parameters: dict[str, str]):
+        self.parameters = parameters
+        self.calls = 0
+    
+    def get_paginator(self, operation_name):
+        assert operation_name == 'get_parameters_by_path'
+        return self
+    
+    def paginate(self, Path, WithDecryption):
+        self.calls += 1
+        prefix = Path.rstrip('/') + '/'
+        yield {'Parameters': [
+            {'Name': name, 'Value': value}
+            for name, value in self.parameters.items() if name.startswith(prefix)
+        ]}
+    
+    def get_parameter(self, Name, WithDecryption):
+        if Name not in self.parameters:
+            raise ClientError({'Error': {'Code': 'ParameterNotFound', 'Message': Name}}, 'GetParameter')
+        return {'Parameter': {'Name': Name, 'Value': self.parameters[Name]}}
+
+
+def _key() -> str:
+    return Fernet.generate_key().decode('utf-8')
+
+
+class TestLoadKeysFromSsm:
+    """Unit tests for the load_keys_from_ssm function."""
+    
+    def test_legacy_key_only(self):
+        """Test that a deployment with only the original parameter keeps using it."""
+        keys, active_key_id = load_keys_from_ssm(FakeSsm({LEGACY_PARAMETER: _key()}))
+        assert active_key_id == LEGACY_KEY_ID
+        assert list(keys) == [LEGACY_KEY_ID]
+    
+    def test_highest_version_is_active(self):
+        """Test that the highest numbered version encrypts and the rest are kept."""
+        ssm = FakeSsm({
+            LEGACY_PARAMETER: _key(),
+            f'{KEY_PATH}/v2': _key(),
+            f'{KEY_PATH}/v10': _key(),
+            f'{KEY_PATH}/v9': _key(),
+        })
+        keys, active_key_id = load_keys_from_ssm(ssm)
+        assert active_key_id == 'v10'
+        assert next(iter(keys)) == 'v10'
+        assert set(keys) == {'v2', 'v9', 'v10', LEGACY_KEY_ID}
+    
+    def test_legacy_parameter_is_optional_with_versions(self):
+        """Test that the legacy parameter may be removed once versions exist."""
+        keys, active_key_id = load_keys_from_ssm(FakeSsm({f'{KEY_PATH}/v1': _key()}))
+        assert active_key_id == 'v1'
+        assert list(keys) == ['v1']
+    
+    def test_no_keys_raises(self):
+        """Test that an empty key store is an error."""
+        with pytest.raises(ClientError):
+            load_keys_from_ssm(FakeSsm({}))
+
+
+class TestKeyRing:
+    """Unit tests for the KeyRing class."""
+    
+    def test_install_configures_engine(self):
+        """Test that installing the ring makes the keys available to crypto."""
+        ring = KeyRing(lambda: load_keys_from_ssm(FakeSsm({f'{KEY_PATH}/v1': _key()})))
+        engine = ring.install()
+        assert crypto.get_engine() is engine
+        assert crypto.encrypt_message("hi").startswith('v1:')
+    
+    def test_refresh_failure_keeps_current_keys(self):
+        """Test that a failed reload leaves the previous engine in place."""
+        ssm = FakeSsm({f'{KEY_PATH}/v1': _key()})
+        ring = KeyRing(lambda: load_keys_from_ssm(ssm))
+        engine = ring.install()
+        ssm.parameters.clear()
+        
+        assert ring.refresh() is False
+        assert crypto.get_engine() is engine
+    
+    def test_rotation_without_restart(self, monkeypatch):
+        """Test that a reader picks up a new key version on demand when it meets it."""
+        monkeypatch.setattr(keyring, 'MIN_FORCED_REFRESH_SECONDS', 0)
+        v1, v2 = _key(), _key()
+        ssm = FakeSsm({f'{KEY_PATH}/v1': v1})
+        ring = KeyRing(lambda: load_keys_from_ssm(ssm))
+        ring.install()
+        old_ciphertext = crypto.encrypt_message("before rotation")
+        
+        # Another instance has already loaded v2 and is writing with it
+        ssm.parameters[f'{KEY_PATH}/v2'] = v2
+        writer = CipherEngine({'v2': v2.encode('utf-8'), 'v1': v1.encode('utf-8')})
+        new_ciphertext = writer.encrypt("after rotation")
+        
+        assert crypto.decrypt_message(new_ciphertext) == "after rotation"
+        assert crypto.decrypt_message(old_ciphertext) == "before rotation"
+        assert crypto.get_engine().active_key_id == 'v2'
+    
+    def test_forced_refresh_is_rate_limited(self):
+        """Test that unknown key ids cannot trigger a reload on every request."""
+        ssm = FakeSsm({f'{KEY_PATH}/v1': _key()})
+        ring = KeyRing(lambda: load_keys_from_ssm(ssm))
+        ring.install()
+        calls = ssm.calls
+        
+        assert ring.refresh_for_key('v7') is None
+        assert ssm.calls == calls
+    
+    def test_background_refresh(self):
+        """Test that the background thread reloads keys on its interval."""
+        ssm = FakeSsm({f'{KEY_PATH}/v1': _key()})
+        ring = KeyRing(lambda: load_keys_from_ssm(ssm), refresh_interval=0.01)
+        ring.install()
+        ssm.parameters[f'{KEY_PATH}/v2'] = _key()
+        ring.start()
+        try:
+            deadline = time.monotonic() + 2
+            while crypto.get_engine().active_key_id != 'v2' and time.monotonic() < deadline:
+                time.sleep(0.01)
+        finally:
+            ring.stop()
+        assert crypto.get_engine().active_key_id == 'v2'
+
+
+class TestLazyInstall:
+    """Unit tests for loading the key ring in the background at startup."""
+    
+    @pytest.fixture(autouse=True)
+    def reset_engine(self):
+        crypto.set_engine(None)
+        yield
+        crypto.set_engine_loader(None)
+    
+    def test_install_does_not_block(self):
+        """Test that a lazy install returns before the keys arrive and first use waits for them."""
+        release = threading.Event()
+        ssm = FakeSsm({f'{KEY_PATH}/v1': _key()})
+        
+        def slow_loader():
+            release.wait()
+            return load_keys_from_ssm(ssm)
+        
+        ring = KeyRing(slow_loader)
+        assert ring.install(wait=False) is None
+        assert ring.ready is False
+        
+        release.set()
+        assert crypto.decrypt_message(crypto.encrypt_message("hi")) == "hi"
+        assert ring.ready is True
+    
+    def test_client_is_created_off_the_calling_thread(self):
+        """Test that SsmKeyLoader builds its client inside the background load."""
+        ssm = FakeSsm({f'{KEY_PATH}/v1': _key()})
+        created_on = []
+        
+        def client_factory():
+            created_on.append(threading.current_thread().name)
+            return ssm
+        
+        ring = KeyRing(SsmKeyLoader(client_factory))
+        ring.install(wait=False)
+        ring.wait_until_ready(timeout=2)
+        
+        assert created_on == ['dadpass-key-load']
+    
+    def test_failed_startup_load_is_retried(self):
+        """Test that a failed background load is retried on the next use."""
+        attempts = []
+        ssm = FakeSsm({f'{KEY_PATH}/v1': _key()})
+        
+        def flaky_loader():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise RuntimeError("SSM timed out")
+            return load_keys_from_ssm(ssm)
+        
+        ring = KeyRing(flaky_loader)
+        ring.install(wait=False)
+        with pytest.raises(RuntimeError):
+            ring.ensure_loading().result(timeout=2)
+        
+        assert crypto.encrypt_message("hi").startswith('v1:')
+        assert len(attempts) == 2
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason="requires os.fork")
+class TestStartKeyRing:
+    """Unit tests for the start_key_ring helper the backends share."""
+    
+    @pytest.fixture(autouse=True)
+    def reset_engine(self):
+        crypto.set_engine(None)
+        yield
+        crypto.set_engine_loader(None)
+    
+    def test_environment_settings(self, monkeypatch):
+        """Test that KEY_LOAD_MODE=eager loads on the spot and KEY_REFRESH_SECONDS sets the interval."""
+        monkeypatch.setenv('KEY_LOAD_MODE', 'eager')
+        monkeypatch.setenv('KEY_REFRESH_SECONDS', '42')
+        monkeypatch.setenv('COMPRESSION_THRESHOLD', '0')
+        monkeypatch.setenv('CIPHER', 'aes-gcm')
+        ring = start_key_ring(lambda: FakeSsm({f'{KEY_PATH}/v1': _key()}))
+        try:
+            assert ring.ready is True
+            assert ring.refresh_interval == 42
+            assert crypto.get_engine().compress_threshold == 0
+            assert crypto.get_engine().cipher == 'aes-gcm'
+            assert ring._thread.is_alive()
+        finally:
+            ring.stop()
+    
+    def test_data_key_settings(self, monkeypatch):
+        """Test that DATA_KEY_PROVIDER gives the engine a data key cache that survives key reloads."""
+        monkeypatch.setenv('KEY_LOAD_MODE', 'eager')
+        monkeypatch.setenv('CIPHER', 'data-key')
+        monkeypatch.setenv('DATA_KEY_PROVIDER', 'local')
+        monkeypatch.setenv('DATA_KEY_MAX_MESSAGES', '7')
+        ring = start_key_ring(lambda: FakeSsm({f'{KEY_PATH}/v1': _key()}))
+        try:
+            data_keys = crypto.get_engine().data_keys
+            assert data_keys.max_messages == 7
+            ciphertext = crypto.encrypt_message("secret")
+            ring.load()
+            assert crypto.get_engine().data_keys is data_keys
+            assert crypto.decrypt_message(ciphertext) == "secret"
+        finally:
+            ring.stop()
+    
+    def test_lazy_by_default(self, monkeypatch):
+        """Test that the keys load in the background unless eager loading is asked for."""
+        monkeypatch.delenv('KEY_LOAD_MODE', raising=False)
+        release = threading.Event()
+        
+        def client_factory():
+            release.wait()
+            return FakeSsm({f'{KEY_PATH}/v1': _key()})
+        
+        ring = start_key_ring(client_factory)
+        try:
+            assert ring.ready is False
+            release.set()
+            assert ring.wait_until_ready(2).active_key_id == 'v1'
+        finally:
+            ring.stop()
+
+
+class TestAfterFork:
+    """Unit tests for re-arming the key ring in a forked worker process."""
+    
+    @pytest.fixture(autouse=True)
+    def reset_engine(self):
+        crypto.set_engine(None)
+        yield
+        crypto.set_engine_loader(None)
+    
+    def _in_child(self, check) -> str:
+        """Runs `check` in a forked child and returns what it printed to the pipe."""
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            try:
+                result = str(check())
+            except Exception as e:
+                result = f"error: {e!r}"
+            os.write(write_fd, result.encode('utf-8'))
+            os._exit(0)
+        os.close(write_fd)
+        with os.fdopen(read_fd) as pipe:
+            output = pipe.read()
+        os.waitpid(pid, 0)
+        return output
+    
+    def test_refresh_thread_and_client_are_recreated(self):
+        """Test that a child gets its own SSM client and a running refresh thread."""
+        ssm = FakeSsm({f'{KEY_PATH}/v1': _key()})
+        clients = []
+        
+        def client_factory():
+            clients.append(os.getpid())
+            return ssm
+        
+        ring = KeyRing(SsmKeyLoader(client_factory))
+        ring.install()
+        ring.start()
+        
+        def check():
+            ring.after_fork()
+            ring.refresh()
+            return (ring._thread.is_alive(), clients[-1] == os.getpid(), crypto.get_engine().active_key_id)
+        
+        try:
+            assert self._in_child(check) == "(True, True, 'v1')"
+        finally:
+            ring.stop()
+    
+    def test_inflight_startup_load_is_restarted(self):
+        """Test that a background load cut off by the fork is started again in the child."""
+        release = threading.Event()
+        ssm = FakeSsm({f'{KEY_PATH}/v1': _key()})
+        attempts = []
+        
+        def loader():
+            attempts.append(os.getpid())
+            if len(attempts) == 1:
+                release.wait()
+            return load_keys_from_ssm(ssm)
+        
+        ring = KeyRing(loader)
+        ring.install(wait=False)
+        while not attempts:
+            time.sleep(0.001)
+        
+        def check():
+            ring.after_fork()
+            return crypto.decrypt_message(crypto.encrypt_message("hi"))
+        
+        try:
+            assert self._in_child(check) == "hi"
+        finally:
+            release.set()
@@ -0,0 +1,132 @@
+import os
+import pytest
+import sys
+import threading
+from collections import Counter
+from pathlib import Path
+from unittest.mock import patch
+
+# Add the shared source directory to the Python path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "src"))
+
+from dadpass_core import keys
+from dadpass_core.keys import (
+    ALPHABET, KeyPool, birthday_probability, collision_probability, generate_key, generate_keys, keyspace
+)
+
+
+class TestGenerateKeys:
+    """Unit tests for bulk key generation."""
+
+    def test_count_and_length(self):
+        """Test that the requested number of keys of the requested length is returned."""
+        result = generate_keys(50, 12)
+        assert len(result) == 50
+        assert all(len(key) == 12 for key in result)
+
+    def test_only_alphabet_characters(self):
+        """Test that keys draw only from the alphanumeric alphabet."""
+        assert set(''.join(generate_keys(200))) <= set(ALPHABET)
+
+    def test_one_urandom_draw_for_a_batch(self):
+        """Test that a whole batch comes from a single CSPRNG call."""
+        with patch('dadpass_core.keys.os.urandom', wraps=os.urandom) as urandom:
+            generate_keys(500)
+        assert urandom.call_count == 1
+
+    def test_rejected_bytes_are_redrawn(self):
+        """Test that bytes past the last full multiple of the alphabet are discarded, not wrapped."""
+        # 248 and above would map onto 'a'..'h' a second time and bias them
+        draws = iter([bytes([255, 248, 0, 1]), bytes([2, 250, 3] + [0] * 64)])
+        with patch('dadpass_core.keys.os.urandom', side_effect=lambda n: next(draws)):
+            assert generate_key(4) == 'abcd'
+
+    def test_characters_are_uniform(self):
+        """Test that no character is favoured (modulo bias would over-weight the first eight)."""
+        counts = Counter(''.join(generate_keys(6200, 10)))
+        expected = 6200 * 10 / len(ALPHABET)
+        assert min(counts.values()) > expected * 0.8
+        assert max(counts.values()) < expected * 1.2
+
+    def test_custom_alphabet(self):
+        """Test that another alphabet can be used."""
+        assert set(generate_key(64, alphabet='01')) <= {'0', '1'}
+
+    def test_invalid_alphabet(self):
+        """Test that an alphabet with repeated characters is rejected."""
+        with pytest.raises(ValueError):
+            generate_key(alphabet='aab')
+
+
+class TestKeyPool:
+    """Unit tests for the pre-generated key pool."""
+
+    def test_keys_are_not_reused(self):
+        """Test that keys taken across several refills are all distinct."""
+        pool = KeyPool(size=16)
+        taken = [pool.take() for _ in range(100)] + pool.take_many(40)
+        assert len(set(taken)) == 140
+
+    def test_refills_in_bulk(self):
+        """Test that the pool generates a full pool at a time."""
+        pool = KeyPool(size=32)
+        with patch('dadpass_core.keys.generate_keys', wraps=keys.generate_keys) as generate:
+            for _ in range(64):
+                pool.take()
+        assert generate.call_count == 2
+
+    def test_take_many_larger_than_pool(self):
+        """Test that a request for more keys than the pool size is served in one go."""
+        assert len(KeyPool(size=8).take_many(100)) == 100
+
+    def test_concurrent_takers_get_distinct_keys(self):
+        """Test that threads sharing a pool never receive the same key."""
+        pool = KeyPool(size=64)
+        results = []
+
+        def take():
+            results.extend(pool.take() for _ in range(200))
+
+        threads = [threading.Thread(target=take) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(set(results)) == 1600
+
+    def test_forked_child_discards_inherited_keys(self):
+        """Test that a child process does not hand out keys its parent still holds."""
+        pool = KeyPool(size=16)
+        pool.take()
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            os.write(write_fd, ','.join(pool.take_many(15)).encode('utf-8'))
+            os._exit(0)
+        os.close(write_fd)
+        with os.fdopen(read_fd) as pipe:
+            child_keys = set(pipe.read().split(','))
+        os.waitpid(pid, 0)
+
+        assert not child_keys & set(pool.take_many(15))
+
+
+class TestCollisionProbability:
+    """Unit tests for the collision calculators."""
+
+    def test_keyspace(self):
+        """Test the number of 10-character alphanumeric keys."""
+        assert keyspace(10) == 62 ** 10
+
+    def test_collision_probability(self):
+        """Test the chance of one put hitting a live key."""
+        assert collision_probability(62 ** 5, length=10) == pytest.approx(62 ** -5)
+        assert collision_probability(10, length=1, alphabet_size=2) == 1.0
+
+    def test_birthday_probability(self):
+        """Test the any-pair collision chance against known values."""
+        # Two one-character binary keys collide half the time
+        assert birthday_probability(2, length=1, alphabet_size=2) == pytest.approx(0.5, rel=0.3)
+        assert birthday_probability(1, length=10) == 0.0
+        assert birthday_probability(10 ** 6, length=10) == pytest.approx(10 ** 12 / (2 * 62 ** 10), rel=1e-3)
@@ -0,0 +1,136 @@
+import io
+import json
+import logging
+import sys
+import threading
+from pathlib import Path
+
+# Add the shared source directory to the Python path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "src"))
+
+from dadpass_core.logs import (
+    DebugSampler, LogPipeline, RedactingFilter, RedactingFormatter, REDACTED, configure_logging, redact
+)
+
+
+def _record(message: str, *args, level: int = logging.INFO, exc_info=None) -> logging.LogRecord:
+    return logging.LogRecord('test', level, __file__, 1, message, args or None, exc_info)
+
+
+class TestRedact:
+    """Unit tests for the redact function."""
+
+    def test_message_fields(self):
+        """Test that message values are removed from JSON and printed dicts, escaped quotes included."""
+        event = json.dumps({'body': json.dumps({'message': 'the "wifi" is hunter2', 'ttlOption': '1day'})})
+
+        assert 'hunter2' not in redact(event)
+        assert '1day' in redact(event)
+        assert 'hunter2' not in redact(repr({'message': 'hunter2\\'}))
+        assert redact("{'message': \"it's hunter2\", 'ttlOption': '1day'}") == \
+            f"{{'message': \"{REDACTED}\", 'ttlOption': '1day'}}"
+        assert redact('{"encryptedMessage": "v1:gAAAA", "message": "x"}') == \
+            f'{{"encryptedMessage": "v1:gAAAA", "message": "{REDACTED}"}}'
+
+    def test_message_key_paths(self):
+        """Test that the key in a read path is removed but the batch route is left alone."""
+        assert redact('GET /dad-pass/Ab3dE6gH9j 200') == f'GET /dad-pass/{REDACTED} 200'
+        assert redact('POST /dad-pass/batch 200') == 'POST /dad-pass/batch 200'
+
+    def test_plain_text_is_unchanged(self):
+        """Test that text without secrets comes back as it was."""
+        assert redact('Key collision detected, retrying with a new message key') == \
+            'Key collision detected, retrying with a new message key'
+
+
+class TestRedactingHandlers:
+    """Unit tests for the redacting formatter and filter."""
+
+    def test_formatter_redacts_tracebacks(self):
+        """Test that a secret in an exception's text is redacted along with the message."""
+        try:
+            raise ValueError("bad body {'message': 'hunter2'}")
+        except ValueError:
+            record = _record('Failed on %s', '/dad-pass/Ab3dE6gH9j', exc_info=sys.exc_info())
+
+        text = RedactingFormatter().format(record)
+
+        assert 'hunter2' not in text and 'Ab3dE6gH9j' not in text
+        assert 'ValueError' in text
+
+    def test_filter_rewrites_the_record(self):
+        """Test that the filter leaves a fully formatted, redacted message for any handler."""
+        record = _record('Event: %s', {'message': 'hunter2'})
+
+        assert RedactingFilter().filter(record) is True
+        assert (record.msg, record.args) == (f"Event: {{'message': '{REDACTED}'}}", None)
+
+
+class TestDebugSampler:
+    """Unit tests for the DebugSampler filter."""
+
+    def test_debug_is_sampled_past_the_burst(self):
+        """Test that DEBUG records past the per-second budget are mostly dropped and other levels never are."""
+        sampler = DebugSampler(burst=10, rate=0.0)
+
+        debug_kept = sum(sampler.filter(_record('x', level=logging.DEBUG)) for _ in range(100))
+        info_kept = sum(sampler.filter(_record('x')) for _ in range(100))
+
+        # Allow one second boundary falling inside the loop
+        assert 10 <= debug_kept <= 20
+        assert info_kept == 100
+
+
+class TestLogPipeline:
+    """Unit tests for the queue-based LogPipeline."""
+
+    def test_formatting_and_writing_happen_on_the_listener(self):
+        """Test that the logging thread only enqueues, and the output is formatted and redacted elsewhere."""
+        formatted_on = []
+
+        class RecordingFormatter(RedactingFormatter):
+            def format(self, record):
+                formatted_on.append(threading.current_thread())
+                return super().format(record)
+
+        stream = io.StringIO()
+        output = logging.StreamHandler(stream)
+        output.setFormatter(RecordingFormatter('%(levelname)s %(message)s'))
+        pipeline = LogPipeline(output)
+        logger = logging.getLogger('dadpass.test_pipeline')
+        logger.propagate = False
+        logger.addHandler(pipeline.handler)
+        pipeline.start()
+        try:
+            logger.warning('Read %s', '/dad-pass/Ab3dE6gH9j')
+        finally:
+            pipeline.stop()
+            logger.removeHandler(pipeline.handler)
+
+        assert stream.getvalue() == f'WARNING Read /dad-pass/{REDACTED}\n'
+        assert formatted_on and threading.current_thread() not in formatted_on
+
+    def test_after_fork_starts_a_new_listener(self):
+        """Test that the pipeline keeps writing once its listener is restarted on a fresh queue."""
+        stream = io.StringIO()
+        pipeline = LogPipeline(logging.StreamHandler(stream))
+        pipeline.start()
+        previous_queue = pipeline.handler.queue
+
+        pipeline.after_fork()
+        pipeline.handler.handle(_record('after fork'))
+        pipeline.stop()
+
+        assert pipeline.handler.queue is not previous_queue
+        assert stream.getvalue() == 'after fork\n'
+
+    def test_configure_logging_leaves_configured_root_alone(self):
+        """Test that, like basicConfig, an already configured root logger is not touched."""
+        root = logging.getLogger()
+        handler = logging.NullHandler()
+        root.addHandler(handler)
+        try:
+            assert configure_logging() is None
+            assert handler in root.handlers
+        finally:
+            root.removeHandler(handler)
@@ -0,0 +1,124 @@
+import json
+import pytest
+import sys
+import threading
+from pathlib import Path
+
+# Add the shared source directory to the Python path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "src"))
+
+from dadpass_core.metrics import Counter, Histogram, MetricsRegistry, emf_line, recorded_since
+
+
+class TestHistogram:
+    """Unit tests for the fixed-bucket histogram."""
+
+    def test_bucket_bounds_are_inclusive(self):
+        """Test that a value equal to an upper bound lands in that bucket, and the rest overflow to +Inf."""
+        histogram = Histogram((0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 1.0, 7.0):
+            histogram.observe(value)
+
+        counts, total = histogram.snapshot()
+
+        assert counts == [2, 2, 1]
+        assert total == pytest.approx(8.65)
+        assert histogram.count == 5
+
+    def test_concurrent_observations_are_not_lost(self):
+        """Test that observations from many threads are all counted."""
+        histogram = Histogram()
+        counter = Counter()
+
+        def record():
+            for _ in range(5000):
+                histogram.observe(0.001)
+                counter.inc()
+
+        threads = [threading.Thread(target=record) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert histogram.count == 40000
+        assert counter.value == 40000
+
+
+class TestMetricsRegistry:
+    """Unit tests for registration and Prometheus exposition."""
+
+    def test_prometheus_text_format(self):
+        """Test counters and histograms in the text exposition format, with cumulative buckets."""
+        registry = MetricsRegistry()
+        requests = registry.counter('requests_total', 'Requests', labels=('route',))
+        latency = registry.histogram('latency_seconds', 'Latency', labels=('stage',), buckets=(0.01, 0.1))
+        requests.labels('/dad-pass').inc()
+        requests.labels('/dad-pass').inc()
+        latency.labels('store').observe(0.005)
+        latency.labels('store').observe(0.05)
+
+        assert registry.render() == (
+            '# HELP requests_total Requests\n'
+            '# TYPE requests_total counter\n'
+            'requests_total{route="/dad-pass"} 2\n'
+            '# HELP latency_seconds Latency\n'
+            '# TYPE latency_seconds histogram\n'
+            'latency_seconds_bucket{stage="store",le="0.01"} 1\n'
+            'latency_seconds_bucket{stage="store",le="0.1"} 2\n'
+            'latency_seconds_bucket{stage="store",le="+Inf"} 2\n'
+            'latency_seconds_sum{stage="store"} 0.055\n'
+            'latency_seconds_count{stage="store"} 2\n'
+        )
+
+    def test_label_values_are_escaped(self):
+        """Test that quotes, backslashes and newlines cannot break the exposition format."""
+        registry = MetricsRegistry()
+        registry.counter('odd_total', 'Odd labels', labels=('value',)).labels('a"b\\c\nd').inc()
+
+        assert 'odd_total{value="a\\"b\\\\c\\nd"} 1' in registry.render()
+
+    def test_registering_again_returns_the_same_metric(self):
+        """Test that two modules registering one metric share it, but a conflicting definition fails."""
+        registry = MetricsRegistry()
+        first = registry.counter('requests_total', 'Requests', labels=('route',))
+
+        assert registry.counter('requests_total', 'Requests', labels=('route',)) is first
+        with pytest.raises(ValueError):
+            registry.histogram('requests_total', 'Requests', labels=('route',))
+
+    def test_wrong_label_count(self):
+        """Test that a child must name every label."""
+        family = MetricsRegistry().counter('requests_total', 'Requests', labels=('method', 'route'))
+        with pytest.raises(ValueError):
+            family.labels('GET')
+
+    def test_recorded_since(self):
+        """Test that the difference of two snapshots is what was observed in between."""
+        registry = MetricsRegistry()
+        stages = registry.histogram('stage_seconds', 'Stages', labels=('stage',))
+        stages.labels('store').observe(1.0)
+        before = registry.totals()
+        stages.labels('store').observe(0.25)
+        stages.labels('encrypt').observe(0.5)
+
+        assert recorded_since(before, registry.totals()) == {
+            ('stage_seconds', ('store',)): (1, 0.25),
+            ('stage_seconds', ('encrypt',)): (1, 0.5)
+        }
+
+
+class TestEmf:
+    """Unit tests for the CloudWatch Embedded Metric Format line."""
+
+    def test_emf_document(self):
+        """Test that the metadata names every metric and dimension present at the top level."""
+        line = json.loads(emf_line('DadPass', {'Route': 'POST /dad-pass'}, {'RequestLatency': 12.5},
+                                   properties={'StatusCode': 200}))
+
+        metadata = line['_aws']['CloudWatchMetrics'][0]
+        assert metadata['Namespace'] == 'DadPass'
+        assert metadata['Dimensions'] == [['Route']]
+        assert metadata['Metrics'] == [{'Name': 'RequestLatency', 'Unit': 'Milliseconds'}]
+        assert isinstance(line['_aws']['Timestamp'], int)
+        assert (line['Route'], line['RequestLatency'], line['StatusCode']) == ('POST /dad-pass', 12.5, 200)
@@ -0,0 +1,330 @@
+import asyncio
+import base64
+import json
+import os
+import pytest
+import sys
+import time
+from pathlib import Path
+from unittest.mock import patch
+from cryptography.fernet import Fernet
+
+# Add the shared source directory to the Python path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "src"))
+
+from dadpass_core import crypto
+from dadpass_core.async_store import AsyncInMemoryMessageStore
+from dadpass_core.crypto import CLIENT_ENVELOPE_VERSION, CipherEngine
+from dadpass_core.metrics import REGISTRY, recorded_since
+from dadpass_core.service import (
+    AsyncMessageService, InvalidMessageError, MessageService, RequestTooLargeError, SizeLimits, COLLISION_ERROR,
+    MAX_BATCH_SIZE, UNAVAILABLE, validate_batch, validate_message
+)
+from dadpass_core.store import InMemoryMessageStore, MessageKeyExistsError
+
+
+@pytest.fixture(autouse=True)
+def engine():
+    crypto.set_engine(CipherEngine({'v1': Fernet.generate_key()}))
+    yield
+    crypto.set_engine(None)
+
+
+def _client_ciphertext(message_bytes: int = 16) -> str:
+    """What the browser sends in zero-knowledge mode: version, nonce, then ciphertext and tag."""
+    raw = bytes((CLIENT_ENVELOPE_VERSION,)) + os.urandom(12 + message_bytes + 16)
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def _taken(message_key: str) -> dict:
+    return {'messageKey': message_key, 'ttl': int(time.time()) + 3600, 'encryptedMessage': 'x', 'ttlOption': '1hour'}
+
+
+class TestValidateMessage:
+    """Unit tests for the validate_message function."""
+
+    def test_valid(self):
+        """Test that a message passes."""
+        assert validate_message({'message': 'a', 'ttlOption': '1day'}) is None
+
+    def test_invalid(self):
+        """Test that a body without a string message is rejected, as a batch entry would be."""
+        assert validate_message(['a']) == 'Message is required'
+        assert validate_message({'ttlOption': '1day'}) == 'Message is required'
+        assert validate_message({'message': 123}) == 'Message is required'
+        assert validate_message({'message': None}) == 'Message is required'
+
+
+class TestValidateBatch:
+    """Unit tests for the validate_batch function."""
+
+    def test_valid(self):
+        """Test that an array of messages passes."""
+        assert validate_batch([{'message': 'a'}, {'message': 'b', 'ttlOption': '1day'}]) is None
+
+    def test_invalid(self):
+        """Test each reason a batch is rejected."""
+        assert validate_batch({'message': 'a'}) == 'A non-empty array of messages is required'
+        assert validate_batch([]) == 'A non-empty array of messages is required'
+        assert 'At most' in validate_batch([{'message': 'a'}] * (MAX_BATCH_SIZE + 1))
+        assert validate_batch([{'message': 'a'}, {'message': 3}]) == 'Message is required (entry 1)'
+
+
+class TestSizeLimits:
+    """Unit tests for the SizeLimits class."""
+
+    def test_body_limits_admit_any_valid_request(self):
+        """Test that the largest valid bodies, every character escaped, are within the limits."""
+        limits = SizeLimits(max_message_length=64)
+        entry = {'message': '🔑' * 64, 'ttlOption': '15min'}
+        body = json.dumps(entry, indent=2).encode()
+
+        limits.check_body(len(body), limits.max_body_bytes)
+        limits.check_body(len(json.dumps([entry] * MAX_BATCH_SIZE).encode()), limits.max_batch_body_bytes)
+        limits.check_body(None, limits.max_body_bytes)
+        with pytest.raises(RequestTooLargeError, match=f'larger than {limits.max_body_bytes} bytes'):
+            limits.check_body(limits.max_body_bytes + 1, limits.max_body_bytes)
+
+    def test_limit_must_fit_a_dynamodb_item(self):
+        """Test that a message length whose ciphertext could outgrow a DynamoDB item is refused at startup."""
+        SizeLimits(max_message_length=50_000)
+        with pytest.raises(ValueError, match='item limit'):
+            SizeLimits(max_message_length=100_000)
+
+
+class TestMessageService:
+    """Unit tests for the synchronous message service."""
+
+    def test_create_then_read_once(self):
+        """Test that a message is stored encrypted and comes back exactly once."""
+        store = InMemoryMessageStore()
+        service = MessageService(store)
+
+        message_key = service.create_message({'message': 'secret', 'ttlOption': '1day'})['messageKey']
+
+        assert len(message_key) == 10 and message_key.isalnum()
+        assert service.get_message(message_key) == {'message': 'secret', 'ttlOption': '1day'}
+        assert service.get_message(message_key) == {'message': UNAVAILABLE}
+
+    @patch('dadpass_core.service.time')
+    def test_ttl_options(self, mock_time):
+        """Test that each TTL option sets the expiry and unknown options fall back to 5 days."""
+        mock_time.time.return_value = 1000000
+        store = InMemoryMessageStore()
+        service = MessageService(store)
+
+        with patch.object(store, 'put_if_absent') as put:
+            service.create_message({'message': 'a', 'ttlOption': '15min'})
+            service.create_message({'message': 'b', 'ttlOption': 'forever'})
+
+        assert [call.args[0]['ttl'] for call in put.call_args_list] == [1000900, 1432000]
+
+    def test_message_is_encrypted_at_rest(self):
+        """Test that the stored item holds ciphertext, not the message."""
+        store = InMemoryMessageStore()
+        service = MessageService(store)
+        message_key = service.create_message({'message': 'secret'})['messageKey']
+
+        item = store.consume(message_key)
+
+        assert 'secret' not in item['encryptedMessage']
+        assert crypto.decrypt_message(item['encryptedMessage']) == 'secret'
+
+    def test_missing_message_is_invalid(self):
+        """Test that a body without a message is rejected."""
+        with pytest.raises(InvalidMessageError, match='Message is required'):
+            MessageService(InMemoryMessageStore()).create_message({'ttlOption': '1hour'})
+
+    def test_long_message_is_too_large(self):
+        """Test that a message over the length limit is refused before it is encrypted or stored."""
+        store = InMemoryMessageStore()
+        service = MessageService(store, limits=SizeLimits(max_message_length=8))
+
+        with patch('dadpass_core.service.encrypt_message') as encrypt, pytest.raises(RequestTooLargeError):
+            service.create_message({'message': 'x' * 9})
+        with pytest.raises(RequestTooLargeError, match='longer than 8 characters'):
+            service.create_messages([{'message': 'short'}, {'message': 'x' * 9}])
+
+        encrypt.assert_not_called()
+        assert 'messageKey' in service.create_message({'message': 'x' * 8})
+
+    def test_taken_key_is_retried(self):
+        """Test that a collision is retried with a fresh key."""
+        store = InMemoryMessageStore()
+        store.put_if_absent(_taken('taken12345'))
+        service = MessageService(store)
+
+        with patch.object(service, 'new_key', side_effect=['taken12345', 'fresh12345']):
+            assert service.create_message({'message': 'secret'}) == {'messageKey': 'fresh12345'}
+
+    def test_collision_after_every_attempt(self):
+        """Test that MessageKeyExistsError escapes once every attempt is taken."""
+        store = InMemoryMessageStore()
+        store.put_if_absent(_taken('taken12345'))
+        service = MessageService(store, key_attempts=2)
+
+        with patch.object(service, 'new_key', return_value='taken12345'), pytest.raises(MessageKeyExistsError):
+            service.create_message({'message': 'secret'})
+
+    def test_unreadable_message_is_unavailable(self):
+        """Test that a message that cannot be decrypted is reported as gone."""
+        store = InMemoryMessageStore()
+        store.put_if_absent(_taken('broken1234'))
+
+        assert MessageService(store).get_message('broken1234') == {'message': UNAVAILABLE}
+
+    def test_batch_in_order_with_collisions(self):
+        """Test that a batch returns keys in order and re-keys only the entries that collided."""
+        store = InMemoryMessageStore()
+        store.put_if_absent(_taken('taken12345'))
+        service = MessageService(store, key_attempts=1)
+
+        with patch.object(service, 'new_key', side_effect=['first12345', 'taken12345']):
+            result = service.create_messages([{'message': 'one'}, {'message': 'two'}])
+
+        assert result == {'messages': [{'messageKey': 'first12345'}, {'error': COLLISION_ERROR}]}
+        assert service.get_message('first12345')['message'] == 'one'
+
+    def test_stages_are_timed(self):
+        """Test that store, encrypt and decrypt time is recorded for each request."""
+        service = MessageService(InMemoryMessageStore())
+        before = REGISTRY.totals()
+
+        service.get_message(service.create_message({'message': 'secret'})['messageKey'])
+
+        recorded = recorded_since(before, REGISTRY.totals())
+        assert {labels: count for (name, labels), (count, _) in recorded.items() if name == 'dadpass_stage_seconds'} == {
+            ('encrypt',): 1, ('store',): 2, ('decrypt',): 1
+        }
+
+
+class TestClientEncryption:
+    """Unit tests for zero-knowledge mode, where the browser sends ciphertext the server cannot read."""
+
+    def test_ciphertext_stored_and_returned_as_sent(self):
+        """Test that client ciphertext round-trips untouched, once, without server-side crypto."""
+        store = InMemoryMessageStore()
+        service = MessageService(store)
+        ciphertext = _client_ciphertext()
+
+        with patch('dadpass_core.service.encrypt_message', side_effect=AssertionError), \
+                patch('dadpass_core.service.decrypt_message', side_effect=AssertionError):
+            message_key = service.create_message({'ciphertext': ciphertext, 'ttlOption': '1hour'})['messageKey']
+            assert service.get_message(message_key) == {'ciphertext': ciphertext, 'ttlOption': '1hour'}
+            assert service.get_message(message_key) == {'message': UNAVAILABLE}
+
+    def test_server_key_id_that_looks_like_a_client_envelope(self):
+        """Test that a server message is decrypted even when its key id decodes like the client envelope's version byte."""
+        for key_id in ('Az01', 'Aw-2024', 'A0key'):
+            crypto.set_engine(CipherEngine({key_id: Fernet.generate_key()}))
+            service = MessageService(InMemoryMessageStore())
+
+            message_key = service.create_message({'message': 'secret', 'ttlOption': '1hour'})['messageKey']
+
+            assert service.get_message(message_key) == {'message': 'secret', 'ttlOption': '1hour'}
+
+    def test_malformed_ciphertext(self):
+        """Test that ciphertext that is not a client envelope, or comes with a message, is refused."""
+        service = MessageService(InMemoryMessageStore())
+        fernet_token = Fernet(Fernet.generate_key()).encrypt(b'secret').decode('ascii')
+
+        for body, error in (({'ciphertext': 'not base64!'}, 'URL-safe base64'),
+                            ({'ciphertext': fernet_token}, 'not a client-encrypted message'),
+                            ({'ciphertext': 42}, 'must be a string'),
+                            ({'ciphertext': _client_ciphertext(), 'message': 'secret'}, 'not both')):
+            with pytest.raises(InvalidMessageError, match=error):
+                service.create_message(body)
+
+    def test_size_limit(self):
+        """Test that ciphertext longer than the longest message could encrypt to is refused with 413."""
+        service = MessageService(InMemoryMessageStore(), limits=SizeLimits(max_message_length=16))
+
+        service.create_message({'ciphertext': _client_ciphertext(16 * 4)})
+        with pytest.raises(RequestTooLargeError, match='Ciphertext is longer than'):
+            service.create_message({'ciphertext': _client_ciphertext(16 * 4 + 3)})
+
+    def test_mixed_batch(self):
+        """Test that a batch can mix server-encrypted and client-encrypted entries."""
+        service = MessageService(InMemoryMessageStore())
+        ciphertext = _client_ciphertext()
+
+        created = service.create_messages([{'message': 'secret'}, {'ciphertext': ciphertext}, {'message': 'other'}])
+        keys = [entry['messageKey'] for entry in created['messages']]
+
+        assert [service.get_message(key) for key in keys] == [
+            {'message': 'secret', 'ttlOption': '5days'},
+            {'ciphertext': ciphertext, 'ttlOption': '5days'},
+            {'message': 'other', 'ttlOption': '5days'}
+        ]
+        assert validate_batch([{'ciphertext': 'AAAA'}]) == 'Ciphertext is not a client-encrypted message (entry 0)'
+
+    def test_async_service_never_waits_for_keys(self):
+        """Test that client-encrypted creates and reads go ahead while the keys are still loading."""
+        class PendingKeyRing:
+            ready = False
+            load_timeout = 1
+
+            def wait_until_ready(self, timeout):
+                raise AssertionError('waited for keys')
+
+        service = AsyncMessageService(AsyncInMemoryMessageStore(), PendingKeyRing())
+        ciphertext = _client_ciphertext()
+
+        async def scenario():
+            created = await service.create_messages([{'ciphertext': ciphertext, 'ttlOption': '1day'}])
+            return await service.get_message(created['messages'][0]['messageKey'])
+
+        assert asyncio.run(scenario()) == {'ciphertext': ciphertext, 'ttlOption': '1day'}
+
+
+class TestAsyncMessageService:
+    """Unit tests for the asyncio message service."""
+
+    def test_create_then_read_once(self):
+        """Test that a message is stored encrypted and comes back exactly once."""
+        service = AsyncMessageService(AsyncInMemoryMessageStore())
+
+        async def scenario():
+            created = await service.create_message({'message': 'secret', 'ttlOption': '15min'})
+            return (await service.get_message(created['messageKey']),
+                    await service.get_message(created['messageKey']))
+
+        first, second = asyncio.run(scenario())
+        assert first == {'message': 'secret', 'ttlOption': '15min'}
+        assert second == {'message': UNAVAILABLE}
+
+    def test_taken_key_is_retried(self):
+        """Test that a collision is retried with a fresh key."""
+        store = AsyncInMemoryMessageStore()
+        store.store.put_if_absent(_taken('taken12345'))
+        service = AsyncMessageService(store)
+
+        with patch.object(service, 'new_key', side_effect=['taken12345', 'fresh12345']):
+            assert asyncio.run(service.create_message({'message': 'secret'})) == {'messageKey': 'fresh12345'}
+
+    def test_batch(self):
+        """Test that every batch entry is created and readable in order."""
+        service = AsyncMessageService(AsyncInMemoryMessageStore())
+
+        async def scenario():
+            created = await service.create_messages([{'message': f'secret {i}'} for i in range(3)])
+            return [(await service.get_message(entry['messageKey']))['message'] for entry in created['messages']]
+
+        assert asyncio.run(scenario()) == ['secret 0', 'secret 1', 'secret 2']
+
+    def test_waits_for_pending_keys_off_the_loop(self):
+        """Test that a key load still in flight is awaited before encrypting."""
+        class PendingKeyRing:
+            ready = False
+            load_timeout = 1
+            waited = False
+
+            def wait_until_ready(self, timeout):
+                self.waited = True
+
+        key_ring = PendingKeyRing()
+        service = AsyncMessageService(AsyncInMemoryMessageStore(), key_ring)
+
+        asyncio.run(service.create_message({'message': 'secret'}))
+
+        assert key_ring.waited is True
@@ -0,0 +1,315 @@
+import pytest
+import sys
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import patch
+from boto3.dynamodb.types import TypeSerializer
+from botocore.exceptions import ClientError
+
+# Add the shared source directory to the Python path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "src"))
+
+from dadpass_core import store as store_module
+from dadpass_core.store import (
+    DynamoDBMessageStore, InMemoryMessageStore, RedisMessageStore, MessageKeyExistsError, create_store
+)
+
+
+def _conditional_check_failed(item: dict | None = None) -> ClientError:
+    response = {'Error': {'Code': 'ConditionalCheckFailedException', 'Message': 'The conditional request failed'}}
+    if item is not None:
+        # Errors bypass the resource layer, so the existing item comes back in DynamoDB JSON
+        response['Item'] = {key: TypeSerializer().serialize(value) for key, value in item.items()}
+    return ClientError(response, 'ConditionalOperation')
+
+
+class FakeDynamoTable:
+    """
+    Thread-safe in-memory stand-in for the conditional PutItem/DeleteItem calls the store makes,
+    and the TransactWriteItems it sends through the table's client.
+    """
+    
+    name = 'test-messages-table'
+    
+    def __init__(self):
+        self.items = {}
+        self.transactions = []
+        # Cancellation codes to force on the next transactions, one list per call
+        self.forced_cancellations = []
+        self._lock = threading.Lock()
+        self.meta = SimpleNamespace(client=self)
+    
+    def transact_write_items(self, TransactItems, ClientRequestToken=None):
+        with self._lock:
+            self.transactions.append(len(TransactItems))
+            puts = [action['Put'] for action in TransactItems]
+            codes = self.forced_cancellations.pop(0) if self.forced_cancellations else [
+                # attribute_not_exists(messageKey) OR #ttl < :now
+                'ConditionalCheckFailed'
+                if put['Item']['messageKey'] in self.items
+                and self.items[put['Item']['messageKey']]['ttl'] >= put['ExpressionAttributeValues'][':now']
+                else 'None'
+                for put in puts
+            ]
+            if any(code != 'None' for code in codes):
+                raise ClientError({
+                    'Error': {'Code': 'TransactionCanceledException', 'Message': 'Transaction cancelled'},
+                    'CancellationReasons': [{'Code': code} for code in codes]
+                }, 'TransactWriteItems')
+            for put in puts:
+                self.items[put['Item']['messageKey']] = dict(put['Item'])
+        return {}
+    
+    def put_item(self, Item, ConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues,
+                 ReturnValuesOnConditionCheckFailure='NONE'):
+        with self._lock:
+            # attribute_not_exists(messageKey) OR #ttl < :now
+            existing = self.items.get(Item['messageKey'])
+            if existing is not None and existing['ttl'] >= ExpressionAttributeValues[':now']:
+                raise _conditional_check_failed(existing if ReturnValuesOnConditionCheckFailure == 'ALL_OLD' else None)
+            self.items[Item['messageKey']] = dict(Item)
+        return {}
+    
+    def delete_item(self, Key, ConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues,
+                    ReturnValues):
+        with self._lock:
+            # attribute_exists(messageKey) AND #ttl >= :now
+            item = self.items.get(Key['messageKey'])
+            if item is None or item['ttl'] < ExpressionAttributeValues[':now']:
+                raise _conditional_check_failed()
+            del self.items[Key['messageKey']]
+        return {'Attributes': item}
+
+
+class FakeRedis:
+    """In-memory stand-in for the redis-py SET NX EX / GETDEL calls the store makes."""
+    
+    def __init__(self):
+        self.values = {}
+        self._lock = threading.Lock()
+    
+    def set(self, name, value, nx=False, ex=None):
+        with self._lock:
+            entry = self.values.get(name)
+            if nx and entry is not None and entry[1] > time.time():
+                return None
+            self.values[name] = (value.encode('utf-8'), time.time() + ex)
+            return True
+    
+    def getdel(self, name):
+        with self._lock:
+            entry = self.values.pop(name, None)
+        if entry is None or entry[1] <= time.time():
+            return None
+        return entry[0]
+    
+    def pipeline(self, transaction=True):
+        return FakeRedisPipeline(self)
+
+
+class FakeRedisPipeline:
+    """Queues SET calls and runs them on execute(), like a redis-py pipeline."""
+    
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+    
+    def set(self, *args, **kwargs):
+        self.commands.append((args, kwargs))
+    
+    def execute(self):
+        return [self.redis.set(*args, **kwargs) for args, kwargs in self.commands]
+
+
+def _item(message_key: str, ttl_offset: int = 3600) -> dict:
+    return {
+        'messageKey': message_key,
+        'ttl': int(time.time()) + ttl_offset,
+        'encryptedMessage': 'v1:gHRva2Vu',
+        'ttlOption': '1hour'
+    }
+
+
+@pytest.fixture(params=['dynamodb', 'memory', 'redis'])
+def store(request):
+    if request.param == 'dynamodb':
+        return DynamoDBMessageStore(FakeDynamoTable())
+    if request.param == 'memory':
+        return InMemoryMessageStore(stripes=4)
+    return RedisMessageStore(FakeRedis())
+
+
+class TestMessageStoreContract:
+    """Behaviour every store implementation must share."""
+    
+    def test_put_then_consume(self, store):
+        """Test that a stored message comes back once."""
+        item = _item('abc123')
+        store.put_if_absent(item)
+        assert store.consume('abc123') == item
+        assert store.consume('abc123') is None
+    
+    def test_consume_missing(self, store):
+        """Test that an unknown key is reported as gone."""
+        assert store.consume('missing') is None
+    
+    def test_put_if_absent_rejects_live_key(self, store):
+        """Test that a live message cannot be overwritten."""
+        store.put_if_absent(_item('abc123'))
+        with pytest.raises(MessageKeyExistsError):
+            store.put_if_absent({**_item('abc123'), 'encryptedMessage': 'v1:b3RoZXI='})
+    
+    def test_expired_message_is_gone(self, store):
+        """Test that a message past its ttl cannot be read."""
+        item = _item('abc123', ttl_offset=60)
+        store.put_if_absent(item)
+        with patch('dadpass_core.store.time.time', return_value=time.time() + 120):
+            assert store.consume('abc123') is None
+    
+    def test_exactly_one_concurrent_reader_wins(self, store):
+        """Test that only one of many simultaneous readers gets the message."""
+        readers = 32
+        store.put_if_absent(_item('race'))
+        barrier = threading.Barrier(readers)
+        results = []
+        
+        def reader():
+            barrier.wait()
+            results.append(store.consume('race'))
+        
+        threads = [threading.Thread(target=reader) for _ in range(readers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        assert sum(result is not None for result in results) == 1
+    
+    def test_put_many_reports_taken_keys(self, store):
+        """Test that a batch stores every free key and returns the taken ones in order."""
+        store.put_if_absent(_item('taken1'))
+        store.put_if_absent(_item('taken2'))
+        batch = [_item('free1'), _item('taken2'), _item('free2'), _item('taken1')]
+        
+        collided = store.put_many_if_absent(batch)
+        
+        assert [item['messageKey'] for item in collided] == ['taken2', 'taken1']
+        assert store.consume('free1') == batch[0]
+        assert store.consume('free2') == batch[2]
+        assert store.consume('taken1')['encryptedMessage'] == 'v1:gHRva2Vu'
+
+
+class TestDynamoDBMessageStore:
+    """Unit tests specific to the DynamoDB store."""
+    
+    def test_retry_of_applied_put_succeeds(self):
+        """Test that a put finding exactly its own item, as a retry after a lost response does, succeeds."""
+        table = FakeDynamoTable()
+        store = DynamoDBMessageStore(table)
+        item = _item('abc123')
+        
+        store.put_if_absent(item)
+        store.put_if_absent(item)
+        
+        assert list(table.items) == ['abc123']
+
+
+class TestDynamoDBBatch:
+    """Unit tests for the transactional batch writes of the DynamoDB store."""
+    
+    def test_chunks_by_transaction_limit(self):
+        """Test that a large batch is split into transactions of at most 100 items."""
+        table = FakeDynamoTable()
+        store = DynamoDBMessageStore(table)
+        
+        assert store.put_many_if_absent([_item(f'key{i}') for i in range(250)]) == []
+        
+        assert table.transactions == [100, 100, 50]
+        assert len(table.items) == 250
+    
+    def test_collisions_resubmit_the_rest(self):
+        """Test that a cancelled transaction is resent without the items whose keys are taken."""
+        table = FakeDynamoTable()
+        store = DynamoDBMessageStore(table)
+        store.put_if_absent(_item('taken'))
+        
+        collided = store.put_many_if_absent([_item('a'), _item('taken'), _item('b')])
+        
+        assert [item['messageKey'] for item in collided] == ['taken']
+        assert table.transactions == [3, 2]
+        assert set(table.items) == {'taken', 'a', 'b'}
+    
+    def test_throttled_items_are_retried(self):
+        """Test that items cancelled by throttling are retried with backoff."""
+        table = FakeDynamoTable()
+        table.forced_cancellations = [['ThrottlingError', 'None']]
+        store = DynamoDBMessageStore(table)
+        
+        with patch.object(store_module, 'TRANSACT_BACKOFF_SECONDS', 0):
+            assert store.put_many_if_absent([_item('a'), _item('b')]) == []
+        
+        assert table.transactions == [2, 2]
+        assert set(table.items) == {'a', 'b'}
+    
+    def test_persistent_throttling_raises(self):
+        """Test that a chunk still throttled after every attempt raises."""
+        table = FakeDynamoTable()
+        table.forced_cancellations = [['ThrottlingError']] * store_module.TRANSACT_MAX_ATTEMPTS
+        store = DynamoDBMessageStore(table)
+        
+        with patch.object(store_module, 'TRANSACT_BACKOFF_SECONDS', 0), pytest.raises(ClientError):
+            store.put_many_if_absent([_item('a')])
+    
+    def test_repeated_key_in_batch_is_a_collision(self):
+        """Test that a key repeated within one batch is reported instead of failing the transaction."""
+        store = DynamoDBMessageStore(FakeDynamoTable())
+        batch = [_item('same'), _item('same')]
+        
+        collided = store.put_many_if_absent(batch)
+        
+        assert collided == [batch[1]]
+
+
+class TestInMemoryMessageStore:
+    """Unit tests specific to the in-memory store."""
+    
+    def test_expired_key_can_be_reused(self):
+        """Test that an expired message does not block its key."""
+        store = InMemoryMessageStore()
+        store.put_if_absent(_item('abc123', ttl_offset=-1))
+        store.put_if_absent(_item('abc123'))
+        assert store.consume('abc123') is not None
+    
+    def test_purge_expired(self):
+        """Test that purge_expired drops only expired messages."""
+        store = InMemoryMessageStore()
+        store.put_if_absent(_item('old', ttl_offset=-1))
+        store.put_if_absent(_item('new'))
+        assert store.purge_expired() == 1
+        assert len(store) == 1
+
+
+class TestRedisMessageStore:
+    """Unit tests specific to the Redis-protocol store."""
+    
+    def test_uses_server_side_expiry(self):
+        """Test that messages are written with NX and an EX matching their ttl."""
+        client = FakeRedis()
+        RedisMessageStore(client).put_if_absent(_item('abc123', ttl_offset=900))
+        value, expires_at = client.values['dad-pass:abc123']
+        assert 895 <= expires_at - time.time() <= 900
+
+
+class TestCreateStore:
+    """Unit tests for the create_store factory."""
+    
+    def test_memory(self):
+        """Test that 'memory' builds the in-memory store."""
+        assert isinstance(create_store('memory'), InMemoryMessageStore)
+    
+    def test_unknown_store(self):
+        """Test that an unknown store name is rejected."""
+        with pytest.raises(ValueError):
+            create_store('sqlite')
@@ -0,0 +1,249 @@
+import asyncio
+import json
+import pytest
+import socket
+import sys
+from pathlib import Path
+from unittest.mock import MagicMock
+from cryptography.fernet import Fernet
+
+# Add the shared source directory to the Python path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "src"))
+
+from dadpass_core import crypto, tracing
+from dadpass_core.crypto import AES_GCM_CIPHER, DATA_KEY_CIPHER, CipherEngine
+from dadpass_core.datakeys import DataKeyCache, LocalDataKeyProvider
+from dadpass_core.keyring import SsmKeyLoader
+from dadpass_core.store import DynamoDBMessageStore
+from dadpass_core.tracing import (
+    FileExporter, TraceContext, Tracer, XRayDaemonExporter, context_from_headers, create_exporter,
+    parse_traceparent, parse_xray_header
+)
+
+TRACE_ID = '4bf92f3577b34da6a3ce929d0e0e4736'
+
+
+class ListExporter:
+    def __init__(self):
+        self.spans = []
+
+    def export(self, span):
+        self.spans.append(span)
+
+    @property
+    def names(self) -> list[str]:
+        return [span.name for span in self.spans]
+
+
+@pytest.fixture
+def exporter():
+    exporter = ListExporter()
+    previous = tracing.get_tracer()
+    tracing.set_tracer(Tracer(exporter, sample_rate=1.0))
+    yield exporter
+    tracing.set_tracer(previous)
+
+
+class TestPropagation:
+    """Unit tests for reading the caller's trace context."""
+
+    def test_traceparent(self):
+        """Test a W3C traceparent header, including its sampled flag."""
+        assert parse_traceparent(f'00-{TRACE_ID}-00f067aa0ba902b7-01') == TraceContext(TRACE_ID, '00f067aa0ba902b7', True)
+        assert parse_traceparent(f'00-{TRACE_ID}-00f067aa0ba902b7-00').sampled is False
+        for header in (None, '', 'garbage', f'00-{"0" * 32}-00f067aa0ba902b7-01', f'00-{TRACE_ID}-xyz-01'):
+            assert parse_traceparent(header) is None
+
+    def test_xray_header(self):
+        """Test an X-Ray trace header, with and without a sampling decision."""
+        header = 'Root=1-5759e988-bd862e3fe1be46a994272793;Parent=53995c3f42cd8ad8;Sampled=1'
+
+        assert parse_xray_header(header) == TraceContext('5759e988bd862e3fe1be46a994272793', '53995c3f42cd8ad8', True)
+        assert parse_xray_header('Root=1-5759e988-bd862e3fe1be46a994272793;Sampled=?').sampled is None
+        assert parse_xray_header('Root=nonsense') is None
+
+    def test_headers_are_case_insensitive_and_traceparent_wins(self):
+        """Test that header names match in any case and traceparent is preferred over X-Amzn-Trace-Id."""
+        headers = {
+            'X-Amzn-Trace-Id': 'Root=1-5759e988-bd862e3fe1be46a994272793;Sampled=1',
+            'TraceParent': f'00-{TRACE_ID}-00f067aa0ba902b7-01'
+        }
+
+        assert context_from_headers(headers).trace_id == TRACE_ID
+        assert context_from_headers({'x-amzn-trace-id': headers['X-Amzn-Trace-Id']}).parent_id is None
+        assert context_from_headers(None) is None
+
+
+class TestTracer:
+    """Unit tests for starting, nesting and sampling spans."""
+
+    def test_spans_nest_under_the_trace(self, exporter):
+        """Test that spans record their parent and are exported as they finish, innermost first."""
+        with tracing.trace('GET /dad-pass/<message_key>', parent=TraceContext(TRACE_ID, 'aaaaaaaaaaaaaaaa', True)) as root:
+            with tracing.span('DynamoDB.DeleteItem', table='messages') as store:
+                pass
+            with tracing.span('Fernet.decrypt'):
+                pass
+
+        assert exporter.names == ['DynamoDB.DeleteItem', 'Fernet.decrypt', 'GET /dad-pass/<message_key>']
+        assert {span.trace_id for span in exporter.spans} == {TRACE_ID}
+        assert root.parent_id == 'aaaaaaaaaaaaaaaa'
+        assert store.parent_id == root.span_id
+        assert store.attributes == {'table': 'messages'}
+        assert tracing.current_span() is None
+
+    def test_span_outside_a_trace_is_a_noop(self, exporter):
+        """Test that instrumented code run outside any request records nothing."""
+        with tracing.span('Fernet.encrypt') as span:
+            span.set('ignored', True)
+
+        assert exporter.spans == []
+
+    def test_caller_sampling_decision_is_kept(self, exporter):
+        """Test that a caller that is not recording the trace turns it off here too."""
+        with tracing.trace('POST /dad-pass', parent=TraceContext(TRACE_ID, 'aaaaaaaaaaaaaaaa', False)):
+            with tracing.span('DynamoDB.PutItem'):
+                pass
+
+        assert exporter.spans == []
+
+    def test_sample_rate_applies_to_new_traces(self):
+        """Test that new traces are recorded at the configured rate."""
+        exporter = ListExporter()
+        never, always = Tracer(exporter, sample_rate=0.0), Tracer(exporter, sample_rate=1.0)
+
+        with never.trace('POST /dad-pass'):
+            pass
+        with always.trace('POST /dad-pass') as span:
+            pass
+
+        assert exporter.spans == [span]
+        assert len(span.trace_id) == 32
+
+    def test_disabled_tracer_ignores_sampled_callers(self):
+        """Test that without an exporter nothing is recorded, whatever the caller decided."""
+        span = Tracer(None).trace('POST /dad-pass', parent=TraceContext(TRACE_ID, None, True))
+
+        assert span is tracing._NOOP_SPAN
+
+    def test_error_is_recorded_and_raised(self, exporter):
+        """Test that a failing operation is marked on its span and the exception still propagates."""
+        with pytest.raises(TimeoutError):
+            with tracing.trace('POST /dad-pass'):
+                with tracing.span('DynamoDB.PutItem'):
+                    raise TimeoutError()
+
+        assert [span.error for span in exporter.spans] == ['TimeoutError', 'TimeoutError']
+
+    def test_concurrent_tasks_keep_their_own_trace(self, exporter):
+        """Test that spans follow their own asyncio task rather than whichever request ran last."""
+        async def request(name):
+            with tracing.trace(name) as root:
+                await asyncio.sleep(0)
+                with tracing.span('DynamoDB.DeleteItem') as child:
+                    await asyncio.sleep(0)
+            return root, child
+
+        async def scenario():
+            return await asyncio.gather(request('first'), request('second'))
+
+        for root, child in asyncio.run(scenario()):
+            assert (child.trace_id, child.parent_id) == (root.trace_id, root.span_id)
+
+
+class TestExporters:
+    """Unit tests for the local and X-Ray exporters."""
+
+    def test_file_exporter_writes_json_lines(self, tmp_path):
+        """Test that each span is appended to the file as one JSON object."""
+        path = tmp_path / 'traces.jsonl'
+        tracer = Tracer(FileExporter(str(path)), sample_rate=1.0)
+
+        with tracer.trace('POST /dad-pass'):
+            with tracing.span('Fernet.encrypt', messages=2):
+                pass
+
+        lines = [json.loads(line) for line in path.read_text().splitlines()]
+        assert [line['name'] for line in lines] == ['Fernet.encrypt', 'POST /dad-pass']
+        assert lines[0]['parentId'] == lines[1]['spanId']
+        assert lines[0]['attributes'] == {'messages': 2}
+        assert lines[0]['durationMs'] >= 0
+
+    def test_xray_exporter_sends_subsegments(self):
+        """Test that a span reaches the daemon address as an X-Ray subsegment of its parent."""
+        daemon = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        daemon.bind(('127.0.0.1', 0))
+        daemon.settimeout(5)
+        exporter = XRayDaemonExporter(f'tcp:127.0.0.1:1 udp:127.0.0.1:{daemon.getsockname()[1]}')
+        parent = parse_xray_header('Root=1-5759e988-bd862e3fe1be46a994272793;Parent=53995c3f42cd8ad8;Sampled=1')
+
+        with Tracer(exporter).trace('POST /dad-pass', parent=parent, **{'http.status': 200}):
+            pass
+
+        header, document = daemon.recv(65536).decode().split('\n', 1)
+        daemon.close()
+        document = json.loads(document)
+        assert json.loads(header) == {'format': 'json', 'version': 1}
+        assert document['type'] == 'subsegment'
+        assert document['trace_id'] == '1-5759e988-bd862e3fe1be46a994272793'
+        assert document['parent_id'] == '53995c3f42cd8ad8'
+        assert document['annotations'] == {'http_status': 200}
+
+    def test_unknown_exporter(self):
+        """Test that a mistyped TRACE_EXPORTER fails at startup."""
+        assert create_exporter('none') is None
+        with pytest.raises(ValueError):
+            create_exporter('jaeger')
+
+
+class TestInstrumentation:
+    """Tests for the spans recorded around AWS calls."""
+
+    def test_dynamodb_calls(self, exporter):
+        """Test that the store's DynamoDB calls are traced with the table name."""
+        table = MagicMock()
+        table.name = 'messages'
+        table.delete_item.return_value = {}
+        store = DynamoDBMessageStore(table)
+
+        with tracing.trace('request'):
+            store.put_if_absent({'messageKey': 'abc', 'ttl': 1, 'encryptedMessage': 'v1:gHRva2Vu', 'ttlOption': '1hour'})
+            store.consume('abc')
+
+        assert exporter.names == ['DynamoDB.PutItem', 'DynamoDB.DeleteItem', 'request']
+        assert exporter.spans[0].attributes == {'table': 'messages'}
+
+    def test_cipher_spans_name_the_cipher_used(self, exporter):
+        """Test that encrypt spans name the engine's cipher and decrypt spans the cipher the message was written with."""
+        key = Fernet.generate_key()
+        data_keys = DataKeyCache(LocalDataKeyProvider())
+        try:
+            fernet_message = crypto.set_engine(CipherEngine({'v1': key})).encrypt('secret')
+            crypto.set_engine(CipherEngine({'v1': key}, cipher=DATA_KEY_CIPHER, data_keys=data_keys))
+            with tracing.trace('request'):
+                data_key_message = crypto.encrypt_message('secret')
+            crypto.set_engine(CipherEngine({'v1': key}, cipher=AES_GCM_CIPHER, data_keys=data_keys))
+
+            with tracing.trace('request'):
+                crypto.decrypt_message(crypto.encrypt_messages(['secret'])[0])
+                crypto.decrypt_message(fernet_message)
+                crypto.decrypt_message(data_key_message)
+        finally:
+            crypto.set_engine(None)
+
+        assert exporter.names == ['DataKey.encrypt', 'request', 'AESGCM.encrypt', 'AESGCM.decrypt', 'Fernet.decrypt',
+                                  'DataKey.decrypt', 'request']
+
+    def test_key_load_starts_its_own_trace(self, exporter):
+        """Test that a background SSM key load is traced even though no request is in flight."""
+        ssm = MagicMock()
+        ssm.get_paginator.return_value.paginate.return_value = [
+            {'Parameters': [{'Name': '/dad-pass/encryption-keys/v1', 'Value': 'key'}]}
+        ]
+        ssm.get_parameter.return_value = {'Parameter': {'Value': 'legacy'}}
+
+        SsmKeyLoader(lambda: ssm)()
+
+        assert exporter.names == ['SSM.CreateClient', 'SSM.GetParametersByPath', 'SSM.GetParameter',
+                                  'load_encryption_keys']
+        assert len({span.trace_id for span in exporter.spans}) == 1